@@ -0,0 +1,145 @@
+import time
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# a single server side copy from src_bucket/src_key to dst_bucket/dst_key of an object of size bytes
+CopyItem = namedtuple('CopyItem', ['src_bucket', 'src_key', 'dst_bucket', 'dst_key', 'size'])
+
+# S3 copy_object only supports objects up to 5GB, larger objects have to be copied in parts
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+# delete_objects accepts at most 1000 keys per request
+MAX_DELETE_OBJECTS_KEYS = 1000
+
+
+class S3CopyEngine(object):
+    """
+    Copies S3 objects server side on a bounded thread pool.
+
+    Objects larger than the multipart threshold are copied with multipart upload_part_copy requests, the source
+    objects of a move are removed with batched delete_objects requests once all objects have been copied.
+    """
+
+    def __init__(self, client, max_workers=None, multipart_threshold=MAX_COPY_OBJECT_SIZE, part_size=None,
+                 progress_callback=None, progress_interval=None):
+        """
+        :param client: boto3 S3 client used to copy the objects
+        :param max_workers: number of copy requests running concurrently
+        :param multipart_threshold: objects larger than this are copied in parts
+        :param part_size: size in bytes of a single upload_part_copy
+        :param progress_callback: called as progress_callback(copied, total) while copying
+        :param progress_interval: minimum number of seconds between two progress_callback calls
+        """
+        self.client = client
+        self.max_workers = max_workers or getattr(settings, "S3_COPY_MAX_WORKERS", 16)
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size or getattr(settings, "S3_COPY_PART_SIZE", 1024 * 1024 * 512)
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval if progress_interval is not None else \
+            getattr(settings, "S3_COPY_PROGRESS_INTERVAL", 5)
+
+    def _copy_object(self, item):
+        if item.size is not None and item.size > self.multipart_threshold:
+            self._copy_multipart(item)
+        else:
+            self.client.copy_object(
+                Bucket=item.dst_bucket,
+                Key=item.dst_key,
+                CopySource={"Bucket": item.src_bucket, "Key": item.src_key},
+            )
+        return item
+
+    def _copy_multipart(self, item):
+        upload_id = self.client.create_multipart_upload(Bucket=item.dst_bucket, Key=item.dst_key)["UploadId"]
+        try:
+            parts = []
+            start = 0
+            part_number = 1
+            while start < item.size:
+                end = min(start + self.part_size, item.size) - 1
+                response = self.client.upload_part_copy(
+                    Bucket=item.dst_bucket,
+                    Key=item.dst_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    CopySource={"Bucket": item.src_bucket, "Key": item.src_key},
+                    CopySourceRange=f"bytes={start}-{end}",
+                )
+                parts.append({"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]})
+                part_number += 1
+                start = end + 1
+            self.client.complete_multipart_upload(Bucket=item.dst_bucket, Key=item.dst_key, UploadId=upload_id,
+                                                  MultipartUpload={"Parts": parts})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=item.dst_bucket, Key=item.dst_key, UploadId=upload_id)
+            raise
+
+    def _report_progress(self, copied, total, force=False):
+        if self.progress_callback is None:
+            return
+        now = time.time()
+        if force or now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            try:
+                self.progress_callback(copied, total)
+            except Exception as ex:
+                # progress reporting must never break the copy itself
+                logger.warning(f"Failed to report copy progress: {ex}")
+
+    def copy(self, items):
+        """
+        Copies all items, raising the first error encountered after the outstanding copies are cancelled
+        :param items: an iterable of CopyItem
+        :return: the number of objects copied
+        """
+        items = list(items)
+        total = len(items)
+        copied = 0
+        self._last_progress = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            items_iter = iter(items)
+            try:
+                while True:
+                    # keep a bounded number of copies queued so huge listings do not create huge queues
+                    for item in items_iter:
+                        pending.add(executor.submit(self._copy_object, item))
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        copied += 1
+                    self._report_progress(copied, total)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        self._report_progress(copied, total, force=True)
+        return copied
+
+    def delete(self, bucket, keys):
+        """
+        Deletes keys from bucket with batched delete_objects requests
+        :param bucket: the bucket name
+        :param keys: an iterable of object keys
+        :return: the number of objects deleted
+        """
+        keys = list(keys)
+        for i in range(0, len(keys), MAX_DELETE_OBJECTS_KEYS):
+            batch = keys[i:i + MAX_DELETE_OBJECTS_KEYS]
+            response = self.client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            errors = response.get("Errors")
+            if errors:
+                raise IOError(f"Failed to delete {len(errors)} objects from {bucket}: "
+                              f"{errors[0].get('Key')} - {errors[0].get('Message')}")
+        return len(keys)
@@ -0,0 +1,63 @@
+import os
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+from django_s3.storage import S3Storage
+from django_s3.zip_engine import S3ZipEngine
+
+
+class Command(BaseCommand):
+    help = "Benchmark S3Storage.zipup against the configured S3 endpoint (e.g., the local MinIO container) " \
+           "for a small-file-heavy and a large-file-heavy synthetic resource."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small-files', type=int, default=2000,
+                            help='Number of files in the small-file-heavy resource (default: 2000)')
+        parser.add_argument('--small-size', type=int, default=4 * 1024,
+                            help='Size in bytes of each small file (default: 4KB)')
+        parser.add_argument('--large-files', type=int, default=2,
+                            help='Number of files in the large-file-heavy resource (default: 2)')
+        parser.add_argument('--large-size', type=int, default=256 * 1024 * 1024,
+                            help='Size in bytes of each large file (default: 256MB)')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Number of fetch threads of the parallel engine (default: 8)')
+        parser.add_argument('--prefetch', type=int, default=16,
+                            help='Number of byte ranges prefetched by the parallel engine (default: 16)')
+        parser.add_argument('--stored', action='store_true',
+                            help='Name the large files *.nc so they are written without compression')
+
+    def handle(self, *args, **options):
+        istorage = S3Storage()
+        client = istorage.connection.meta.client
+        run_id = uuid4().hex
+        datasets = [
+            ("small-file-heavy", options['small_files'], options['small_size'], "txt"),
+            ("large-file-heavy", options['large_files'], options['large_size'],
+             "nc" if options['stored'] else "bin"),
+        ]
+        engines = [
+            ("sequential", dict(max_workers=1, prefetch=1)),
+            ("parallel", dict(max_workers=options['workers'], prefetch=options['prefetch'])),
+        ]
+        try:
+            for name, count, size, ext in datasets:
+                prefix = f"{run_id}/{name}/data/contents"
+                self.stdout.write(f"Uploading {count} files of {size} bytes for {name}")
+                # random content so that deflate does not shrink the data to nothing
+                content = os.urandom(size)
+                for i in range(count):
+                    client.put_object(Bucket="tmp", Key=f"{prefix}/file_{i}.{ext}", Body=content)
+
+                for engine_name, engine_options in engines:
+                    engine = S3ZipEngine(client, **engine_options)
+                    stats = istorage.zipup(f"zips/{run_id}/{name}-{engine_name}.zip", f"tmp/{prefix}",
+                                           zip_engine=engine)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{name} {engine_name}: {stats['files']} files, {stats['bytes'] / 1024 / 1024:.1f} MB in "
+                        f"{stats['seconds']:.2f} seconds - {stats['bytes_per_second'] / 1024 / 1024:.2f} MB/s, "
+                        f"{stats['files'] / stats['seconds']:.1f} files/s"
+                    ))
+        finally:
+            istorage.connection.Bucket("tmp").objects.filter(Prefix=f"{run_id}/").delete()
+            istorage.connection.Bucket("zips").objects.filter(Prefix=f"{run_id}/").delete()
@@ -0,0 +1,124 @@
+import io
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    A read only, seekable file object over an S3 object.
+
+    The object is read in blocks of block_size bytes with ranged requests, the blocks needed by a read that are
+    not cached yet are fetched with a single request. The most recently used cache_blocks blocks are kept in
+    memory, so at most block_size * cache_blocks bytes are held no matter how large the object is, and
+    libraries that accept file objects (zipfile, ElementTree, h5py, ...) only read the bytes they need instead
+    of the whole object being downloaded first.
+    """
+
+    def __init__(self, client, bucket, key, block_size=None, cache_blocks=None):
+        """
+        :param client: boto3 S3 client used to read the object
+        :param bucket: bucket of the object
+        :param key: key of the object
+        :param block_size: size in bytes of a block read from S3
+        :param cache_blocks: number of blocks kept in the cache
+        """
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.name = f"{bucket}/{key}"
+        self.block_size = block_size or getattr(settings, "S3_RANGE_FILE_BLOCK_SIZE", 1024 * 1024)
+        self.cache_blocks = max(cache_blocks or getattr(settings, "S3_RANGE_FILE_CACHE_BLOCKS", 16), 1)
+        head = client.head_object(Bucket=bucket, Key=key)
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"].strip('"')
+        self._position = 0
+        self._blocks = OrderedDict()
+        self.requests = 0
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def _fetch_blocks(self, first, last):
+        """Reads the blocks first to last (inclusive) with one ranged request and caches them"""
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}")["Body"]
+        data = body.read()
+        self.requests += 1
+        self.bytes_read += len(data)
+        for index in range(first, last + 1):
+            offset = (index - first) * self.block_size
+            self._cache_block(index, data[offset:offset + self.block_size])
+
+    def _cache_block(self, index, block):
+        self._blocks[index] = block
+        self._blocks.move_to_end(index)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _get_block(self, index, last):
+        """Returns a block, fetching it with the following uncached blocks up to last when it isn't cached"""
+        if index not in self._blocks:
+            end = index
+            # blocks that don't fit in the cache would be evicted before they are used
+            while end < last and end + 1 not in self._blocks and end - index + 1 < self.cache_blocks:
+                end += 1
+            self._fetch_blocks(index, end)
+        self._blocks.move_to_end(index)
+        return self._blocks[index]
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        view = memoryview(buffer).cast("B")
+        length = min(len(view), max(self.size - self._position, 0))
+        if length == 0:
+            return 0
+        last = (self._position + length - 1) // self.block_size
+        copied = 0
+        while copied < length:
+            index, block_offset = divmod(self._position, self.block_size)
+            block = self._get_block(index, last)
+            chunk = block[block_offset:block_offset + length - copied]
+            if not chunk:
+                break
+            view[copied:copied + len(chunk)] = chunk
+            copied += len(chunk)
+            self._position += len(chunk)
+        return copied
+
+    def readall(self):
+        return self.read(max(self.size - self._position, 0))
+
+    def close(self):
+        if not self.closed:
+            logger.debug(f"Read {self.bytes_read} of {self.size} bytes of {self.name} "
+                         f"with {self.requests} requests")
+            self._blocks.clear()
+        super().close()
@@ -1,4 +1,5 @@
 import os
+import json
 import subprocess
 import tempfile
 import zipfile
@@ -25,7 +26,12 @@ from .utils import (
 from uuid import uuid4
 
 from django.utils.deconstruct import deconstructible
+from django.utils.timezone import make_naive
 from .s3_backend import S3Storage
+from .copy_engine import S3CopyEngine, CopyItem
+from .range_file import S3RangeFile
+from .unzip_engine import S3UnzipEngine
+from .zip_engine import S3ZipEngine, ZipMember
 from django.core.exceptions import ImproperlyConfigured
 
 try:
@@ -52,6 +58,29 @@ class S3Storage(S3Storage):
     def download(self, name):
         return self.open(name, mode="rb")
 
+    def open_stream(self, name, mode="rb", **kwargs):
+        """
+        open a file for reading it from start to end in chunks, without first copying the whole file
+        to local storage as download does
+        :param name: the data object name with full collection path
+        :param mode: "rb" or "r", any other keyword arguments (e.g., encoding, newline) are passed to smart_open
+        :return: a file object streaming the content of the data object
+        """
+        bucket, key = bucket_and_name(name)
+        return open(f's3://{bucket}/{key}', mode, transport_params={'client': self.connection.meta.client}, **kwargs)
+
+    def open_range(self, name, block_size=None, cache_blocks=None):
+        """
+        open a file for random access, only the blocks of the file that are read are fetched from S3
+        :param name: the data object name with full collection path
+        :param block_size: size in bytes of a block read from S3
+        :param cache_blocks: number of blocks kept in memory
+        :return: a seekable, read only binary file object (S3RangeFile)
+        """
+        bucket, key = bucket_and_name(name)
+        return S3RangeFile(self.connection.meta.client, bucket, key, block_size=block_size,
+                           cache_blocks=cache_blocks)
+
     def listdir(self, path, remove_metadata=False):
         """
         list the contents of the directory
@@ -100,39 +129,37 @@ class S3Storage(S3Storage):
 
         return (directories, files, file_sizes)
 
-    def zipup(self, out_name, *in_names, in_prefix=None):
+    def zipup(self, out_name, *in_names, in_prefix=None, zip_engine=None, previous_manifest=None):
         """
         run command to generate zip file for the bag
         :param out_name: the output zipped file name
         :param in_names: input parameters to indicate one or more collection paths to generate zip
         :param in_prefix: the prefix of the input files to be zipped
-        :return: None
-        """
-        def chunk_request(zip_archive_file, bucket, key):
-            chunk_size = getattr(settings, "S3_STREAM_ZIP_CHUNKING_SIZE", 1024 * 1024 * 256)  # 256MB
-            object_attrs = self.connection.meta.client.get_object_attributes(Bucket=bucket, Key=key,
-                                                                             ObjectAttributes=["ObjectSize"])
-            object_size = object_attrs.get("ObjectSize")
-            if object_size is None:
-                # could not get object size, read the entire file
-                logger.warning(f"Could not get object size for {key}")
-                file = self.connection.meta.client.get_object(Bucket=bucket, Key=key)
-                zip_archive_file.write(file.get("Body").read())
-            else:
-                chunk_start = 0
-                chunk_end = chunk_start + chunk_size - 1
-
-                while chunk_start < object_size:
-                    # Read specific byte range from file as a chunk. We do this because AWS server times out and sends
-                    # empty chunks when streaming the entire file.
-                    if body := self.connection.meta.client.get_object(
-                        Bucket=bucket, Key=key, Range=f"bytes={chunk_start}-{chunk_end}"
-                    ).get("Body"):
-                        chunk = body.read()
-                        zip_archive_file.write(chunk)
-                        chunk_start += chunk_size
-                        chunk_end += chunk_size
-                        chunk_end = min(chunk_end, object_size)
+        :param zip_engine: the S3ZipEngine used to stream the files into the zip file, an engine configured
+        from settings is used when not provided
+        :param previous_manifest: the manifest of a previous version of the zip file (see get_zip_manifest), members
+        that have not changed since are copied from it instead of being compressed again
+        :return: a dict with the number of files and bytes zipped, the throughput and the manifest of the zip file
+        """
+        if zip_engine is None:
+            zip_engine = S3ZipEngine(self.connection.meta.client)
+
+        members = []
+        for in_name in in_names:
+            in_bucket_name, in_path = bucket_and_name(in_name)
+            resource_id = in_path.split('/')[0]
+            in_bucket = self.connection.Bucket(in_bucket_name)
+            filesCollection = in_bucket.objects.filter(Prefix=in_path).all()
+            if not in_prefix:
+                in_prefix = os.path.dirname(in_path) if self.isDir(in_name) else in_path
+            for file_key in filesCollection:
+                if file_key.key.startswith(f"{resource_id}/.hsmetadata/") or \
+                   file_key.key.startswith(f"{resource_id}/.hsjsonld/"):
+                    continue
+                relative_path = file_key.key[len(in_prefix):].strip("/")
+                # the listing already provides the object size, no need to request the object attributes
+                members.append(ZipMember(in_bucket_name, file_key.key, relative_path, file_key.size,
+                                         file_key.e_tag.strip('"'), file_key.last_modified))
 
         out_bucket, out_path = bucket_and_name(out_name)
 
@@ -140,26 +167,59 @@ class S3Storage(S3Storage):
             with open(f's3://{out_bucket}/{out_path}', 'wb',
                       transport_params={'client': self.connection.meta.client}) as out_file:
                 with zipfile.ZipFile(out_file, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
-                    for in_name in in_names:
-                        in_bucket_name, in_path = bucket_and_name(in_name)
-                        resource_id = in_path.split('/')[0]
-                        in_bucket = self.connection.Bucket(in_bucket_name)
-                        filesCollection = in_bucket.objects.filter(Prefix=in_path).all()
-                        if not in_prefix:
-                            in_prefix = os.path.dirname(in_path) if self.isDir(in_name) else in_path
-                        for file_key in filesCollection:
-                            if file_key.key.startswith(f"{resource_id}/.hsmetadata/") or \
-                               file_key.key.startswith(f"{resource_id}/.hsjsonld/"):
-                                continue
-                            relative_path = file_key.key[len(in_prefix):].strip("/")
-                            with zip_archive.open(relative_path, 'w', force_zip64=True) as zip_archive_file:
-                                chunk_request(zip_archive_file, in_bucket_name, file_key.key)
+                    stats = zip_engine.write(zip_archive, members, previous_manifest=previous_manifest)
         except ClientError as e:
             if "An error occurred (InvalidRequest) when calling the CompleteMultipartUpload operation:" in str(e):
                 raise QuotaException("Bucket quota exceeded. Please contact your system administrator.")
             if "XMinioAdminBucketQuotaExceeded" in str(e):
                 raise QuotaException("Bucket quota exceeded. Please contact your system administrator.")
+            if previous_manifest and e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+                # the previous zip file was replaced while it was being read, zip everything again
+                logger.warning(f"{out_name} changed during the incremental rebuild, rebuilding it in full")
+                return self.zipup(out_name, *in_names, in_prefix=in_prefix, zip_engine=zip_engine)
             raise e
+        return stats
+
+    def _zip_manifest_name(self, zip_name):
+        bucket, name = bucket_and_name(zip_name)
+        return bucket, f"{name}.manifest.json"
+
+    def save_zip_manifest(self, zip_name, manifest):
+        """
+        save the per member manifest of a zip file created by zipup next to the zip file, so that the zip file can
+        later be rebuilt incrementally
+        :param zip_name: the zip file name, e.g., bags/<resource_id>.zip
+        :param manifest: the manifest returned in the zipup stats
+        """
+        bucket, name = bucket_and_name(zip_name)
+        etag = self.connection.meta.client.head_object(Bucket=bucket, Key=name)["ETag"].strip('"')
+        manifest_bucket, manifest_name = self._zip_manifest_name(zip_name)
+        body = json.dumps({"bucket": bucket, "key": name, "etag": etag, "members": manifest})
+        self.connection.meta.client.put_object(Bucket=manifest_bucket, Key=manifest_name, Body=body.encode())
+
+    def get_zip_manifest(self, zip_name):
+        """
+        get the manifest saved by save_zip_manifest for a zip file
+        :param zip_name: the zip file name, e.g., bags/<resource_id>.zip
+        :return: the manifest with members indexed by archive name, or None when there is no manifest or it
+        does not describe the current zip file
+        """
+        bucket, name = bucket_and_name(zip_name)
+        manifest_bucket, manifest_name = self._zip_manifest_name(zip_name)
+        client = self.connection.meta.client
+        try:
+            manifest = json.loads(client.get_object(Bucket=manifest_bucket, Key=manifest_name)["Body"].read())
+            etag = client.head_object(Bucket=bucket, Key=name)["ETag"].strip('"')
+        except ClientError:
+            return None
+        if manifest.get("etag") != etag:
+            return None
+        manifest["members"] = {entry["arcname"]: entry for entry in manifest["members"]}
+        return manifest
+
+    def delete_zip_manifest(self, zip_name):
+        manifest_bucket, manifest_name = self._zip_manifest_name(zip_name)
+        self.connection.Object(manifest_bucket, manifest_name).delete()
 
     def unzip(self, zip_file_path, unzipped_folder=""):
         """
@@ -169,25 +229,31 @@ class S3Storage(S3Storage):
         provided.  The folder to unzip to.
         :return: the folder files were unzipped to
         """
+        self.unzip_files(zip_file_path, unzipped_folder)
+        return unzipped_folder
 
+    def unzip_files(self, zip_file_path, unzipped_folder=""):
+        """
+        unzip files into a new folder, extracting the files concurrently
+        :param zip_file_path: path of the zipped file to be unzipped
+        :param unzipped_folder: The folder to unzip to.
+        :return: a list of UnzippedFile with the path (within unzipped_folder), size, checksum and modified time
+        of every file unzipped, which can be used to set the system metadata of the corresponding ResourceFiles
+        """
         zip_bucket, zip_name = bucket_and_name(zip_file_path)
         unzipped_bucket, unzipped_path = bucket_and_name(unzipped_folder)
-        with zipfile.ZipFile(open(f's3://{zip_bucket}/{zip_name}', 'rb',
-                                  transport_params={'client': self.connection.meta.client})) as zip_ref:
-            for file_info in zip_ref.infolist():
-                if not file_info.is_dir():
-                    file_name = file_info.filename
-                    s3_key = os.path.join(unzipped_path, file_name)
-                    with zip_ref.open(file_name, 'r') as data:
-                        try:
-                            self.connection.meta.client.upload_fileobj(Fileobj=data, Bucket=unzipped_bucket, Key=s3_key)
-                        except ClientError as e:
-                            if "XMinioAdminBucketQuotaExceeded" in str(e):
-                                raise QuotaException(
-                                    "Bucket quota exceeded. Please contact your system administrator."
-                                )
-                            raise e
-        return unzipped_folder
+        unzip_engine = S3UnzipEngine(self.connection.meta.client)
+        try:
+            unzipped_files = unzip_engine.extract(zip_bucket, zip_name, unzipped_bucket, unzipped_path)
+        except ClientError as e:
+            if "XMinioAdminBucketQuotaExceeded" in str(e):
+                raise QuotaException(
+                    "Bucket quota exceeded. Please contact your system administrator."
+                )
+            raise e
+        # report paths relative to the storage, as the other S3Storage methods expect them
+        return [f._replace(key=os.path.join(unzipped_folder, f.key[len(unzipped_path):].lstrip("/")))
+                for f in unzipped_files]
 
     def setAVU(self, name, attName, attVal):
         """
@@ -268,7 +334,7 @@ class S3Storage(S3Storage):
             for file in self.connection.Bucket(src_bucket).objects.filter(Prefix=src_name):
                 self.connection.Object(src_bucket, file.key).delete()
 
-    def copyFiles(self, src_path, dest_path, delete_src=False):
+    def copyFiles(self, src_path, dest_path, delete_src=False, progress_callback=None):
         """
         copies an S3 object (file) or files matching a prefix (directory)
         to another data-object or collection
@@ -278,52 +344,43 @@ class S3Storage(S3Storage):
         src_path: the object or prefix name to be copied from.
         dest_path: the object or prefix name to be copied to
         delete_src: delete the source file after copying when set to True. Default is False
+        progress_callback: called as progress_callback(copied, total) while a prefix is being copied
         """
         src_bucket, src_name = bucket_and_name(src_path)
         dst_bucket, dest_name = bucket_and_name(dest_path)
         bucket = self.connection.Bucket(src_bucket)
+        copy_engine = S3CopyEngine(self.connection.meta.client, progress_callback=progress_callback)
 
-        if self.isFile(src_path):
-            try:
-                self.connection.meta.client.copy_object(
-                    Bucket=dst_bucket,
-                    Key=dest_name,
-                    CopySource={"Bucket": src_bucket, "Key": src_name},
-                )
-            except ClientError as e:
-                if "XMinioAdminBucketQuotaExceeded" in str(e):
-                    raise QuotaException(
-                        "Bucket quota exceeded. Please contact your system administrator."
-                    )
-                raise e
-            if delete_src:
-                self.connection.Object(src_bucket, src_name).delete()
+        is_file = self.isFile(src_path)
+        if is_file:
+            items = [CopyItem(src_bucket, src_name, dst_bucket, dest_name,
+                              self.connection.Object(src_bucket, src_name).content_length)]
         else:
-            # copy files
-            for file in bucket.objects.filter(Prefix=src_name):
-                src_file_path = file.key
-                dst_file_path = file.key.replace(src_name, dest_name)
-                try:
-                    self.connection.meta.client.copy_object(
-                        Bucket=dst_bucket,
-                        Key=dst_file_path,
-                        CopySource={"Bucket": src_bucket, "Key": src_file_path},
-                    )
-                except ClientError as e:
-                    if "XMinioAdminBucketQuotaExceeded" in str(e):
-                        raise QuotaException(
-                            "Bucket quota exceeded. Please contact your system administrator."
-                        )
-                    raise e
-                if delete_src:
-                    self.connection.Object(src_bucket, src_file_path).delete()
-
-            # update empty_folders AVU
-            res_id = "/".join(dest_name.split("/")[:1])
-            for empty_folder in self._empty_folders(res_id, filter=src_name):
-                new_folder = empty_folder.replace(src_name, dest_name)
-                self.remove_folder(res_id, empty_folder, AVU_only=True)
-                self.create_folder(res_id, new_folder)
+            items = [CopyItem(src_bucket, file.key, dst_bucket, dest_name + file.key[len(src_name):], file.size)
+                     for file in bucket.objects.filter(Prefix=src_name)]
+
+        try:
+            copy_engine.copy(items)
+        except ClientError as e:
+            if "XMinioAdminBucketQuotaExceeded" in str(e):
+                raise QuotaException(
+                    "Bucket quota exceeded. Please contact your system administrator."
+                )
+            raise e
+        if delete_src:
+            # the sources are only removed once everything has been copied
+            copy_engine.delete(src_bucket, [item.src_key for item in items])
+
+        if is_file:
+            return
+
+        # update empty_folders AVU once for all the folders that have been copied
+        res_id = "/".join(dest_name.split("/")[:1])
+        moved_folders = self._empty_folders(res_id, filter=src_name)
+        if moved_folders:
+            folders = [f for f in self._empty_folders(res_id) if f not in moved_folders]
+            folders.extend(dest_name + f[len(src_name):] for f in moved_folders)
+            self.setAVU(res_id, "empty_folders", folder_delimiter.join(set(folders)))
 
     def moveFile(self, src_path, dest_path):
         """
@@ -352,6 +409,21 @@ class S3Storage(S3Storage):
             f.flush()
             self.saveFile(f.name, f"{resource_id}/manifest-md5.txt")
 
+    def files_system_metadata(self, path):
+        """
+        get size, modified time and checksum of all the files under a resource path from a paginated bucket listing,
+        which returns these values for 1000 files per request
+        :param path: the resource path (e.g., <resource_id>/data/contents) to list files for
+        :return: a dict of (size, modified time, checksum) keyed by file path
+        """
+        bucket_name, prefix = bucket_and_name(path)
+        prefix = prefix.strip("/") + "/"
+        files = {}
+        for file in self.connection.Bucket(bucket_name).objects.filter(Prefix=prefix):
+            modified_time = file.last_modified if settings.USE_TZ else make_naive(file.last_modified)
+            files[file.key] = (file.size, modified_time, file.e_tag.strip('"'))
+        return files
+
     def saveFile(self, src_local_file, dest_s3_bucket_path):
         """
         Parameters:
@@ -451,26 +523,25 @@ class S3Storage(S3Storage):
         dest_name = src_name
 
         bucket = self.connection.Bucket(src_bucket)
-        files_to_delete = []
-        for file in bucket.objects.filter(Prefix=src_name):
-            src_file_path = file.key
-            dst_file_path = file.key.replace(src_name, dest_name)
-            try:
-                self.connection.meta.client.copy_object(
-                    Bucket=dst_bucket,
-                    Key=dst_file_path,
-                    CopySource={"Bucket": src_bucket, "Key": src_file_path},
+        copy_engine = S3CopyEngine(self.connection.meta.client)
+        items = [CopyItem(src_bucket, file.key, dst_bucket, dest_name + file.key[len(src_name):], file.size)
+                 for file in bucket.objects.filter(Prefix=src_name)]
+        try:
+            copy_engine.copy(items)
+        except ClientError as e:
+            if "XMinioAdminBucketQuotaExceeded" in str(e):
+                raise QuotaException(
+                    "Bucket quota exceeded. Please contact your system administrator."
                 )
-            except ClientError as e:
-                if "XMinioAdminBucketQuotaExceeded" in str(e):
-                    raise QuotaException(
-                        "Bucket quota exceeded. Please contact your system administrator."
-                    )
-                raise e
-            files_to_delete.append(src_file_path)
-
-        for src_file_path in files_to_delete:
-            self.connection.Object(src_bucket, src_file_path).delete()
+            raise e
+        copy_engine.delete(src_bucket, [item.src_key for item in items])
+
+    def bucket_size(self, bucket_name):
+        """
+        Return the total size in bytes of the objects in a bucket, listing 1000 objects per request
+        :param bucket_name: the bucket name
+        """
+        return sum(file.size for file in self.connection.Bucket(bucket_name).objects.all())
 
     def bucket_exists(self, bucket_name):
         try:
@@ -0,0 +1,79 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from django_s3.copy_engine import S3CopyEngine, CopyItem
+
+
+class FakeS3Client(object):
+    """In memory stand-in for the boto3 client methods used by S3CopyEngine"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.uploads = {}
+        self.delete_requests = []
+        self.lock = threading.Lock()
+
+    def copy_object(self, Bucket, Key, CopySource):
+        with self.lock:
+            self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.uploads[(Bucket, Key)] = {}
+        return {"UploadId": "upload"}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange):
+        start, end = CopySourceRange[len("bytes="):].split("-")
+        data = self.objects[(CopySource["Bucket"], CopySource["Key"])][int(start):int(end) + 1]
+        self.uploads[(Bucket, Key)][PartNumber] = data
+        return {"CopyPartResult": {"ETag": str(PartNumber)}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop((Bucket, Key))
+        self.objects[(Bucket, Key)] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop((Bucket, Key), None)
+
+    def delete_objects(self, Bucket, Delete):
+        self.delete_requests.append(len(Delete["Objects"]))
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
+        return {}
+
+
+class TestS3CopyEngine(SimpleTestCase):
+
+    def setUp(self):
+        self.objects = {("src", f"res/data/contents/file_{i}.txt"): f"content {i}".encode() for i in range(2500)}
+        self.client = FakeS3Client(self.objects)
+        self.items = [CopyItem("src", key, "dst", key.replace("res/", "new/"), len(data))
+                      for (_, key), data in list(self.objects.items())]
+
+    def test_copy_all_objects(self):
+        progress = []
+        engine = S3CopyEngine(self.client, max_workers=4, progress_callback=lambda done, total: progress.append(
+            (done, total)), progress_interval=0)
+        self.assertEqual(2500, engine.copy(self.items))
+        for item in self.items:
+            self.assertEqual(self.objects[("src", item.src_key)], self.objects[("dst", item.dst_key)])
+        self.assertEqual((2500, 2500), progress[-1])
+
+    def test_multipart_copy_of_large_objects(self):
+        self.objects[("src", "res/data/contents/large.bin")] = bytes(range(256)) * 4
+        item = CopyItem("src", "res/data/contents/large.bin", "dst", "new/data/contents/large.bin", 1024)
+        engine = S3CopyEngine(self.client, multipart_threshold=100, part_size=300)
+        engine.copy([item])
+        self.assertEqual(bytes(range(256)) * 4, self.objects[("dst", "new/data/contents/large.bin")])
+
+    def test_delete_in_batches(self):
+        engine = S3CopyEngine(self.client)
+        engine.delete("src", [item.src_key for item in self.items])
+        self.assertEqual([1000, 1000, 500], self.client.delete_requests)
+        self.assertFalse([key for key in self.objects if key[0] == "src"])
+
+    def test_copy_error_is_raised(self):
+        items = self.items[:10] + [CopyItem("src", "missing", "dst", "missing", 1)]
+        engine = S3CopyEngine(self.client, max_workers=2)
+        with self.assertRaises(KeyError):
+            engine.copy(items)
@@ -0,0 +1,77 @@
+import io
+import zipfile
+
+from django.test import SimpleTestCase
+
+from django_s3.range_file import S3RangeFile
+
+
+class FakeS3Client(object):
+    """In memory stand-in for the boto3 client methods used by S3RangeFile"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self.objects[(Bucket, Key)]), "ETag": '"etag"'}
+
+    def get_object(self, Bucket, Key, Range):
+        self.ranges.append(Range)
+        start, end = Range[len("bytes="):].split("-")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)][int(start):int(end) + 1])}
+
+
+class TestS3RangeFile(SimpleTestCase):
+
+    def setUp(self):
+        self.data = bytes(range(256)) * 40
+        self.client = FakeS3Client({("bucket", "res/data/contents/file.bin"): self.data})
+
+    def _open(self, **kwargs):
+        return S3RangeFile(self.client, "bucket", "res/data/contents/file.bin", **kwargs)
+
+    def test_read_and_seek(self):
+        with self._open(block_size=1000, cache_blocks=4) as range_file:
+            self.assertEqual(len(self.data), range_file.size)
+            self.assertEqual(self.data[:10], range_file.read(10))
+            range_file.seek(2500)
+            self.assertEqual(self.data[2500:4100], range_file.read(1600))
+            range_file.seek(-5, io.SEEK_END)
+            self.assertEqual(self.data[-5:], range_file.read())
+            self.assertEqual(b"", range_file.read(10))
+            range_file.seek(0)
+            self.assertEqual(self.data, range_file.read())
+
+    def test_only_needed_blocks_are_read(self):
+        with self._open(block_size=1000, cache_blocks=4) as range_file:
+            range_file.seek(5500)
+            range_file.read(100)
+            # reading again from a cached block doesn't make another request
+            range_file.seek(5000)
+            range_file.read(1000)
+            self.assertEqual(["bytes=5000-5999"], self.client.ranges)
+            # the uncached blocks of a read are fetched with one request
+            range_file.seek(1000)
+            range_file.read(3000)
+            self.assertEqual(["bytes=5000-5999", "bytes=1000-3999"], self.client.ranges)
+            self.assertEqual(4000, range_file.bytes_read)
+
+    def test_cache_is_bounded(self):
+        with self._open(block_size=1000, cache_blocks=2) as range_file:
+            self.assertEqual(self.data, range_file.read())
+            self.assertEqual(2, len(range_file._blocks))
+            self.assertEqual(len(self.data), range_file.bytes_read)
+
+    def test_read_zip_members(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zip_archive:
+            zip_archive.writestr("large.bin", bytes(range(256)) * 400)
+            zip_archive.writestr("small.txt", b"small")
+        self.client.objects[("bucket", "res/data/contents/files.zip")] = buffer.getvalue()
+        with S3RangeFile(self.client, "bucket", "res/data/contents/files.zip", block_size=1024) as range_file:
+            self.assertTrue(zipfile.is_zipfile(range_file))
+            with zipfile.ZipFile(range_file) as zip_archive:
+                self.assertEqual(b"small", zip_archive.read("small.txt"))
+            # the data of the large member is not read
+            self.assertLess(range_file.bytes_read, len(buffer.getvalue()))
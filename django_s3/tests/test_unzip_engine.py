@@ -0,0 +1,93 @@
+import io
+import zipfile
+from hashlib import md5
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.timezone import make_aware
+
+from django_s3.unzip_engine import S3UnzipEngine
+
+
+class FakeS3Client(object):
+    """In memory stand-in for the boto3 client methods used by S3UnzipEngine"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.uploads = {}
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range):
+        self.ranges.append(Range)
+        start, end = Range[len("bytes="):].split("-")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)][int(start):int(end) + 1])}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+        return {"ETag": f'"{md5(Body).hexdigest()}"'}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.uploads[(Bucket, Key)] = {}
+        return {"UploadId": "upload"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[(Bucket, Key)][PartNumber] = Body
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop((Bucket, Key))
+        self.objects[(Bucket, Key)] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        return {"ETag": f'"multipart-{len(parts)}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop((Bucket, Key), None)
+
+
+class TestS3UnzipEngine(SimpleTestCase):
+
+    def setUp(self):
+        self.contents = {
+            "a.txt": b"a" * 100,
+            "folder/b.csv": b"1,2,3\n" * 50,
+            "folder/sub/large.bin": bytes(range(256)) * 40,
+            "empty.txt": b"",
+        }
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
+            zip_archive.writestr("folder/", b"")
+            for name, data in self.contents.items():
+                zip_archive.writestr(name, data)
+        self.client = FakeS3Client({("bucket", "res/data/contents/files.zip"): buffer.getvalue()})
+
+    def _extract(self, **kwargs):
+        engine = S3UnzipEngine(self.client, **kwargs)
+        zip_bytes = self.client.objects[("bucket", "res/data/contents/files.zip")]
+        with mock.patch("django_s3.unzip_engine.open", return_value=io.BytesIO(zip_bytes)):
+            return engine.extract("bucket", "res/data/contents/files.zip", "bucket", "res/data/contents/files")
+
+    def test_extract_files(self):
+        unzipped_files = self._extract(max_workers=3, part_size=1024)
+        self.assertEqual([f"res/data/contents/files/{name}" for name in self.contents],
+                         [f.key for f in unzipped_files])
+        for unzipped_file, (name, data) in zip(unzipped_files, self.contents.items()):
+            self.assertEqual(data, self.client.objects[("bucket", unzipped_file.key)])
+            self.assertEqual(len(data), unzipped_file.size)
+            self.assertIsNotNone(unzipped_file.modified_time)
+        # one ranged read per member
+        self.assertEqual(len(self.contents), len(self.client.ranges))
+
+    def test_large_members_use_multipart_upload(self):
+        unzipped_files = {f.key: f for f in self._extract(part_size=4096)}
+        large = unzipped_files["res/data/contents/files/folder/sub/large.bin"]
+        self.assertEqual("multipart-3", large.checksum)
+        small = unzipped_files["res/data/contents/files/a.txt"]
+        self.assertEqual(md5(b"a" * 100).hexdigest(), small.checksum)
+
+    def test_modified_time_of_archive_members(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zip_archive:
+            zip_archive.writestr(zipfile.ZipInfo("dated.txt", date_time=(2020, 5, 17, 8, 30, 10)), b"dated")
+        self.client.objects[("bucket", "res/data/contents/files.zip")] = buffer.getvalue()
+        unzipped_file, = self._extract()
+        self.assertEqual(make_aware(datetime(2020, 5, 17, 8, 30, 10)), unzipped_file.modified_time)
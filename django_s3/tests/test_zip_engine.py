@@ -0,0 +1,208 @@
+import io
+import zipfile
+from datetime import datetime
+
+from django.test import SimpleTestCase, override_settings
+
+from django_s3.zip_engine import S3ZipEngine, ZipMember, _RawZipMemberWriter
+
+
+class FakeS3Client(object):
+    """In memory stand-in for the boto3 client methods used by S3ZipEngine"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.requests.append((Key, Range))
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            data = data[int(start):int(end) + 1]
+        return {"Body": io.BytesIO(data)}
+
+
+class UnseekableBuffer(io.RawIOBase):
+    """Write only stream without seek support, like the smart_open multipart writer"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+class TestS3ZipEngine(SimpleTestCase):
+
+    def setUp(self):
+        self.objects = {
+            ("bucket", "res/data/contents/a.txt"): b"a" * 1000,
+            ("bucket", "res/data/contents/empty.txt"): b"",
+            ("bucket", "res/data/contents/b.nc"): bytes(range(256)) * 10,
+            ("bucket", "res/data/contents/c.txt"): b"c" * 33,
+        }
+        self.client = FakeS3Client(self.objects)
+        self.members = [ZipMember(bucket, key, key[len("res/"):], len(data))
+                        for (bucket, key), data in self.objects.items()]
+
+    def _zip(self, engine, members, previous_manifest=None, seekable=True):
+        out = io.BytesIO() if seekable else UnseekableBuffer()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
+            stats = engine.write(zip_archive, members, previous_manifest=previous_manifest)
+        buffer = out if seekable else out.buffer
+        buffer.seek(0)
+        return zipfile.ZipFile(buffer), stats
+
+    def _versioned_members(self):
+        modified = datetime(2024, 1, 1, 12, 0, 0)
+        members = []
+        for member in self.members:
+            data = self.objects[(member.bucket, member.key)]
+            members.append(member._replace(size=len(data), etag=str(hash(data)), last_modified=modified))
+        return members
+
+    def _incremental_rebuild(self, seekable):
+        engine = S3ZipEngine(self.client, chunk_size=64, stored_extensions=(".nc",))
+        zip_file, stats = self._zip(engine, self._versioned_members(), seekable=seekable)
+        self.objects[("bags", "res.zip")] = zip_file.fp.getvalue()
+        previous_manifest = {"bucket": "bags", "key": "res.zip", "etag": "etag",
+                             "members": {entry["arcname"]: entry for entry in stats["manifest"]}}
+
+        # change a single member
+        self.objects[("bucket", "res/data/contents/c.txt")] = b"changed"
+        members = self._versioned_members()
+        full_zip, _ = self._zip(engine, members, seekable=seekable)
+        self.client.requests = []
+        incremental_zip, stats = self._zip(engine, members, previous_manifest=previous_manifest, seekable=seekable)
+
+        self.assertEqual(len(members) - 1, stats["reused"])
+        self.assertEqual(full_zip.fp.getvalue(), incremental_zip.fp.getvalue())
+        self.assertIsNone(incremental_zip.testzip())
+        self.assertEqual(b"changed", incremental_zip.read("data/contents/c.txt"))
+        # only the changed member is read from the source objects
+        self.assertEqual({"res.zip", "res/data/contents/c.txt"}, {key for key, _ in self.client.requests})
+
+    def test_members_written_in_order_with_content(self):
+        engine = S3ZipEngine(self.client, max_workers=4, prefetch=4, chunk_size=64, stored_extensions=())
+        zip_file, stats = self._zip(engine, self.members)
+        self.assertEqual([m.arcname for m in self.members], zip_file.namelist())
+        self.assertIsNone(zip_file.testzip())
+        for member in self.members:
+            self.assertEqual(self.objects[(member.bucket, member.key)], zip_file.read(member.arcname))
+        self.assertEqual(len(self.members), stats["files"])
+        self.assertEqual(sum(len(d) for d in self.objects.values()), stats["bytes"])
+
+    def test_objects_read_in_ranges(self):
+        engine = S3ZipEngine(self.client, max_workers=2, prefetch=2, chunk_size=100, stored_extensions=())
+        self._zip(engine, self.members)
+        a_requests = [r for k, r in self.client.requests if k.endswith("a.txt")]
+        self.assertEqual(10, len(a_requests))
+        self.assertIn("bytes=900-999", a_requests)
+        # empty objects do not need a request
+        self.assertFalse([r for k, r in self.client.requests if k.endswith("empty.txt")])
+
+    @override_settings(S3_STREAM_ZIP_CHUNKING_SIZE=250)
+    def test_chunk_size_setting(self):
+        engine = S3ZipEngine(self.client, stored_extensions=())
+        self.assertEqual(250, engine.chunk_size)
+        self._zip(engine, self.members)
+        a_requests = [r for k, r in self.client.requests if k.endswith("a.txt")]
+        self.assertEqual(4, len(a_requests))
+
+    def test_stored_mode_for_compressed_extensions(self):
+        engine = S3ZipEngine(self.client, chunk_size=64, stored_extensions=(".NC",))
+        zip_file, _ = self._zip(engine, self.members)
+        self.assertEqual(zipfile.ZIP_STORED, zip_file.getinfo("data/contents/b.nc").compress_type)
+        self.assertEqual(zipfile.ZIP_DEFLATED, zip_file.getinfo("data/contents/a.txt").compress_type)
+        self.assertEqual(self.objects[("bucket", "res/data/contents/b.nc")], zip_file.read("data/contents/b.nc"))
+
+    def test_unknown_size_read_in_one_request(self):
+        member = ZipMember("bucket", "res/data/contents/c.txt", "c.txt", None)
+        engine = S3ZipEngine(self.client, chunk_size=8)
+        zip_file, _ = self._zip(engine, [member])
+        self.assertEqual(b"c" * 33, zip_file.read("c.txt"))
+        self.assertEqual([("res/data/contents/c.txt", None)], self.client.requests)
+
+    def test_short_read_raises(self):
+        class ShortReadClient(FakeS3Client):
+            def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+                return {"Body": io.BytesIO(b"")}
+
+        engine = S3ZipEngine(ShortReadClient(self.objects), chunk_size=64, max_attempts=2)
+        with self.assertRaises(IOError):
+            self._zip(engine, self.members[:1])
+
+    def test_incremental_rebuild_is_byte_identical(self):
+        self._incremental_rebuild(seekable=True)
+
+    def test_incremental_rebuild_is_byte_identical_unseekable(self):
+        self._incremental_rebuild(seekable=False)
+
+    def test_changed_member_not_reused(self):
+        engine = S3ZipEngine(self.client, chunk_size=64)
+        members = self._versioned_members()
+        _, stats = self._zip(engine, members)
+        previous_manifest = {"bucket": "bags", "key": "res.zip", "etag": "etag",
+                             "members": {entry["arcname"]: entry for entry in stats["manifest"]}}
+        changed = [member._replace(etag="other") for member in members]
+        self.assertIsNone(engine._reusable_entry(changed[0], previous_manifest))
+        self.assertIsNotNone(engine._reusable_entry(members[0], previous_manifest))
+
+
+class TestRawZipMemberWriter(SimpleTestCase):
+    """_RawZipMemberWriter relies on zipfile internals, its output must stay byte identical to the public API"""
+
+    def setUp(self):
+        self.contents = [
+            ("a.txt", b"a" * 1000, zipfile.ZIP_DEFLATED),
+            ("b.nc", bytes(range(256)) * 10, zipfile.ZIP_STORED),
+            ("empty.txt", b"", zipfile.ZIP_DEFLATED),
+            ("c.txt", b"c" * 33, zipfile.ZIP_STORED),
+        ]
+
+    def _zipinfo(self, name, compress_type):
+        zinfo = zipfile.ZipInfo(name, date_time=(2024, 1, 1, 12, 0, 0))
+        zinfo.compress_type = compress_type
+        return zinfo
+
+    def _archive(self, write_member, seekable):
+        out = io.BytesIO() if seekable else UnseekableBuffer()
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zip_archive:
+            for name, data, compress_type in self.contents:
+                write_member(zip_archive, name, data, compress_type)
+        return out.getvalue() if seekable else out.buffer.getvalue()
+
+    def _compare(self, seekable):
+        def write_with_zipfile(zip_archive, name, data, compress_type):
+            zinfo = self._zipinfo(name, compress_type)
+            zinfo.file_size = len(data)
+            with zip_archive.open(zinfo, 'w', force_zip64=True) as member_file:
+                member_file.write(data)
+
+        expected = self._archive(write_with_zipfile, seekable)
+        source = zipfile.ZipFile(io.BytesIO(expected))
+
+        def write_raw(zip_archive, name, data, compress_type):
+            info = source.getinfo(name)
+            # the compressed data of the member follows its local file header (with the zip64 extra field)
+            data_offset = info.header_offset + len(info.FileHeader(True))
+            zinfo = self._zipinfo(name, compress_type)
+            zinfo.CRC = info.CRC
+            zinfo.compress_size = info.compress_size
+            zinfo.file_size = info.file_size
+            raw_writer = _RawZipMemberWriter(zip_archive, zinfo)
+            raw_writer.write(expected[data_offset:data_offset + info.compress_size])
+            raw_writer.close()
+
+        self.assertEqual(expected, self._archive(write_raw, seekable))
+        self.assertIsNone(zipfile.ZipFile(io.BytesIO(expected)).testzip())
+
+    def test_same_bytes_as_zipfile(self):
+        self._compare(seekable=True)
+
+    def test_same_bytes_as_zipfile_unseekable(self):
+        self._compare(seekable=False)
@@ -0,0 +1,126 @@
+import os
+import struct
+import zipfile
+import logging
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.utils.timezone import make_aware
+from smart_open import open
+
+logger = logging.getLogger(__name__)
+
+# a file extracted from a zip archive: key is the object key it was uploaded to, checksum the ETag of the object,
+# modified_time the timestamp of the member in the archive
+UnzippedFile = namedtuple('UnzippedFile', ['key', 'size', 'checksum', 'modified_time'])
+
+
+class S3UnzipEngine(object):
+    """
+    Extracts a zip archive stored in S3 into S3 objects.
+
+    The central directory of the archive is read once, then every member is read with a single ranged request
+    covering its local header and data and uploaded on a bounded thread pool. Members larger than part_size are
+    uploaded with multipart uploads while they are being decompressed, so at most max_workers * part_size bytes
+    are held in memory.
+    """
+
+    def __init__(self, client, max_workers=None, part_size=None):
+        """
+        :param client: boto3 S3 client used to read the archive and upload the members
+        :param max_workers: number of members extracted concurrently
+        :param part_size: size in bytes of a single uploaded part, smaller members are uploaded in one request
+        """
+        self.client = client
+        self.max_workers = max_workers or getattr(settings, "S3_UNZIP_MAX_WORKERS", 8)
+        self.part_size = part_size or getattr(settings, "S3_UNZIP_PART_SIZE", 1024 * 1024 * 16)
+
+    def _read_central_directory(self, bucket, key):
+        """Returns the ZipInfo of the files in the archive with the offset where the data of each member ends"""
+        with open(f's3://{bucket}/{key}', 'rb', transport_params={'client': self.client}) as zip_file:
+            with zipfile.ZipFile(zip_file) as zip_ref:
+                infos = zip_ref.infolist()
+                start_dir = zip_ref.start_dir
+        ends = {}
+        offsets = sorted(set(info.header_offset for info in infos)) + [start_dir]
+        for info in infos:
+            ends[info.header_offset] = offsets[offsets.index(info.header_offset) + 1]
+        return [(info, ends[info.header_offset]) for info in infos if not info.is_dir()]
+
+    def _open_member(self, bucket, key, info, end):
+        """Returns a file like object decompressing the member data read with a single ranged request"""
+        if info.flag_bits & zipfile._MASK_ENCRYPTED:
+            raise RuntimeError(f"File {info.filename} is encrypted, password required for extraction")
+        body = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={info.header_offset}-{end - 1}")["Body"]
+        fheader = body.read(zipfile.sizeFileHeader)
+        if len(fheader) != zipfile.sizeFileHeader:
+            raise zipfile.BadZipFile("Truncated file header")
+        fheader = struct.unpack(zipfile.structFileHeader, fheader)
+        if fheader[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile("Bad magic number for file header")
+        # skip the file name and the extra field of the local header
+        body.read(fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH])
+        return zipfile.ZipExtFile(body, 'r', info, None, close_fileobj=True)
+
+    def _upload(self, data, dst_bucket, dst_key):
+        """Uploads the file like object data, returns the size and ETag of the created object"""
+        chunk = data.read(self.part_size)
+        next_chunk = data.read(self.part_size) if len(chunk) == self.part_size else b""
+        if not next_chunk:
+            response = self.client.put_object(Bucket=dst_bucket, Key=dst_key, Body=chunk)
+            return len(chunk), response["ETag"].strip('"')
+
+        upload_id = self.client.create_multipart_upload(Bucket=dst_bucket, Key=dst_key)["UploadId"]
+        try:
+            parts = []
+            size = 0
+            while chunk:
+                part_number = len(parts) + 1
+                response = self.client.upload_part(Bucket=dst_bucket, Key=dst_key, UploadId=upload_id,
+                                                   PartNumber=part_number, Body=chunk)
+                parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+                size += len(chunk)
+                chunk, next_chunk = next_chunk, data.read(self.part_size) if next_chunk else b""
+            response = self.client.complete_multipart_upload(Bucket=dst_bucket, Key=dst_key, UploadId=upload_id,
+                                                             MultipartUpload={"Parts": parts})
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=dst_bucket, Key=dst_key, UploadId=upload_id)
+            raise
+        return size, response["ETag"].strip('"')
+
+    def _extract_member(self, bucket, key, info, end, dst_bucket, dst_prefix):
+        dst_key = os.path.join(dst_prefix, info.filename)
+        with self._open_member(bucket, key, info, end) as data:
+            size, etag = self._upload(data, dst_bucket, dst_key)
+        return UnzippedFile(dst_key, size, etag, make_aware(datetime(*info.date_time)))
+
+    def extract(self, bucket, key, dst_bucket, dst_prefix):
+        """
+        Extracts all files of the archive bucket/key under dst_prefix in dst_bucket
+        :return: a list of UnzippedFile in the order of the archive members
+        """
+        members = self._read_central_directory(bucket, key)
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            members_iter = iter(members)
+            try:
+                while True:
+                    # keep a bounded number of members queued so huge archives do not create huge queues
+                    for info, end in members_iter:
+                        future = executor.submit(self._extract_member, bucket, key, info, end, dst_bucket, dst_prefix)
+                        pending[future] = info.filename
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        return [results[info.filename] for info, _ in members]
@@ -0,0 +1,263 @@
+import os
+import time
+import struct
+import zipfile
+import logging
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# a single object to be written into the archive; size is the object size in bytes as reported
+# by the bucket listing (None when unknown, in which case the object is fetched in one request).
+# etag and last_modified are used to recognize members that can be reused from a previous archive,
+# last_modified is also used as the member timestamp so that rebuilding an archive is deterministic
+ZipMember = namedtuple('ZipMember', ['bucket', 'key', 'arcname', 'size', 'etag', 'last_modified'],
+                       defaults=(None, None))
+
+# extensions of files that are already compressed - deflating them again only costs CPU time
+DEFAULT_STORED_EXTENSIONS = (
+    '.nc', '.nc4', '.tif', '.tiff', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.mp4', '.h5', '.hdf5', '.parquet',
+)
+
+
+class _RawZipMemberWriter(object):
+    """
+    Writes the already compressed data of a member copied from another archive into a zipfile.ZipFile.
+
+    zipfile has no public API to add raw member data, so this mirrors what ZipFile.open(zinfo, 'w',
+    force_zip64=True) and _ZipWriteFile.close() do, producing the same bytes as compressing the data again.
+    """
+
+    def __init__(self, zip_archive, zinfo):
+        self._zip_archive = zip_archive
+        self._zinfo = zinfo
+        zinfo.flag_bits = 0x00
+        if not zip_archive._seekable:
+            zinfo.flag_bits |= zipfile._MASK_USE_DATA_DESCRIPTOR
+        if not zinfo.external_attr:
+            zinfo.external_attr = 0o600 << 16
+        if zip_archive._seekable:
+            zip_archive.fp.seek(zip_archive.start_dir)
+        zinfo.header_offset = zip_archive.fp.tell()
+        zip_archive._writecheck(zinfo)
+        zip_archive._didModify = True
+        zip_archive.fp.write(zinfo.FileHeader(True))
+        zip_archive._writing = True
+
+    def write(self, data):
+        self._zip_archive.fp.write(data)
+
+    def close(self):
+        zip_archive = self._zip_archive
+        zinfo = self._zinfo
+        try:
+            if zinfo.flag_bits & zipfile._MASK_USE_DATA_DESCRIPTOR:
+                zip_archive.fp.write(struct.pack('<LLQQ', zipfile._DD_SIGNATURE, zinfo.CRC,
+                                                 zinfo.compress_size, zinfo.file_size))
+            zip_archive.start_dir = zip_archive.fp.tell()
+            zip_archive.filelist.append(zinfo)
+            zip_archive.NameToInfo[zinfo.filename] = zinfo
+        finally:
+            zip_archive._writing = False
+
+
+class S3ZipEngine(object):
+    """
+    Streams S3 objects into a zipfile.ZipFile.
+
+    Objects are split into byte ranges which are fetched ahead of the writer on a bounded thread pool;
+    the writer consumes the fetched ranges strictly in order, so the archive layout is the same as the one
+    produced by reading the objects sequentially. At most `prefetch` ranges are held in memory at any time,
+    which bounds the memory used to prefetch * chunk_size bytes.
+
+    When the manifest of a previous archive is given, members whose object has not changed since (same key,
+    ETag, size and modification time) are not compressed again: their compressed bytes are copied from the
+    previous archive with ranged reads.
+    """
+
+    def __init__(self, client, max_workers=None, prefetch=None, chunk_size=None, stored_extensions=None,
+                 max_attempts=3):
+        """
+        :param client: boto3 S3 client used to read the objects
+        :param max_workers: number of threads fetching byte ranges concurrently
+        :param prefetch: maximum number of byte ranges fetched ahead of the writer
+        :param chunk_size: size in bytes of a single ranged read
+        :param stored_extensions: file extensions that are written without compression (ZIP_STORED)
+        :param max_attempts: number of times a short ranged read is retried before giving up
+        """
+        self.client = client
+        self.max_workers = max_workers or getattr(settings, "S3_ZIP_MAX_WORKERS", 8)
+        self.prefetch = max(prefetch or getattr(settings, "S3_ZIP_PREFETCH", 16), self.max_workers)
+        self.chunk_size = chunk_size or getattr(settings, "S3_STREAM_ZIP_CHUNKING_SIZE", 1024 * 1024 * 8)
+        if stored_extensions is None:
+            stored_extensions = getattr(settings, "S3_ZIP_STORED_EXTENSIONS", DEFAULT_STORED_EXTENSIONS)
+        self.stored_extensions = tuple(ext.lower() for ext in stored_extensions)
+        self.max_attempts = max_attempts
+
+    def compress_type(self, arcname):
+        """Returns the zip compression method to use for the archive member named arcname"""
+        _, ext = os.path.splitext(arcname)
+        if ext.lower() in self.stored_extensions:
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def _ranges(self, size, offset=0):
+        """Yields (start, end) inclusive byte ranges covering size bytes from offset; (None, None) reads the
+        whole object"""
+        if size is None:
+            yield None, None
+            return
+        start = offset
+        while start < offset + size:
+            end = min(start + self.chunk_size, offset + size) - 1
+            yield start, end
+            start = end + 1
+
+    def _fetch(self, bucket, key, start, end, etag=None):
+        if start is None:
+            return self.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        params = {"IfMatch": etag} if etag else {}
+        expected = end - start + 1
+        for attempt in range(1, self.max_attempts + 1):
+            # Read specific byte range from file as a chunk. We do this because AWS server times out and sends
+            # empty chunks when streaming the entire file.
+            body = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", **params).get("Body")
+            data = body.read() if body else b""
+            if len(data) == expected:
+                return data
+            logger.warning(f"Short read of {key} bytes {start}-{end} ({len(data)} of {expected} bytes), "
+                           f"attempt {attempt} of {self.max_attempts}")
+        raise IOError(f"Could not read bytes {start}-{end} of {bucket}/{key}")
+
+    def _reusable_entry(self, member, previous_manifest):
+        """Returns the manifest entry of the previous archive holding the same data as member, if any"""
+        if not previous_manifest or member.etag is None:
+            return None
+        entry = previous_manifest["members"].get(member.arcname)
+        if entry is None:
+            return None
+        if (entry["key"], entry["etag"], entry["size"], tuple(entry["date_time"]), entry["compress_type"]) != \
+                (member.key, member.etag, member.size, self._date_time(member), self.compress_type(member.arcname)):
+            return None
+        return entry
+
+    def _tasks(self, members, reused, previous_manifest):
+        """Yields (member_index, is_first_range, is_last_range, bucket, key, start, end, etag) for all members"""
+        for index, member in enumerate(members):
+            entry = reused[index]
+            if entry is not None:
+                bucket, key, etag = previous_manifest["bucket"], previous_manifest["key"], previous_manifest["etag"]
+                size, offset = entry["compress_size"], entry["data_offset"]
+            else:
+                bucket, key, etag = member.bucket, member.key, None
+                size, offset = member.size, 0
+            if size == 0:
+                # nothing to fetch, the writer creates an empty entry
+                yield index, True, True, None, None, None, None, None
+                continue
+            ranges = list(self._ranges(size, offset))
+            for i, (start, end) in enumerate(ranges):
+                yield index, i == 0, i == len(ranges) - 1, bucket, key, start, end, etag
+
+    def _date_time(self, member):
+        if member.last_modified is not None:
+            return tuple(member.last_modified.timetuple()[:6])
+        return tuple(time.localtime(time.time())[:6])
+
+    def _zipinfo(self, member):
+        zinfo = zipfile.ZipInfo(member.arcname, date_time=self._date_time(member))
+        zinfo.compress_type = self.compress_type(member.arcname)
+        if member.size is not None:
+            zinfo.file_size = member.size
+        return zinfo
+
+    def _open_member(self, zip_archive, member, entry=None):
+        zinfo = self._zipinfo(member)
+        if entry is None:
+            return zip_archive.open(zinfo, 'w', force_zip64=True)
+        zinfo.CRC = entry["crc"]
+        zinfo.compress_size = entry["compress_size"]
+        zinfo.file_size = entry["size"]
+        return _RawZipMemberWriter(zip_archive, zinfo)
+
+    def write(self, zip_archive, members, previous_manifest=None):
+        """
+        Writes members into zip_archive in the order given
+        :param zip_archive: a zipfile.ZipFile opened for writing
+        :param members: an iterable of ZipMember
+        :param previous_manifest: the manifest (as returned in the stats of a previous call) of an earlier
+        version of the archive, extended with the 'bucket', 'key' and 'etag' of that archive in S3
+        :return: a dict with the number of files and bytes written, the number of reused members, the elapsed
+        seconds, the throughput and the manifest of the members written
+        """
+        members = list(members)
+        start_time = time.time()
+        total_bytes = 0
+        reused = [self._reusable_entry(member, previous_manifest) for member in members]
+        tasks = self._tasks(members, reused, previous_manifest)
+        pending = deque()
+        manifest = []
+
+        def submit_next(executor):
+            task = next(tasks, None)
+            if task is None:
+                return False
+            index, first, last, bucket, key, start, end, etag = task
+            future = executor.submit(self._fetch, bucket, key, start, end, etag) if key is not None else None
+            pending.append((index, first, last, future))
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while len(pending) < self.prefetch and submit_next(executor):
+                    pass
+                zip_archive_file = None
+                data_offset = None
+                while pending:
+                    index, first, last, future = pending.popleft()
+                    data = future.result() if future is not None else b""
+                    # keep the prefetch window full while this range is being written
+                    submit_next(executor)
+                    if first:
+                        zip_archive_file = self._open_member(zip_archive, members[index], reused[index])
+                        data_offset = zip_archive.fp.tell()
+                    zip_archive_file.write(data)
+                    total_bytes += len(data)
+                    if last:
+                        zip_archive_file.close()
+                        zip_archive_file = None
+                        zinfo = zip_archive.filelist[-1]
+                        member = members[index]
+                        manifest.append({
+                            "arcname": member.arcname,
+                            "key": member.key,
+                            "etag": member.etag,
+                            "size": zinfo.file_size,
+                            "date_time": list(zinfo.date_time),
+                            "compress_type": zinfo.compress_type,
+                            "crc": zinfo.CRC,
+                            "compress_size": zinfo.compress_size,
+                            "data_offset": data_offset,
+                        })
+            except BaseException:
+                for _, _, _, future in pending:
+                    if future is not None:
+                        future.cancel()
+                raise
+
+        elapsed = time.time() - start_time
+        stats = {
+            "files": len(members),
+            "reused": len([entry for entry in reused if entry is not None]),
+            "bytes": total_bytes,
+            "seconds": elapsed,
+            "bytes_per_second": total_bytes / elapsed if elapsed else 0,
+            "manifest": manifest,
+        }
+        logger.debug(f"Zipped {stats['files']} files ({stats['reused']} reused, {stats['bytes']} bytes) "
+                     f"in {elapsed:.2f} seconds")
+        return stats
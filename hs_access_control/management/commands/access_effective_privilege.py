@@ -0,0 +1,67 @@
+"""
+This rebuilds or checks the materialized effective privilege of users over resources.
+
+* `access_effective_privilege rebuild` recomputes EffectiveResourcePrivilege for all users
+  (or for the given users) from user and group privilege.
+* `access_effective_privilege check` compares EffectiveResourcePrivilege with view and edit
+  privilege computed from the privilege tables and reports discrepancies.
+  With --fix, users with discrepancies are rebuilt.
+
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from hs_access_control.models import EffectiveResourcePrivilege
+from hs_access_control.management.utilities import user_from_name
+
+
+class Command(BaseCommand):
+    help = """Rebuild or check the effective privilege of users over resources."""
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('command', type=str, choices=['rebuild', 'check'])
+        parser.add_argument('usernames', nargs='*', type=str,
+                            help='users to rebuild or check; all users if omitted')
+        parser.add_argument('--fix', action='store_true', dest='fix',
+                            help='rebuild users whose effective privilege is inconsistent')
+
+    def handle(self, *args, **options):
+
+        users = None
+        if options['usernames']:
+            users = []
+            for username in options['usernames']:
+                user = user_from_name(username)
+                if user is None:
+                    raise CommandError("No such user {}.".format(username))
+                users.append(user)
+
+        if options['command'] == 'rebuild':
+            if users is None:
+                count = EffectiveResourcePrivilege.rebuild()
+                print("Rebuilt effective privilege: {} records.".format(count))
+            else:
+                EffectiveResourcePrivilege.refresh(users=users)
+                print("Rebuilt effective privilege of {} users.".format(len(users)))
+            return
+
+        if users is None:
+            users = User.objects.order_by('id').select_related('uaccess').iterator()
+        inconsistent = []
+        checked = 0
+        for user in users:
+            checked += 1
+            discrepancies = user.uaccess.check_effective_privilege()
+            if not any(discrepancies.values()):
+                continue
+            inconsistent.append(user)
+            print("user '{}' (id={}):".format(user.username, user.id))
+            for kind, short_ids in discrepancies.items():
+                for short_id in sorted(short_ids):
+                    print("  {} {}".format(kind, short_id))
+
+        print("Checked {} users: {} inconsistent.".format(checked, len(inconsistent)))
+        if inconsistent and options['fix']:
+            EffectiveResourcePrivilege.refresh(users=inconsistent)
+            print("Rebuilt effective privilege of {} users.".format(len(inconsistent)))
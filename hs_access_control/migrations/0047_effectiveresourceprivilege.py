@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_effective_privilege(apps, schema_editor):
+    """Materialize the effective privilege of each user over each resource from user and group privilege.
+    This is the same computation as EffectiveResourcePrivilege.compute, on historical models."""
+    UserResourcePrivilege = apps.get_model('hs_access_control', 'UserResourcePrivilege')
+    UserGroupPrivilege = apps.get_model('hs_access_control', 'UserGroupPrivilege')
+    GroupResourcePrivilege = apps.get_model('hs_access_control', 'GroupResourcePrivilege')
+    EffectiveResourcePrivilege = apps.get_model('hs_access_control', 'EffectiveResourcePrivilege')
+
+    effective = {}
+    for user_id, resource_id, privilege in \
+            UserResourcePrivilege.objects.values_list('user_id', 'resource_id', 'privilege').iterator():
+        effective[(user_id, resource_id)] = privilege
+
+    members = {}
+    for user_id, group_id in UserGroupPrivilege.objects.filter(group__gaccess__active=True) \
+            .values_list('user_id', 'group_id').iterator():
+        members.setdefault(group_id, []).append(user_id)
+    for group_id, resource_id, privilege in GroupResourcePrivilege.objects.filter(group_id__in=list(members)) \
+            .values_list('group_id', 'resource_id', 'privilege').iterator():
+        privilege = max(privilege, 2)  # groups grant at most CHANGE
+        for user_id in members[group_id]:
+            key = (user_id, resource_id)
+            effective[key] = min(effective.get(key, 4), privilege)
+
+    EffectiveResourcePrivilege.objects.bulk_create(
+        [EffectiveResourcePrivilege(user_id=user_id, resource_id=resource_id, privilege=privilege)
+         for (user_id, resource_id), privilege in effective.items()],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0088_re_populate_resource_cached_metadata'),
+        ('hs_access_control', '0046_requestcommunity_cancelled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveResourcePrivilege',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('privilege', models.IntegerField(choices=[(1, 'Owner'), (2, 'Change'), (3, 'View')], default=3, editable=False)),
+                ('resource', models.ForeignKey(editable=False, help_text='resource to which privilege applies', on_delete=django.db.models.deletion.CASCADE, related_name='r2erp', to='hs_core.baseresource')),
+                ('user', models.ForeignKey(editable=False, help_text='user holding privilege', on_delete=django.db.models.deletion.CASCADE, related_name='u2erp', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'resource')},
+            },
+        ),
+        migrations.RunPython(populate_effective_privilege, migrations.RunPython.noop),
+    ]
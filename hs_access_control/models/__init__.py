@@ -1,6 +1,7 @@
 from .privilege import PrivilegeCodes, \
     UserResourcePrivilege, UserGroupPrivilege, GroupResourcePrivilege, \
-    UserCommunityPrivilege, GroupCommunityPrivilege, CommunityResourcePrivilege
+    UserCommunityPrivilege, GroupCommunityPrivilege, CommunityResourcePrivilege, \
+    EffectiveResourcePrivilege
 from .provenance import UserResourceProvenance, UserGroupProvenance, GroupResourceProvenance, \
     UserCommunityProvenance, GroupCommunityProvenance, CommunityResourceProvenance
 from .user import UserAccess, FeatureCodes, Feature
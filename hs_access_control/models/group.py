@@ -2,9 +2,12 @@ from django.contrib.auth.models import User, Group
 from django.db import models
 from django.db.models import Q, F, Exists, OuterRef
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 
 from hs_core.models import BaseResource
-from hs_access_control.models.privilege import PrivilegeCodes, UserGroupPrivilege
+from hs_access_control.models.privilege import PrivilegeCodes, UserGroupPrivilege, \
+    EffectiveResourcePrivilege
 from hs_access_control.models.community import Community
 from sorl.thumbnail import ImageField as ThumbnailImageField
 from theme.utils import get_upload_path_group
@@ -87,6 +90,13 @@ class GroupAccess(models.Model):
     date_created = models.DateTimeField(editable=False, auto_now_add=True)
     picture = ThumbnailImageField(upload_to=get_upload_path_group, null=True, blank=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the stored active flag; effective privilege is refreshed only when it changes
+        instance._active_in_db = instance.__dict__.get('active')
+        return instance
+
     ####################################
     # group membership: owners, edit_users, view_users are parallel to those in resources
     ####################################
@@ -429,3 +439,35 @@ class GroupAccess(models.Model):
             return opriv[0].user
         else:
             return None
+
+
+#############################################
+# Keep effective resource privilege in sync with changes to groups
+# that do not go through PrivilegeBase.update.
+#############################################
+
+@receiver(post_save, sender=GroupAccess)
+def group_active_changed(sender, instance, created, **kwargs):
+    """ Activating or deactivating a group grants or revokes the privileges of its members """
+    if not created and getattr(instance, '_active_in_db', None) != instance.active:
+        EffectiveResourcePrivilege.refresh(
+            users=User.objects.filter(u2ugp__group=instance.group),
+            resources=BaseResource.objects.filter(r2grp__group=instance.group))
+    instance._active_in_db = instance.active
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    """ Remember the members and resources of a group before delete cascades remove them """
+    instance._effective_users = list(User.objects.filter(u2ugp__group=instance).values_list('id', flat=True))
+    instance._effective_resources = list(BaseResource.objects.filter(r2grp__group=instance)
+                                         .values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """ Revoke the privileges the members of a deleted group held via the group """
+    users = getattr(instance, '_effective_users', None)
+    resources = getattr(instance, '_effective_resources', None)
+    if users and resources:
+        EffectiveResourcePrivilege.refresh(users=users, resources=resources)
@@ -140,6 +140,7 @@ class PrivilegeBase(models.Model):
             del kwargs['grantor']
         if 'exhibit' in kwargs:
             del kwargs['exhibit']
+        EffectiveResourcePrivilege.refresh_zone(**kwargs)
         zone_of_influence(**kwargs)
 
     @classmethod
@@ -1245,3 +1246,146 @@ class CommunityResourcePrivilege(PrivilegeBase):
             assert isinstance(kwargs['grantor'], User)
             assert len(kwargs) == 2
         return CommunityResourceProvenance.get_undo_resources(**kwargs)
+
+
+class EffectiveResourcePrivilege(models.Model):
+    """ Effective privilege of a user over a resource
+
+    This is a denormalization of UserResourcePrivilege, UserGroupPrivilege and
+    GroupResourcePrivilege: one record per user and resource that the user can view,
+    holding the best privilege the user holds over the resource, either directly or
+    via any active group of which the user is a member. Access lists then become
+    single indexed lookups rather than multi-hop joins followed by distinct().
+
+    Resource flags are not accounted for. In particular, CHANGE over an immutable
+    resource does not allow the user to change it; see UserAccess.edit_resources.
+
+    This is maintained by PrivilegeBase.update for the pairs of users and resources
+    affected by each change in privilege, and by changes in the active flag of groups.
+    It can be rebuilt and checked with the access_effective_privilege management command.
+    """
+
+    privilege = models.IntegerField(choices=PrivilegeCodes.CHOICES,
+                                    editable=False,
+                                    default=PrivilegeCodes.VIEW)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             null=False,
+                             editable=False,
+                             related_name='u2erp',
+                             help_text='user holding privilege')
+
+    resource = models.ForeignKey(BaseResource, on_delete=models.CASCADE,
+                                 null=False,
+                                 editable=False,
+                                 related_name='r2erp',
+                                 help_text='resource to which privilege applies')
+
+    class Meta:
+        unique_together = ('user', 'resource')
+
+    def __str__(self):
+        """ Return printed depiction for debugging """
+        return str.format("<user '{}' (id={}) effectively holds {} ({})"
+                          + " over resource '{}' (id={})>",
+                          str(self.user.username), str(self.user.id),
+                          PrivilegeCodes.NAMES[self.privilege],
+                          str(self.privilege),
+                          str(self.resource.title),
+                          str(self.resource.short_id))
+
+    @classmethod
+    def compute(cls, users=None, resources=None):
+        """
+        Compute effective privilege from the privilege tables.
+
+        :param users: users (or a QuerySet of users) to compute, or None for all users.
+        :param resources: resources (or a QuerySet of resources) to compute, or None for all resources.
+        :return: dict of privilege codes keyed by (user id, resource id); pairs without privilege are absent.
+        """
+        user_privileges = UserResourcePrivilege.objects.all()
+        memberships = UserGroupPrivilege.objects.filter(group__gaccess__active=True)
+        if users is not None:
+            user_privileges = user_privileges.filter(user__in=users)
+            memberships = memberships.filter(user__in=users)
+        if resources is not None:
+            user_privileges = user_privileges.filter(resource__in=resources)
+
+        effective = {}
+        for user_id, resource_id, privilege in \
+                user_privileges.values_list('user_id', 'resource_id', 'privilege'):
+            effective[(user_id, resource_id)] = privilege
+
+        members = {}
+        for user_id, group_id in memberships.values_list('user_id', 'group_id'):
+            members.setdefault(group_id, []).append(user_id)
+        group_privileges = GroupResourcePrivilege.objects.filter(group_id__in=list(members))
+        if resources is not None:
+            group_privileges = group_privileges.filter(resource__in=resources)
+        for group_id, resource_id, privilege in \
+                group_privileges.values_list('group_id', 'resource_id', 'privilege'):
+            # groups cannot own resources; a group grants at most CHANGE to its members
+            privilege = max(privilege, PrivilegeCodes.CHANGE)
+            for user_id in members[group_id]:
+                key = (user_id, resource_id)
+                effective[key] = min(effective.get(key, PrivilegeCodes.NONE), privilege)
+        return effective
+
+    @classmethod
+    def refresh(cls, users=None, resources=None):
+        """
+        Recompute effective privilege for the given users and resources.
+
+        :param users: users (or a QuerySet of users) to refresh, or None for all users.
+        :param resources: resources (or a QuerySet of resources) to refresh, or None for all resources.
+
+        **This is a system routine** and not recommended for use in application code.
+        """
+        with transaction.atomic():
+            records = cls.objects.all()
+            if users is not None:
+                records = records.filter(user__in=users)
+            if resources is not None:
+                records = records.filter(resource__in=resources)
+            effective = cls.compute(users=users, resources=resources)
+            records.delete()
+            cls.objects.bulk_create([cls(user_id=user_id, resource_id=resource_id, privilege=privilege)
+                                     for (user_id, resource_id), privilege in effective.items()],
+                                    batch_size=1000, ignore_conflicts=True)
+
+    @classmethod
+    def refresh_zone(cls, **kwargs):
+        """
+        Recompute effective privilege for the zone of influence of a change in privilege.
+
+        This takes the keys of a privilege record, e.g.,
+
+            * EffectiveResourcePrivilege.refresh_zone(user={X}, resource={Y})
+            * EffectiveResourcePrivilege.refresh_zone(group={X}, resource={Y})
+            * EffectiveResourcePrivilege.refresh_zone(user={X}, group={Y})
+
+        Community privileges do not confer resource privileges and are ignored.
+
+        **This is a system routine** and not recommended for use in application code.
+        """
+        if 'resource' in kwargs:
+            if 'user' in kwargs:
+                cls.refresh(users=[kwargs['user']], resources=[kwargs['resource']])
+            elif 'group' in kwargs:
+                cls.refresh(users=User.objects.filter(u2ugp__group=kwargs['group']),
+                            resources=[kwargs['resource']])
+        elif 'user' in kwargs and 'group' in kwargs:
+            cls.refresh(users=[kwargs['user']],
+                        resources=BaseResource.objects.filter(r2grp__group=kwargs['group']))
+
+    @classmethod
+    def rebuild(cls, batch_size=500):
+        """
+        Rebuild the effective privilege of all users, a batch of users at a time.
+
+        :return: number of effective privilege records.
+        """
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(user_ids), batch_size):
+            cls.refresh(users=user_ids[start:start + batch_size])
+        return cls.objects.count()
@@ -59,24 +59,6 @@ class ResourceAccess(models.Model):
     # workalike queries adapt to old access control system
     #############################################
 
-    @property
-    def __view_users_from_individual(self):
-        return Q(is_active=True,
-                 u2urp__resource=self.resource)
-
-    @property
-    def __view_users_from_group(self):
-        return Q(is_active=True,
-                 u2ugp__group__gaccess__active=True,
-                 u2ugp__group__g2grp__resource=self.resource)
-
-    @property
-    def __view_users_from_community(self):
-        return Q(is_active=True,
-                 u2ugp__group__gaccess__active=True,
-                 u2ugp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-                 u2ugp__group__g2gcp__community__c2gcp__group__g2grp__resource=self.resource)
-
     @property
     def view_users(self):
         """
@@ -88,39 +70,11 @@ class ResourceAccess(models.Model):
 
         For VIEW, effective privilege = declared privilege, in the sense that all editors have
         VIEW, even if the resource is immutable.
-        """
 
-        return User.objects.filter(self.__view_users_from_individual
-                                   | self.__view_users_from_group).distinct()
-
-    @property
-    def __edit_users_from_individual(self):
-        return Q(is_active=True,
-                 u2urp__resource=self.resource,
-                 u2urp__privilege=PC.OWNER) | \
-            Q(is_active=True,
-              u2urp__resource=self.resource,
-              u2urp__resource__raccess__immutable=False,
-              u2urp__privilege__lte=PC.CHANGE)
-
-    @property
-    def __edit_users_from_group(self):
-        return Q(is_active=True,
-                 u2ugp__group__gaccess__active=True,
-                 u2ugp__group__g2grp__resource=self.resource,
-                 u2ugp__group__g2grp__resource__raccess__immutable=False,
-                 u2ugp__group__g2grp__privilege__lte=PC.CHANGE)
+        This is read from EffectiveResourcePrivilege rather than computed from user and group privilege.
+        """
 
-    @property
-    def __edit_users_from_community(self):
-        return Q(
-            is_active=True,
-            u2ugp__group__gaccess__active=True,
-            u2ugp__group__g2gcp__privilege=PC.CHANGE,
-            u2ugp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-            u2ugp__group__g2gcp__community__c2gcp__group__g2grp__resource=self.resource,
-            u2ugp__group__g2gcp__community__c2gcp__group__g2grp__resource__raccess__immutable=False,
-            u2ugp__group__g2gcp__community__c2gcp__group__g2grp__privilege=PC.CHANGE)
+        return User.objects.filter(is_active=True, u2erp__resource=self.resource)
 
     @property
     def edit_users(self):
@@ -131,10 +85,14 @@ class ResourceAccess(models.Model):
 
         This now accounts for group and community privileges
 
+        This is read from EffectiveResourcePrivilege rather than computed from user and group privilege.
         """
-        return User.objects\
-                   .filter(self.__edit_users_from_individual
-                           | self.__edit_users_from_group).distinct()
+        if self.immutable:
+            # owners can edit immutable resources
+            return User.objects.filter(is_active=True, u2erp__resource=self.resource,
+                                       u2erp__privilege=PC.OWNER)
+        return User.objects.filter(is_active=True, u2erp__resource=self.resource,
+                                   u2erp__privilege__lte=PC.CHANGE)
 
     @property
     def __view_groups_from_group(self):
@@ -1,6 +1,6 @@
 from django.contrib.auth.models import User, Group
 from django.db import models, transaction
-from django.db.models import Q, Subquery
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
 from django.core.exceptions import PermissionDenied
 
 from hs_core.models import BaseResource
@@ -12,6 +12,7 @@ from hs_access_control.models.privilege import (
     UserCommunityPrivilege,
     GroupCommunityPrivilege,
     CommunityResourcePrivilege,
+    EffectiveResourcePrivilege,
 )
 from hs_access_control.models.group import GroupAccess, GroupMembershipRequest
 from hs_access_control.models.exceptions import PolymorphismError
@@ -1195,6 +1196,18 @@ class UserAccess(models.Model):
             )
         )
 
+    def __effective_view_q(self):
+        # effective privilege is materialized in EffectiveResourcePrivilege;
+        # this is equivalent to __resource_view_q
+        return Q(r2erp__user=self.user)
+
+    def __effective_edit_q(self):
+        # equivalent to __resource_edit_q: owners can edit immutable resources
+        return Q(r2erp__user=self.user) & (
+            Q(r2erp__privilege=PrivilegeCodes.OWNER)
+            | Q(r2erp__privilege=PrivilegeCodes.CHANGE, raccess__immutable=False)
+        )
+
     @property
     def view_resources(self):
         """
@@ -1208,7 +1221,7 @@ class UserAccess(models.Model):
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        return BaseResource.objects.filter(self.__resource_view_q()).distinct()
+        return BaseResource.objects.filter(self.__effective_view_q())
 
     @property
     def owned_resources(self):
@@ -1248,7 +1261,31 @@ class UserAccess(models.Model):
         # 1. it's shared with the user and editable.
         # 2. it's shared with a group that has edit privilege and contains the user,
 
-        return BaseResource.objects.filter(self.__resource_edit_q()).distinct()
+        return BaseResource.objects.filter(self.__effective_edit_q())
+
+    def check_effective_privilege(self):
+        """
+        Check the materialized effective privilege of the user against the privilege tables.
+
+        :return: dict of sets of short ids of resources, keyed by 'view_missing', 'view_extra',
+                 'edit_missing' and 'edit_extra'. All sets are empty if EffectiveResourcePrivilege
+                 is consistent with the Q-based computation of view and edit privilege.
+
+        This is used by the access_effective_privilege management command.
+        """
+        def short_ids(q):
+            return set(BaseResource.objects.filter(q).values_list('short_id', flat=True))
+
+        view_expected = short_ids(self.__resource_view_q())
+        view_actual = short_ids(self.__effective_view_q())
+        edit_expected = short_ids(self.__resource_edit_q())
+        edit_actual = short_ids(self.__effective_edit_q())
+        return {
+            'view_missing': view_expected - view_actual,
+            'view_extra': view_actual - view_expected,
+            'edit_missing': edit_expected - edit_actual,
+            'edit_extra': edit_actual - edit_expected,
+        }
 
     def get_resources_with_explicit_access(self, this_privilege,
                                            via_user=True, via_group=False):
@@ -1477,8 +1514,8 @@ class UserAccess(models.Model):
         if access_resource.immutable:
             return False
 
-        can_change = BaseResource.objects.filter(
-            Q(id=this_resource.id) & self.__resource_edit_q()
+        can_change = EffectiveResourcePrivilege.objects.filter(
+            user=self.user, resource=this_resource, privilege__lte=PrivilegeCodes.CHANGE
         ).exists()
 
         return can_change
@@ -1567,12 +1604,48 @@ class UserAccess(models.Model):
         if self.user.is_superuser:
             return True
 
-        can_view = BaseResource.objects.filter(
-            Q(id=this_resource.id) & self.__resource_view_q()
+        can_view = EffectiveResourcePrivilege.objects.filter(
+            user=self.user, resource=this_resource
         ).exists()
 
         return can_view
 
+    def get_resources_access(self, short_ids):
+        """
+        Resource flags and effective view and change access of the user for a set of resources, in one query.
+
+        :param short_ids: short ids of the resources to check
+        :return: dict keyed by short id of dicts with the public, allow_private_sharing and discoverable flags of
+                 the resource and whether the user can_view and can_change it. Resources that do not exist are
+                 not included.
+
+        can_view and can_change have the same meaning as can_view_resource and can_change_resource, except
+        that an inactive user gets False instead of PermissionDenied (public and private link shared resources
+        can still be viewed). This is used to authorize requests covering several resources at once (e.g., S3
+        multi-prefix requests).
+        """
+        resources = BaseResource.objects.filter(short_id__in=short_ids)
+        if not self.user.is_active:
+            resources = resources.annotate(user_can_view=Value(False), user_can_change=Value(False))
+        elif self.user.is_superuser:
+            resources = resources.annotate(user_can_view=Value(True), user_can_change=Value(True))
+        else:
+            resources = resources.annotate(
+                user_can_view=Exists(BaseResource.objects.filter(Q(id=OuterRef('id')) & self.__effective_view_q())),
+                user_can_change=Exists(BaseResource.objects.filter(Q(id=OuterRef('id')) & self.__effective_edit_q())),
+            )
+        access = {}
+        for res in resources.values('short_id', 'raccess__public', 'raccess__allow_private_sharing',
+                                    'raccess__discoverable', 'user_can_view', 'user_can_change'):
+            access[res['short_id']] = {
+                'public': res['raccess__public'],
+                'allow_private_sharing': res['raccess__allow_private_sharing'],
+                'discoverable': res['raccess__discoverable'],
+                'can_view': res['raccess__public'] or res['raccess__allow_private_sharing'] or res['user_can_view'],
+                'can_change': res['user_can_change'],
+            }
+        return access
+
     def can_view_resources_owned_by(self, owner):
         """
         Count of resources that self has permission to view that are owned by owner.
@@ -0,0 +1,167 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import PrivilegeCodes, EffectiveResourcePrivilege
+
+from hs_core import hydroshare
+from hs_core.testing import MockS3TestCaseMixin
+
+from hs_access_control.tests.utilities import global_reset
+
+
+class T21EffectivePrivilege(MockS3TestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(T21EffectivePrivilege, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.bat = hydroshare.create_account(
+            'bat@gmail.com',
+            username='bat',
+            first_name='not a man',
+            last_name='last_name_bat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.bones = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.dog,
+            title='all about dog bones',
+            metadata=[],
+        )
+
+        self.chewies = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.dog,
+            title='all about dog chewies',
+            metadata=[],
+        )
+
+        self.felines = self.dog.uaccess.create_group(
+            title='felines', description="We are the felines")
+
+    def effective(self, user, resource):
+        return EffectiveResourcePrivilege.objects.filter(user=user, resource=resource) \
+            .values_list('privilege', flat=True).first() or PrivilegeCodes.NONE
+
+    def assertConsistent(self):
+        for user in (self.dog, self.cat, self.bat):
+            discrepancies = user.uaccess.check_effective_privilege()
+            self.assertFalse(any(discrepancies.values()), discrepancies)
+
+    def test_01_user_privilege(self):
+        "effective privilege follows sharing with users"
+        dog = self.dog
+        cat = self.cat
+        self.assertEqual(self.effective(dog, self.bones), PrivilegeCodes.OWNER)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.NONE)
+
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.CHANGE)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.CHANGE)
+        self.assertConsistent()
+
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.VIEW)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.VIEW)
+        self.assertConsistent()
+
+        dog.uaccess.undo_share_resource_with_user(self.bones, cat)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.CHANGE)
+        self.assertConsistent()
+
+        dog.uaccess.unshare_resource_with_user(self.bones, cat)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.NONE)
+        self.assertNotIn(cat, self.bones.raccess.view_users)
+        self.assertConsistent()
+
+    def test_02_group_privilege(self):
+        "effective privilege follows group membership, group sharing and group activity"
+        dog = self.dog
+        cat = self.cat
+        dog.uaccess.share_resource_with_group(self.bones, self.felines, PrivilegeCodes.CHANGE)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.NONE)
+
+        dog.uaccess.share_group_with_user(self.felines, cat, PrivilegeCodes.VIEW)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.CHANGE)
+        self.assertIn(self.bones, cat.uaccess.edit_resources)
+        self.assertIn(cat, self.bones.raccess.edit_users)
+        self.assertConsistent()
+
+        # the best of user and group privilege is effective
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.VIEW)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.CHANGE)
+        dog.uaccess.unshare_resource_with_group(self.bones, self.felines)
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.VIEW)
+        self.assertConsistent()
+
+        dog.uaccess.share_resource_with_group(self.chewies, self.felines, PrivilegeCodes.VIEW)
+        self.assertEqual(self.effective(cat, self.chewies), PrivilegeCodes.VIEW)
+
+        # inactive groups do not give privilege
+        self.felines.gaccess.active = False
+        self.felines.gaccess.save()
+        self.assertEqual(self.effective(cat, self.chewies), PrivilegeCodes.NONE)
+        self.assertNotIn(self.chewies, cat.uaccess.view_resources)
+        self.assertConsistent()
+
+        self.felines.gaccess.active = True
+        self.felines.gaccess.save()
+        self.assertEqual(self.effective(cat, self.chewies), PrivilegeCodes.VIEW)
+        self.assertConsistent()
+
+        dog.uaccess.unshare_group_with_user(self.felines, cat)
+        self.assertEqual(self.effective(cat, self.chewies), PrivilegeCodes.NONE)
+        self.assertConsistent()
+
+        dog.uaccess.share_group_with_user(self.felines, cat, PrivilegeCodes.VIEW)
+        dog.uaccess.delete_group(self.felines)
+        self.assertEqual(self.effective(cat, self.chewies), PrivilegeCodes.NONE)
+        self.assertConsistent()
+
+    def test_03_immutable(self):
+        "CHANGE over an immutable resource does not allow editing, OWNER does"
+        dog = self.dog
+        cat = self.cat
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.CHANGE)
+        self.bones.raccess.immutable = True
+        self.bones.raccess.save()
+        self.assertIn(self.bones, cat.uaccess.view_resources)
+        self.assertNotIn(self.bones, cat.uaccess.edit_resources)
+        self.assertIn(self.bones, dog.uaccess.edit_resources)
+        self.assertNotIn(cat, self.bones.raccess.edit_users)
+        self.assertIn(dog, self.bones.raccess.edit_users)
+        self.assertConsistent()
+
+    def test_04_rebuild(self):
+        "rebuild restores effective privilege and the consistency check detects drift"
+        dog = self.dog
+        cat = self.cat
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.VIEW)
+        EffectiveResourcePrivilege.objects.filter(user=cat).delete()
+        EffectiveResourcePrivilege.objects.create(user=self.bat, resource=self.chewies,
+                                                  privilege=PrivilegeCodes.VIEW)
+        self.assertEqual(cat.uaccess.check_effective_privilege()['view_missing'], {self.bones.short_id})
+        self.assertEqual(self.bat.uaccess.check_effective_privilege()['view_extra'], {self.chewies.short_id})
+
+        EffectiveResourcePrivilege.rebuild()
+        self.assertEqual(self.effective(cat, self.bones), PrivilegeCodes.VIEW)
+        self.assertEqual(self.effective(self.bat, self.chewies), PrivilegeCodes.NONE)
+        self.assertConsistent()
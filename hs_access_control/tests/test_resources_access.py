@@ -0,0 +1,141 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import PrivilegeCodes
+
+from hs_core import hydroshare
+from hs_core.testing import MockS3TestCaseMixin
+
+from hs_access_control.tests.utilities import global_reset
+
+
+class T20ResourcesAccess(MockS3TestCaseMixin, TestCase):
+
+    def setUp(self):
+        super(T20ResourcesAccess, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.admin = hydroshare.create_account(
+            'admin@gmail.com',
+            username='admin',
+            first_name='administrator',
+            last_name='couch',
+            superuser=True,
+            groups=[]
+        )
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.bat = hydroshare.create_account(
+            'bat@gmail.com',
+            username='bat',
+            first_name='not a man',
+            last_name='last_name_bat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.bones = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.dog,
+            title='all about dog bones',
+            metadata=[],
+        )
+
+        self.chewies = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.dog,
+            title='all about dog chewies',
+            metadata=[],
+        )
+
+        self.felines = self.dog.uaccess.create_group(
+            title='felines', description="We are the felines")
+
+    def check_matches_single_resource_checks(self, user, resources):
+        access = user.uaccess.get_resources_access([r.short_id for r in resources] + ['not_a_resource'])
+        self.assertEqual(set(access.keys()), set(r.short_id for r in resources))
+        for r in resources:
+            self.assertEqual(access[r.short_id]['can_view'], user.uaccess.can_view_resource(r))
+            self.assertEqual(access[r.short_id]['can_change'], user.uaccess.can_change_resource(r))
+            self.assertEqual(access[r.short_id]['public'], r.raccess.public)
+            self.assertEqual(access[r.short_id]['discoverable'], r.raccess.discoverable)
+            self.assertEqual(access[r.short_id]['allow_private_sharing'], r.raccess.allow_private_sharing)
+
+    def test_01_user_privileges(self):
+        "access of many resources matches single resource checks for user privileges"
+        dog = self.dog
+        cat = self.cat
+        bat = self.bat
+        resources = [self.bones, self.chewies]
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.VIEW)
+        dog.uaccess.share_resource_with_user(self.chewies, cat, PrivilegeCodes.CHANGE)
+        for user in (dog, cat, bat, self.admin):
+            self.check_matches_single_resource_checks(user, resources)
+
+        access = cat.uaccess.get_resources_access([self.bones.short_id, self.chewies.short_id])
+        self.assertTrue(access[self.bones.short_id]['can_view'])
+        self.assertFalse(access[self.bones.short_id]['can_change'])
+        self.assertTrue(access[self.chewies.short_id]['can_change'])
+
+        # immutable resources can only be changed by owners
+        self.chewies.raccess.immutable = True
+        self.chewies.raccess.save()
+        for user in (dog, cat, bat):
+            self.check_matches_single_resource_checks(user, resources)
+
+    def test_02_group_privileges_and_flags(self):
+        "access of many resources matches single resource checks for group privileges and flags"
+        dog = self.dog
+        cat = self.cat
+        bat = self.bat
+        resources = [self.bones, self.chewies]
+        dog.uaccess.share_group_with_user(self.felines, cat, PrivilegeCodes.VIEW)
+        dog.uaccess.share_resource_with_group(self.bones, self.felines, PrivilegeCodes.CHANGE)
+        self.chewies.raccess.public = True
+        self.chewies.raccess.discoverable = True
+        self.chewies.raccess.save()
+        for user in (dog, cat, bat):
+            self.check_matches_single_resource_checks(user, resources)
+
+        access = cat.uaccess.get_resources_access([self.bones.short_id])
+        self.assertTrue(access[self.bones.short_id]['can_change'])
+
+        # inactive groups do not give access
+        self.felines.gaccess.active = False
+        self.felines.gaccess.save()
+        for user in (dog, cat, bat):
+            self.check_matches_single_resource_checks(user, resources)
+
+    def test_03_inactive_user(self):
+        "an inactive user can only view public and private link shared resources"
+        dog = self.dog
+        cat = self.cat
+        dog.uaccess.share_resource_with_user(self.bones, cat, PrivilegeCodes.CHANGE)
+        self.chewies.raccess.allow_private_sharing = True
+        self.chewies.raccess.save()
+        cat.is_active = False
+        cat.save()
+
+        access = cat.uaccess.get_resources_access([self.bones.short_id, self.chewies.short_id])
+        self.assertFalse(access[self.bones.short_id]['can_view'])
+        self.assertFalse(access[self.bones.short_id]['can_change'])
+        self.assertTrue(access[self.chewies.short_id]['can_view'])
+        self.assertFalse(access[self.chewies.short_id]['can_change'])
+        self.assertTrue(cat.uaccess.can_view_resource(self.chewies))
@@ -15,7 +15,8 @@ from pprint import pprint
 
 from hs_access_control.models import UserAccess, GroupAccess, ResourceAccess, \
     UserResourcePrivilege, GroupResourcePrivilege, UserGroupPrivilege, PrivilegeCodes, \
-    UserResourceProvenance, GroupResourceProvenance, UserGroupProvenance, Community, RequestCommunity
+    UserResourceProvenance, GroupResourceProvenance, UserGroupProvenance, Community, RequestCommunity, \
+    EffectiveResourcePrivilege
 
 
 # from hs_core import hydroshare
@@ -26,6 +27,7 @@ def global_reset():
     UserResourcePrivilege.objects.all().delete()
     UserGroupPrivilege.objects.all().delete()
     GroupResourcePrivilege.objects.all().delete()
+    EffectiveResourcePrivilege.objects.all().delete()
     UserResourceProvenance.objects.all().delete()
     UserGroupProvenance.objects.all().delete()
     GroupResourceProvenance.objects.all().delete()
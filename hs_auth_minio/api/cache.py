@@ -1,91 +1,125 @@
+import logging
 import os
 
 import redis
 
+logger = logging.getLogger("micro-auth")
+
 # Redis configuration
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
-REDIS_PORT = os.getenv('REDIS_PORT', 6379)
-REDIS_TTL = os.getenv('REDIS_TTL', 3600)
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+# time to live in seconds of cached authorization data
+REDIS_TTL = int(os.getenv('REDIS_TTL', 3600))
+# time to live in seconds of cached negative results (unknown users and resources, users without access). Kept short
+# so that changes the access control hook is not notified about (e.g., group membership) are picked up quickly
+REDIS_NEGATIVE_TTL = int(os.getenv('REDIS_NEGATIVE_TTL', 60))
+# the cache can be disabled to read all authorization data from the database
+CACHE_ENABLED = os.getenv('AUTH_CACHE_ENABLED', 'true').lower() == 'true'
+
+# user access to a resource stored in the cache, EDIT implies VIEW
+EDIT = "EDIT"
+VIEW = "VIEW"
+NONE = "NONE"
 
 # Initialize Redis connection
 redis_client = redis.Redis(
     host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
 
+class CacheMiss(Exception):
+    """Raised when the requested value is not in the cache"""
+
+
+def invalidate_users_access(resource_id, user_ids):
+    """Drop the cached access of the users to a resource, which is read again from the database when needed"""
+    if user_ids:
+        redis_client.delete(*[f"{user_id}: {resource_id}" for user_id in user_ids])
+
+
 def set_cache_xx(key, value):
     redis_client.set(key, value, xx=True, ex=REDIS_TTL)
 
 
 def hset_cache_xx(key, mapping):
+    # only update cached resources, and keep them for at most REDIS_TTL from now
     if redis_client.exists(key):
-        redis_client.hset(key, mapping=mapping)
+        with redis_client.pipeline() as pipe:
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, REDIS_TTL)
+            pipe.execute()
 
 
 def is_superuser_and_id_cache(username):
-    # disable cache access for now
     is_superuser, user_id = redis_client.hmget(
         username, ["is_superuser", "user_id"])
     if is_superuser is None:
-        raise Exception
-    # is_superuser is stored as a byte
-    return is_superuser == b'\x00', int(user_id)
-
-
-def resource_discoverability_cache(resource_id):
-    # disable cache access for now
-    access = redis_client.hmget(resource_id, ["access", "private_sharing"])
-    if access[0] == "DISCOVERABLE":
-        # public, allow_private_sharing, discoverable
-        return False, access[1] == "ENABLED", True
-    elif access[0] == "PUBLIC":
-        return True, access[1] == "ENABLED", True
-    elif access[0] == "PRIVATE":
-        return False, access[1] == "ENABLED", False
-    elif access[0] is None:
-        raise Exception
-
-
-def user_has_view_access_cache(user_id, resource_id):
-    # disable cache access for now
-    access = redis_client.get(f"{user_id}: {resource_id}")
-    if access is None:
-        raise Exception
-    else:
-        return access in ["VIEW", "EDIT"]
-
-
-def user_has_edit_access_cache(user_id, resource_id):
-    # disable cache access for now
-    access = redis_client.get(f"{user_id}: {resource_id}")
-    if access is None:
-        raise Exception
-    else:
-        return access == "EDIT"
+        raise CacheMiss
+    return is_superuser == "1", int(user_id) if user_id else None
+
+
+def _discoverability(access, private_sharing):
+    # public, allow_private_sharing, discoverable
+    if access == "DISCOVERABLE":
+        return False, private_sharing == "ENABLED", True
+    elif access == "PUBLIC":
+        return True, private_sharing == "ENABLED", True
+    elif access == "PRIVATE":
+        return False, private_sharing == "ENABLED", False
+    return None
+
+
+def resources_access_cache(user_id, resource_ids):
+    """
+    Return the cached access of the user to the resources in a single round trip
+    :return: a dict of (public, allow_private_sharing, discoverable, access) by resource id, resources that are not
+    fully cached are not included
+    """
+    with redis_client.pipeline(transaction=False) as pipe:
+        for resource_id in resource_ids:
+            pipe.hmget(resource_id, ["access", "private_sharing"])
+            pipe.get(f"{user_id}: {resource_id}")
+        results = pipe.execute()
+    cached = {}
+    for i, resource_id in enumerate(resource_ids):
+        (access, private_sharing), user_access = results[2 * i], results[2 * i + 1]
+        discoverability = _discoverability(access, private_sharing)
+        if discoverability is None or user_access is None:
+            continue
+        cached[resource_id] = discoverability + (user_access,)
+    return cached
 
 
 def backfill_superuser_and_id(username, is_superuser, user_id):
-    redis_client.hmset(
-        username, {"is_superuser": bytes(is_superuser), "user_id": user_id})
-
-
-def backfill_resource_discoverability(resource_id, public, allow_private_sharing, discoverable):
+    with redis_client.pipeline() as pipe:
+        pipe.hset(username, mapping={"is_superuser": "1" if is_superuser else "0",
+                                     "user_id": user_id if user_id is not None else ""})
+        pipe.expire(username, REDIS_TTL if user_id is not None else REDIS_NEGATIVE_TTL)
+        pipe.execute()
+
+
+def backfill_resources_access(user_id, resources_access, unknown_resource_ids=()):
+    """
+    Cache the access of the user to resources read from the database in a single round trip
+    :param resources_access: a dict of (public, allow_private_sharing, discoverable, access) by resource id
+    :param unknown_resource_ids: ids of resources not found in the database, cached as private for a short time
+    """
+    with redis_client.pipeline(transaction=False) as pipe:
+        for resource_id, (public, allow_private_sharing, discoverable, access) in resources_access.items():
+            _backfill_resource(pipe, resource_id, public, allow_private_sharing, discoverable, REDIS_TTL)
+            pipe.set(f"{user_id}: {resource_id}", access, ex=REDIS_TTL if access != NONE else REDIS_NEGATIVE_TTL)
+        for resource_id in unknown_resource_ids:
+            _backfill_resource(pipe, resource_id, False, False, False, REDIS_NEGATIVE_TTL)
+            pipe.set(f"{user_id}: {resource_id}", NONE, ex=REDIS_NEGATIVE_TTL)
+        pipe.execute()
+
+
+def _backfill_resource(pipe, resource_id, public, allow_private_sharing, discoverable, ttl):
     if public:
         access = "PUBLIC"
     elif discoverable:
         access = "DISCOVERABLE"
     else:
         access = "PRIVATE"
-    redis_client.hmset(
-        resource_id,
-        {"access": access, "private_sharing": "ENABLED" if allow_private_sharing else "DISABLED"},
-    )
-
-
-def backfill_view_access(user_id, resource_id, view_access):
-    redis_client.set(f"{user_id}: {resource_id}",
-                     "VIEW" if view_access else "NONE", ex=REDIS_TTL)
-
-
-def backfill_edit_access(user_id, resource_id, edit_access):
-    redis_client.set(f"{user_id}: {resource_id}",
-                     "EDIT" if edit_access else "VIEW", ex=REDIS_TTL)
+    pipe.hset(resource_id, mapping={"access": access,
+                                    "private_sharing": "ENABLED" if allow_private_sharing else "DISABLED"})
+    pipe.expire(resource_id, ttl)
@@ -1,9 +1,15 @@
 import os
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, text
 
 DATABASE_URL = os.environ.get("HS_DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+# authorization requests run the queries on the threads of the server thread pool, size the connection pool for it
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=int(os.environ.get("HS_DATABASE_POOL_SIZE", 10)),
+    max_overflow=int(os.environ.get("HS_DATABASE_MAX_OVERFLOW", 20)),
+    pool_pre_ping=True,
+)
 
 
 def is_superuser_and_id(username: str):
@@ -20,91 +26,46 @@ def is_superuser_and_id(username: str):
         row = rs.fetchone()
         if row:
             return row
-    return {False, None}
+    return (False, None)
 
 
-def resource_discoverability(resource_id: str):
-    # return public, allow_private_sharing, discoverable as tuple
-    query = """SELECT hs_access_control_resourceaccess.public, hs_access_control_resourceaccess.allow_private_sharing,
-        hs_access_control_resourceaccess.discoverable
-    FROM hs_access_control_resourceaccess
-    INNER JOIN hs_core_genericresource
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_resourceaccess.resource_id)
-    WHERE hs_core_genericresource.short_id = :resource_id"""
-
-    with engine.connect() as con:
-        rs = con.execute(statement=text(query),
-                         parameters=dict(resource_id=resource_id))
-        row = rs.fetchone()
-        if row:
-            return row
-    return (False, False, False)
-
-
-def user_has_view_access(user_id: int, resource_id: str):
-    query = """SELECT DISTINCT hs_core_genericresource.short_id
-    FROM hs_core_genericresource
-    LEFT OUTER JOIN hs_access_control_userresourceprivilege
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_userresourceprivilege.resource_id)
-    LEFT OUTER JOIN hs_access_control_groupresourceprivilege
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_groupresourceprivilege.resource_id)
-    LEFT OUTER JOIN auth_group
-    ON (hs_access_control_groupresourceprivilege.group_id = auth_group.id)
-    LEFT OUTER JOIN hs_access_control_usergroupprivilege
-    ON (auth_group.id = hs_access_control_usergroupprivilege.group_id)
-    LEFT OUTER JOIN hs_access_control_groupaccess
-    ON (auth_group.id = hs_access_control_groupaccess.group_id)
-    INNER JOIN pages_page
-    ON (hs_core_genericresource.page_ptr_id = pages_page.id)
-    WHERE (hs_access_control_userresourceprivilege.user_id = :user_id
-    OR (hs_access_control_usergroupprivilege.user_id = :user_id
-    AND hs_access_control_groupaccess.active))
-    AND hs_core_genericresource.short_id = :resource_id"""
-
-    with engine.connect() as con:
-        rs = con.execute(
-            statement=text(query),
-            parameters=dict(user_id=user_id, resource_id=resource_id),
-        )
-        result = rs.fetchone()
-        if result:
-            return True
-        return False
+# public, allow_private_sharing, discoverable and the effective access of a user to a set of resources. The access
+# follows UserAccess.can_view_resource and can_change_resource in hs_access_control: view through any user privilege
+# or membership of an active group with a privilege, edit as an owner, or with a user or active group CHANGE privilege
+# on a resource that is not immutable
+RESOURCES_ACCESS_QUERY = text("""SELECT r.short_id, ra.public, ra.allow_private_sharing, ra.discoverable,
+    EXISTS (SELECT 1 FROM hs_access_control_userresourceprivilege urp
+            WHERE urp.resource_id = r.page_ptr_id AND urp.user_id = :user_id
+            AND (urp.privilege = 1 OR (urp.privilege <= 2 AND NOT ra.immutable)))
+    OR (NOT ra.immutable AND EXISTS (
+            SELECT 1 FROM hs_access_control_groupresourceprivilege grp
+            INNER JOIN hs_access_control_usergroupprivilege ugp ON ugp.group_id = grp.group_id
+            INNER JOIN hs_access_control_groupaccess ga ON ga.group_id = grp.group_id
+            WHERE grp.resource_id = r.page_ptr_id AND ugp.user_id = :user_id AND ga.active
+            AND grp.privilege = 2)) AS can_edit,
+    EXISTS (SELECT 1 FROM hs_access_control_userresourceprivilege urp
+            WHERE urp.resource_id = r.page_ptr_id AND urp.user_id = :user_id)
+    OR EXISTS (SELECT 1 FROM hs_access_control_groupresourceprivilege grp
+            INNER JOIN hs_access_control_usergroupprivilege ugp ON ugp.group_id = grp.group_id
+            INNER JOIN hs_access_control_groupaccess ga ON ga.group_id = grp.group_id
+            WHERE grp.resource_id = r.page_ptr_id AND ugp.user_id = :user_id AND ga.active) AS can_view
+FROM hs_core_genericresource r
+INNER JOIN hs_access_control_resourceaccess ra ON ra.resource_id = r.page_ptr_id
+WHERE r.short_id IN :resource_ids""").bindparams(bindparam("resource_ids", expanding=True))
 
 
-def user_has_edit_access(user_id: int, resource_id: str):
-    query = """SELECT DISTINCT hs_core_genericresource.short_id
-    FROM hs_core_genericresource
-    LEFT OUTER JOIN hs_access_control_userresourceprivilege
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_userresourceprivilege.resource_id)
-    LEFT OUTER JOIN hs_access_control_resourceaccess
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_resourceaccess.resource_id)
-    LEFT OUTER JOIN hs_access_control_groupresourceprivilege
-    ON (hs_core_genericresource.page_ptr_id = hs_access_control_groupresourceprivilege.resource_id)
-    LEFT OUTER JOIN auth_group
-    ON (hs_access_control_groupresourceprivilege.group_id = auth_group.id)
-    LEFT OUTER JOIN hs_access_control_usergroupprivilege
-    ON (auth_group.id = hs_access_control_usergroupprivilege.group_id)
-    LEFT OUTER JOIN hs_access_control_groupaccess
-    ON (auth_group.id = hs_access_control_groupaccess.group_id)
-    INNER JOIN pages_page
-    ON (hs_core_genericresource.page_ptr_id = pages_page.id)
-    WHERE ((hs_access_control_userresourceprivilege.privilege = 1
-    AND hs_access_control_userresourceprivilege.user_id = :user_id)
-    OR (hs_access_control_userresourceprivilege.privilege <= 2
-    AND hs_access_control_userresourceprivilege.user_id = :user_id
-    AND NOT hs_access_control_resourceaccess.immutable)
-    OR (hs_access_control_usergroupprivilege.user_id = :user_id
-    AND hs_access_control_groupaccess.active
-    AND hs_access_control_groupresourceprivilege.privilege = 2
-    AND NOT hs_access_control_resourceaccess.immutable))
-    AND hs_core_genericresource.short_id = :resource_id"""
+def resources_access(user_id: int, resource_ids: list):
+    # return (public, allow_private_sharing, discoverable, access) by resource id for all resources in a single query,
+    # access being EDIT (which implies view), VIEW or NONE. Resources that do not exist are not returned.
+    if not resource_ids:
+        return {}
     with engine.connect() as con:
         rs = con.execute(
-            statement=text(query),
-            parameters=dict(user_id=user_id, resource_id=resource_id),
+            statement=RESOURCES_ACCESS_QUERY,
+            parameters=dict(user_id=user_id, resource_ids=list(resource_ids)),
         )
-        result = rs.fetchone()
-        if result:
-            return True
-        return False
+        access = {}
+        for short_id, public, allow_private_sharing, discoverable, can_edit, can_view in rs:
+            user_access = "EDIT" if can_edit else "VIEW" if can_view else "NONE"
+            access[short_id] = (public, allow_private_sharing, discoverable, user_access)
+        return access
@@ -28,15 +28,15 @@ class AccessControlChanged(BaseModel):
     resources: List[ResourceAccess]
 
 
+# only entries already in the cache are updated, entries not cached are read from the database when first needed.
+# The access sent for a user is the explicit privilege of the user, while the cache holds the effective access
+# (including group access), so the cached access of the users is dropped and read again from the database
 @router.post("/hook/")
-async def set_auth(access_control_changed: AccessControlChanged, response: Response):
+def set_auth(access_control_changed: AccessControlChanged, response: Response):
     try:
         for resource in access_control_changed.resources:
             resource_id = resource.id
-            for user_access in resource.user_access:
-                user_id = user_access.id
-                access = user_access.access
-                cache.set_cache_xx(f"{user_id}: {resource_id}", access)
+            cache.invalidate_users_access(resource_id, [user_access.id for user_access in resource.user_access])
 
             if resource.public:
                 resource_access = "PUBLIC"
@@ -4,18 +4,10 @@ from typing import AnyStr, List, Optional
 
 from fastapi import APIRouter
 from pydantic import BaseModel
+from redis.exceptions import RedisError
 
-from api.cache import (
-    backfill_edit_access,
-    backfill_resource_discoverability,
-    backfill_superuser_and_id,
-    backfill_view_access,
-    # is_superuser_and_id_cache,
-    # resource_discoverability_cache,
-    # user_has_edit_access_cache,
-    # user_has_view_access_cache,
-)
-from api.database import is_superuser_and_id, resource_discoverability, user_has_edit_access, user_has_view_access
+import api.cache as cache
+from api.database import is_superuser_and_id, resources_access
 
 router = APIRouter()
 logger = logging.getLogger("micro-auth")
@@ -76,8 +68,64 @@ class AuthRequest(AllowBaseModel):
     input: Input
 
 
+def _read_through(cache_get, db_get, backfill, *args):
+    """
+    Return the value cached by cache_get, reading it with db_get and caching it with backfill on a miss.
+    The database is used directly when the cache is disabled or unavailable.
+    """
+    if cache.CACHE_ENABLED:
+        try:
+            return cache_get(*args)
+        except cache.CacheMiss:
+            pass
+        except RedisError:
+            logger.exception("Error reading authorization cache")
+    value = db_get(*args)
+    if cache.CACHE_ENABLED:
+        try:
+            backfill(*args, value)
+        except RedisError:
+            logger.exception("Error writing authorization cache")
+    return value
+
+
+def _superuser_and_id(username):
+    return _read_through(
+        cache.is_superuser_and_id_cache,
+        lambda u: tuple(is_superuser_and_id(u)),
+        lambda u, value: cache.backfill_superuser_and_id(u, *value),
+        username,
+    )
+
+
+def _resources_access(user_id, resource_ids):
+    """
+    Return (public, allow_private_sharing, discoverable, access) of the user for all resources of a request, reading
+    the resources that are not cached with a single query
+    """
+    resource_ids = list(dict.fromkeys(resource_ids))
+    access = {}
+    if cache.CACHE_ENABLED:
+        try:
+            access = cache.resources_access_cache(user_id, resource_ids)
+        except RedisError:
+            logger.exception("Error reading authorization cache")
+    missing = [resource_id for resource_id in resource_ids if resource_id not in access]
+    if missing:
+        found = resources_access(user_id, missing)
+        access.update(found)
+        if cache.CACHE_ENABLED:
+            try:
+                cache.backfill_resources_access(user_id, found, [r for r in missing if r not in found])
+            except RedisError:
+                logger.exception("Error writing authorization cache")
+    return access
+
+
+# the handler is synchronous so that FastAPI runs it on its thread pool, the cache and database calls would
+# otherwise block the event loop
 @router.post("/authorization/")
-async def hs_s3_authorization_check(auth_request: AuthRequest):
+def hs_s3_authorization_check(auth_request: AuthRequest):
 
     username = auth_request.input.conditions.user
     bucket = auth_request.input.bucket
@@ -91,11 +139,7 @@ async def hs_s3_authorization_check(auth_request: AuthRequest):
         # This is needed by mc to list buckets and does not contain a prefix
         return {"result": {"allow": True}}
 
-    try:
-        user_is_superuser, user_id = is_superuser_and_id(username)
-    except Exception:
-        user_is_superuser, user_id = is_superuser_and_id(username)
-        backfill_superuser_and_id(username, user_is_superuser, user_id)
+    user_is_superuser, user_id = _superuser_and_id(username)
     if user_is_superuser:
         return {"result": {"allow": True}}
 
@@ -121,9 +165,11 @@ async def hs_s3_authorization_check(auth_request: AuthRequest):
             "/")[0], True) if prefix.split("/", 1)[1].startswith("data/contents/") else (prefix.split("/")[0], False)
         for prefix in prefixes
     ]
-    # check the user and each resource against the action
+    # check the user and each resource against the action, the access of the user to all the resources of the
+    # request is resolved at once
+    access = _resources_access(user_id, [resource_id for resource_id, _ in resource_ids_and_is_contents_path])
     for resource_id, is_contents_path in resource_ids_and_is_contents_path:
-        if not _check_user_authorization(user_id, resource_id, action, is_contents_path):
+        if not _check_user_authorization(access.get(resource_id), action, is_contents_path):
             return {"result": {"allow": False}}
     if resource_ids_and_is_contents_path:
         return {"result": {"allow": True}}
@@ -131,35 +177,25 @@ async def hs_s3_authorization_check(auth_request: AuthRequest):
     return {"result": {"allow": False}}
 
 
-def _check_user_authorization(user_id, resource_id, action, is_contents_path):
+def _check_user_authorization(resource_access, action, is_contents_path):
     # Break this down into just view and edit for now.
     # We may need to make owners distinct from edit at some point
 
     # List of actions
     # https://docs.aws.amazon.com/AmazonS3/latest/API/API_Operations.html
 
+    if resource_access is None:
+        # the resource does not exist
+        return False
+    public, allow_private_sharing, discoverable, user_access = resource_access
+
     # view actions
     if action in VIEW_ACTIONS:
-        try:
-            public, allow_private_sharing, discoverable = resource_discoverability(
-                resource_id)
-        except Exception:
-            public, allow_private_sharing, discoverable = resource_discoverability(
-                resource_id)
-            backfill_resource_discoverability(
-                resource_id, public, allow_private_sharing, discoverable)
-
-        try:
-            view_access = user_has_view_access(user_id, resource_id)
-        except Exception:
-            view_access = user_has_view_access(user_id, resource_id)
-            backfill_view_access(user_id, resource_id, view_access)
-
         if action in ["s3:GetObject", "s3:GetObjectRetention", "s3:GetObjectLegalHold"]:
-            return public or allow_private_sharing or view_access
+            return public or allow_private_sharing or user_access in [cache.VIEW, cache.EDIT]
         # view and discoverable actions
         if action in ["s3:ListObjects", "s3:ListObjectsV2", "s3:ListBucket"]:
-            return public or allow_private_sharing or discoverable or view_access
+            return public or allow_private_sharing or discoverable or user_access in [cache.VIEW, cache.EDIT]
 
     # Check if edit actions are enabled via environment variable
     enable_edit_actions = os.environ.get(
@@ -168,12 +204,6 @@ def _check_user_authorization(user_id, resource_id, action, is_contents_path):
         if not is_contents_path:
             # if the prefix request is not in the contents path, do not allow edit
             return False
-        try:
-            edit_access = user_has_edit_access(user_id, resource_id)
-        except Exception:
-            edit_access = user_has_edit_access(user_id, resource_id)
-            backfill_edit_access(user_id, resource_id, edit_access)
-        print(f"Edit access {user_id} {resource_id} {edit_access}")
-        return edit_access
+        return user_access == cache.EDIT
 
     return False
@@ -0,0 +1,92 @@
+"""
+Load benchmark of the MinIO authorization webhook with and without the Redis authorization cache.
+
+Runs against the database and Redis used by the tests (the staged snapshot in init-scripts loaded in Postgres and a
+Redis server reachable at REDIS_HOST), e.g. from the micro-auth test container:
+
+    python tests/benchmark_authorization.py --requests 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+import api.cache as cache
+from api.main import app
+
+# users and resources defined in init-scripts/hydroshare-staged-snapshot.sql
+USERS = ["user1", "user2", "user3", "user4", "user5", "user6", "user7"]
+RESOURCES = [
+    "f211b93642f84c55a0bdd1b12880e32e",
+    "d5c432ae01eb4f03a73d589e54d341b3",
+    "a2c0df5bf3eb4d8c8a34beaffe169f91",
+    "5670903e39d54026a729abd4cc148f99",
+]
+ACTIONS = ["s3:GetObject", "s3:ListObjectsV2", "s3:PutObject"]
+
+
+def _payloads():
+    payloads = []
+    for username in USERS:
+        for resource_id in RESOURCES:
+            for action in ACTIONS:
+                path = f"{resource_id}/data/contents/file.txt"
+                payloads.append(json.dumps({
+                    "input": {
+                        "conditions": {"preferred_username": [username], "Prefix": [path]},
+                        "action": action,
+                        "bucket": "user1",
+                        "object": path,
+                    }
+                }))
+    return payloads
+
+
+async def _run(total, concurrency):
+    payloads = _payloads()
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://micro-auth") as client:
+        counter = iter(range(total))
+
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                response = await client.post("/minio/authorization/", content=payloads[i % len(payloads)],
+                                             headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "authorizations_per_second": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="number of authorization requests per run")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of concurrent clients")
+    args = parser.parse_args()
+
+    cache.CACHE_ENABLED = False
+    print("without cache:", asyncio.run(_run(args.requests, args.concurrency)))
+
+    cache.CACHE_ENABLED = True
+    cache.redis_client.flushdb()
+    print("with cache (cold):", asyncio.run(_run(args.requests, args.concurrency)))
+    print("with cache (warm):", asyncio.run(_run(args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from redis import Redis
@@ -15,6 +17,13 @@ def clear_redis_cache():
     redis_client.flushdb()
 
 
+def _cached_users_access(access_control_changed_payload):
+    redis_client = Redis(host='redis', port=6379, db=0)
+    return [redis_client.get(f"{user_access['id']}: {resource['id']}")
+            for resource in json.loads(access_control_changed_payload)["resources"]
+            for user_access in resource["user_access"]]
+
+
 @pytest.mark.parametrize(
     "action_json",
     [
@@ -25,7 +34,7 @@ def clear_redis_cache():
         "user1_list_objects_v2.json",
     ],
 )
-def test_view_user_access_change_view(action_json):
+def test_view_user_access_change_invalidates_cache(action_json):
     with open(f"tests/json_payloads/view_authorization/{action_json}", "r") as file:
         request_body = file.read()
 
@@ -42,11 +51,9 @@ def test_view_user_access_change_view(action_json):
         "/hook/", data=access_control_changed_payload)
     assert response.status_code == 204
 
-    # user2 has view access
-    request_body = request_body.replace("user1", "user2")
-    response = minio_client.post("/authorization/", data=request_body)
-    assert response.status_code == 200
-    assert response.json() == {"result": {"allow": True}}
+    # the cached access of user2 is dropped, so that its effective access (including group access) is read
+    # again from the database
+    assert not any(_cached_users_access(access_control_changed_payload))
 
 
 @pytest.mark.parametrize(
@@ -64,7 +71,7 @@ def test_view_user_access_change_view(action_json):
         "edit_authorization/user1_delete_objects.json",
     ],
 )
-def test_edit_user_access_change_edit(action_json):
+def test_edit_user_access_change_invalidates_cache(action_json):
     with open(f"tests/json_payloads/{action_json}", "r") as file:
         request_body = file.read()
 
@@ -81,8 +88,6 @@ def test_edit_user_access_change_edit(action_json):
         "/hook/", data=access_control_changed_payload)
     assert response.status_code == 204
 
-    # user2 has edit access
-    request_body = request_body.replace("user1", "user2")
-    response = minio_client.post("/authorization/", data=request_body)
-    assert response.status_code == 200
-    assert response.json() == {"result": {"allow": True}}
+    # the cached access of user2 is dropped, so that its effective access (including group access) is read
+    # again from the database
+    assert not any(_cached_users_access(access_control_changed_payload))
@@ -1,7 +1,12 @@
+import json
+from unittest import mock
+
 import pytest
 from fastapi.testclient import TestClient
 from redis import Redis
 
+import api.cache as cache
+import api.database as database
 from api.routers.minio import router as minio_router
 
 client = TestClient(minio_router)
@@ -599,3 +604,56 @@ def test_admin_request():
     response = client.post("/authorization/", data=request_body)
     assert response.status_code == 200
     assert response.json() == {"result": {"allow": False}}
+
+
+# authorization cache
+def test_authorization_cache():
+    with open("tests/json_payloads/view_authorization/user1_get_object_retention.json", "r") as file:
+        request_body = file.read()
+    redis_client = Redis(host='redis', port=6379, db=0, decode_responses=True)
+
+    # user2 has no access, the result is cached for a short time
+    response = client.post("/authorization/", data=request_body.replace("user1", "user2"))
+    assert response.json() == {"result": {"allow": False}}
+    assert redis_client.get("19: f211b93642f84c55a0bdd1b12880e32e") == "NONE"
+    assert 0 < redis_client.ttl("19: f211b93642f84c55a0bdd1b12880e32e") <= cache.REDIS_NEGATIVE_TTL
+
+    # user1 owns the resource
+    response = client.post("/authorization/", data=request_body)
+    assert response.json() == {"result": {"allow": True}}
+    assert redis_client.get("18: f211b93642f84c55a0bdd1b12880e32e") == "EDIT"
+    assert redis_client.hget("f211b93642f84c55a0bdd1b12880e32e", "access") == "PRIVATE"
+
+    # cached results are used without querying the database
+    with mock.patch("api.routers.minio.resources_access") as resources_access:
+        response = client.post("/authorization/", data=request_body)
+        assert response.json() == {"result": {"allow": True}}
+        resources_access.assert_not_called()
+
+    # unknown resources are cached as private for a short time
+    unknown_request_body = request_body.replace("f211b93642f84c55a0bdd1b12880e32e", "00000000000000000000000000000000")
+    response = client.post("/authorization/", data=unknown_request_body)
+    assert response.json() == {"result": {"allow": False}}
+    assert 0 < redis_client.ttl("00000000000000000000000000000000") <= cache.REDIS_NEGATIVE_TTL
+
+
+def test_multi_prefix_authorization_single_query():
+    with open("tests/json_payloads/view_authorization/user1_list_objects_v2.json", "r") as file:
+        request_body = json.loads(file.read())
+    conditions = request_body["input"]["conditions"]
+    prefix_key = "Prefix" if conditions.get("Prefix") else "prefix"
+
+    # user3 has view access to the private resource, the other resources are public, private link and discoverable
+    conditions["preferred_username"] = ["user3"]
+    conditions[prefix_key] = [f"{resource_id}/data/contents/" for resource_id in [
+        "f211b93642f84c55a0bdd1b12880e32e", "d5c432ae01eb4f03a73d589e54d341b3",
+        "a2c0df5bf3eb4d8c8a34beaffe169f91", "5670903e39d54026a729abd4cc148f99"]]
+    with mock.patch("api.routers.minio.resources_access", wraps=database.resources_access) as resources_access:
+        response = client.post("/authorization/", data=json.dumps(request_body))
+        assert response.json() == {"result": {"allow": True}}
+        resources_access.assert_called_once()
+
+    # user2 has no access to the private resource, so the whole request is denied
+    conditions["preferred_username"] = ["user2"]
+    response = client.post("/authorization/", data=json.dumps(request_body))
+    assert response.json() == {"result": {"allow": False}}
@@ -0,0 +1,117 @@
+"""
+Registry of the aggregations (logical files) of a composite resource.
+
+CompositeResource.logical_files used to query the ten logical file tables every time it was iterated,
+and each aggregation then queried its metadata, its files and its resource when used. A resource now
+keeps an AggregationRegistry that loads all its aggregations with their metadata in one query per
+aggregation type, and their files in one query per aggregation type present in the resource, and that
+indexes the aggregations by folder and by aggregation name.
+
+Registries are invalidated by aggregations_changed(), which the receivers of this app call when a
+logical file, its metadata or the aggregation of a resource file is saved or deleted (i.e., when an
+aggregation is created, removed, moved or renamed). A resource whose registry was invalidated loads a
+new one the next time its aggregations are used, and the files prefetched for the aggregations of
+invalidated registries are dropped, so that an aggregation held by a caller reads its files again.
+"""
+import itertools
+import threading
+import weakref
+
+from django.db.models import prefetch_related_objects
+
+from hs_core.models import ResourceFile
+from hs_file_types.models import (
+    FileSetLogicalFile,
+    GenericLogicalFile,
+    GeoFeatureLogicalFile,
+    GeoRasterLogicalFile,
+    ModelInstanceLogicalFile,
+    ModelProgramLogicalFile,
+    NetCDFLogicalFile,
+    RefTimeseriesLogicalFile,
+    TimeSeriesLogicalFile,
+    CSVLogicalFile,
+)
+
+# in the order CompositeResource.logical_files has always listed aggregations
+LOGICAL_FILE_CLASSES = (
+    FileSetLogicalFile,
+    GenericLogicalFile,
+    GeoFeatureLogicalFile,
+    NetCDFLogicalFile,
+    GeoRasterLogicalFile,
+    RefTimeseriesLogicalFile,
+    TimeSeriesLogicalFile,
+    ModelProgramLogicalFile,
+    ModelInstanceLogicalFile,
+    CSVLogicalFile,
+)
+
+_generations = itertools.count(1)
+_generation = next(_generations)
+_registries = weakref.WeakSet()
+_registries_lock = threading.Lock()
+
+
+def aggregations_changed():
+    """Invalidate all aggregation registries of this process"""
+    global _generation
+    # itertools.count is thread safe, a concurrent change gets a generation of its own
+    _generation = next(_generations)
+    with _registries_lock:
+        registries = list(_registries)
+        _registries.clear()
+    for registry in registries:
+        registry.drop_prefetched_files()
+
+
+class AggregationRegistry(object):
+    """The aggregations of a composite resource, loaded in a bounded number of queries"""
+
+    def __init__(self, resource):
+        self.generation = _generation
+        self.aggregations = []
+        content_object = ResourceFile._meta.get_field('content_object')
+        for logical_file_class in LOGICAL_FILE_CLASSES:
+            aggregations = list(logical_file_class.objects.filter(resource=resource).select_related('metadata'))
+            if not aggregations:
+                continue
+            for aggregation in aggregations:
+                aggregation.resource = resource
+            prefetch_related_objects(aggregations, 'files')
+            for aggregation in aggregations:
+                for res_file in aggregation.files.all():
+                    content_object.set_cached_value(res_file, resource)
+            self.aggregations.extend(aggregations)
+
+        self._by_folder = {}
+        for aggregation in self.aggregations:
+            folder = getattr(aggregation, 'folder', None)
+            if folder is not None:
+                self._by_folder.setdefault(folder, aggregation)
+        self._by_name = None
+        with _registries_lock:
+            _registries.add(self)
+
+    @property
+    def is_current(self):
+        """False if the aggregations of any resource changed since this registry was loaded"""
+        return self.generation == _generation
+
+    def folder_aggregation(self, folder):
+        """Get the aggregation that a folder (relative to data/contents) represents, None if there is none"""
+        return self._by_folder.get(folder)
+
+    def aggregation_by_name(self, aggregation_name):
+        """Get the aggregation whose aggregation name (path) is *aggregation_name*, None if there is none"""
+        if self._by_name is None:
+            by_name = {}
+            for aggregation in self.aggregations:
+                by_name.setdefault(aggregation.aggregation_name, aggregation)
+            self._by_name = by_name
+        return self._by_name.get(aggregation_name)
+
+    def drop_prefetched_files(self):
+        """Make the aggregations of this registry read their files from the database again"""
+        for aggregation in self.aggregations:
+            getattr(aggregation, '_prefetched_objects_cache', {}).pop('files', None)
@@ -20,6 +20,7 @@ from hs_file_types.models import (
     CSVLogicalFile,
 )
 from hs_file_types.enums import AggregationMetaFilePath
+from .aggregation_registry import AggregationRegistry
 from hs_file_types.utils import update_target_spatial_coverage, update_target_temporal_coverage
 
 logger = logging.getLogger(__name__)
@@ -72,30 +73,18 @@ class CompositeResource(BaseResource):
                 return False
         return True
 
+    @property
+    def aggregation_registry(self):
+        """The aggregations of this resource with their metadata and files, loaded once until they change"""
+        registry = getattr(self, '_aggregation_registry', None)
+        if registry is None or not registry.is_current:
+            registry = self._aggregation_registry = AggregationRegistry(self)
+        return registry
+
     @property
     def logical_files(self):
-        """A generator to access each of the logical files of this resource"""
-
-        for lf in self.filesetlogicalfile_set.all():
-            yield lf
-        for lf in self.genericlogicalfile_set.all():
-            yield lf
-        for lf in self.geofeaturelogicalfile_set.all():
-            yield lf
-        for lf in self.netcdflogicalfile_set.all():
-            yield lf
-        for lf in self.georasterlogicalfile_set.all():
-            yield lf
-        for lf in self.reftimeserieslogicalfile_set.all():
-            yield lf
-        for lf in self.timeserieslogicalfile_set.all():
-            yield lf
-        for lf in self.modelprogramlogicalfile_set.all():
-            yield lf
-        for lf in self.modelinstancelogicalfile_set.all():
-            yield lf
-        for lf in self.csvlogicalfile_set.all():
-            yield lf
+        """An iterator to access each of the logical files of this resource"""
+        return iter(self.aggregation_registry.aggregations)
 
     @property
     def aggregation_types(self):
@@ -227,8 +216,9 @@ class CompositeResource(BaseResource):
         """
 
         aggregation_path = self.get_relative_path(dir_path)
-        logical_files = self._cache_aggregations(aggregations=aggregations)
-        for lf in logical_files:
+        if aggregations is None:
+            return self.aggregation_registry.folder_aggregation(aggregation_path)
+        for lf in aggregations:
             if hasattr(lf, 'folder'):
                 if lf.folder == aggregation_path:
                     return lf
@@ -328,9 +318,9 @@ class CompositeResource(BaseResource):
         :return an aggregation object if found
         :raises ObjectDoesNotExist if no matching aggregation is found
         """
-        for aggregation in self.logical_files:
-            if aggregation.aggregation_name == aggregation_name:
-                return aggregation
+        aggregation = self.aggregation_registry.aggregation_by_name(aggregation_name)
+        if aggregation is not None:
+            return aggregation
 
         raise ObjectDoesNotExist("No matching aggregation was found for "
                                  "name:{}".format(aggregation_name))
@@ -838,7 +828,7 @@ class CompositeResource(BaseResource):
     def _cache_aggregations(self, aggregations):
         """A helper function to cache aggregations to avoid repeated database queries"""
         if aggregations is None:
-            aggregations = list(self.logical_files)
+            aggregations = self.aggregation_registry.aggregations
 
         return aggregations
 
@@ -1,11 +1,18 @@
 import os
 
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from hs_core.models import ResourceFile
 from hs_core.signals import pre_add_files_to_resource
+from hs_file_types.models.base import AbstractFileMetaData, AbstractLogicalFile
 
+from .aggregation_registry import aggregations_changed
 from .models import CompositeResource
 
+# fields of a resource file that determine its aggregation and the aggregation name
+_AGGREGATION_FILE_FIELDS = {'resource_file', 'file_folder', 'logical_file_object_id', 'logical_file_content_type'}
+
 
 @receiver(pre_add_files_to_resource, sender=CompositeResource)
 def pre_add_files_to_resource_handler(sender, **kwargs):
@@ -19,3 +26,24 @@ def pre_add_files_to_resource_handler(sender, **kwargs):
         if not resource.can_add_files(target_full_path=tgt_path):
             validate_files['are_files_valid'] = False
             validate_files['message'] = "Adding files to this folder is not allowed."
+
+
+def _aggregation_changed(instance, update_fields=None):
+    if isinstance(instance, ResourceFile):
+        if update_fields is not None and not _AGGREGATION_FILE_FIELDS.intersection(update_fields):
+            return
+    elif not isinstance(instance, (AbstractLogicalFile, AbstractFileMetaData)):
+        return
+    aggregations_changed()
+
+
+@receiver(post_save)
+def aggregation_saved(sender, instance, update_fields=None, **kwargs):
+    """Invalidate aggregation registries when an aggregation is created, moved or renamed"""
+    _aggregation_changed(instance, update_fields)
+
+
+@receiver(post_delete)
+def aggregation_deleted(sender, instance, **kwargs):
+    """Invalidate aggregation registries when an aggregation or one of its files is removed"""
+    _aggregation_changed(instance)
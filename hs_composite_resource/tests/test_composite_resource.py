@@ -1869,6 +1869,63 @@ class CompositeResourceTest(
                          ["Single File Content", "Multidimensional Content", "Geographic Raster Content",
                           "CSV Content"])
 
+    def test_aggregation_registry(self):
+        """Here we are testing that the aggregations of the resource are loaded once and reloaded when
+        an aggregation is created or removed
+        """
+
+        self.create_composite_resource()
+        self.add_file_to_resource(file_to_add=self.generic_file)
+        self.assertEqual(list(self.composite_resource.logical_files), [])
+
+        gen_res_file = self.composite_resource.files.first()
+        GenericLogicalFile.set_file_type(
+            self.composite_resource, self.user, gen_res_file.id
+        )
+        # the registry is reloaded after the aggregation got created
+        self.assertEqual(len(list(self.composite_resource.logical_files)), 1)
+
+        # aggregations, their metadata and files are used without further queries
+        with self.assertNumQueries(0):
+            gen_aggr = next(self.composite_resource.logical_files)
+            self.assertEqual(gen_aggr.metadata.extra_metadata, {})
+            self.assertEqual(gen_aggr.files.count(), 1)
+            self.assertEqual(
+                self.composite_resource.get_aggregation_by_aggregation_name(self.generic_file_name), gen_aggr
+            )
+            self.assertEqual(self.composite_resource.aggregation_types, ["Single File Content"])
+
+        # the registry is reloaded after the aggregation got removed
+        gen_aggr.remove_aggregation()
+        self.assertEqual(list(self.composite_resource.logical_files), [])
+
+    def test_aggregation_registry_folder_rename(self):
+        """Here we are testing that the files of the aggregations are read again after the folder of an
+        aggregation got renamed, which updates the resource files in bulk without sending any signal
+        """
+
+        self.create_composite_resource()
+        new_folder_path = os.path.join("data", "contents", "my-folder")
+        create_folder(self.composite_resource.short_id, new_folder_path)
+        self.add_file_to_resource(file_to_add=self.generic_file, upload_folder="my-folder")
+        gen_res_file = self.composite_resource.files.first()
+        GenericLogicalFile.set_file_type(
+            self.composite_resource, self.user, gen_res_file.id
+        )
+        gen_aggr = next(self.composite_resource.logical_files)
+        self.assertEqual(gen_aggr.files.first().file_folder, "my-folder")
+
+        move_or_rename_file_or_folder(
+            self.user,
+            self.composite_resource.short_id,
+            new_folder_path,
+            os.path.join("data", "contents", "renamed-folder"),
+        )
+        # neither the registry nor the aggregation held here return the files with their old folder
+        self.assertEqual(gen_aggr.files.first().file_folder, "renamed-folder")
+        gen_aggr = next(self.composite_resource.logical_files)
+        self.assertEqual(gen_aggr.files.first().file_folder, "renamed-folder")
+
     def test_can_be_public_or_discoverable_with_no_aggregation(self):
         """Here we are testing the function 'can_be_public_or_discoverable()'
         This function should return False unless we have the required metadata at the resource level
@@ -0,0 +1,163 @@
+"""
+View and download counters of resources, accumulated in Redis and flushed to the database in bulk.
+
+Counting a landing page view or a download used to read the count of the resource, add one in Python
+and write the count back, which loses increments under concurrency and writes to the database on
+every hit. Increments are instead added to a Redis hash per counter (HINCRBY, keyed by resource id)
+and added to the database counts with F() updates by the flush_resource_counters periodic task.
+
+The totals of a resource are the count in the database plus the increments still pending in Redis;
+use AbstractResource.total_view_count and total_download_count where exact counts are shown.
+
+Flushed increments are counted at least once: a flush that dies after a batch is committed to the
+database but before the batch is removed from Redis writes that batch again on the next flush.
+
+If Redis is unavailable, or settings.RESOURCE_COUNTERS_BUFFERED is False, increments are written to
+the database immediately, still atomically.
+"""
+import logging
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+VIEW_COUNT = 'view_count'
+DOWNLOAD_COUNT = 'download_count'
+COUNTERS = (VIEW_COUNT, DOWNLOAD_COUNT)
+
+BATCH_SIZE = 500
+
+FLUSH_LOCK_KEY = 'hs_resource_counters:flush_lock'
+# seconds after which the lock of a flush that did not finish (e.g., killed worker) expires
+FLUSH_LOCK_TIMEOUT = 600
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        url = getattr(settings, 'RESOURCE_COUNTERS_REDIS_URL', None) or settings.CACHES['default']['LOCATION']
+        _client = redis.Redis.from_url(url, socket_timeout=1)
+    return _client
+
+
+def _key(counter):
+    return f"hs_resource_{counter}s"
+
+
+def _flushing_key(counter):
+    return f"{_key(counter)}:flushing"
+
+
+def increment(resource, counter):
+    """
+    Add one to a counter of a resource
+
+    :param resource: the resource counted
+    :param counter: VIEW_COUNT or DOWNLOAD_COUNT
+    """
+    if getattr(settings, 'RESOURCE_COUNTERS_BUFFERED', True):
+        try:
+            _redis().hincrby(_key(counter), resource.id, 1)
+            return
+        except redis.RedisError as ex:
+            logger.warning(f"Error buffering {counter} of resource {resource.short_id}: {str(ex)}")
+    # using update query api to update instead of resource.save() to avoid triggering search index update
+    type(resource).objects.filter(id=resource.id).update(**{counter: F(counter) + 1})
+    setattr(resource, counter, getattr(resource, counter) + 1)
+
+
+def pending(resource_ids, counter):
+    """
+    Get the increments of a counter not yet flushed to the database
+
+    :param resource_ids: ids of resources
+    :param counter: VIEW_COUNT or DOWNLOAD_COUNT
+    :return: dict from resource id to its pending increment, for resources with one
+    """
+    resource_ids = list(resource_ids)
+    if not resource_ids or not getattr(settings, 'RESOURCE_COUNTERS_BUFFERED', True):
+        return {}
+    try:
+        # read both hashes atomically so that a concurrent flush does not move increments in between
+        with _redis().pipeline() as pipe:
+            pipe.hmget(_key(counter), resource_ids)
+            pipe.hmget(_flushing_key(counter), resource_ids)
+            counts, flushing = pipe.execute()
+    except redis.RedisError as ex:
+        logger.warning(f"Error reading pending {counter}s: {str(ex)}")
+        return {}
+    totals = {}
+    for resource_id, count, flushing_count in zip(resource_ids, counts, flushing):
+        total = int(count or 0) + int(flushing_count or 0)
+        if total:
+            totals[resource_id] = total
+    return totals
+
+
+def total(resource, counter):
+    """the count of a resource in the database plus its pending increments"""
+    return getattr(resource, counter) + pending([resource.id], counter).get(resource.id, 0)
+
+
+def _apply_increment(counter, count, resource_ids):
+    """add count to a counter of the resources with the given ids, in one transaction"""
+    from hs_core.models import BaseResource
+
+    with transaction.atomic():
+        BaseResource.objects.filter(id__in=resource_ids).update(**{counter: F(counter) + count})
+
+
+def flush():
+    """
+    Add the pending increments of all counters to the database
+
+    The pending increments are atomically moved to a processing hash (RENAME) before they are written,
+    so increments made during a flush are kept for the next one. The increments of each batch of
+    resources are removed from the processing hash right after the batch is committed, so a flush that
+    failed part way is resumed by the next one from the first batch not removed. Counts are at least
+    once: a batch committed but not removed (e.g., the worker was killed in between) is written again.
+    A Redis lock keeps flushes from running concurrently.
+
+    :return: dict from counter to the number of resources updated, None if another flush is running
+    """
+    client = _redis()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        logger.info("Resource counters are already being flushed")
+        return None
+    try:
+        updated = {}
+        for counter in COUNTERS:
+            flushing_key = _flushing_key(counter)
+            if not client.exists(flushing_key):
+                try:
+                    client.rename(_key(counter), flushing_key)
+                except redis.ResponseError:
+                    # no increments since the last flush
+                    updated[counter] = 0
+                    continue
+
+            # one update per distinct increment, which are few, rather than one per resource
+            by_increment = defaultdict(list)
+            for resource_id, count in client.hgetall(flushing_key).items():
+                by_increment[int(count)].append(int(resource_id))
+            for count, resource_ids in by_increment.items():
+                for i in range(0, len(resource_ids), BATCH_SIZE):
+                    batch = resource_ids[i:i + BATCH_SIZE]
+                    _apply_increment(counter, count, batch)
+                    # the hash (and the key) is gone once all its increments are written; a failure
+                    # before this hdel applies the batch again on the next flush
+                    client.hdel(flushing_key, *batch)
+            updated[counter] = sum(len(resource_ids) for resource_ids in by_increment.values())
+        return updated
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            logger.warning(f"The lock of the resource counters flush expired after {FLUSH_LOCK_TIMEOUT} seconds")
@@ -0,0 +1,184 @@
+"""
+Bulk synchronization of the MongoDB discovery collection with the discoverable resources in Django.
+
+Documents of the discovery collection are normally written by the S3 event pipeline: Django writes the
+metadata json files of a resource, hs_extract combines them into .hsjsonld/dataset_metadata.json and
+collect_file_to_catalog upserts that file into the collection. Reindexing every resource through the
+pipeline serializes, uploads and replaces each record one at a time.
+
+sync_discovery_collection instead builds the metadata records of the discoverable resources in a pool
+of processes, compares the hash of the records (carried in the system metadata, and so in the documents
+written by the pipeline) with the hash of the indexed documents, and writes only new and changed
+documents, and deletes documents of resources that are no longer discoverable, with batched bulk_write
+calls. The hasPart and associatedMedia references that hs_extract adds to a document are kept.
+"""
+import json
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+from django.db.models import Q
+from pymongo import DeleteOne, ReplaceOne
+
+from hs_core.hydroshare.utils import get_resource_by_shortkey
+from hs_core.hydroshare_atlas_discovery_collection import MongoDBClient, catalog_document, datetime_parser
+from hs_core.models import BaseResource
+
+BATCH_SIZE = 500
+# references to S3 files written by hs_extract, which Django does not know
+EXTRACTED_FIELDS = ('hasPart', 'associatedMedia')
+
+CatalogEntry = namedtuple('CatalogEntry', ['short_id', 'metadata_hash', 'document', 'error'])
+
+
+class SyncReport(object):
+    """Outcome of a synchronization of the discovery collection"""
+
+    def __init__(self):
+        self.added = []
+        self.updated = []
+        self.deleted = []
+        self.failed = {}
+        self.unchanged = 0
+        self.built = 0
+        self.build_seconds = 0.0
+        self.write_seconds = 0.0
+
+    @property
+    def records_per_second(self):
+        return self.built / self.build_seconds if self.build_seconds else 0.0
+
+
+def catalog_path(short_id):
+    """Key (in the bucket of the resource) of the dataset metadata file indexed for a resource"""
+    return f"{short_id}/.hsjsonld/dataset_metadata.json"
+
+
+def build_catalog_entry(short_id, indexed_hash=None, write_files=False):
+    """
+    Build the discovery collection document of a resource unless its indexed document is up to date
+
+    :param short_id: id of the resource
+    :param indexed_hash: metadata hash of the indexed document of the resource, if any
+    :param write_files: whether to also write the metadata json files of a changed resource to S3
+    :return: a CatalogEntry, whose metadata_hash is None if the resource is not to be in the catalog, and
+        whose document is None if the resource is not to be in the catalog or its document is up to date
+    """
+    try:
+        resource = get_resource_by_shortkey(short_id, or_404=False)
+        if not resource.show_in_discover:
+            return CatalogEntry(short_id, None, None, None)
+        user_metadata, system_metadata = resource.get_metadata_json_records()
+        metadata_hash = system_metadata['metadata_hash']
+        if metadata_hash == indexed_hash:
+            return CatalogEntry(short_id, metadata_hash, None, None)
+
+        # the same document the event pipeline gets from the json file hs_extract writes
+        dataset_metadata = json.dumps({**system_metadata, **user_metadata}, default=str)
+        document = catalog_document(json.loads(dataset_metadata, object_hook=datetime_parser),
+                                    catalog_path(short_id))
+        if document is None:
+            return CatalogEntry(short_id, None, None, None)
+        if write_files:
+            resource.write_django_metadata_json_files((user_metadata, system_metadata))
+        return CatalogEntry(short_id, metadata_hash, document, None)
+    except BaseResource.DoesNotExist:
+        return CatalogEntry(short_id, None, None, None)
+    except Exception as ex:
+        return CatalogEntry(short_id, None, None, str(ex))
+
+
+def _build_catalog_entry(args):
+    return build_catalog_entry(*args)
+
+
+def _build_catalog_entries(tasks, processes):
+    if processes <= 1:
+        for task in tasks:
+            yield build_catalog_entry(*task)
+        return
+
+    # forked workers must open database connections of their own
+    connections.close_all()
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork')) as pool:
+        yield from pool.map(_build_catalog_entry, tasks, chunksize=20)
+
+
+def sync_discovery_collection(short_ids=None, processes=None, batch_size=BATCH_SIZE, dry_run=False,
+                              force=False, write_files=False):
+    """
+    Bring the discovery collection in sync with the discoverable resources
+
+    :param short_ids: ids of the resources to sync, all resources if None
+    :param processes: number of processes building documents, the number of CPUs if None
+    :param batch_size: number of operations per bulk_write
+    :param dry_run: if True, report the differences without writing anything
+    :param force: if True, rewrite the documents of all discoverable resources
+    :param write_files: if True, also write the metadata json files of new and changed resources to S3
+    :return: a SyncReport
+    """
+    collection = MongoDBClient.get_discovery_collection()
+    report = SyncReport()
+
+    query = {}
+    if short_ids is not None:
+        query = {"_s3_filepath": {"$in": [catalog_path(short_id) for short_id in short_ids]}}
+    projection = {"_s3_filepath": 1, "metadata_hash": 1, **{field: 1 for field in EXTRACTED_FIELDS}}
+    indexed = {}
+    for document in collection.find(query, projection):
+        indexed[document["_s3_filepath"].split('/', 1)[0]] = document
+
+    resources = BaseResource.objects.filter(Q(raccess__discoverable=True) | Q(raccess__public=True))
+    if short_ids is not None:
+        resources = resources.filter(short_id__in=short_ids)
+    candidates = list(resources.values_list('short_id', flat=True))
+
+    operations = []
+
+    def flush(force_write=False):
+        if operations and (force_write or len(operations) >= batch_size):
+            start = time.monotonic()
+            if not dry_run:
+                collection.bulk_write(operations, ordered=False)
+            report.write_seconds += time.monotonic() - start
+            operations.clear()
+
+    def delete(short_id):
+        report.deleted.append(short_id)
+        operations.append(DeleteOne({"_s3_filepath": catalog_path(short_id)}))
+        flush()
+
+    write_files = write_files and not dry_run
+    tasks = [(short_id, None if force else indexed.get(short_id, {}).get("metadata_hash"), write_files)
+             for short_id in candidates]
+    start = time.monotonic()
+    for entry in _build_catalog_entries(tasks, processes or multiprocessing.cpu_count()):
+        report.built += 1
+        if entry.error is not None:
+            report.failed[entry.short_id] = entry.error
+        elif entry.metadata_hash is None:
+            if entry.short_id in indexed:
+                delete(entry.short_id)
+        elif entry.document is None:
+            report.unchanged += 1
+        else:
+            indexed_document = indexed.get(entry.short_id)
+            if indexed_document is None:
+                report.added.append(entry.short_id)
+            else:
+                report.updated.append(entry.short_id)
+                for field in EXTRACTED_FIELDS:
+                    if field in indexed_document:
+                        entry.document[field] = indexed_document[field]
+            operations.append(ReplaceOne({"_s3_filepath": entry.document["_s3_filepath"]}, entry.document,
+                                         upsert=True))
+            flush()
+    report.build_seconds = time.monotonic() - start - report.write_seconds
+
+    # documents of resources that are neither discoverable nor public
+    for short_id in set(indexed).difference(candidates):
+        delete(short_id)
+    flush(force_write=True)
+    return report
@@ -0,0 +1,367 @@
+"""
+Listing of a folder of a resource for the file browser (see data_store_structure).
+
+Listing a folder used to query each file of the folder, its aggregation and the aggregation metadata
+one at a time, and to check with several queries per sub-folder whether an aggregation can be created
+from it. Here the resource files of the folder are read in one query, their aggregations and metadata
+in one query per aggregation type, and aggregation eligibility of all sub-folders is evaluated from an
+AggregationIndex built with one query for all files under the folder.
+
+Listings are cached per resource and folder. The cache key includes a content version of the resource,
+which is replaced whenever resource files, aggregations or aggregation metadata change (see
+hs_core.receivers), so that cached listings are never served after such a change. Changes that do not
+go through Django (e.g., an empty folder created directly in S3) are picked up when the cached listing
+expires after settings.FOLDER_LISTING_CACHE_TIMEOUT seconds.
+"""
+import hashlib
+import os
+from collections import defaultdict
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from hs_core.hydroshare.utils import get_file_mime_type
+from hs_core.models import ResourceFile
+
+CACHE_TIMEOUT = getattr(settings, 'FOLDER_LISTING_CACHE_TIMEOUT', 3600)
+_APPKEY = 'appkey'
+
+
+def _version_key(resource_id):
+    return f"hs_folder_listing_version_{resource_id}"
+
+
+def _listing_key(resource_id, version, store_path):
+    path_hash = hashlib.md5(store_path.encode('utf-8')).hexdigest()
+    return f"hs_folder_listing_{resource_id}_{version}_{path_hash}"
+
+
+def content_version(resource_id):
+    """Get the content version of a resource, which identifies the state of its files and aggregations"""
+    key = _version_key(resource_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def listing_changed(resource_id):
+    """Invalidate the cached folder listings of a resource"""
+    cache.delete(_version_key(resource_id))
+
+
+def get_cached_listing(resource, store_path, version):
+    """Get the cached listing of a folder at a content version, None if it is not cached"""
+    return cache.get(_listing_key(resource.id, version, store_path))
+
+
+def cache_listing(resource, store_path, version, listing):
+    """Cache the listing of a folder computed at a content version"""
+    cache.set(_listing_key(resource.id, version, store_path), listing, CACHE_TIMEOUT)
+
+
+class AggregationIndex(object):
+    """
+    The aggregations of a resource and the files under a folder, indexed to evaluate whether an
+    aggregation can be created from each sub-folder without further queries.
+
+    The rules are those of ModelProgramLogicalFile, ModelInstanceLogicalFile and FileSetLogicalFile
+    can_set_folder_to_aggregation.
+    """
+
+    def __init__(self, resource, dir_path):
+        """
+        :param resource: a composite resource
+        :param dir_path: full path (starting with resource id) of the folder whose sub-folders are evaluated
+        """
+        self.resource = resource
+        self.dir_path = dir_path
+        self.aggregations = list(resource.logical_files)
+        self.folder_aggregations = {}
+        for aggregation in self.aggregations:
+            folder = getattr(aggregation, 'folder', None)
+            if folder is not None:
+                self.folder_aggregations.setdefault(folder, aggregation)
+
+        # aggregation types of the files under each sub-folder, None for files not in an aggregation
+        self.sub_folder_files = defaultdict(list)
+        prefix = dir_path.rstrip('/') + '/'
+        for path, content_type_id in ResourceFile.objects.filter(object_id=resource.id,
+                                                                 resource_file__startswith=prefix) \
+                .values_list('resource_file', 'logical_file_content_type_id').iterator():
+            relative_path = path[len(prefix):]
+            if '/' not in relative_path:
+                # a file of the folder itself
+                continue
+            type_name = None
+            if content_type_id is not None:
+                type_name = ContentType.objects.get_for_id(content_type_id).model_class().__name__
+            self.sub_folder_files[relative_path.split('/', 1)[0]].append(type_name)
+
+    def folder_aggregation(self, dir_path):
+        """Get the aggregation that the folder *dir_path* represents, see get_folder_aggregation_object"""
+        return self.folder_aggregations.get(self.resource.get_relative_path(dir_path))
+
+    def _aggregations_under(self, class_name, aggregation_path):
+        return any(aggregation.get_aggregation_class_name() == class_name
+                   and aggregation.folder is not None and aggregation.folder.startswith(aggregation_path)
+                   for aggregation in self.aggregations if hasattr(aggregation, 'folder'))
+
+    def can_set_model_aggregation(self, class_name, sub_folder):
+        """Whether a ModelProgramLogicalFile or ModelInstanceLogicalFile (class_name) can be created from sub_folder"""
+        dir_path = os.path.join(self.dir_path, sub_folder)
+        if self.folder_aggregation(dir_path) is not None:
+            return False
+
+        aggregation_path = self.resource.get_relative_path(dir_path)
+        if self._aggregations_under('FileSetLogicalFile', aggregation_path):
+            return False
+        if class_name == 'ModelProgramLogicalFile' and \
+                self._aggregations_under('ModelProgramLogicalFile', aggregation_path):
+            return False
+        if self._aggregations_under('ModelInstanceLogicalFile', aggregation_path):
+            return False
+
+        path = os.path.dirname(dir_path)
+        parent_aggregation = None
+        while '/' in path:
+            if path == self.resource.file_path:
+                break
+            parent_aggregation = self.folder_aggregation(path)
+            if parent_aggregation is not None:
+                break
+            path = os.path.dirname(path)
+
+        files = self.sub_folder_files.get(sub_folder, [])
+        if not files:
+            return False
+        if parent_aggregation is not None:
+            if parent_aggregation.is_fileset:
+                return all(type_name == 'FileSetLogicalFile' for type_name in files)
+            return False
+        if class_name == 'ModelProgramLogicalFile':
+            return not any(files)
+        return not any(type_name in ('ModelInstanceLogicalFile', 'FileSetLogicalFile') for type_name in files)
+
+    def can_set_fileset(self, sub_folder):
+        """Whether a FileSetLogicalFile can be created from a sub-folder"""
+        dir_path = os.path.join(self.dir_path, sub_folder)
+        if self.folder_aggregation(dir_path) is not None:
+            return False
+        path = os.path.dirname(dir_path)
+        while '/' in path:
+            parent_aggregation = self.folder_aggregation(path)
+            if parent_aggregation is not None and (parent_aggregation.is_model_program
+                                                   or parent_aggregation.is_model_instance):
+                return False
+            path = os.path.dirname(path)
+        return len(self.sub_folder_files.get(sub_folder, [])) > 0
+
+
+def _folder_entry(resource, index, store_path, folder_path, dname):
+    d_store_path = os.path.join(store_path, dname)
+    main_file = ''
+    folder_aggregation_type = ''
+    folder_aggregation_name = ''
+    folder_aggregation_id = ''
+    folder_aggregation_type_to_set = ''
+    folder_aggregation_appkey = ''
+    if index is not None:
+        aggregation_object = index.folder_aggregation(resource.get_s3_path(d_store_path))
+        # folder aggregation type is not relevant for single file aggregation types - which
+        # are: GenericLogicalFile, RefTimeseriesLogicalFile, and CSVLogicalFile
+        if aggregation_object is not None:
+            folder_aggregation_type = aggregation_object.get_aggregation_class_name()
+            folder_aggregation_name = aggregation_object.get_aggregation_display_name()
+            folder_aggregation_id = aggregation_object.id
+            folder_aggregation_appkey = aggregation_object.metadata.extra_metadata.get(_APPKEY, '')
+            aggr_main_file = aggregation_object.get_main_file
+            if aggr_main_file is not None:
+                main_file = aggr_main_file.file_name
+        else:
+            # check first if ModelProgram/ModelInstance aggregation type can be created from this folder
+            can_set_model_instance = index.can_set_model_aggregation('ModelInstanceLogicalFile', dname)
+            can_set_model_program = index.can_set_model_aggregation('ModelProgramLogicalFile', dname)
+            if can_set_model_instance and can_set_model_program:
+                folder_aggregation_type_to_set = 'ModelProgramOrInstanceLogicalFile'
+            elif can_set_model_program:
+                folder_aggregation_type_to_set = 'ModelProgramLogicalFile'
+            elif can_set_model_instance:
+                folder_aggregation_type_to_set = 'ModelInstanceLogicalFile'
+            # otherwise, check if FileSet aggregation type that can be created from this folder
+            elif index.can_set_fileset(dname):
+                folder_aggregation_type_to_set = 'FileSetLogicalFile'
+    return {'name': dname,
+            'url': resource.get_url_of_path(d_store_path),
+            'main_file': main_file,
+            'folder_aggregation_type': folder_aggregation_type,
+            'folder_aggregation_name': folder_aggregation_name,
+            'folder_aggregation_id': folder_aggregation_id,
+            'folder_aggregation_type_to_set': folder_aggregation_type_to_set,
+            'folder_short_path': os.path.join(folder_path, dname),
+            'folder_aggregation_appkey': folder_aggregation_appkey,
+            }
+
+
+def _load_resource_files(resource, paths):
+    """Get the resource files at paths, with their aggregations and aggregation metadata loaded"""
+    res_files = list(ResourceFile.objects.filter(object_id=resource.id, resource_file__in=paths))
+    content_object = ResourceFile._meta.get_field('content_object')
+    for res_file in res_files:
+        # the url of a file is computed from its resource
+        content_object.set_cached_value(res_file, resource)
+
+    # the aggregations of the files with their metadata, one query per aggregation type
+    object_ids = defaultdict(set)
+    for res_file in res_files:
+        if res_file.has_logical_file:
+            object_ids[res_file.logical_file_content_type_id].add(res_file.logical_file_object_id)
+    logical_files = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        for logical_file in model.objects.filter(id__in=ids).select_related('metadata'):
+            if isinstance(resource, model.resource.field.related_model):
+                logical_file.resource = resource
+            logical_files[(content_type_id, logical_file.id)] = logical_file
+    logical_file_field = ResourceFile._meta.get_field('logical_file_content_object')
+    for res_file in res_files:
+        if res_file.has_logical_file:
+            key = (res_file.logical_file_content_type_id, res_file.logical_file_object_id)
+            logical_file_field.set_cached_value(res_file, logical_files.get(key))
+    return {res_file.resource_file.name: res_file for res_file in res_files}
+
+
+def _is_virtual_folder(res_file, fname):
+    """Whether the aggregation of a file is shown in the UI as a virtual folder named after the file"""
+    main_extension = res_file.logical_file.get_main_file_type()
+    if not main_extension:
+        # accept any extension
+        main_extension = ""
+    _, file_extension = os.path.splitext(fname)
+    return bool(file_extension) and main_extension.endswith(file_extension) and main_extension != ".csv"
+
+
+def _file_entries(resource, store_path, file_names, sizes):
+    dir_in_s3 = resource.get_s3_path(store_path)
+    paths = [os.path.join(dir_in_s3, fname) for fname in file_names]
+    res_files = _load_resource_files(resource, paths)
+
+    # files of aggregations shown as virtual folders are needed for their main file and url
+    virtual_folders = [res_files[path].logical_file for path, fname in zip(paths, file_names)
+                       if path in res_files and res_files[path].has_logical_file
+                       and res_files[path].logical_file is not None and _is_virtual_folder(res_files[path], fname)]
+    by_type = defaultdict(list)
+    for logical_file in virtual_folders:
+        by_type[type(logical_file)].append(logical_file)
+    for logical_files in by_type.values():
+        prefetch_related_objects(logical_files, 'files')
+    content_object = ResourceFile._meta.get_field('content_object')
+    for logical_file in virtual_folders:
+        for res_file in logical_file.files.all():
+            content_object.set_cached_value(res_file, resource)
+
+    files = []
+    aggregations = []
+    found_unreferenced_files = False
+    for index, (f_store_path, fname, file_in_s3) in enumerate(
+            zip((os.path.join(store_path, fname) for fname in file_names), file_names, paths)):
+        res_file = res_files.get(file_in_s3)
+        if not res_file:
+            # skip metadata, schema and schema values files
+            is_metadata_related_file = (
+                resource.is_metadata_xml_file(f_store_path)
+                or resource.is_metadata_json_file(f_store_path)
+                or resource.is_schema_json_file(f_store_path)
+                or resource.is_schema_json_values_file(f_store_path)
+            )
+            if not is_metadata_related_file:
+                found_unreferenced_files = True
+            continue
+
+        size = sizes[index]
+        mtype = get_file_mime_type(fname)
+        idx = mtype.find('/')
+        if idx >= 0:
+            mtype = mtype[idx + 1:]
+
+        f_ref_url = ''
+        logical_file_type = ''
+        logical_file_id = ''
+        aggregation_name = ''
+        # flag for UI to know if a file is part of a model program aggregation that has been created from a folder
+        # Note: model program aggregation can be created either from a single file of a folder that has one or more
+        # files
+        has_model_program_aggr_folder = False
+        has_model_instance_aggr_folder = False
+        aggregation_appkey = ''
+        if res_file.has_logical_file:
+            logical_file = res_file.logical_file
+            if _is_virtual_folder(res_file, fname):
+                if not hasattr(logical_file, 'folder') or logical_file.folder is None:
+                    aggregation_appkey = logical_file.metadata.extra_metadata.get(_APPKEY, '')
+
+                # these aggregations will be shown in the UI as virtual folders
+                aggregations.append({'logical_file_id': logical_file.id,
+                                     'name': logical_file.dataset_name,
+                                     'logical_type': logical_file.get_aggregation_class_name(),
+                                     'aggregation_name': logical_file.get_aggregation_display_name(),
+                                     'aggregation_appkey': aggregation_appkey,
+                                     'main_file': logical_file.get_main_file.file_name,
+                                     'preview_data_url': logical_file.metadata.get_preview_data_url(
+                                         resource=resource,
+                                         folder_path=f_store_path
+                                     ),
+                                     'url': logical_file.url})
+            logical_file_type = res_file.logical_file_type_name
+            logical_file_id = logical_file.id
+            aggregation_name = res_file.aggregation_display_name
+            aggregation_appkey = ''
+            if not hasattr(logical_file, 'folder') or logical_file.folder is None:
+                aggregation_appkey = logical_file.metadata.extra_metadata.get(_APPKEY, '')
+            if 'url' in logical_file.extra_data:
+                f_ref_url = logical_file.extra_data['url']
+
+            # check if this file (f) is part of a model program folder aggregation
+            if logical_file_type == "ModelProgramLogicalFile":
+                if res_file.file_folder is not None and logical_file.folder is not None:
+                    if res_file.file_folder.startswith(logical_file.folder):
+                        has_model_program_aggr_folder = True
+            elif logical_file_type == "ModelInstanceLogicalFile":
+                if res_file.file_folder is not None and logical_file.folder is not None:
+                    if res_file.file_folder.startswith(logical_file.folder):
+                        has_model_instance_aggr_folder = True
+
+        files.append({'name': fname, 'size': size, 'type': mtype, 'pk': res_file.pk, 'url': res_file.url,
+                      'reference_url': f_ref_url,
+                      'aggregation_name': aggregation_name,
+                      'logical_type': logical_file_type,
+                      'logical_file_id': logical_file_id,
+                      'aggregation_appkey': aggregation_appkey,
+                      'has_model_program_aggr_folder': has_model_program_aggr_folder,
+                      'has_model_instance_aggr_folder': has_model_instance_aggr_folder})
+    return files, aggregations, found_unreferenced_files
+
+
+def list_folder(resource, store_path, store):
+    """
+    List a folder of a resource for the file browser
+
+    :param resource: the resource
+    :param store_path: path of the folder relative to the resource id, starting with data/contents
+    :param store: the S3 listing of the folder, as (directory names, file names, file sizes)
+    :return: (listing, found_unreferenced_files) where listing holds the files, folders and aggregations
+        of the folder, and found_unreferenced_files is True if S3 has files that are not resource files
+    """
+    dir_names, file_names, sizes = store
+    # folder path relative to 'data/contents/' needed for the UI
+    folder_path = store_path[len("data/contents/"):]
+    index = None
+    if resource.resource_type == "CompositeResource" and dir_names:
+        index = AggregationIndex(resource, resource.get_s3_path(store_path))
+    dirs = [_folder_entry(resource, index, store_path, folder_path, dname) for dname in dir_names]
+    files, aggregations, found_unreferenced_files = _file_entries(resource, store_path, file_names, sizes)
+    return {'files': files, 'folders': dirs, 'aggregations': aggregations}, found_unreferenced_files
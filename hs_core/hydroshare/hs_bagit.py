@@ -55,6 +55,7 @@ def delete_bag(resource, istorage=None, raise_on_exception=False):
     try:
         if istorage.exists(resource.bag_path):
             istorage.delete(resource.bag_path)
+            istorage.delete_zip_manifest(resource.bag_path)
     except Exception as e:
         logger = logging.getLogger(__name__)
         logger.error("cannot remove {}: {}".format(resource.bag_path, e))
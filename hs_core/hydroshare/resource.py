@@ -18,6 +18,7 @@ from django.db.models import Sum
 
 from hs_core.hydroshare import hs_bagit
 from hs_core.models import ResourceFile, BaseResource
+from hs_core.metadata_sync import bulk_metadata_edit
 from hs_core import signals
 from hs_core.exceptions import ResourceVersioningException
 from hs_core.hydroshare import utils
@@ -79,7 +80,8 @@ def get_data_zone_usage(username, raise_on_error=True, include_published=False):
 
 def update_quota_usage(username, notify_user=False):
     """
-    This function is called to update quota usage for a user in Django DB.
+    This function is called to update quota usage for a user in Django DB by reconciling the quota usage ledger
+    with the usage of the user bucket in MinIO.
     :param
     username: the name of the user that needs to update quota usage for.
     : param notify_user: if True, send email notification to user if the quota is exceeded.
@@ -96,7 +98,7 @@ def update_quota_usage(username, notify_user=False):
 
     original_quota_data = uq.get_quota_data()
     user = User.objects.get(username=username)
-    uq.save()
+    uq.reconcile_used_size()
 
     updated_quota_data = uq.get_quota_data()
     # if enforcing quota, take steps to send messages
@@ -505,14 +507,16 @@ def create_resource(
             utils.prepare_resource_default_metadata(resource=resource, metadata=metadata,
                                                     res_title=title)
 
-            for element in metadata:
-                # here k is the name of the element
-                # v is a dict of all element attributes/field names and field values
-                k, v = list(element.items())[0]
-                resource.metadata.create_element(k, **v)
+            # cached metadata and metadata json files are updated once for all elements
+            with bulk_metadata_edit():
+                for element in metadata:
+                    # here k is the name of the element
+                    # v is a dict of all element attributes/field names and field values
+                    k, v = list(element.items())[0]
+                    resource.metadata.create_element(k, **v)
 
-            for keyword in keywords:
-                resource.metadata.create_element('subject', value=keyword)
+                for keyword in keywords:
+                    resource.metadata.create_element('subject', value=keyword)
 
             resource.title = resource.metadata.title.value
             resource.save(update_fields=["title"])
@@ -950,6 +954,78 @@ def delete_resource_file(pk, filename_or_id, user, delete_logical_file=True):
     return filename_or_id
 
 
+def delete_resource_files(resource, short_paths, user):
+    """
+    Deletes many files from a HydroShare resource with one query for the files and one bulk delete, sending the
+    post delete signal, updating the sharing status and marking the resource as modified once.
+    Files of aggregations that are deleted with their files are deleted as in delete_resource_file().
+
+    Parameters:
+    :param resource: the resource from which the files will be deleted
+    :param short_paths: paths (relative to data/contents) of the files to be deleted
+    :param user: requesting user
+
+    :returns: The short paths of the files which were deleted
+
+    Raises:
+    ValidationError - The files of a published resource can't be deleted by the user
+    """
+    files = list(ResourceFile.objects.filter(
+        object_id=resource.id,
+        resource_file__in=[os.path.join(resource.file_path, short_path) for short_path in short_paths]))
+    if not files:
+        return []
+    if resource.raccess.published:
+        if resource.files.count() == len(files):
+            raise ValidationError("Resource file delete is not allowed. Published resource must contain at "
+                                  "least one file")
+        elif user is None or not user.is_superuser:
+            raise ValidationError("Resource file can be deleted only by admin for a published resource")
+
+    res_cls = resource.__class__
+    deleted_paths = []
+    files_to_delete = []
+    deleted_logical_files = set()
+    for f in files:
+        if f.has_logical_file:
+            logical_file = f.logical_file
+            if (logical_file.__class__, logical_file.id) in deleted_logical_files:
+                deleted_paths.append(f.get_short_path())
+                continue
+            if logical_file.can_be_deleted_on_file_delete():
+                # logical_delete() deletes all files of the aggregation
+                deleted_paths.append(f.get_short_path())
+                deleted_logical_files.add((logical_file.__class__, logical_file.id))
+                logical_file.logical_delete(user)
+                continue
+            logical_file.set_metadata_dirty()
+        files_to_delete.append(f)
+
+    for f in files_to_delete:
+        signals.pre_delete_file_from_resource.send(sender=res_cls, file=f, resource=resource, user=user)
+    # deleting aggregations or the pre delete handlers may have deleted some of the files already
+    deleted = ResourceFile.objects.filter(pk__in=[f.pk for f in files_to_delete])
+    file_names = [f.get_short_path() for f in deleted]
+    deleted.delete()
+    deleted_paths.extend(file_names)
+
+    # This presumes that the files are no longer in django
+    resource_file_extensions = {os.path.splitext(f.get_short_path())[1] for f in resource.files.all()}
+    for file_name in file_names:
+        if os.path.splitext(file_name)[1] not in resource_file_extensions:
+            resource.metadata.formats.filter(value=utils.get_file_mime_type(file_name)).delete()
+
+    signals.post_delete_file_from_resource.send(sender=res_cls, resource=resource)
+
+    # set to private if necessary -- AFTER post_delete_file handling
+    resource.update_public_and_discoverable()  # set to False if necessary
+
+    # generate bag
+    utils.resource_modified(resource, user, overwrite_bag=False)
+
+    return deleted_paths
+
+
 def get_resource_doi(res_id, flag=''):
     doi_str = "https://doi.org/10.4211/hs.{shortkey}".format(shortkey=res_id)
     if flag:
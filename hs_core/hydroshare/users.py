@@ -2,20 +2,19 @@ import json
 import logging
 
 from django.contrib.auth.models import User, Group
-from django.contrib.gis.geos import Polygon, Point
 from django.core import exceptions
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist, ValidationError
 from django.core.files import File
 from django.core.files.uploadedfile import UploadedFile
-from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef, Q
 
 from hs_core.models import (
+    SEARCH_CONFIG,
     BaseResource,
     Contributor,
     Creator,
     Subject,
-    Description,
-    Title,
     Coverage,
     Relation,
 )
@@ -439,46 +438,23 @@ def get_resource_list(
         q.append(Q(object_id__in=author_parties.values_list("object_id", flat=True)))
 
     if coverage_type in ("box", "point"):
-        if not north or not west or not south or not east:
+        if None in (north, south, east, west):
             raise ValueError(
                 "coverage queries must have north, west, south, and east params"
             )
 
-        coverages = set()
-        search_polygon = Polygon.from_bbox((east, south, west, north))
-
-        for coverage in Coverage.objects.filter(type="box"):
-            coverage_polygon = Polygon.from_bbox(
-                (
-                    coverage.value.get("eastlimit", None),
-                    coverage.value.get("southlimit", None),
-                    coverage.value.get("westlimit", None),
-                    coverage.value.get("northlimit", None),
-                )
-            )
-
-            if search_polygon.intersects(coverage_polygon):
-                coverages.add(coverage.id)
-
-        for coverage in Coverage.objects.filter(type="point"):
-            try:
-                coverage_shape = Point(
-                    coverage.value.get("east", None),
-                    coverage.value.get("north", None),
-                )
-
-                if search_polygon.intersects(coverage_shape):
-                    coverages.add(coverage.id)
-            except Exception:
-                log.error("Coverage value invalid for coverage id %d" % coverage.id)
-
-        coverage_hits = Coverage.objects.filter(id__in=coverages)
-        coverage_filters = Q()
-        for cov in coverage_hits:
-            coverage_filters = coverage_filters | Q(object_id=cov.object_id) & Q(
-                content_type_id=cov.content_type_id
-            )
-        q.append(coverage_filters)
+        north, south, east, west = (float(v) for v in (north, south, east, west))
+        # resources with a box or point coverage intersecting the search box, using the indexed bounding box
+        intersecting = Coverage.objects.filter(
+            content_type_id=OuterRef("content_type_id"),
+            object_id=OuterRef("object_id"),
+            type__in=("box", "point"),
+            bbox_west__lte=max(east, west),
+            bbox_east__gte=min(east, west),
+            bbox_south__lte=max(north, south),
+            bbox_north__gte=min(north, south),
+        )
+        q.append(Exists(intersecting))
 
     if contributor:
         contributor_parties = Contributor.objects.filter(
@@ -544,14 +520,11 @@ def get_resource_list(
             )
         )
     if full_text_search:
-        description_ids = Description.objects.filter(
-            abstract__icontains=full_text_search
-        ).values_list("object_id", flat=True)
-        title_ids = Title.objects.filter(value__icontains=full_text_search).values_list(
-            "object_id", flat=True
-        )
-        # Full text search must match within the title or abstract
-        flt = flt.filter(object_id__in=description_ids.union(title_ids))
+        # Full text search must match within the title, keywords or abstract, best matches first
+        query = SearchQuery(full_text_search, config=SEARCH_CONFIG, search_type="websearch")
+        flt = flt.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        ).order_by("-search_rank")
     for q in q:
         flt = flt.filter(q)
 
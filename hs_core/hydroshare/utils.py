@@ -167,6 +167,8 @@ def get_file_from_s3(resource, file_path, temp_dir=None):
     Copy the file (given by file_path) from S3
     over to django (temp directory) which is
     necessary for manipulating the file (e.g. metadata extraction, zipping etc.).
+    Use open_file_from_s3 instead when the file can be read from a file object - this is only needed for
+    libraries that require a path of a local file (e.g. GDAL, netCDF4, sqlite3).
     Note: The caller is responsible for cleaning the temp directory
 
     :param  resource: an instance of CompositeResource
@@ -196,6 +198,23 @@ def get_file_from_s3(resource, file_path, temp_dir=None):
     return tmpfile
 
 
+def open_file_from_s3(resource, file_path, block_size=None, cache_blocks=None):
+    """
+    Open the file (given by file_path) in S3 for reading without copying it to django. Only the parts
+    of the file that are read are fetched from S3 (with ranged requests) and a limited number of them are
+    cached in memory, so reading a header or a few members of a large archive doesn't need the whole file.
+
+    :param  resource: an instance of CompositeResource
+    :param  file_path: storage path (absolute path) of a file in S3
+    :param  block_size: (optional) size in bytes of a part of the file read from S3
+    :param  cache_blocks: (optional) number of parts of the file cached in memory
+    :return: a seekable, read only binary file object - the caller is responsible for closing it
+    """
+
+    istorage = resource.get_s3_storage()
+    return istorage.open_range(file_path, block_size=block_size, cache_blocks=cache_blocks)
+
+
 def get_temp_dir():
     """Creates a temporary directory"""
 
@@ -226,6 +245,52 @@ def replace_resource_file_on_s3(new_file, original_resource_file, user):
     resource_modified(ori_res, by_user=user, overwrite_bag=False)
 
 
+def set_files_system_metadata_from_listing(resource, res_files=None):
+    """
+    Sets size, checksum, and modified time of resource files from a single paginated listing of the resource
+    files in S3 (1000 files per request) instead of querying S3 three times per file, and saves them in bulk
+    :param resource: the resource the files belong to
+    :param res_files: the ResourceFiles to update, all files of the resource are updated when not provided
+    :return: the list of updated ResourceFiles
+    """
+    if res_files is None:
+        res_files = resource.files.all()
+    res_files = list(res_files)
+    if not res_files:
+        return res_files
+
+    istorage = resource.get_s3_storage()
+    files_metadata = istorage.files_system_metadata(resource.file_path)
+    for res_file in res_files:
+        size, modified_time, checksum = files_metadata.get(res_file.resource_file.name, (0, None, None))
+        if size <= 0:
+            # file was not found in S3 (or is empty), same as ResourceFile.set_system_metadata
+            size, modified_time, checksum = 0, None, None
+        res_file.set_system_metadata_values(size, modified_time, checksum)
+
+    ResourceFile.objects.bulk_update(res_files, ResourceFile.system_meta_fields(),
+                                     batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    # bulk_update does not send post_save, apply the size changes to the quota usage ledger here
+    ResourceFile.update_quota_usage(resource, res_files)
+    return res_files
+
+
+def set_resources_files_system_metadata(resources, files_filter=None):
+    """
+    Sets size, checksum, and modified time of the files of many resources, listing the files of each resource once
+    :param resources: an iterable of resources
+    :param files_filter: an optional Q object selecting the files of each resource to update
+    :return: the number of files updated
+    """
+    count = 0
+    for resource in resources:
+        res_files = resource.files.all()
+        if files_filter is not None:
+            res_files = res_files.filter(files_filter)
+        count += len(set_files_system_metadata_from_listing(resource, res_files))
+    return count
+
+
 # TODO: should be inside ResourceFile, and federation logic should be transparent.
 def get_resource_file_name_and_extension(res_file):
     """
@@ -263,12 +328,13 @@ def get_resource_file_by_id(resource, file_id):
     return resource.files.filter(id=file_id).first()
 
 
-def copy_resource_files_and_AVUs(src_res_id, dest_res_id):
+def copy_resource_files_and_AVUs(src_res_id, dest_res_id, progress_callback=None):
     """
     Copy resource files and AVUs from source resource to target resource including both
     on S3 storage and on Django database
     :param src_res_id: source resource uuid
     :param dest_res_id: target resource uuid
+    :param progress_callback: called as progress_callback(copied, total) while the files are being copied
     :return:
     """
     avu_list = ['bag_modified', 'metadata_dirty', 'isPublic', 'resourceType']
@@ -282,7 +348,7 @@ def copy_resource_files_and_AVUs(src_res_id, dest_res_id):
     # This makes an exact copy of all physical files.
     src_files = os.path.join(src_res.root_path, 'data', 'contents')
     dest_files = os.path.join(tgt_res.root_path, 'data', 'contents')
-    istorage.copyFiles(src_files, dest_files)
+    istorage.copyFiles(src_files, dest_files, progress_callback=progress_callback)
 
     src_coll = src_res.root_path
     tgt_coll = tgt_res.root_path
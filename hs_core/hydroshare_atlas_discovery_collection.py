@@ -1,19 +1,25 @@
 import datetime
+import logging
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
-from pymongo import MongoClient
+from botocore.config import Config
+from pymongo import DeleteOne, MongoClient, ReplaceOne
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
 
-s3 = boto3.client('s3')
+# number of dataset metadata files fetched from S3 at once when collecting a batch of files
+FETCH_WORKERS = 16
+
+s3 = boto3.client('s3', config=Config(max_pool_connections=FETCH_WORKERS))
+_fetch_pool = None
 
 
 datetime_format_regex = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{6}\+\d{2}:\d{2}$')
 temporal_coverage_datetime_format_regex = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
-datetime_format = "%Y-%m-%d %H:%M:%S.%f%z"
-temporal_coverage_datetime_format = "%Y-%m-%d %H:%M:%S"
 
 
 class MongoDBClient:
@@ -30,25 +36,27 @@ class MongoDBClient:
 
 def datetime_parser(dct):
     for k, v in dct.items():
-        if isinstance(v, str):
-            if datetime_format_regex.match(v):
-                dct[k] = datetime.datetime.strptime(v, datetime_format)
-            if temporal_coverage_datetime_format_regex.match(v):
-                dct[k] = datetime.datetime.strptime(v, temporal_coverage_datetime_format)
+        # most strings are not datetimes, check their length and separators before matching
+        if isinstance(v, str) and len(v) in (19, 32) and v[10:11] == ' ' and v[4:5] == '-':
+            if datetime_format_regex.match(v) or temporal_coverage_datetime_format_regex.match(v):
+                # both formats are ISO 8601, which fromisoformat parses much faster than strptime
+                dct[k] = datetime.datetime.fromisoformat(v)
     return dct
 
 
-def collect_file_to_catalog(filepath: str):
-    bucket_name, object_key = filepath.split('/', 1)
-    response = s3.get_object(Bucket=bucket_name, Key=object_key)
-    metadata_json = json.loads(response['Body'].read(), object_hook=datetime_parser)
+def catalog_document(metadata_json: dict, object_key: str):
+    """Make the discovery collection document of a resource from its dataset metadata
 
+    :param metadata_json: the dataset metadata, with datetimes parsed by datetime_parser
+    :param object_key: key of the dataset metadata file in S3, which identifies the document
+    :return: the document, None if the resource is not to be in the catalog
+    """
     if "relations" in metadata_json:
         for relation in metadata_json['relations']:
             if "name" in relation:
                 if relation["name"] == "This resource has been replaced by a newer version":
                     # skip adding replaced resources to the catalog
-                    return
+                    return None
 
     metadata_json['_s3_filepath'] = object_key
     metadata_json['first_creator'] = (
@@ -73,6 +81,16 @@ def collect_file_to_catalog(filepath: str):
     #         json_dict = json.loads(content)
     #         content_types.append(json_dict.get('additionalType'))
     #     metadata_json['content_types'] = list(set(content_types))
+    return metadata_json
+
+
+def collect_file_to_catalog(filepath: str):
+    bucket_name, object_key = filepath.split('/', 1)
+    response = s3.get_object(Bucket=bucket_name, Key=object_key)
+    metadata_json = json.loads(response['Body'].read(), object_hook=datetime_parser)
+    metadata_json = catalog_document(metadata_json, object_key)
+    if metadata_json is None:
+        return
 
     MongoDBClient.get_discovery_collection().find_one_and_replace(
         {
@@ -86,3 +104,37 @@ def collect_file_to_catalog(filepath: str):
 def delete_file_from_catalog(filepath: str):
     _, object_key = filepath.split('/', 1)
     MongoDBClient.get_discovery_collection().delete_one({"_s3_filepath": object_key})
+
+
+def _fetch_catalog_document(filepath: str):
+    bucket_name, object_key = filepath.split('/', 1)
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=object_key)
+        metadata_json = json.loads(response['Body'].read(), object_hook=datetime_parser)
+    except Exception as ex:
+        logger.error(f"Error reading {filepath} for the discovery collection: {str(ex)}")
+        return None
+    return catalog_document(metadata_json, object_key)
+
+
+def sync_files_to_catalog(collect_filepaths, delete_filepaths):
+    """Collect files to and delete files from the catalog with one bulk write
+
+    The files to collect are read from S3 concurrently. Files that cannot be read are skipped.
+
+    :param collect_filepaths: paths (starting with the bucket) of dataset metadata files to collect
+    :param delete_filepaths: paths (starting with the bucket) of dataset metadata files to delete
+    :return: the number of documents replaced and deleted
+    """
+    global _fetch_pool
+    operations = [DeleteOne({"_s3_filepath": filepath.split('/', 1)[1]}) for filepath in delete_filepaths]
+    if collect_filepaths:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(FETCH_WORKERS, thread_name_prefix='discovery_fetch')
+        for metadata_json in _fetch_pool.map(_fetch_catalog_document, collect_filepaths):
+            if metadata_json is not None:
+                operations.append(ReplaceOne({"_s3_filepath": metadata_json["_s3_filepath"]}, metadata_json,
+                                             upsert=True))
+    if operations:
+        MongoDBClient.get_discovery_collection().bulk_write(operations, ordered=False)
+    return len(operations)
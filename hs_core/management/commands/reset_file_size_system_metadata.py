@@ -6,7 +6,7 @@ from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
 from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
-from django.db.models import Q, F
+from django.db.models import Q, F, Sum
 
 from hs_core.hydroshare import current_site_url
 from hs_core.models import ResourceFile, BaseResource
@@ -35,6 +35,17 @@ def chunked_queryset(queryset, chunk_size=_BATCH_SIZE):
     yield queryset.filter(pk__gte=start_pk)
 
 
+def reset_file_sizes(res_files):
+    """Reset the cached size of files so that it is recomputed, removing their sizes from the quota usage ledger
+    until then so that they are not counted twice once recomputed."""
+    sizes = res_files.filter(_size__gt=0).order_by().values('object_id').annotate(size=Sum('_size'))
+    sizes = {s['object_id']: s['size'] for s in sizes}
+    quota_holders = BaseResource.objects.filter(id__in=sizes.keys()).values_list('id', 'quota_holder_id')
+    for res_id, quota_holder_id in quota_holders:
+        UserQuota.update_used_size(quota_holder_id, -sizes[res_id])
+    res_files.update(_size=-1)
+
+
 def update_file_sizes(resources, refreshed_weeks=None, modified_weeks=None):
     total_resources = len(resources)
     print(f"Updating file sizes for {total_resources} resources in Django")
@@ -120,10 +131,8 @@ class Command(BaseCommand):
         elif min_quota_django_model > 0:
             uqs = UserQuota.objects.filter(user__is_active=True) \
                 .filter(user__is_superuser=False)
-            # TODO: once the quota system is moved to django, used_value can no longer be filtered on
-            # It will be a property, so this will need to be updated
             if min_quota_django_model > 0:
-                uqs = uqs.filter(used_value__gt=min_quota_django_model).order_by('-used_value')
+                uqs = uqs.filter(used_size__gt=min_quota_django_model * 1024 ** 3).order_by('-used_size')
             num_uqs = uqs.count()
             counter = 1
             print(f'Found {num_uqs} users with quotas. Filtering out users with < {min_quota_django_model}GB')
@@ -162,7 +171,7 @@ class Command(BaseCommand):
                     chunk_number += 1
             else:
                 # reset the cache for the files
-                res_files.update(_size=-1)
+                reset_file_sizes(res_files)
             print("Done")
             return
 
@@ -174,7 +183,7 @@ class Command(BaseCommand):
 
                 # using res.files instead of res.files.exclude(size=0) in case 0 values are cached incorrectly
                 res_files = filter_files(res.files, refreshed_weeks=refreshed_weeks, modified_weeks=modified_weeks)
-                res_files.update(_size=-1)
+                reset_file_sizes(res_files)
 
                 # set the updated date to now so that nightly celery task can update the size
                 res.updated = timezone.now().isoformat()
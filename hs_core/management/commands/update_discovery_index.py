@@ -1,9 +1,12 @@
 """Update the MongoDB Discovery Index for changes in resources
 Optional argument --force does the update even if the record exists.
 Optional argument --debug causes all exceptions to halt execution.
+Optional argument --bulk writes changed records to the Discovery Index directly (see hs_core.discovery_sync),
+with --dry-run to only report the differences.
 """
 from django.core.management.base import BaseCommand
 from django.db.models import Q
+from hs_core.discovery_sync import BATCH_SIZE, sync_discovery_collection
 from hs_core.models import BaseResource
 from hs_core.hydroshare.utils import get_resource_by_shortkey
 from hs_core.hydroshare_atlas_discovery_collection import MongoDBClient
@@ -28,6 +31,43 @@ class Command(BaseCommand):
             help='debug by stopping on any exception',
         )
 
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            dest='bulk',
+            help='write new and changed records to the index directly, in batches, skipping unchanged records',
+        )
+
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='with --bulk, report the records that would be added, updated and deleted without writing',
+        )
+
+        parser.add_argument(
+            '--processes',
+            type=int,
+            dest='processes',
+            default=None,
+            help='with --bulk, number of processes building records (default: number of CPUs)',
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=BATCH_SIZE,
+            help=f'with --bulk, number of index writes per batch (default: {BATCH_SIZE})',
+        )
+
+        parser.add_argument(
+            '--write-files',
+            action='store_true',
+            dest='write_files',
+            help='with --bulk, also write the metadata json files of new and changed resources to S3',
+        )
+
         parser.add_argument(
             'resource_ids',
             nargs='*',
@@ -36,7 +76,9 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        if len(options['resource_ids']) > 0:
+        if options['bulk']:
+            self.bulk_sync(options)
+        elif len(options['resource_ids']) > 0:
             for rid in options['resource_ids']:
                 print(f"Updating resource {rid} in Discovery Index...")
                 if not options['debug']:
@@ -135,3 +177,27 @@ class Command(BaseCommand):
             print(f"{added_to_mongodb} resources in Django triggered for addition to MongoDB Discovery Index")
             print(f"{triggered_refresh_in_mongodb} resources were refreshed in MongoDB Discovery Index")
             print(f"{deleted_from_mongodb} resources not in Django removed from MongoDB Discovery Index")
+
+    def bulk_sync(self, options):
+        report = sync_discovery_collection(
+            short_ids=options['resource_ids'] or None,
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            force=options['force'],
+            write_files=options['write_files'],
+        )
+        prefix = "Would have " if options['dry_run'] else ""
+        if options['verbosity'] > 1:
+            for action, short_ids in (('added', report.added), ('updated', report.updated),
+                                      ('deleted', report.deleted)):
+                for short_id in short_ids:
+                    print(f"{prefix}{action} resource {short_id}")
+        for short_id, error in report.failed.items():
+            print(f"resource {short_id} generated exception {error}")
+
+        print(f"{prefix}added {len(report.added)}, updated {len(report.updated)} and deleted "
+              f"{len(report.deleted)} records in MongoDB Discovery Index")
+        print(f"{report.unchanged} records were unchanged, {len(report.failed)} resources failed")
+        print(f"Built {report.built} records in {report.build_seconds:.1f}s "
+              f"({report.records_per_second:.1f} records/s), wrote to the index in {report.write_seconds:.1f}s")
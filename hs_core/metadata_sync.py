@@ -0,0 +1,140 @@
+"""
+Keeps the cached metadata and the metadata json files of resources in sync with metadata elements.
+
+Every save or delete of a metadata element updates the cached metadata of its resource and rewrites
+the metadata json files of the resource in S3. Bulk metadata edits (e.g., CoreMetaData.update with
+many creators and keywords) would repeat this for every element. Inside a bulk_metadata_edit() block
+the changed fields are collected instead, and each changed resource is brought in sync once when the
+outermost block exits:
+
+    with bulk_metadata_edit():
+        for creator in creators:
+            resource.metadata.create_element('creator', **creator)
+
+The edits of a request that modifies data (e.g., a POST of a metadata form or of the REST API) are
+coalesced the same way by MetadataSyncMiddleware, which syncs each changed resource once when the request
+has been handled. Edits in a bulk_metadata_edit() block within a request are still synced when the block
+exits.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class _PendingSync(object):
+    """Changes to the metadata of a resource not yet reflected in its cached metadata and json files"""
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.field_names = set()
+        self.update_modified_date = False
+        self.write_json_files = False
+
+
+def metadata_changed(resource, field_name=None, update_modified_date=True, write_json_files=True):
+    """
+    Bring the cached metadata and metadata json files of a resource in sync with a change to its metadata
+
+    :param resource: resource whose metadata changed
+    :param field_name: cached metadata field to update ('creator', 'subject', etc.), None to update no field
+    :param update_modified_date: whether the change updates the modified date of the resource
+    :param write_json_files: whether to rewrite the metadata json files of the resource
+
+    This is done immediately, unless called within a bulk_metadata_edit() or coalesced_metadata_sync()
+    block, in which case it is done once per resource when the outermost block exits.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = getattr(_local, 'request_pending', None)
+    if pending is None:
+        _sync(resource, {field_name} if field_name else set(), update_modified_date, write_json_files)
+        return
+
+    sync = pending.get(resource.pk)
+    if sync is None:
+        sync = pending[resource.pk] = _PendingSync(resource)
+    if field_name:
+        sync.field_names.add(field_name)
+    sync.update_modified_date = sync.update_modified_date or update_modified_date
+    sync.write_json_files = sync.write_json_files or write_json_files
+
+
+@contextmanager
+def bulk_metadata_edit():
+    """
+    Context manager that coalesces the updates of cached metadata and metadata json files
+
+    The metadata edits within the block are done in a transaction. When the outermost block exits
+    successfully, the cached metadata of each changed resource is updated once for all changed fields
+    and its metadata json files are written once. If the block raises, the transaction is rolled back
+    and there is nothing to sync. Nested blocks are merged into the outermost one.
+
+    Syncing happens when the block exits rather than in transaction.on_commit so that code that reads
+    the cached metadata later in an enclosing transaction sees the edits.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # nested block, the outermost block syncs
+        yield
+        return
+
+    _local.pending = {}
+    try:
+        with transaction.atomic():
+            yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+
+    _sync_pending(pending)
+
+
+@contextmanager
+def coalesced_metadata_sync():
+    """
+    Context manager that coalesces the updates of cached metadata and metadata json files of a request
+
+    Unlike bulk_metadata_edit(), no transaction is opened: the metadata edits within the block are committed
+    as they are made, so each changed resource is synced once when the outermost block exits, even if the
+    block raises. Edits in a bulk_metadata_edit() block within this block are synced when that block exits.
+    """
+    if getattr(_local, 'request_pending', None) is not None:
+        # nested block, the outermost block syncs
+        yield
+        return
+
+    _local.request_pending = {}
+    try:
+        yield
+    finally:
+        pending = _local.request_pending
+        _local.request_pending = None
+        _sync_pending(pending)
+
+
+def _sync_pending(pending):
+    for sync in pending.values():
+        _sync(sync.resource, sync.field_names, sync.update_modified_date, sync.write_json_files)
+
+
+def _sync(resource, field_names, update_modified_date, write_json_files):
+    if field_names:
+        try:
+            resource.update_cached_metadata_fields(field_names, update_modified_date=update_modified_date)
+        except Exception as ex:
+            # NOTE: The error may not be related to the fields that are logged here as
+            # we update other fields that might be missing in the cache as part of caching the specified fields
+            err_msg = f"Error updating cached metadata:{','.join(sorted(field_names))} for resource " \
+                      f"{resource.short_id}: {str(ex)}"
+            logger.error(err_msg)
+
+    if write_json_files:
+        try:
+            resource.write_django_metadata_json_files()
+        except Exception as ex:
+            logger.error(f"Error writing user metadata json file for resource {resource.short_id}: {str(ex)}")
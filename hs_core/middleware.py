@@ -2,6 +2,8 @@ from django.http import HttpResponse
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
+from hs_core.metadata_sync import coalesced_metadata_sync
+
 
 class HSClientMiddleware(MiddlewareMixin):
     """Default middleware for checking if a request is made from deprecated versions of hsclient
@@ -31,3 +33,22 @@ class HSClientMiddleware(MiddlewareMixin):
                     Please upgrade hsclient to version {min_version_string} or later'
                 response.content = message
         return response
+
+
+class MetadataSyncMiddleware():
+    """Syncs the cached metadata and metadata json files of the resources changed by a request once per resource
+
+    Requests that do not modify data (GET, HEAD, OPTIONS) are not coalesced, so that the pages they render
+    always see the metadata edits they make.
+    """
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in self.SAFE_METHODS:
+            return self.get_response(request)
+        with coalesced_metadata_sync():
+            return self.get_response(request)
@@ -0,0 +1,76 @@
+import json
+
+from django.db import migrations, models
+
+
+def bounding_box(coverage_type, value):
+    """Return (north, south, east, west) of a box or point coverage value, None if there is none"""
+    try:
+        if coverage_type == 'box':
+            north, south = float(value['northlimit']), float(value['southlimit'])
+            east, west = float(value['eastlimit']), float(value['westlimit'])
+        elif coverage_type == 'point':
+            north = south = float(value['north'])
+            east = west = float(value['east'])
+        else:
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(north, south), min(north, south), max(east, west), min(east, west)
+
+
+def populate_bounding_box(apps, schema_editor):
+    """Compute the bounding box of existing box and point coverages"""
+    Coverage = apps.get_model('hs_core', 'Coverage')
+    coverages = []
+    for coverage in Coverage.objects.filter(type__in=('box', 'point')).iterator():
+        try:
+            value = json.loads(coverage._value)
+        except ValueError:
+            continue
+        bbox = bounding_box(coverage.type, value)
+        if bbox is None:
+            continue
+        coverage.bbox_north, coverage.bbox_south, coverage.bbox_east, coverage.bbox_west = bbox
+        coverages.append(coverage)
+    Coverage.objects.bulk_update(coverages, ['bbox_north', 'bbox_south', 'bbox_east', 'bbox_west'],
+                                 batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0088_re_populate_resource_cached_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coverage',
+            name='bbox_east',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='bbox_north',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='bbox_south',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='coverage',
+            name='bbox_west',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='coverage',
+            index=models.Index(fields=['bbox_west', 'bbox_east'], name='hs_core_cov_bbox_lon_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coverage',
+            index=models.Index(fields=['bbox_south', 'bbox_north'], name='hs_core_cov_bbox_lat_idx'),
+        ),
+        migrations.RunPython(populate_bounding_box, migrations.RunPython.noop),
+    ]
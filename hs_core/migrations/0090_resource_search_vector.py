@@ -0,0 +1,42 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# the same weighting as hs_core.models.search_vector, computed from the cached metadata of all resources
+POPULATE_SEARCH_VECTOR = """
+UPDATE hs_core_genericresource SET search_vector =
+    setweight(to_tsvector('english', coalesce(cached_metadata->'title'->>'value', '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(
+        (SELECT string_agg(subject, ' ') FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(cached_metadata->'subjects') = 'array'
+                 THEN cached_metadata->'subjects' ELSE '[]'::jsonb END) AS subject), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(cached_metadata->'abstract'->>'value', '')), 'C')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0089_coverage_bounding_box'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='baseresource',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='baseresource',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'],
+                                                           name='hs_core_resource_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['value'], name='hs_core_subject_value_trgm',
+                                                           opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
@@ -1,5 +1,6 @@
 """Declare critical models for Hydroshare hs_core app."""
 import copy
+import hashlib
 import json
 import logging
 import os.path
@@ -18,11 +19,13 @@ from django.contrib.contenttypes.fields import (GenericForeignKey,
                                                 GenericRelation)
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import HStoreField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.exceptions import (ObjectDoesNotExist, PermissionDenied,
                                     SuspiciousFileOperation, ValidationError)
 from django.core.files import File
 from django.core.validators import URLValidator
-from django.db import models, transaction
+from django.db import models
 from django.db.models import Q, Sum
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -47,6 +50,8 @@ from spam_patterns.worst_patterns_re import patterns
 
 from django_s3.storage import S3Storage
 from hs_core.enums import (DataciteSubmissionStatus, RelationTypes)
+from hs_core import counters
+from hs_core.metadata_sync import bulk_metadata_edit
 from hs_core.s3 import ResourceFileS3Mixin, ResourceS3Mixin
 from .hs_rdf import (HSTERMS, RDFS1, RDF_MetaData_Mixin, RDF_Term_MixIn,
                      rdf_terms)
@@ -1539,6 +1544,12 @@ class Coverage(AbstractMetaDataElement):
     term = 'Coverage'
     type = models.CharField(max_length=20, choices=COVERAGE_TYPES)
 
+    # bounding box of box and point coverages, maintained from _value on save for indexed spatial search
+    bbox_north = models.FloatField(null=True, blank=True, editable=False)
+    bbox_south = models.FloatField(null=True, blank=True, editable=False)
+    bbox_east = models.FloatField(null=True, blank=True, editable=False)
+    bbox_west = models.FloatField(null=True, blank=True, editable=False)
+
     def __unicode__(self):
         """Return {type} {value} for unicode representation."""
         return "{type} {value}".format(type=self.type, value=self._value)
@@ -1547,6 +1558,10 @@ class Coverage(AbstractMetaDataElement):
         """Define meta properties for Coverage model."""
 
         unique_together = ("type", "content_type", "object_id")
+        indexes = [
+            models.Index(fields=['bbox_west', 'bbox_east'], name='hs_core_cov_bbox_lon_idx'),
+            models.Index(fields=['bbox_south', 'bbox_north'], name='hs_core_cov_bbox_lat_idx'),
+        ]
     """
     _value field stores a json string. The content of the json
      string depends on the type of coverage as shown below. All keys shown in
@@ -1585,6 +1600,32 @@ class Coverage(AbstractMetaDataElement):
         """Return json representation of coverage values."""
         return json.loads(self._value)
 
+    @staticmethod
+    def bounding_box(coverage_type, value):
+        """Return (north, south, east, west) of a box or point coverage value, None if there is none"""
+        try:
+            if coverage_type == 'box':
+                north, south = float(value['northlimit']), float(value['southlimit'])
+                east, west = float(value['eastlimit']), float(value['westlimit'])
+            elif coverage_type == 'point':
+                north = south = float(value['north'])
+                east = west = float(value['east'])
+            else:
+                return None
+        except (KeyError, TypeError, ValueError):
+            return None
+        # limits are ordered as in spatial search, which does not wrap around the antimeridian
+        return max(north, south), min(north, south), max(east, west), min(east, west)
+
+    def save(self, *args, **kwargs):
+        """Maintain the bounding box from the coverage value"""
+        bbox = self.bounding_box(self.type, self.value) if self._value else None
+        self.bbox_north, self.bbox_south, self.bbox_east, self.bbox_west = bbox or (None, None, None, None)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and '_value' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'bbox_north', 'bbox_south', 'bbox_east', 'bbox_west'}
+        super(Coverage, self).save(*args, **kwargs)
+
     @classmethod
     def create(cls, **kwargs):
         """Define custom create method for Coverage model.
@@ -2018,6 +2059,8 @@ class Subject(AbstractMetaDataElement):
         """Define meta properties for Subject model."""
 
         unique_together = ("value", "content_type", "object_id")
+        # trigram index for case insensitive pattern matching of keywords in resource search
+        indexes = [GinIndex(fields=['value'], opclasses=['gin_trgm_ops'], name='hs_core_subject_value_trgm')]
 
     def __unicode__(self):
         """Return value field for unicode representation."""
@@ -2081,6 +2124,27 @@ class Rights(AbstractMetaDataElement):
         raise ValidationError("Rights element of a resource can't be deleted.")
 
 
+# catalog record fields that change without a metadata change, and are left out of the metadata hash
+METADATA_HASH_EXCLUDED_FIELDS = {'viewCount'}
+
+# cached metadata fields indexed for full text search
+SEARCH_FIELDS = {'title', 'subject', 'description'}
+SEARCH_CONFIG = 'english'
+
+
+def search_vector(cached_metadata):
+    """Return the full text search vector of a resource from its cached metadata
+
+    The title is weighted highest, then keywords, then the abstract.
+    """
+    title = (cached_metadata.get('title') or {}).get('value') or ''
+    subjects = ' '.join(cached_metadata.get('subjects') or [])
+    abstract = (cached_metadata.get('abstract') or {}).get('value') or ''
+    return SearchVector(models.Value(title, output_field=models.TextField()), weight='A', config=SEARCH_CONFIG) \
+        + SearchVector(models.Value(subjects, output_field=models.TextField()), weight='B', config=SEARCH_CONFIG) \
+        + SearchVector(models.Value(abstract, output_field=models.TextField()), weight='C', config=SEARCH_CONFIG)
+
+
 def short_id():
     """Generate a uuid4 hex to be used as a resource or element short_id."""
     return uuid4().hex
@@ -2192,20 +2256,37 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
         super(AbstractResource, self).save(*args, **kwargs)
 
     def update_view_count(self):
-        self.view_count += 1
-        # using update query api to update instead of self.save() to avoid triggering search index update
-        type(self).objects.filter(id=self.id).update(view_count=self.view_count)
+        """count a view of this resource (see hs_core.counters)"""
+        counters.increment(self, counters.VIEW_COUNT)
 
     def update_download_count(self):
-        self.download_count += 1
-        # using update query api to update instead of self.save() to avoid triggering search index update
-        type(self).objects.filter(id=self.id).update(download_count=self.download_count)
+        """count a download of this resource (see hs_core.counters)"""
+        counters.increment(self, counters.DOWNLOAD_COUNT)
+
+    @property
+    def total_view_count(self):
+        """views of this resource, including those not yet flushed to the database"""
+        return counters.total(self, counters.VIEW_COUNT)
+
+    @property
+    def total_download_count(self):
+        """downloads of this resource, including those not yet flushed to the database"""
+        return counters.total(self, counters.DOWNLOAD_COUNT)
 
     def update_cached_metadata_field(self, field_name: str, update_modified_date: bool):
         """
         Update a specific field in the cached metadata or all fields if 'all' is specified
 
         :param field_name: The field to update ('creator', 'subject', etc.). If 'all', update all fields.
+        """
+        self.update_cached_metadata_fields([field_name], update_modified_date=update_modified_date)
+
+    def update_cached_metadata_fields(self, field_names, update_modified_date: bool):
+        """
+        Update several fields in the cached metadata with a single read and write of the cached metadata
+
+        :param field_names: The fields to update ('creator', 'subject', etc.). If it includes 'all',
+        update all fields.
 
         NOTE: This method gets called from post_save and post_delete signal handler for
         any core metadata elements. We need to update the 'modified' field in cached metadata
@@ -2238,20 +2319,22 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
         }
 
         # Update all fields if 'all' is specified
-        if field_name == 'all':
+        update_all = 'all' in field_names
+        if update_all:
             for updater in field_updaters.values():
                 updater(copied_metadata, metadata)
         else:
-            # Update the specified field
-            if field_name in field_updaters:
-                field_updaters[field_name](copied_metadata, metadata)
+            # Update the specified fields
+            for field_name in field_names:
+                if field_name in field_updaters:
+                    field_updaters[field_name](copied_metadata, metadata)
 
         # Ensure all required fields are present
         self._ensure_required_fields(copied_metadata, metadata)
 
         # Update the modified date every time a metadata element is updated/deleted, or when 'all' is specified
         modified_date = metadata.dates.filter(type='modified').first()
-        if field_name == 'all':
+        if update_all:
             # this is the case of updating cached metadata as part of management command
             if modified_date:
                 copied_metadata['modified'] = modified_date.start_date.isoformat()
@@ -2265,20 +2348,27 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
                 # this update won't trigger the post_save signal for Date model since we are using update query api
                 type(modified_date).objects.filter(id=modified_date.id).update(start_date=copied_metadata['modified'])
 
-        type(self).objects.filter(id=self.id).update(cached_metadata=copied_metadata)
+        updates = {'cached_metadata': copied_metadata}
+        if update_all or set(field_names) & SEARCH_FIELDS:
+            updates['search_vector'] = search_vector(copied_metadata)
+        type(self).objects.filter(id=self.id).update(**updates)
 
-    def write_django_metadata_json_files(self):
-        self.write_user_metadata_json_file()
-        self.write_system_metadata_json_file()
+    def write_django_metadata_json_files(self, metadata_records=None):
+        """Write the user and system metadata JSON files of this resource to the .hsmetadata directory in S3
 
-    def write_user_metadata_json_file(self):
-        """Write user metadata JSON file to resource .hsmetadata directory in S3"""
-        istorage = self.get_s3_storage()
-        user_metadata_path = f"{self.short_id}/.hsmetadata/user_metadata.json"
+        :param metadata_records: (optional) the (user metadata, system metadata) to write, as returned by
+        get_metadata_json_records()
+        """
+        user_metadata, system_metadata = metadata_records or self.get_metadata_json_records()
+        self.write_user_metadata_json_file(user_metadata)
+        self.write_system_metadata_json_file(system_metadata)
+
+    def get_user_metadata_catalog_record(self):
+        """Get the user metadata of this resource as a catalog record"""
         hs_json = self.metadata.get_json().model_dump_json(indent=2)
         hs_json = json.loads(hs_json)  # validate json
         hs_json['sharing_status'] = self.raccess.sharing_status
-        hs_json['viewCount'] = self.view_count
+        hs_json['viewCount'] = self.total_view_count
         # TODO find a better way to call the composite resource aggregation types property
         hs_json['content_types'] = [self.resource_type]
         if self.resource_type == 'CompositeResource':
@@ -2286,16 +2376,11 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
             res = CompositeResource.objects.get(id=self.id)
             hs_json['content_types'] = list(set(res.aggregation_type_names).union({self.resource_type}))
         from hs_core.hydroshare_schemaorg_adapter import HydroshareMetadataAdapter
-        hs_json = HydroshareMetadataAdapter.to_catalog_record(hs_json).model_dump()
-        hs_json = json.dumps(hs_json, indent=2, default=str)
-        with NamedTemporaryFile(mode='w+') as temp_file:
-            temp_file.write(hs_json)
-            temp_file.flush()
-            istorage.saveFile(temp_file.name, user_metadata_path)
+        return HydroshareMetadataAdapter.to_catalog_record(hs_json).model_dump()
 
-    def write_system_metadata_json_file(self):
-        """Write system metadata JSON file to resource .hsmetadata directory in S3"""
-        json_dict = {
+    def get_system_metadata(self):
+        """Get the system metadata of this resource"""
+        return {
             "resource_id": self.short_id,
             "doi": self.doi,
             "created": self.created.isoformat(),
@@ -2307,12 +2392,41 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
                 "shareable": self.raccess.shareable
             }
         }
-        istorage = self.get_s3_storage()
+
+    def get_metadata_json_records(self):
+        """Get the user metadata catalog record and the system metadata of this resource as written to the
+        metadata JSON files. The system metadata includes a hash of both records, which is carried to the
+        discovery collection and tells whether the catalog entry of the resource is up to date. Fields that
+        change without a metadata change (e.g., the view count) are not hashed, so that they alone do not
+        cause the catalog entry to be rewritten."""
+        user_metadata = self.get_user_metadata_catalog_record()
+        system_metadata = self.get_system_metadata()
+        hashed_user_metadata = {key: value for key, value in user_metadata.items()
+                                if key not in METADATA_HASH_EXCLUDED_FIELDS}
+        records = json.dumps([hashed_user_metadata, system_metadata], sort_keys=True, default=str)
+        system_metadata["metadata_hash"] = hashlib.sha256(records.encode()).hexdigest()
+        return user_metadata, system_metadata
+
+    def write_user_metadata_json_file(self, user_metadata=None):
+        """Write user metadata JSON file to resource .hsmetadata directory in S3"""
+        if user_metadata is None:
+            user_metadata, _ = self.get_metadata_json_records()
+        user_metadata_path = f"{self.short_id}/.hsmetadata/user_metadata.json"
+        self._write_metadata_json_file(user_metadata_path, json.dumps(user_metadata, indent=2, default=str))
+
+    def write_system_metadata_json_file(self, system_metadata=None):
+        """Write system metadata JSON file to resource .hsmetadata directory in S3"""
+        if system_metadata is None:
+            _, system_metadata = self.get_metadata_json_records()
         system_metadata_path = f"{self.short_id}/.hsmetadata/system_metadata.json"
+        self._write_metadata_json_file(system_metadata_path, json.dumps(system_metadata, indent=2))
+
+    def _write_metadata_json_file(self, path, content):
+        istorage = self.get_s3_storage()
         with NamedTemporaryFile(mode='w+') as temp_file:
-            temp_file.write(json.dumps(json_dict, indent=2))
+            temp_file.write(content)
             temp_file.flush()
-            istorage.saveFile(temp_file.name, system_metadata_path)
+            istorage.saveFile(temp_file.name, path)
 
     def _update_creators_field(self, copied_metadata, metadata):
         """Update creators field in cached metadata"""
@@ -2869,6 +2983,12 @@ class AbstractResource(ResourcePermissionsMixin, ResourceS3Mixin):
         if self.quota_holder:
             self.get_s3_storage().new_quota_holder(self.short_id, new_holder.username)
 
+        # move the size of the resource files from the quota usage of the previous holder to the new holder
+        from theme.models import UserQuota
+        quota_size = self.files.filter(_size__gt=0).aggregate(Sum('_size'))['_size__sum'] or 0
+        UserQuota.update_used_size(self.quota_holder_id, -quota_size)
+        UserQuota.update_used_size(new_holder.id, quota_size)
+
         self.quota_holder = new_holder
         self.save()
 
@@ -3519,6 +3639,35 @@ class ResourceFile(ResourceFileS3Mixin):
     def __str__(self):
         return self.resource_file.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(ResourceFile, cls).from_db(db, field_names, values)
+        # remember the size counted in the quota usage ledger so that changes of the size can be applied to it
+        instance._quota_size = max(instance._size, 0) if '_size' in field_names else None
+        return instance
+
+    @classmethod
+    def update_quota_usage(cls, resource, res_files):
+        """Applies the size changes of res_files since they were loaded or last saved to the quota usage ledger of
+        the quota holder of resource. This is called on save and delete of a single file and must be called after
+        bulk updates of file sizes, which do not send signals.
+        :param resource: the resource containing the files
+        :param res_files: the resource files whose sizes have been saved
+        """
+        from theme.models import UserQuota
+
+        delta = 0
+        for res_file in res_files:
+            quota_size = getattr(res_file, '_quota_size', 0)
+            if quota_size is None:
+                # size was not loaded, the change can't be computed; left to the periodic reconciliation
+                continue
+            new_quota_size = max(res_file._size, 0)
+            delta += new_quota_size - quota_size
+            res_file._quota_size = new_quota_size
+        if resource is not None:
+            UserQuota.update_used_size(resource.quota_holder_id, delta)
+
     @classmethod
     def banned_symbols(cls):
         """returns a list of banned characters for file/folder name"""
@@ -3772,6 +3921,16 @@ class ResourceFile(ResourceFileS3Mixin):
         if save:
             self.save(update_fields=self.system_meta_fields())
 
+    def set_system_metadata_values(self, size, modified_time, checksum):
+        """Set system metadata (size, modified time, and checksum) for a file from values already obtained from S3
+        (e.g., from a bucket listing or returned by an upload) without querying S3 for each of them.
+        The caller is responsible for saving the file (typically with bulk_update on system_meta_fields()).
+        """
+        self._size = size
+        self._modified_time = modified_time
+        self._checksum = checksum
+        self.filesize_cache_updated = now()
+
     # ResourceFile API handles file operations
     def set_storage_path(self, path, test_exists=True):
         """Bind this ResourceFile instance to an existing file.
@@ -4257,6 +4416,9 @@ class BaseResource(Page, AbstractResource):
     # means the resource is not locked
     locked_time = models.DateTimeField(null=True, blank=True)
 
+    # weighted title, keywords and abstract for full text search, maintained with the cached metadata
+    search_vector = SearchVectorField(null=True, editable=False)
+
     objects = PublishedManager()
     public_resources = PublicResourceManager()
     discoverable_resources = DiscoverableResourceManager()
@@ -4271,6 +4433,7 @@ class BaseResource(Page, AbstractResource):
 
         verbose_name = 'Generic'
         db_table = 'hs_core_genericresource'
+        indexes = [GinIndex(fields=['search_vector'], name='hs_core_resource_search_idx')]
 
     def can_add(self, request):
         """Pass through to abstract resource can_add function."""
@@ -5538,7 +5701,8 @@ class CoreMetaData(models.Model, RDF_MetaData_Mixin):
                                     'fundingagency': FundingAgencyValidationForm
                                     }
         # updating non-repeatable elements
-        with transaction.atomic():
+        # cached metadata and metadata json files are updated once for all elements
+        with bulk_metadata_edit():
             for element_name in ('title', 'description', 'language', 'rights'):
                 for dict_item in metadata:
                     if element_name in dict_item:
@@ -1,5 +1,6 @@
 """Signal receivers for the hs_core app."""
 from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.signals import post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django_s3.storage import S3Storage
@@ -10,7 +11,12 @@ from hs_core.signals import pre_metadata_element_create, pre_metadata_element_up
     post_add_reftimeseries_aggregation, post_remove_file_aggregation, post_raccess_change, \
     post_delete_file_from_resource, post_add_csv_aggregation
 from hs_core.tasks import update_web_services
-from hs_core.models import BaseResource, Creator, Contributor, Party, AbstractMetaDataElement, Relation
+from hs_core.folder_listing import listing_changed
+from hs_core.metadata_sync import metadata_changed
+from hs_core.models import BaseResource, Creator, Contributor, Party, AbstractMetaDataElement, Relation, \
+    ResourceFile
+from hs_file_types.models.base import AbstractFileMetaData, AbstractLogicalFile
+from theme.models import UserQuota
 from django.conf import settings
 
 from .forms import SubjectsForm, AbstractValidationForm, CreatorValidationForm, \
@@ -232,6 +238,23 @@ def pre_delete_user_handler(sender, instance, **kwargs):
         istorage.delete_bucket(user.username)
 
 
+@receiver(post_save, sender=ResourceFile)
+def resource_file_saved(sender, instance, update_fields=None, **kwargs):
+    """Apply the change of the file size to the quota usage ledger of the resource quota holder"""
+    if update_fields is not None and '_size' not in update_fields:
+        return
+    ResourceFile.update_quota_usage(instance.resource, [instance])
+
+
+@receiver(post_delete, sender=ResourceFile)
+def resource_file_deleted(sender, instance, **kwargs):
+    """Remove the size of the deleted file from the quota usage ledger of the resource quota holder"""
+    quota_size = getattr(instance, '_quota_size', 0)
+    resource = instance.resource
+    if quota_size and resource is not None:
+        UserQuota.update_used_size(resource.quota_holder_id, -quota_size)
+
+
 @receiver(post_save, sender=ResourceAccess)
 def resource_access_post_save_handler(sender, instance, **kwargs):
     """Update status in cached metadata when resource sharing
@@ -241,19 +264,10 @@ def resource_access_post_save_handler(sender, instance, **kwargs):
     # when making a copy of a resource, the copy resource may not have raccess attribute when
     # the post_save signal is sent for ResourceAccess
     if resource is not None and hasattr(resource, 'raccess') and resource.raccess is not None:
-        try:
-            resource.update_cached_metadata_field('status', update_modified_date=True)
-        except Exception as ex:
-            logger.error(f"Error updating status in cached metadata for resource {resource.short_id}: {str(ex)}")
-
-        try:
-            resource.write_django_metadata_json_files()
-        except Exception as ex:
-            logger.error(f"Error writing user metadata json file for resource {resource.short_id}: {str(ex)}")
+        metadata_changed(resource, 'status', update_modified_date=True)
 
 
-@receiver(post_save)
-def metadata_element_saved(sender, instance, **kwargs):
+def _metadata_element_changed(instance):
     if isinstance(instance, AbstractMetaDataElement):
         if hasattr(instance, 'metadata') and instance.metadata is not None:
             if hasattr(instance.metadata, 'resource') and instance.metadata.resource is not None:
@@ -267,48 +281,43 @@ def metadata_element_saved(sender, instance, **kwargs):
                     or relation_type not in {r.value for r in Relation.NOT_USER_EDITABLE}
                 )
 
-                try:
-                    resource.update_cached_metadata_field(meta_field_name, update_modified_date=update_modified_date)
-                except Exception as ex:
-                    # NOTE: The error may not be related to the field that is logged here as
-                    # we update other fields that might be missing in the cache as part of caching the specified field
-                    err_msg = f"Error updating cached metadata:{meta_field_name} for resource " \
-                              f"{resource.short_id}: {str(ex)}"
-                    logger.error(err_msg)
-                    print(err_msg)
+                # coalesced within bulk_metadata_edit() blocks
+                metadata_changed(resource, meta_field_name, update_modified_date=update_modified_date)
 
-                try:
-                    resource.write_django_metadata_json_files()
-                except Exception as ex:
-                    logger.error(f"Error writing user metadata json file for resource {resource.short_id}: {str(ex)}")
+
+@receiver(post_save)
+def metadata_element_saved(sender, instance, **kwargs):
+    _metadata_element_changed(instance)
 
 
 @receiver(post_delete)
 def metadata_element_deleted(sender, instance, **kwargs):
-    if isinstance(instance, AbstractMetaDataElement):
-        if hasattr(instance, 'metadata') and instance.metadata is not None:
-            if hasattr(instance.metadata, 'resource') and instance.metadata.resource is not None:
-                resource = instance.metadata.resource
-                meta_field_name = instance.__class__.__name__.lower()
+    _metadata_element_changed(instance)
+
+
+def _folder_listing_changed(instance):
+    """Invalidate the cached folder listings of the resource of a changed file, aggregation or aggregation
+    metadata"""
+    resource_id = None
+    if isinstance(instance, ResourceFile):
+        resource_id = instance.object_id
+    elif isinstance(instance, AbstractLogicalFile):
+        resource_id = instance.resource_id
+    elif isinstance(instance, AbstractFileMetaData):
+        try:
+            resource_id = instance.logical_file.resource_id
+        except ObjectDoesNotExist:
+            # metadata of an aggregation being created or deleted
+            pass
+    if resource_id is not None:
+        listing_changed(resource_id)
 
-                # Don't update modified date for system-managed relation types (hasPart, isPartOf, etc.)
-                relation_type = instance.type if isinstance(instance, Relation) else None
-                update_modified_date = (
-                    relation_type is None
-                    or relation_type not in {r.value for r in Relation.NOT_USER_EDITABLE}
-                )
 
-                try:
-                    resource.update_cached_metadata_field(meta_field_name, update_modified_date=update_modified_date)
-                except Exception as ex:
-                    logger.error(f"Error updating cached metadata for resource {resource.short_id}: {str(ex)}")
-                    # NOTE: The error may not be related to the field that is logged here as
-                    # we update other fields that might be missing in the cache as part of caching the specified field
-                    err_msg = f"Error updating cached metadata:{meta_field_name} for resource " \
-                              f"{resource.short_id}: {str(ex)}"
-                    logger.error(err_msg)
-                    print(err_msg)
-                try:
-                    resource.write_django_metadata_json_files()
-                except Exception as ex:
-                    logger.error(f"Error writing user metadata json file for resource {resource.short_id}: {str(ex)}")
+@receiver(post_save)
+def folder_listing_saved(sender, instance, **kwargs):
+    _folder_listing_changed(instance)
+
+
+@receiver(post_delete)
+def folder_listing_deleted(sender, instance, **kwargs):
+    _folder_listing_changed(instance)
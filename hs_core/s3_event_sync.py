@@ -0,0 +1,132 @@
+"""
+Batched synchronization of Django resource files with S3 object events.
+
+The hs_django S3 event processor used to handle each object event on its own: it loaded the resource,
+linked or deleted one ResourceFile and marked the resource as modified, so a bulk upload of thousands
+of files into a resource repeated all of this thousands of times. sync_s3_events instead groups the
+events of a batch by resource, keeps only the latest event of each file, and for each resource links
+the created files with one bulk insert, deletes the removed files with one bulk delete and marks the
+resource as modified (which sets the dirty bag flag) once. Resources are synced by a fixed-size pool of
+threads, and the events of a resource are always applied by a single thread.
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+
+from hs_core.hydroshare.resource import delete_resource_files
+from hs_core.hydroshare.utils import get_resource_by_shortkey, resource_modified
+from hs_core.metadata_sync import bulk_metadata_edit
+from hs_core.views.utils import link_s3_files_to_django
+from hs_file_types.utils import get_logical_file_type, set_logical_file_type
+from theme.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+SYNC_WORKERS = 8
+
+_sync_pool = None
+
+# key is the path of the file relative to data/contents of the resource, username is the bucket name of the
+# user who made the change
+S3FileEvent = namedtuple('S3FileEvent', ['resource_id', 'key', 'created', 'size', 'checksum', 'modified_time',
+                                         'username'])
+
+
+def group_events(events):
+    """
+    Group S3 file events by resource, keeping the latest event of each file
+
+    :param events: S3FileEvent in the order they happened
+    :return: a dict of resource id to a dict of file key to the latest S3FileEvent of the file
+    """
+    events_by_resource = {}
+    for event in events:
+        resource_events = events_by_resource.setdefault(event.resource_id, {})
+        # a later event of a file replaces an earlier one, and moves the file to the end
+        resource_events.pop(event.key, None)
+        resource_events[event.key] = event
+    return events_by_resource
+
+
+def _user_of_bucket(username):
+    # the user identity from minio is equivalent to bucket name
+    try:
+        return UserProfile.objects.get(_bucket_name=username).user
+    except UserProfile.DoesNotExist:
+        logger.warning(f"No user found for bucket {username}")
+        return None
+
+
+def _set_logical_file_types(resource, res_files):
+    for res_file in res_files:
+        try:
+            file_type = get_logical_file_type(res=resource, file_id=res_file.pk, fail_feedback=False)
+            if not res_file.has_logical_file and file_type is not None:
+                set_logical_file_type(res=resource, user=None, file_id=res_file.pk, fail_feedback=False)
+        except Exception as ex:
+            logger.error(f"Error setting the aggregation of {res_file.short_path} of resource "
+                         f"{resource.short_id}: {ex}")
+
+
+def sync_resource_events(resource_id, events):
+    """
+    Apply the S3 file events of a resource to its files in Django
+
+    :param resource_id: id of the resource
+    :param events: the latest S3FileEvent of each file changed in the resource
+    :return: a tuple of the number of files linked and the number of files deleted
+    """
+    created = [event for event in events if event.created]
+    deleted = [event for event in events if not event.created]
+    resource = get_resource_by_shortkey(resource_id, or_404=False)
+    user = None
+    res_files = []
+    deleted_paths = []
+    with bulk_metadata_edit():
+        if created:
+            res_files = link_s3_files_to_django(resource, created)
+            if resource.resource_type == "CompositeResource":
+                _set_logical_file_types(resource, res_files)
+        if deleted:
+            user = _user_of_bucket(deleted[-1].username)
+            try:
+                # deleting the files marks the resource as modified
+                deleted_paths = delete_resource_files(resource, [event.key for event in deleted], user)
+            except ValidationError as ex:
+                logger.error(f"Error deleting files of resource {resource_id}: {ex}")
+        if res_files and not deleted_paths:
+            if user is None:
+                user = _user_of_bucket(created[-1].username)
+            resource_modified(resource, user, overwrite_bag=False)
+    return len(res_files), len(deleted_paths)
+
+
+def _sync_resource_events(resource_id, events):
+    # worker threads keep their database connections across batches, unless they broke or expired
+    close_old_connections()
+    try:
+        return sync_resource_events(resource_id, events)
+    except Exception as ex:
+        logger.error(f"Error syncing resource {resource_id}: {ex}")
+        return 0, 0
+
+
+def sync_s3_events(events):
+    """
+    Apply a batch of S3 file events to the files of their resources in Django
+
+    :param events: S3FileEvent in the order they happened
+    :return: a dict of resource id to a tuple of the number of files linked and deleted in the resource
+    """
+    global _sync_pool
+    events_by_resource = group_events(events)
+    if not events_by_resource:
+        return {}
+    if _sync_pool is None:
+        _sync_pool = ThreadPoolExecutor(SYNC_WORKERS, thread_name_prefix='s3_event_sync')
+    resource_ids = list(events_by_resource)
+    resource_events = [list(events_by_resource[resource_id].values()) for resource_id in resource_ids]
+    return dict(zip(resource_ids, _sync_pool.map(_sync_resource_events, resource_ids, resource_events)))
@@ -89,6 +89,23 @@ def get_or_create_task_notification(task_id, status='progress', name='', payload
         }
 
 
+def get_task_progress_callback(task_id, message="Copied {done} of {total} files"):
+    """
+    get a callback to report the progress of a long running storage operation (e.g., S3Storage.copyFiles) of a
+    celery task as the payload of its TaskNotification
+    :param task_id: the id of the celery task, no progress is reported when None (task not run asynchronously)
+    :param message: the progress message to be formatted with done and total
+    :return: a callable taking the done and total counts, or None
+    """
+    if not task_id:
+        return None
+
+    def report_progress(done, total):
+        get_or_create_task_notification(task_id, status='progress', payload=message.format(done=done, total=total))
+
+    return report_progress
+
+
 def get_task_notification(task_id):
     try:
         obj = TaskNotification.objects.get(task_id=task_id)
@@ -7,7 +7,7 @@ import os
 import sys
 import traceback
 import zipfile
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 import requests
 from billiard.exceptions import TimeLimitExceeded
@@ -22,7 +22,7 @@ from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.mail import send_mail
 from django.db.models import F, Q
 from django.utils import timezone
-from hs_tracking.models import Variable
+from hs_tracking.models import ResourceDailyActivity, Variable
 from rest_framework import status
 
 from celery import Task, shared_task
@@ -30,6 +30,7 @@ from django_s3.exceptions import SessionException
 from django_s3.storage import S3Storage
 from hs_access_control.models import GroupMembershipRequest
 from hs_collection_resource.models import CollectionDeletedResource
+from hs_core import counters
 from hs_core.enums import (RelationTypes)
 from hs_core.exceptions import ResourceCopyException, ResourceVersioningException
 from hs_core.hydroshare import (create_empty_resource, current_site_url,
@@ -37,8 +38,8 @@ from hs_core.hydroshare import (create_empty_resource, current_site_url,
 from hs_core.hydroshare.hs_bagit import (create_bag_metadata_files,
                                          create_bagit_files_by_s3)
 from hs_core.hydroshare.resource import (get_resource_doi, update_quota_usage,)
-from hs_core.models import BaseResource, ResourceFile, TaskNotification
-from hs_core.task_utils import get_or_create_task_notification
+from hs_core.models import BaseResource, TaskNotification
+from hs_core.task_utils import get_or_create_task_notification, get_task_progress_callback
 from hs_file_types.models import (
     FileSetLogicalFile,
     GenericLogicalFile,
@@ -78,6 +79,7 @@ NIGHTLY_RESOURCE_REPAIR_DURATION = getattr(settings, 'NIGHTLY_RESOURCE_REPAIR_DU
 NIGHTLY_GENERATE_FILESYSTEM_METADATA_DURATION = getattr(
     settings, 'NIGHTLY_GENERATE_FILESYSTEM_METADATA_DURATION', 14400
 )
+NIGHTLY_QUOTA_RECONCILIATION_DURATION = getattr(settings, 'NIGHTLY_QUOTA_RECONCILIATION_DURATION', 3600)
 
 
 class FileOverrideException(Exception):
@@ -143,11 +145,16 @@ def setup_periodic_tasks(sender, **kwargs):
     if (hasattr(settings, 'DISABLE_PERIODIC_TASKS') and settings.DISABLE_PERIODIC_TASKS):
         logger.debug("Periodic tasks are disabled in SETTINGS")
     else:
+        # Every 5 minutes
+        sender.add_periodic_task(crontab(minute='*/5'), flush_resource_counters.s(), options={'queue': 'periodic'})
+
         # Hourly
         sender.add_periodic_task(crontab(minute=0), check_bucket_names.s(), options={'queue': 'periodic'})
 
         # Daily (times in UTC)
         sender.add_periodic_task(crontab(minute=30, hour=2), clear_tokens.s(), options={'queue': 'periodic'})
+        sender.add_periodic_task(crontab(minute=0, hour=1), nightly_hs_tracking_rollup.s(),
+                                 options={'queue': 'periodic'})
         sender.add_periodic_task(crontab(minute=0, hour=2), nightly_hs_tracking_cleanup.s(),
                                  options={'queue': 'periodic'})
         sender.add_periodic_task(crontab(minute=0, hour=3), nightly_metadata_review_reminder.s(),
@@ -162,6 +169,8 @@ def setup_periodic_tasks(sender, **kwargs):
                                  options={'queue': 'periodic'})
         sender.add_periodic_task(crontab(minute=0, hour=6), nightly_cache_file_system_metadata.s(),
                                  options={'queue': 'periodic'})
+        sender.add_periodic_task(crontab(minute=0, hour=7), nightly_reconcile_quota_usage.s(),
+                                 options={'queue': 'periodic'})
         sender.add_periodic_task(crontab(minute=30, hour=6), nightly_periodic_task_check.s(),
                                  options={'queue': 'periodic'})
         sender.add_periodic_task(crontab(minute=30, hour=7), task_notification_cleanup.s(),
@@ -255,10 +264,29 @@ def nightly_periodic_task_check():
         file.write(timezone.now().strftime('%m/%d/%y %H:%M:%S'))
 
 
+@celery_app.task(ignore_result=True, base=HydroshareTask)
+def flush_resource_counters():
+    # adds the resource view and download counts accumulated in Redis to the database
+    counters.flush()
+
+
+@celery_app.task(ignore_result=True, base=HydroshareTask)
+def nightly_hs_tracking_rollup():
+    # rolls up the hs_tracking variables of each complete day into the daily activity tables
+    days = ResourceDailyActivity.rollup_pending()
+    if days:
+        logger.info(f"Rolled up hs_tracking activity from {days[0]} to {days[-1]}")
+
+
 @celery_app.task(ignore_result=True, base=HydroshareTask)
 def nightly_hs_tracking_cleanup():
-    # trims the hs_tracking tables to the last 60 days
+    # trims the hs_tracking tables to the last 60 days, keeping variables of days not yet rolled up
     time_threshold = timezone.now() - timedelta(days=60)
+    last_rolled_up = ResourceDailyActivity.last_rolled_up()
+    if last_rolled_up is None:
+        return
+    time_threshold = min(time_threshold, timezone.make_aware(
+        datetime.combine(last_rolled_up + timedelta(days=1), datetime.min.time()), dt_timezone.utc))
     Variable.objects.filter(timestamp__lt=time_threshold).delete()
 
 
@@ -587,6 +615,24 @@ def send_over_quota_emails():
             logger.debug('user ' + u.username + ' does not have UserQuota foreign key relation')
 
 
+@celery_app.task(ignore_result=True, base=HydroshareTask, time_limit=NIGHTLY_QUOTA_RECONCILIATION_DURATION)
+def nightly_reconcile_quota_usage():
+    """
+    Reconcile the quota usage ledger of users with the usage of their buckets in MinIO, starting with the
+    quotas reconciled least recently so that quotas not reached before the time limit are reconciled first next time
+    """
+    uqs = UserQuota.objects.filter(zone="hydroshare").select_related("user__userprofile") \
+        .order_by(F("used_size_reconciled").asc(nulls_first=True))
+    for uq in uqs.iterator():
+        try:
+            drift = uq.reconcile_used_size()
+        except Exception as ex:
+            logger.error(f"Failed to reconcile quota usage for user {uq.user.username}: {str(ex)}")
+            continue
+        if drift:
+            logger.info(f"Quota usage of user {uq.user.username} was off by {drift} bytes, reconciled")
+
+
 @celery_app.task(ignore_result=True, base=HydroshareTask)
 def notify_increased_usage_during_quota_enforcement(user_pk, message):
     from hs_core.views.utils import get_default_support_user
@@ -719,14 +765,13 @@ def add_zip_file_contents_to_resource(pk, zip_file_path):
         for i, f in enumerate(files):
             logger.debug("Adding file {0} to resource {1}".format(f.name, pk))
             res_file = utils.add_file_to_resource(resource, f, save_file_system_metadata=False)
-            res_file.set_system_metadata(resource=resource, save=False)
             resource_files.append(res_file)
             resource.file_unpack_message = "Imported {0} of about {1} file(s) ...".format(
                 i, num_files)
             resource.save(update_fields=['file_unpack_message'])
 
-        ResourceFile.objects.bulk_update(resource_files, ResourceFile.system_meta_fields(),
-                                         batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+        # sets size, checksum, and modified time for all the added files from a single listing
+        utils.set_files_system_metadata_from_listing(resource, resource_files)
 
         # This might make the resource unsuitable for public consumption
         resource.update_public_and_discoverable()
@@ -851,9 +896,13 @@ def create_bag_by_s3(resource_id, create_zip=True):
         is_exist = istorage.exists(bagit_input_path)
         if is_exist:
             try:
-                if istorage.exists(bag_path):
+                # members that have not changed since the last bag was created are copied from it as they are,
+                # only the changed files (e.g., resourcemetadata.xml) are compressed again
+                previous_manifest = istorage.get_zip_manifest(bag_path)
+                if previous_manifest is None and istorage.exists(bag_path):
                     istorage.delete(bag_path)
-                istorage.zipup(bag_path, bagit_input_path)
+                stats = istorage.zipup(bag_path, bagit_input_path, previous_manifest=previous_manifest)
+                istorage.save_zip_manifest(bag_path, stats["manifest"])
                 res.setAVU("bag_modified", False)
                 if res.raccess.published:
                     # compute checksum to meet DataONE distribution requirement
@@ -874,7 +923,8 @@ def copy_resource_task(ori_res_id, new_res_id=None, request_username=None):
         if not new_res_id:
             new_res = create_empty_resource(ori_res_id, request_username, action='copy')
             new_res_id = new_res.short_id
-        utils.copy_resource_files_and_AVUs(ori_res_id, new_res_id)
+        progress_callback = get_task_progress_callback(copy_resource_task.request.id)
+        utils.copy_resource_files_and_AVUs(ori_res_id, new_res_id, progress_callback=progress_callback)
         ori_res = utils.get_resource_by_shortkey(ori_res_id)
         if not new_res:
             new_res = utils.get_resource_by_shortkey(new_res_id)
@@ -922,7 +972,8 @@ def create_new_version_resource_task(ori_res_id, username, new_res_id=None):
         if not new_res_id:
             new_res = create_empty_resource(ori_res_id, username)
             new_res_id = new_res.short_id
-        utils.copy_resource_files_and_AVUs(ori_res_id, new_res_id)
+        progress_callback = get_task_progress_callback(create_new_version_resource_task.request.id)
+        utils.copy_resource_files_and_AVUs(ori_res_id, new_res_id, progress_callback=progress_callback)
 
         # copy metadata from source resource to target new-versioned resource except three elements
         if not new_res:
@@ -1151,11 +1202,7 @@ def set_resource_files_system_metadata(resource_id):
     """
     resource = utils.get_resource_by_shortkey(resource_id)
     res_files = resource.files.exclude(_size__gte=0).all()
-    for res_file in res_files:
-        res_file.set_system_metadata(resource=resource, save=False)
-
-    ResourceFile.objects.bulk_update(res_files, ResourceFile.system_meta_fields(),
-                                     batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    utils.set_files_system_metadata_from_listing(resource, res_files)
 
 
 @celery_app.task(ignore_result=True, base=HydroshareTask, time_limit=NIGHTLY_GENERATE_FILESYSTEM_METADATA_DURATION)
@@ -1164,31 +1211,21 @@ def nightly_cache_file_system_metadata():
     Generate and store file checksums and modified times for a subset of resources
     """
 
-    def set_res_files_system_metadata(resource):
-        # exclude files with size 0 (file missing in S3)
-        res_files = resource.files.filter(
-            Q(_checksum__isnull=True)
-            | Q(_modified_time__isnull=True)
-            | Q(_size__lt=0)).exclude(_size=0).all()
-        for res_file in res_files:
-            res_file.set_system_metadata(resource=resource, save=False)
-
-        ResourceFile.objects.bulk_update(res_files, ResourceFile.system_meta_fields(),
-                                         batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    # exclude files with size 0 (file missing in S3)
+    files_filter = (Q(_checksum__isnull=True) | Q(_modified_time__isnull=True) | Q(_size__lt=0)) & ~Q(_size=0)
     cuttoff_time = timezone.now() - timedelta(days=1)
     recently_updated_resources = BaseResource.objects \
         .filter(updated__gte=cuttoff_time)
 
-    for res in recently_updated_resources:
-        set_res_files_system_metadata(res)
+    # the files of each resource are listed once in S3 rather than queried one at a time
+    utils.set_resources_files_system_metadata(recently_updated_resources, files_filter)
 
     # spend any remaining time generating filesystem metadata starting with most recently edited resources
     recently_updated_rids = [res.short_id for res in recently_updated_resources]
     less_recently_updated = BaseResource.objects \
         .exclude(short_id__in=recently_updated_rids) \
         .order_by('-updated')
-    for res in less_recently_updated:
-        set_res_files_system_metadata(res)
+    utils.set_resources_files_system_metadata(less_recently_updated, files_filter)
 
 
 @celery_app.task(ignore_result=True, base=HydroshareTask)
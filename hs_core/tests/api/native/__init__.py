@@ -7,6 +7,7 @@ from .test_create_new_version_resource import *
 from .test_create_resource import *
 from .test_delete_resource_file import *
 from .test_delete_resource import *
+from .test_files_system_metadata import *
 from .test_get_capabilities import *
 from .test_get_checksum import *
 from .test_get_citation import *
@@ -17,8 +18,10 @@ from .test_get_resource_types import *
 from .test_group_from_id import *
 from .test_hstore_extra_metadata import *
 from .test_publish_resource import *
+from .test_quota_usage import *
 from .test_resolve_doi import *
 from .test_resource_file_folder_operations import *
+from .test_storage_move_file import *
 from .test_update_account import *
 from .test_update_group import *
 from .test_update_metadata import *
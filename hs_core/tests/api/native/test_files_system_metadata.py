@@ -0,0 +1,64 @@
+import os
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.hydroshare.resource import add_resource_files
+from hs_core.hydroshare.utils import set_files_system_metadata_from_listing, set_resources_files_system_metadata
+from hs_core.models import ResourceFile
+from hs_core.testing import MockS3TestCaseMixin
+
+
+class TestFilesSystemMetadataFromListing(MockS3TestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestFilesSystemMetadataFromListing, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'creator@usu.edu',
+            username='creator',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+        self.res = hydroshare.create_resource('CompositeResource', self.user, 'Test Resource')
+
+        self.file_names = ["test1.txt", "test2.txt"]
+        for name in self.file_names:
+            with open(name, 'w') as test_file:
+                test_file.write(f"Test text file in {name}")
+        files = [open(name, 'rb') for name in self.file_names]
+        add_resource_files(self.res.short_id, *files)
+        for f in files:
+            f.close()
+
+    def tearDown(self):
+        super(TestFilesSystemMetadataFromListing, self).tearDown()
+        for name in self.file_names:
+            os.remove(name)
+
+    def test_system_metadata_matches_per_file_values(self):
+        expected = {}
+        for res_file in self.res.files.all():
+            res_file.set_system_metadata(resource=self.res)
+            expected[res_file.id] = (res_file._size, res_file._modified_time, res_file._checksum)
+        self.res.files.all().update(_size=-1, _modified_time=None, _checksum=None)
+
+        res_files = set_files_system_metadata_from_listing(self.res)
+
+        self.assertEqual(len(self.file_names), len(res_files))
+        for res_file in ResourceFile.objects.filter(object_id=self.res.id):
+            self.assertEqual(expected[res_file.id], (res_file._size, res_file._modified_time, res_file._checksum))
+            self.assertIsNotNone(res_file.filesize_cache_updated)
+
+    def test_missing_files(self):
+        res_file = self.res.files.first()
+        self.res.get_s3_storage().delete(res_file.storage_path)
+
+        set_resources_files_system_metadata([self.res])
+
+        res_file.refresh_from_db()
+        self.assertEqual(0, res_file._size)
+        self.assertIsNone(res_file._checksum)
+        self.assertIsNone(res_file._modified_time)
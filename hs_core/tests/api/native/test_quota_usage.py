@@ -0,0 +1,91 @@
+import os
+import uuid
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_access_control.models import PrivilegeCodes
+from hs_core import hydroshare
+from hs_core.hydroshare.resource import add_resource_files, delete_resource_file
+from hs_core.hydroshare.utils import set_files_system_metadata_from_listing
+from hs_core.testing import MockS3TestCaseMixin
+from theme.models import UserQuota
+
+
+class TestQuotaUsageLedger(MockS3TestCaseMixin, TestCase):
+    def setUp(self):
+        super(TestQuotaUsageLedger, self).setUp()
+        self.hs_group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user1 = hydroshare.create_account(
+            'quota_user1@email.com',
+            username='quota_owner1' + uuid.uuid4().hex,
+            first_name='owner1_first_name',
+            last_name='owner1_last_name',
+            superuser=False,
+            groups=[self.hs_group]
+        )
+        self.user2 = hydroshare.create_account(
+            'quota_user2@email.com',
+            username='quota_owner2' + uuid.uuid4().hex,
+            first_name='owner2_first_name',
+            last_name='owner2_last_name',
+            superuser=False,
+            groups=[self.hs_group]
+        )
+        self.res = hydroshare.create_resource('CompositeResource', self.user1, 'Quota Test Resource')
+
+        self.file_names = ["quota_test1.txt", "quota_test2.txt"]
+        for name in self.file_names:
+            with open(name, 'w') as test_file:
+                test_file.write(f"Test text file in {name}")
+        files = [open(name, 'rb') for name in self.file_names]
+        add_resource_files(self.res.short_id, *files)
+        for f in files:
+            f.close()
+
+    def tearDown(self):
+        super(TestQuotaUsageLedger, self).tearDown()
+        for name in self.file_names:
+            os.remove(name)
+        self.res.delete()
+        self.user1.delete()
+        self.user2.delete()
+
+    def _used_size(self, user):
+        return UserQuota.objects.get(user=user, zone='hydroshare').used_size
+
+    def _files_size(self):
+        return sum(f.size for f in self.res.files.all())
+
+    def test_file_add_and_delete(self):
+        files_size = self._files_size()
+        self.assertGreater(files_size, 0)
+        self.assertEqual(files_size, self._used_size(self.user1))
+
+        res_file = self.res.files.first()
+        file_size = res_file.size
+        delete_resource_file(self.res.short_id, res_file.id, self.user1)
+        self.assertEqual(files_size - file_size, self._used_size(self.user1))
+
+    def test_bulk_system_metadata_update(self):
+        files_size = self._files_size()
+        # sizes harvested again from the bucket listing are not counted twice
+        set_files_system_metadata_from_listing(self.res)
+        self.assertEqual(files_size, self._used_size(self.user1))
+
+    def test_change_quota_holder(self):
+        files_size = self._files_size()
+        self.user1.uaccess.share_resource_with_user(self.res, self.user2, PrivilegeCodes.OWNER)
+        self.res.set_quota_holder(self.user1, self.user2)
+        self.assertEqual(0, self._used_size(self.user1))
+        self.assertEqual(files_size, self._used_size(self.user2))
+
+    def test_reconcile_with_bucket_usage(self):
+        files_size = self._files_size()
+        UserQuota.update_used_size(self.user1.id, 1000)
+        uq = UserQuota.objects.get(user=self.user1, zone='hydroshare')
+        uq.reconcile_used_size()
+        self.assertIsNotNone(uq.used_size_reconciled)
+        # the bucket also holds the resource metadata files
+        self.assertGreaterEqual(self._used_size(self.user1), files_size)
+        self.assertLess(self._used_size(self.user1), files_size + 1000)
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.testing import MockS3TestCaseMixin
+
+
+class TestS3StorageMoveFile(MockS3TestCaseMixin, TestCase):
+    """Test cases for S3Storage.moveFile() method."""
+
+    def setUp(self):
+        super(TestS3StorageMoveFile, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'user1@nowhere.com',
+            username='user1',
+            first_name='Creator_FirstName',
+            last_name='Creator_LastName',
+            superuser=False,
+            groups=[]
+        )
+
+        self.res = hydroshare.create_resource(
+            'CompositeResource',
+            self.user,
+            'test resource for moveFile',
+        )
+        self.istorage = self.res.get_s3_storage()
+        self.contents_path = self.res.file_path
+
+    def test_move_file(self):
+        src_path = f'{self.contents_path}/file1.txt'
+        dest_path = f'{self.contents_path}/renamed.txt'
+        self.istorage.save(src_path, ContentFile(b'file 1'))
+
+        self.istorage.moveFile(src_path, dest_path)
+
+        self.assertFalse(self.istorage.exists(src_path))
+        self.assertTrue(self.istorage.exists(dest_path))
+        with self.istorage.download(dest_path) as moved_file:
+            self.assertEqual(b'file 1', moved_file.read())
+
+    def test_move_folder(self):
+        src_folder = f'{self.contents_path}/folder'
+        dest_folder = f'{self.contents_path}/moved'
+        for name in ('a.txt', 'sub/b.txt'):
+            self.istorage.save(f'{src_folder}/{name}', ContentFile(name.encode()))
+
+        self.istorage.moveFile(src_folder, dest_folder)
+
+        for name in ('a.txt', 'sub/b.txt'):
+            self.assertFalse(self.istorage.exists(f'{src_folder}/{name}'))
+            self.assertTrue(self.istorage.exists(f'{dest_folder}/{name}'))
@@ -3,7 +3,6 @@ import os
 
 from django.core.files.uploadedfile import UploadedFile
 from rest_framework import status
-from unittest import skip
 
 from hs_core.hydroshare import resource
 from hs_file_types.models import GenericLogicalFile, GenericFileMetaData
@@ -117,6 +116,32 @@ class TestResourceList(HSRESTTestCase):
         content = json.loads(response.content.decode())
         self.assertEqual(content['count'], 2)
 
+    def test_resource_list_by_full_text_search(self):
+        gen_res_one = resource.create_resource('CompositeResource', self.user, 'Snow melt in the Rockies')
+        gen_res_two = resource.create_resource('CompositeResource', self.user, 'Resource 2')
+        gen_res_three = resource.create_resource('CompositeResource', self.user, 'Resource 3')
+
+        self.resources_to_delete.append(gen_res_one.short_id)
+        self.resources_to_delete.append(gen_res_two.short_id)
+        self.resources_to_delete.append(gen_res_three.short_id)
+
+        gen_res_two.metadata.create_element("description", abstract="Measurements of melting snow")
+        gen_res_three.metadata.create_element("subject", value="rainfall")
+
+        response = self.client.get('/hsapi/resource/', {'full_text_search': 'snow melt'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content.decode())
+        self.assertEqual(content['count'], 2)
+        # title matches rank above abstract matches
+        self.assertEqual([r['resource_id'] for r in content['results']],
+                         [gen_res_one.short_id, gen_res_two.short_id])
+
+        response = self.client.get('/hsapi/resource/', {'full_text_search': 'rainfall'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = json.loads(response.content.decode())
+        self.assertEqual(content['count'], 1)
+        self.assertEqual(content['results'][0]['resource_id'], gen_res_three.short_id)
+
     def test_resource_list_obsolete(self):
         gen_res_one = resource.create_resource('CompositeResource', self.user, 'Resource 1')
         # make a new version of gen_res_one to make gen_res_one obsolete
@@ -150,7 +175,6 @@ class TestResourceList(HSRESTTestCase):
         self.assertIn(gen_res_one.short_id, result_res_id_list,
                       msg='obsoleted resource id is not included in returned resource list')
 
-    @skip("re-enable after resolution of https://github.com/hydroshare/hydroshare/issues/5240")
     def test_resource_list_by_bounding_box(self):
         metadata_dict_one = [{'coverage': {'type': 'point', 'value': {'north': '70',
                                                                       'east': '70',
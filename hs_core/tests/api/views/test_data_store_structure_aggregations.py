@@ -0,0 +1,86 @@
+import json
+import os
+
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+
+from hs_core import hydroshare
+from hs_core.folder_listing import AggregationIndex
+from hs_core.hydroshare.utils import add_file_to_resource
+from hs_core.testing import MockS3TestCaseMixin, ViewTestCase
+from hs_core.views.resource_folder_hierarchy import data_store_structure
+from hs_file_types.models import FileSetLogicalFile, ModelInstanceLogicalFile, ModelProgramLogicalFile
+
+
+class TestDataStoreStructureAggregations(MockS3TestCaseMixin, ViewTestCase):
+    def setUp(self):
+        super(TestDataStoreStructureAggregations, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'john@gmail.com',
+            username='john',
+            first_name='John',
+            last_name='Clarson',
+            superuser=False,
+            password='jhmypassword',
+            groups=[]
+        )
+        self.composite_resource = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.user,
+            title='Test Resource for Aggregations in File Browsing'
+        )
+
+    def tearDown(self):
+        super(TestDataStoreStructureAggregations, self).tearDown()
+        hydroshare.delete_resource(self.composite_resource.short_id)
+
+    def _add_file(self, folder, file_name):
+        res_file = ContentFile(b'some content')
+        res_file.name = file_name
+        add_file_to_resource(self.composite_resource, res_file, folder=folder, check_target_folder=True,
+                             save_file_system_metadata=True)
+
+    def _list(self, store_path):
+        request = self.factory.post('/_internal/data-store-structure/',
+                                    data={'res_id': self.composite_resource.short_id, 'store_path': store_path})
+        request.user = self.user
+        self.set_request_message_attributes(request)
+        self.add_session_to_request(request)
+        response = data_store_structure(request)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())
+
+    def test_folder_aggregation_types(self):
+        """Test that the aggregation types of sub-folders agree with can_set_folder_to_aggregation"""
+
+        resource = self.composite_resource
+        self._add_file('plain', 'file1.txt')
+        self._add_file('fileset', 'file2.txt')
+        self._add_file('fileset/inner', 'file3.txt')
+        FileSetLogicalFile.set_file_type(resource, self.user, folder_path='fileset')
+
+        for store_path in ('', 'fileset'):
+            dir_path = resource.get_s3_path(os.path.join('data/contents', store_path).rstrip('/'))
+            index = AggregationIndex(resource, dir_path)
+            aggregations = list(resource.logical_files)
+            for dname in index.sub_folder_files:
+                sub_folder = f'{dir_path}/{dname}'
+                for aggregation_class in (ModelProgramLogicalFile, ModelInstanceLogicalFile):
+                    self.assertEqual(
+                        index.can_set_model_aggregation(aggregation_class.__name__, dname),
+                        aggregation_class.can_set_folder_to_aggregation(resource, sub_folder,
+                                                                        aggregations=aggregations))
+                self.assertEqual(index.can_set_fileset(dname),
+                                 FileSetLogicalFile.can_set_folder_to_aggregation(resource, sub_folder,
+                                                                                  aggregations=aggregations))
+
+        folders = {folder['name']: folder for folder in self._list('')['folders']}
+        self.assertEqual(folders['plain']['folder_aggregation_type_to_set'], 'ModelProgramOrInstanceLogicalFile')
+        self.assertEqual(folders['fileset']['folder_aggregation_type'], 'FileSetLogicalFile')
+        self.assertEqual(folders['fileset']['folder_aggregation_type_to_set'], '')
+
+        listing = self._list('fileset')
+        self.assertEqual([f['logical_type'] for f in listing['files']], ['FileSetLogicalFile'])
+        folders = {folder['name']: folder for folder in listing['folders']}
+        self.assertEqual(folders['inner']['folder_aggregation_type_to_set'], 'ModelProgramOrInstanceLogicalFile')
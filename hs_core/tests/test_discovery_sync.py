@@ -0,0 +1,87 @@
+"""
+Tests bulk synchronization of the discovery collection.
+"""
+import uuid
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.discovery_sync import catalog_path, sync_discovery_collection
+from hs_core.hydroshare_atlas_discovery_collection import MongoDBClient
+from hs_core.testing import MockS3TestCaseMixin
+
+
+class TestDiscoverySync(MockS3TestCaseMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'test_user@email.com',
+            username='testuser' + uuid.uuid4().hex,
+            first_name='Test',
+            last_name='User',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.resource = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.user,
+            title='Test Resource'
+        )
+        self.resource.raccess.discoverable = True
+        self.resource.raccess.save()
+
+        self.collection = MagicMock()
+        self.collection_patcher = patch.object(MongoDBClient, "get_discovery_collection",
+                                               return_value=self.collection)
+        self.collection_patcher.start()
+
+    def tearDown(self):
+        self.collection_patcher.stop()
+        super().tearDown()
+
+    def _operations(self):
+        return [operation for call in self.collection.bulk_write.call_args_list for operation in call[0][0]]
+
+    def test_sync(self):
+        """new records are written, unchanged records skipped and records of removed resources deleted"""
+        self.collection.find.return_value = [{"_s3_filepath": catalog_path("removed")}]
+        report = sync_discovery_collection(processes=1)
+        self.assertEqual(report.added, [self.resource.short_id])
+        self.assertEqual(report.deleted, ["removed"])
+        replace, delete = self._operations()
+        document = replace._doc
+        self.assertEqual(document["_s3_filepath"], catalog_path(self.resource.short_id))
+        self.assertEqual(document["name"], "Test Resource")
+        self.assertEqual(delete._filter, {"_s3_filepath": catalog_path("removed")})
+
+        # the indexed record is unchanged
+        self.collection.reset_mock()
+        self.collection.find.return_value = [{"_s3_filepath": document["_s3_filepath"],
+                                              "metadata_hash": document["metadata_hash"]}]
+        report = sync_discovery_collection(processes=1)
+        self.assertEqual(report.unchanged, 1)
+        self.collection.bulk_write.assert_not_called()
+
+        # views of the resource do not change the record
+        self.resource.update_view_count()
+        report = sync_discovery_collection(processes=1)
+        self.assertEqual(report.unchanged, 1)
+        self.collection.bulk_write.assert_not_called()
+
+        # the record changed, references written by hs_extract are kept
+        self.resource.raccess.public = True
+        self.resource.raccess.save()
+        self.collection.find.return_value = [{"_s3_filepath": document["_s3_filepath"],
+                                              "metadata_hash": document["metadata_hash"],
+                                              "hasPart": [{"url": "has_parts.json"}]}]
+        report = sync_discovery_collection(processes=1, dry_run=True)
+        self.assertEqual(report.updated, [self.resource.short_id])
+        self.collection.bulk_write.assert_not_called()
+        report = sync_discovery_collection(processes=1)
+        replace, = self._operations()
+        self.assertEqual(replace._doc["hasPart"], [{"url": "has_parts.json"}])
+        self.assertNotEqual(replace._doc["metadata_hash"], document["metadata_hash"])
@@ -6,7 +6,7 @@ from unittest.mock import MagicMock, patch
 from unittest_parametrize import ParametrizedTestCase, parametrize, param
 
 from hs_core.hydroshare_atlas_discovery_collection import (
-    MongoDBClient, collect_file_to_catalog, delete_file_from_catalog
+    MongoDBClient, collect_file_to_catalog, datetime_parser, delete_file_from_catalog, sync_files_to_catalog
 )
 
 
@@ -129,3 +129,65 @@ class TestDeleteFileFromCatalog(TestCase):
         self.mock_collection.delete_one.assert_called_once_with(
             {"_s3_filepath": "abc123/.hsjsonld/dataset_metadata.json"}
         )
+
+
+class TestSyncFilesToCatalog(TestCase):
+
+    def setUp(self):
+        self.mock_s3 = MagicMock()
+        self.mock_collection = MagicMock()
+
+        self.s3_patcher = patch("hs_core.hydroshare_atlas_discovery_collection.s3", self.mock_s3)
+        self.collection_patcher = patch.object(
+            MongoDBClient,
+            "get_discovery_collection",
+            return_value=self.mock_collection
+        )
+        self.s3_patcher.start()
+        self.collection_patcher.start()
+
+    def tearDown(self):
+        self.s3_patcher.stop()
+        self.collection_patcher.stop()
+
+    def test_sync_with_one_bulk_write(self):
+        """Collected and deleted files are written with one bulk write, unreadable files are skipped."""
+        def get_object(Bucket, Key):
+            if Key.startswith("missing"):
+                raise Exception("NoSuchKey")
+            return _make_s3_response(SAMPLE_METADATA)
+        self.mock_s3.get_object.side_effect = get_object
+
+        written = sync_files_to_catalog(
+            ["bucket/res1/.hsjsonld/dataset_metadata.json", "bucket/missing/.hsjsonld/dataset_metadata.json"],
+            ["bucket/res2/.hsjsonld/dataset_metadata.json"]
+        )
+        self.assertEqual(written, 2)
+        self.mock_collection.bulk_write.assert_called_once()
+        delete, replace = self.mock_collection.bulk_write.call_args[0][0]
+        self.assertEqual(delete._filter, {"_s3_filepath": "res2/.hsjsonld/dataset_metadata.json"})
+        self.assertEqual(replace._filter, {"_s3_filepath": "res1/.hsjsonld/dataset_metadata.json"})
+        self.assertEqual(replace._doc["first_creator"]["name"], "Jane Smith")
+        self.assertEqual(replace._doc["dateCreated"], datetime.fromisoformat(SAMPLE_METADATA["dateCreated"]))
+
+    def test_nothing_to_sync(self):
+        """No bulk write is made without files to collect or delete."""
+        self.assertEqual(sync_files_to_catalog([], []), 0)
+        self.mock_collection.bulk_write.assert_not_called()
+
+
+class TestDatetimeParser(ParametrizedTestCase):
+
+    @parametrize(
+        "value,expected",
+        [
+            param("2026-01-15 10:30:00.000000+00:00", datetime.fromisoformat("2026-01-15 10:30:00.000000+00:00"),
+                  id="datetime"),
+            param("2026-01-15 10:30:00", datetime(2026, 1, 15, 10, 30), id="temporal_coverage"),
+            param("2026-01-15T10:30:00", "2026-01-15T10:30:00", id="iso_t_separator"),
+            param("2026-01-15", "2026-01-15", id="date"),
+            param("water and hydrology", "water and hydrology", id="text"),
+        ],
+    )
+    def test_datetime_parser(self, value, expected):
+        self.assertEqual(datetime_parser({"value": value})["value"], expected)
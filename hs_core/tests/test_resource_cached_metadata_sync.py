@@ -8,10 +8,14 @@ for metadata elements (Creator, Title, Subject, Date, Status, etc.).
 
 from datetime import datetime
 import uuid
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth.models import Group
 
 from hs_core import hydroshare
+from hs_core.metadata_sync import bulk_metadata_edit
+from hs_core.middleware import MetadataSyncMiddleware
+from hs_core.models import BaseResource
 
 
 class TestDenormalizedMetadataSync(TestCase):
@@ -1588,3 +1592,56 @@ class TestDenormalizedMetadataSync(TestCase):
         original_resource_modified_date = datetime.fromisoformat(self.resource.cached_metadata['modified'])
         new_resource_modified_date = datetime.fromisoformat(new_resource.cached_metadata['modified'])
         self.assertGreater(new_resource_modified_date, original_resource_modified_date)
+
+    def test_bulk_metadata_edit_syncs_once(self):
+        """Test that metadata edits in a bulk_metadata_edit block update cached metadata and json files once."""
+
+        with mock.patch.object(BaseResource, 'write_django_metadata_json_files') as write_json, \
+                mock.patch.object(BaseResource, 'update_cached_metadata_fields',
+                                  autospec=True, side_effect=BaseResource.update_cached_metadata_fields) as update:
+            with bulk_metadata_edit():
+                for i in range(5):
+                    self.resource.metadata.create_element('creator', name=f'Creator {i}')
+                for keyword in ('hydrology', 'water quality', 'snow'):
+                    self.resource.metadata.create_element('subject', value=keyword)
+                # nothing is synced until the block exits
+                write_json.assert_not_called()
+                update.assert_not_called()
+
+        self.assertEqual(write_json.call_count, 1)
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(set(update.call_args[0][1]), {'creator', 'subject'})
+        self.resource.refresh_from_db()
+        self.assertEqual(len(self.resource.cached_metadata['creators']), 6)
+        self.assertEqual(set(self.resource.cached_metadata['subjects']), {'hydrology', 'water quality', 'snow'})
+
+    def test_request_syncs_once(self):
+        """Test that metadata edits of a request that modifies data update cached metadata and json files once."""
+
+        def view(request):
+            for i in range(5):
+                self.resource.metadata.create_element('creator', name=f'Creator {i}')
+            # nothing is synced until the request has been handled
+            write_json.assert_not_called()
+            return None
+
+        request = mock.Mock(method='POST')
+        with mock.patch.object(BaseResource, 'write_django_metadata_json_files') as write_json:
+            MetadataSyncMiddleware(view)(request)
+
+        self.assertEqual(write_json.call_count, 1)
+        self.resource.refresh_from_db()
+        self.assertEqual(len(self.resource.cached_metadata['creators']), 6)
+
+    def test_metadata_update_syncs_once(self):
+        """Test that CoreMetaData.update writes the metadata json files once for all elements."""
+
+        metadata = [{'creator': {'name': f'Creator {i}'}} for i in range(5)]
+        metadata += [{'subject': {'value': keyword}} for keyword in ('hydrology', 'water quality', 'snow')]
+        with mock.patch.object(BaseResource, 'write_django_metadata_json_files') as write_json:
+            self.resource.metadata.update(metadata, self.user)
+
+        self.assertEqual(write_json.call_count, 1)
+        self.resource.refresh_from_db()
+        self.assertEqual(len(self.resource.cached_metadata['creators']), 5)
+        self.assertEqual(set(self.resource.cached_metadata['subjects']), {'hydrology', 'water quality', 'snow'})
@@ -0,0 +1,125 @@
+"""
+Tests resource view and download counters.
+"""
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from hs_core import counters, hydroshare
+from hs_core.models import BaseResource
+
+
+class TestResourceCounters(TestCase):
+
+    def setUp(self):
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'test_user@email.com',
+            username='testuser' + uuid.uuid4().hex,
+            first_name='Test',
+            last_name='User',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.resource = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.user,
+            title='Test Resource'
+        )
+
+    def tearDown(self):
+        client = counters._redis()
+        for counter in counters.COUNTERS:
+            client.delete(counters._key(counter), counters._flushing_key(counter))
+        client.delete(counters.FLUSH_LOCK_KEY)
+        super().tearDown()
+
+    def test_unbuffered_increments(self):
+        """increments from stale copies of a resource are not lost"""
+        stale = BaseResource.objects.get(id=self.resource.id)
+        self.resource.update_view_count()
+        stale.update_view_count()
+        stale.update_download_count()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 2)
+        self.assertEqual(self.resource.download_count, 1)
+        self.assertEqual(self.resource.total_view_count, 2)
+
+    @override_settings(RESOURCE_COUNTERS_BUFFERED=True)
+    def test_buffered_increments(self):
+        """increments are pending in Redis until flushed, and totals include them"""
+        for _ in range(3):
+            self.resource.update_view_count()
+        self.resource.update_download_count()
+
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 0)
+        self.assertEqual(self.resource.total_view_count, 3)
+        self.assertEqual(self.resource.total_download_count, 1)
+
+        counters.flush()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 3)
+        self.assertEqual(self.resource.download_count, 1)
+        self.assertEqual(self.resource.total_view_count, 3)
+
+        self.resource.update_view_count()
+        self.assertEqual(self.resource.total_view_count, 4)
+        counters.flush()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 4)
+
+    @override_settings(RESOURCE_COUNTERS_BUFFERED=True)
+    def test_failed_flush_is_resumed(self):
+        """batches written before a flush failed are not written again by the next flush"""
+        other = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.user,
+            title='Other Resource'
+        )
+        self.resource.update_view_count()
+        other.update_view_count()
+
+        apply_increment = counters._apply_increment
+        calls = []
+
+        def fail_second_batch(counter, count, resource_ids):
+            calls.append(resource_ids)
+            if len(calls) == 2:
+                raise RuntimeError("database unavailable")
+            apply_increment(counter, count, resource_ids)
+
+        with mock.patch.object(counters, 'BATCH_SIZE', 1), \
+                mock.patch.object(counters, '_apply_increment', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                counters.flush()
+        # the written batch is no longer pending, so totals are not counted twice
+        self.resource.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.resource.total_view_count + other.total_view_count, 2)
+
+        counters.flush()
+        self.resource.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 1)
+        self.assertEqual(other.view_count, 1)
+        self.assertEqual(self.resource.total_view_count, 1)
+
+    @override_settings(RESOURCE_COUNTERS_BUFFERED=True)
+    def test_concurrent_flush_is_skipped(self):
+        """a flush does not run while another one holds the lock"""
+        self.resource.update_view_count()
+        lock = counters._redis().lock(counters.FLUSH_LOCK_KEY, timeout=10)
+        self.assertTrue(lock.acquire(blocking=False))
+        try:
+            self.assertIsNone(counters.flush())
+        finally:
+            lock.release()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 0)
+
+        counters.flush()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.view_count, 1)
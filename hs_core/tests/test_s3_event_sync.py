@@ -0,0 +1,98 @@
+"""
+Tests batched synchronization of resource files with S3 object events.
+"""
+import uuid
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.utils.timezone import now
+
+from hs_core import hydroshare
+from hs_core.models import ResourceFile
+from hs_core.s3_event_sync import S3FileEvent, group_events, sync_resource_events
+from hs_core.testing import MockS3TestCaseMixin
+
+
+class TestS3EventSync(MockS3TestCaseMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'test_user@email.com',
+            username='testuser' + uuid.uuid4().hex,
+            first_name='Test',
+            last_name='User',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.resource = hydroshare.create_resource(
+            resource_type='CompositeResource',
+            owner=self.user,
+            title='Test Resource'
+        )
+
+    def _event(self, key, created=True, size=10):
+        return S3FileEvent(self.resource.short_id, key, created, size, 'etag', now(),
+                           self.user.userprofile.bucket_name)
+
+    def test_group_events(self):
+        """events are grouped by resource and only the latest event of a file is kept"""
+        first = self._event('a.txt')
+        other = S3FileEvent('other', 'a.txt', True, 1, 'etag', now(), 'bucket')
+        second = self._event('b.txt')
+        last = self._event('a.txt', created=False)
+        self.assertEqual(group_events([first, other, second, last]), {
+            self.resource.short_id: {'b.txt': second, 'a.txt': last},
+            'other': {'a.txt': other},
+        })
+
+    def test_sync_resource_events(self):
+        """created files are linked with the sizes of the events and deleted files are removed"""
+        linked, deleted = sync_resource_events(self.resource.short_id, [
+            self._event('a.txt', size=10),
+            self._event('folder/b.csv', size=20),
+        ])
+        self.assertEqual((linked, deleted), (2, 0))
+        files = {f.short_path: f for f in ResourceFile.objects.filter(object_id=self.resource.id)}
+        self.assertEqual(set(files), {'a.txt', 'folder/b.csv'})
+        self.assertEqual(files['folder/b.csv']._size, 20)
+        self.assertEqual(files['folder/b.csv']._checksum, 'etag')
+        self.assertEqual(files['folder/b.csv'].file_folder, 'folder')
+        formats = set(self.resource.metadata.formats.values_list('value', flat=True))
+        self.assertIn('text/plain', formats)
+        self.assertIn('text/csv', formats)
+
+        # a file created again is updated
+        sync_resource_events(self.resource.short_id, [self._event('a.txt', size=30)])
+        res_file = ResourceFile.get(resource=self.resource, file='a.txt')
+        self.assertEqual(res_file._size, 30)
+
+        linked, deleted = sync_resource_events(self.resource.short_id, [self._event('folder/b.csv', created=False)])
+        self.assertEqual((linked, deleted), (0, 1))
+        self.assertEqual([f.short_path for f in ResourceFile.objects.filter(object_id=self.resource.id)],
+                         ['a.txt'])
+        formats = set(self.resource.metadata.formats.values_list('value', flat=True))
+        self.assertNotIn('text/csv', formats)
+
+    def test_sync_resource_events_unknown_user(self):
+        """events of a bucket that has no user are applied and the resource is marked as modified"""
+        sync_resource_events(self.resource.short_id, [self._event('a.txt')])
+        self.resource.setAVU('bag_modified', False)
+        linked, deleted = sync_resource_events(self.resource.short_id, [
+            self._event('b.txt')._replace(username='unknown-bucket'),
+            self._event('a.txt', created=False)._replace(username='unknown-bucket'),
+        ])
+        self.assertEqual((linked, deleted), (1, 1))
+        self.assertEqual([f.short_path for f in ResourceFile.objects.filter(object_id=self.resource.id)],
+                         ['b.txt'])
+        self.assertTrue(self.resource.getAVU('bag_modified'))
+
+        # the resource is marked as modified when none of the deleted files were in the resource
+        self.resource.setAVU('bag_modified', False)
+        linked, deleted = sync_resource_events(self.resource.short_id, [
+            self._event('c.txt')._replace(username='unknown-bucket'),
+            self._event('missing.txt', created=False)._replace(username='unknown-bucket'),
+        ])
+        self.assertEqual((linked, deleted), (1, 0))
+        self.assertTrue(self.resource.getAVU('bag_modified'))
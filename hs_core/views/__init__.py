@@ -2295,7 +2295,12 @@ def hsapi_get_user(request, user_identifier):
     return get_user_or_group_data(request, user_identifier, "false")
 
 
-def check_user(user: User, resource: BaseResource, action: str):
+def check_user(resource_access: dict, action: str):
+    """
+    Check an S3 action against the access of a user to a resource
+    :param resource_access: the access of the user to the resource as returned by UserAccess.get_resources_access
+    :param action: the S3 action
+    """
     # Break this down into just view and edit for now.
     # HydroShare does not conusme changes made through S3 API yet so edit check is not active
     # Later on we could share the metadata files only or allow resource deletion.
@@ -2303,24 +2308,22 @@ def check_user(user: User, resource: BaseResource, action: str):
 
     # List of actions https://docs.aws.amazon.com/AmazonS3/latest/API/API_Operations.html
 
-    r = resource.raccess
-    u = user.uaccess
     # view actions
     if action == "s3:GetObject":
-        return r.public or r.allow_private_sharing or u.can_view_resource(resource)
+        return resource_access["can_view"]
     # view and discoverable actions
-    if action == "s3:ListObjects" or action == "s3:ListObjjectsV2" or action == "s3:ListBucket":
-        return r.public or r.allow_private_sharing or r.discoverable or u.can_view_resource(resource)
+    if action == "s3:ListObjects" or action == "s3:ListObjectsV2" or action == "s3:ListBucket":
+        return resource_access["discoverable"] or resource_access["can_view"]
 
     # edit actions
     if action == "s3:PutObject":
-        return u.can_change_resource(resource)
+        return resource_access["can_change"]
     if action == "s3:DeleteObject":
-        return u.can_change_resource(resource)
+        return resource_access["can_change"]
     if action == "s3:DeleteObjects":
-        return u.can_change_resource(resource)
+        return resource_access["can_change"]
     if action == "s3:UploadPart":
-        return u.can_change_resource(resource)
+        return resource_access["can_change"]
 
     return False
 
@@ -2387,25 +2390,25 @@ def hsapi_user_s3_authorization(request):
         return JsonResponse({"result" : {"allow": False}})
     logger.info("Checking", username, prefixes, action)
     # the root of the prefix (folder) is the resource id
-    resource_ids = [prefix.split("/")[0] for prefix in prefixes]
-    try:
-        resources: list[BaseResource] = [get_resource_by_shortkey(resource_id, False) for resource_id in resource_ids]
-    except BaseResource.DoesNotExist:
+    resource_ids = list(dict.fromkeys(prefix.split("/")[0] for prefix in prefixes))
+    # access of the user to all resources of the request from a single query
+    resources_access = user.uaccess.get_resources_access(resource_ids)
+    if len(resources_access) != len(resource_ids):
         logger.warning(f"at least one resource {resource_ids} not found")
-        return False  # resource not found for a prefix
+        return JsonResponse({"result" : {"allow": False}})  # resource not found for a prefix
 
     # users access the objects in these buckets through presigned urls, admins are approved above
     if bucket in ["zips", "tmp", "bags"]:
         return JsonResponse({"result" : {"allow": False}})
 
     # check the user against and each resource against the action
-    for resource in resources:
-        if not check_user(user, resource, action):
-            logger.info(f"Denied {username} {resource.short_id} {action}")
+    for resource_id in resource_ids:
+        if not check_user(resources_access[resource_id], action):
+            logger.info(f"Denied {username} {resource_id} {action}")
             return JsonResponse({"result" : {"allow": False}})
         else:
-            logger.info(f"Approved {username} {resource.short_id} {action}")
-    if resources:
+            logger.info(f"Approved {username} {resource_id} {action}")
+    if resource_ids:
         return JsonResponse({"result" : {"allow": True}})
     logger.info(f"No resources found for {username} {prefixes}")
     return JsonResponse({"result" : {"allow": False}})
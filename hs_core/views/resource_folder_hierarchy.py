@@ -15,8 +15,9 @@ from rest_framework.response import Response
 
 from django_s3.exceptions import SessionException
 from hs_core.hydroshare import delete_resource_file
-from hs_core.hydroshare.utils import (QuotaException, get_file_mime_type,
-                                      resolve_request)
+from hs_core.folder_listing import (cache_listing, content_version,
+                                    get_cached_listing, list_folder)
+from hs_core.hydroshare.utils import QuotaException, resolve_request
 from hs_core.models import ResourceFile
 from hs_core.task_utils import get_or_create_task_notification
 from hs_core.tasks import FileOverrideException, unzip_task
@@ -29,8 +30,6 @@ from hs_core.views.utils import (ACTION_TO_AUTHORIZE,
                                  remove_folder, rename_file_or_folder,
                                  unzip_file, zip_by_aggregation_file,
                                  zip_folder)
-from hs_file_types.models import (FileSetLogicalFile, ModelInstanceLogicalFile,
-                                  ModelProgramLogicalFile)
 
 logger = logging.getLogger(__name__)
 
@@ -45,7 +44,6 @@ def data_store_structure(request):
     where store_path is the relative path to res_id/data/contents
     """
     res_id = request.POST.get('res_id', None)
-    found_unreferenced_files = False   # flag to trigger ingest of unreferenced files
     if res_id is None:
         logger.error("no resource id in request")
         return HttpResponse('Bad request - resource id is not included',
@@ -68,178 +66,31 @@ def data_store_structure(request):
     except ValidationError as ex:
         return HttpResponse(str(ex), status=status.HTTP_400_BAD_REQUEST)
 
-    istorage = resource.get_s3_storage()
-    directory_in_s3 = resource.get_s3_path(store_path)
+    version = content_version(resource.id)
+    listing = get_cached_listing(resource, store_path, version)
+    if listing is None:
+        istorage = resource.get_s3_storage()
+        directory_in_s3 = resource.get_s3_path(store_path)
 
-    try:
-        # Check if directory exists first - it may not exist if all files were deleted
-        if not istorage.exists(directory_in_s3):
-            # Return empty structure - this is valid when all files are deleted
-            store = ([], [], [])  # (directories, files, sizes)
-        else:
-            store = istorage.listdir(directory_in_s3)
-    except SessionException as ex:
-        logger.error("session exception querying store_path {} for {}".format(store_path, res_id))
-        return HttpResponse(ex.stderr, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    files = []
-    dirs = []
-    aggregations = []
-    _APPKEY = 'appkey'
-    # folder path relative to 'data/contents/' needed for the UI
-    folder_path = store_path[len("data/contents/"):]
-    if resource.resource_type == "CompositeResource":
-        res_aggregations = list(resource.logical_files)
-
-    for dname in store[0]:     # directories
-        d_pk = dname
-        d_store_path = os.path.join(store_path, d_pk)
-        d_url = resource.get_url_of_path(d_store_path)
-        main_file = ''
-        folder_aggregation_type = ''
-        folder_aggregation_name = ''
-        folder_aggregation_id = ''
-        folder_aggregation_type_to_set = ''
-        folder_aggregation_appkey = ''
-        if resource.resource_type == "CompositeResource":
-            dir_path = resource.get_s3_path(d_store_path)
-            # find if this folder *dir_path* represents (contains) an aggregation object
-            aggregation_object = resource.get_folder_aggregation_object(dir_path, aggregations=res_aggregations)
-            # folder aggregation type is not relevant for single file aggregation types - which
-            # are: GenericLogicalFile, RefTimeseriesLogicalFile, and CSVLogicalFile
-            if aggregation_object is not None:
-                folder_aggregation_type = aggregation_object.get_aggregation_class_name()
-                folder_aggregation_name = aggregation_object.get_aggregation_display_name()
-                folder_aggregation_id = aggregation_object.id
-                folder_aggregation_appkey = aggregation_object.metadata.extra_metadata.get(_APPKEY, '')
-                aggr_main_file = aggregation_object.get_main_file
-                if aggr_main_file is not None:
-                    main_file = aggr_main_file.file_name
+        try:
+            # Check if directory exists first - it may not exist if all files were deleted
+            if not istorage.exists(directory_in_s3):
+                # Return empty structure - this is valid when all files are deleted
+                store = ([], [], [])  # (directories, files, sizes)
             else:
-                # check first if ModelProgram/ModelInstance aggregation type can be created from this folder
-                can_set_model_instance = ModelInstanceLogicalFile.can_set_folder_to_aggregation(
-                    resource=resource, dir_path=dir_path, aggregations=res_aggregations)
-                can_set_model_program = ModelProgramLogicalFile.can_set_folder_to_aggregation(
-                    resource=resource, dir_path=dir_path, aggregations=res_aggregations)
-                if can_set_model_instance and can_set_model_program:
-                    folder_aggregation_type_to_set = 'ModelProgramOrInstanceLogicalFile'
-                elif can_set_model_program:
-                    folder_aggregation_type_to_set = ModelProgramLogicalFile.__name__
-                elif can_set_model_instance:
-                    folder_aggregation_type_to_set = ModelInstanceLogicalFile.__name__
-                # otherwise, check if FileSet aggregation type that can be created from this folder
-                elif FileSetLogicalFile.can_set_folder_to_aggregation(resource=resource, dir_path=dir_path,
-                                                                      aggregations=res_aggregations):
-                    folder_aggregation_type_to_set = FileSetLogicalFile.__name__
-                else:
-                    folder_aggregation_type_to_set = ""
-        dirs.append({'name': d_pk,
-                     'url': d_url,
-                     'main_file': main_file,
-                     'folder_aggregation_type': folder_aggregation_type,
-                     'folder_aggregation_name': folder_aggregation_name,
-                     'folder_aggregation_id': folder_aggregation_id,
-                     'folder_aggregation_type_to_set': folder_aggregation_type_to_set,
-                     'folder_short_path': os.path.join(folder_path, d_pk),
-                     'folder_aggregation_appkey': folder_aggregation_appkey,
-                     })
-
-    for index, fname in enumerate(store[1]):  # files
-        f_store_path = os.path.join(store_path, fname)
-        file_in_s3 = resource.get_s3_path(f_store_path)
-        res_file = ResourceFile.objects.filter(object_id=resource.id,
-                                               resource_file=file_in_s3).first()
-
-        if not res_file:
-            # skip metadata, schema and schema values files
-            is_metadata_related_file = (
-                resource.is_metadata_xml_file(f_store_path)
-                or resource.is_metadata_json_file(f_store_path)
-                or resource.is_schema_json_file(f_store_path)
-                or resource.is_schema_json_values_file(f_store_path)
-            )
-            if not is_metadata_related_file:
-                found_unreferenced_files = True
-            continue
-
-        size = store[2][index]
-        mtype = get_file_mime_type(fname)
-        idx = mtype.find('/')
-        if idx >= 0:
-            mtype = mtype[idx + 1:]
-
-        f_ref_url = ''
-        logical_file_type = ''
-        logical_file_id = ''
-        aggregation_name = ''
-        # flag for UI to know if a file is part of a model program aggregation that has been created from a folder
-        # Note: model program aggregation can be created either from a single file of a folder that has one or more
-        # files
-        has_model_program_aggr_folder = False
-        has_model_instance_aggr_folder = False
-        aggregation_appkey = ''
-        if res_file.has_logical_file:
-            main_extension = res_file.logical_file.get_main_file_type()
-            if not main_extension:
-                # accept any extension
-                main_extension = ""
-
-            _, file_extension = os.path.splitext(fname)
-            if file_extension and main_extension.endswith(file_extension) and main_extension != ".csv":
-                if not hasattr(res_file.logical_file, 'folder') or res_file.logical_file.folder is None:
-                    aggregation_appkey = res_file.logical_file.metadata.extra_metadata.get(_APPKEY, '')
-
-                # these aggregations will be shown in the UI as virtual folders
-                aggregations.append({'logical_file_id': res_file.logical_file.id,
-                                     'name': res_file.logical_file.dataset_name,
-                                     'logical_type': res_file.logical_file.get_aggregation_class_name(),
-                                     'aggregation_name': res_file.logical_file.get_aggregation_display_name(),
-                                     'aggregation_appkey': aggregation_appkey,
-                                     'main_file': res_file.logical_file.get_main_file.file_name,
-                                     'preview_data_url': res_file.logical_file.metadata.get_preview_data_url(
-                                         resource=resource,
-                                         folder_path=f_store_path
-                                     ),
-                                     'url': res_file.logical_file.url})
-            logical_file = res_file.logical_file
-            logical_file_type = res_file.logical_file_type_name
-            logical_file_id = logical_file.id
-            aggregation_name = res_file.aggregation_display_name
-            aggregation_appkey = ''
-            if not hasattr(logical_file, 'folder') or logical_file.folder is None:
-                aggregation_appkey = logical_file.metadata.extra_metadata.get(_APPKEY, '')
-            if 'url' in res_file.logical_file.extra_data:
-                f_ref_url = res_file.logical_file.extra_data['url']
-
-            # check if this file (f) is part of a model program folder aggregation
-            if logical_file_type == "ModelProgramLogicalFile":
-                if res_file.file_folder is not None and res_file.logical_file.folder is not None:
-                    if res_file.file_folder.startswith(res_file.logical_file.folder):
-                        has_model_program_aggr_folder = True
-            elif logical_file_type == "ModelInstanceLogicalFile":
-                if res_file.file_folder is not None and res_file.logical_file.folder is not None:
-                    if res_file.file_folder.startswith(res_file.logical_file.folder):
-                        has_model_instance_aggr_folder = True
-
-        files.append({'name': fname, 'size': size, 'type': mtype, 'pk': res_file.pk, 'url': res_file.url,
-                      'reference_url': f_ref_url,
-                      'aggregation_name': aggregation_name,
-                      'logical_type': logical_file_type,
-                      'logical_file_id': logical_file_id,
-                      'aggregation_appkey': aggregation_appkey,
-                      'has_model_program_aggr_folder': has_model_program_aggr_folder,
-                      'has_model_instance_aggr_folder': has_model_instance_aggr_folder})
-
-    return_object = {'files': files,
-                     'folders': dirs,
-                     'aggregations': aggregations,
-                     'can_be_public': resource.can_be_public_or_discoverable}
-
-    if found_unreferenced_files:
-        from hs_core.management.utils import ingest_s3_files
-        ingest_s3_files(resource, None)
-        return data_store_structure(request)
+                store = istorage.listdir(directory_in_s3)
+        except SessionException as ex:
+            logger.error("session exception querying store_path {} for {}".format(store_path, res_id))
+            return HttpResponse(ex.stderr, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        listing, found_unreferenced_files = list_folder(resource, store_path, store)
+        if found_unreferenced_files:
+            from hs_core.management.utils import ingest_s3_files
+            ingest_s3_files(resource, None)
+            return data_store_structure(request)
+        cache_listing(resource, store_path, version, listing)
 
+    return_object = dict(listing, can_be_public=resource.can_be_public_or_discoverable)
     return HttpResponse(
         json.dumps(return_object),
         content_type="application/json"
@@ -272,10 +272,6 @@ class ResourceListCreate(generics.ListCreateAPIView):
 
         filter_parms = resource_list_request_validator.validated_data
 
-        if 'coverage_type' in filter_parms:
-            site_url = hydroshare.utils.current_site_url()
-            message = f"Spatial query is currently disabled in hsapi. Please use discover: {site_url}/search"
-            raise ValidationError(detail=message)
         filter_parms['user'] = (self.request.user if self.request.user.is_authenticated else None)
         if len(filter_parms['type']) == 0:
             filter_parms['type'] = None
@@ -284,7 +280,10 @@ class ResourceListCreate(generics.ListCreateAPIView):
 
         filter_parms['public'] = not self.request.user.is_authenticated
 
-        return hydroshare.get_resource_list(**filter_parms)
+        try:
+            return hydroshare.get_resource_list(**filter_parms)
+        except ValueError as ex:
+            raise ValidationError(detail=str(ex))
 
     # covers serialization of output from GET request
     def get_serializer_class(self):
@@ -107,7 +107,8 @@ class ResourceListRequestValidator(serializers.Serializer):
     subject = serializers.CharField(required=False,
                                     help_text='Comma separated list of subjects')
     full_text_search = serializers.CharField(required=False,
-                                             help_text='get a list of resources with this text')
+                                             help_text='get a list of resources whose title, keywords or '
+                                                       'abstract match this text, best matches first')
     edit_permission = serializers.BooleanField(required=False, default=False,
                                                help_text='filter by edit permissions of '
                                                          'user/group/owner')
@@ -119,20 +120,20 @@ class ResourceListRequestValidator(serializers.Serializer):
     coverage_type = serializers.ChoiceField(choices=['box', 'point'], required=False,
                                             help_text='to get a list of resources that fall within '
                                                       'the specified spatial coverage boundary')
-    north = serializers.CharField(required=False,
-                                  help_text='north coordinate of spatial coverage. This parameter '
+    north = serializers.FloatField(required=False,
+                                   help_text='north coordinate of spatial coverage. This parameter '
+                                             'is required if *coverage_type* has been specified')
+    south = serializers.FloatField(required=False,
+                                   help_text='south coordinate of spatial coverage. This parameter '
+                                             'is required if *coverage_type* has been specified '
+                                             'with a value of box')
+    east = serializers.FloatField(required=False,
+                                  help_text='east coordinate of spatial coverage. This parameter '
                                             'is required if *coverage_type* has been specified')
-    south = serializers.CharField(required=False,
-                                  help_text='south coordinate of spatial coverage. This parameter '
-                                            'is required if *coverage_type* has been specified '
-                                            'with a value of box')
-    east = serializers.CharField(required=False,
-                                 help_text='east coordinate of spatial coverage. This parameter '
-                                           'is required if *coverage_type* has been specified')
-    west = serializers.CharField(required=False,
-                                 help_text='west coordinate of spatial coverage. This parameter '
-                                           'is required if *coverage_type* has been specified with '
-                                           'a value of box')
+    west = serializers.FloatField(required=False,
+                                  help_text='west coordinate of spatial coverage. This parameter '
+                                            'is required if *coverage_type* has been specified with '
+                                            'a value of box')
     include_obsolete = serializers.BooleanField(required=False, default=False,
                                                 help_text='Include repleaced resources')
 
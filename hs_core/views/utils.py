@@ -39,13 +39,15 @@ from django_s3.exceptions import SessionException
 from hs_access_control.models import PrivilegeCodes
 from hs_core import hydroshare
 from hs_core.enums import RelationTypes
+from hs_core.folder_listing import listing_changed
 from hs_core.hydroshare import (add_resource_files, check_resource_type,
                                 delete_resource_file,
                                 validate_resource_file_size)
 from hs_core.hydroshare.utils import (QuotaException, check_aggregations,
                                       get_file_mime_type, validate_user_quota)
 from hs_core.models import (AbstractMetaDataElement, BaseResource,
-                            CoreMetaData, Relation, ResourceFile, get_user)
+                            CoreMetaData, Relation, ResourceFile, get_resource_file_path,
+                            get_user)
 from hs_core.signals import (post_delete_file_from_resource,
                              pre_metadata_element_create)
 from hs_core.tasks import FileOverrideException, create_temp_zip
@@ -767,6 +769,75 @@ def link_s3_folder_to_django(resource, istorage, foldername, auto_aggregate=True
     return res_files
 
 
+def link_unzipped_files_to_django(resource, unzipped_files, auto_aggregate=True):
+    """
+    Link files extracted by S3Storage.unzip_files to Django resource model in bulk (see link_s3_files_to_django),
+    setting their system metadata from the sizes, checksums and archive timestamps returned by the extraction
+    instead of querying S3 for each file
+
+    :param resource: the BaseResource object representing a HydroShare resource
+    :param unzipped_files: list of UnzippedFile returned by S3Storage.unzip_files
+    :param auto_aggregate: a bool indicating whether to check for and aggregate recognized files
+    :return: List of ResourceFile of newly linked files
+    """
+    res_files = link_s3_files_to_django(resource, unzipped_files)
+    if auto_aggregate:
+        check_aggregations(resource, res_files)
+    return res_files
+
+
+def link_s3_files_to_django(resource, s3_files):
+    """
+    Link many S3 files to Django resource model with one query for the files already linked and one bulk insert
+    of the new files, setting the system metadata of the files from values already obtained from S3 (e.g., from
+    S3 event notifications) instead of querying S3 for each file
+
+    :param resource: the BaseResource object representing a HydroShare resource
+    :param s3_files: objects with the key (path relative to data/contents), size, checksum and modified_time of
+    the files, e.g., UnzippedFile
+    :return: List of ResourceFile of the files, in the order of s3_files
+    """
+    s3_files_by_path = {}
+    for s3_file in s3_files:
+        folder, base = ResourceFile.resource_path_is_acceptable(resource, s3_file.key, test_exists=False)
+        s3_files_by_path[get_resource_file_path(resource, base, folder=folder)] = (folder, s3_file)
+
+    existing_files = {f.resource_file.name: f for f in
+                      ResourceFile.objects.filter(object_id=resource.id, resource_file__in=list(s3_files_by_path))}
+    res_files = []
+    new_files = []
+    updated_files = []
+    for path, (folder, s3_file) in s3_files_by_path.items():
+        res_file = existing_files.get(path)
+        if res_file is None:
+            res_file = ResourceFile(content_object=resource, file_folder=folder, resource_file=path)
+            new_files.append(res_file)
+        else:
+            updated_files.append(res_file)
+        res_file.set_system_metadata_values(s3_file.size, s3_file.modified_time, s3_file.checksum)
+        res_files.append(res_file)
+
+    ResourceFile.objects.bulk_create(new_files, batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    ResourceFile.objects.bulk_update(updated_files, ResourceFile.system_meta_fields(),
+                                     batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    # bulk operations do not send the signals that keep the quota usage, the folder listings and the
+    # aggregation registries up to date
+    ResourceFile.update_quota_usage(resource, res_files)
+    listing_changed(resource.id)
+    if resource.resource_type == "CompositeResource":
+        from hs_composite_resource.aggregation_registry import aggregations_changed
+        aggregations_changed()
+
+    if new_files:
+        existing_formats = {mime.value for mime in resource.metadata.formats.all()}
+        for res_file in new_files:
+            file_format_type = get_file_mime_type(res_file.resource_file.name)
+            if file_format_type not in existing_formats:
+                resource.metadata.create_element('format', value=file_format_type)
+                existing_formats.add(file_format_type)
+    return res_files
+
+
 def listfolders_recursively(istorage, path):
     folders = []
     listing = istorage.listdir(path)
@@ -875,6 +946,11 @@ def rename_s3_file_or_folder_in_django(resource, src_name, tgt_name):
 
         if res_file_objs:
             ResourceFile.objects.bulk_update(res_file_objs, ['file_folder', 'resource_file'], batch_size=batch_size)
+            if resource.resource_type == "CompositeResource":
+                # bulk_update does not send the signals that invalidate the aggregation registries, which
+                # would keep the files prefetched for the aggregations with their old paths
+                from hs_composite_resource.aggregation_registry import aggregations_changed
+                aggregations_changed()
 
             if is_target_folder_aggregation and composite_file_move:
                 res_file_objs = ResourceFile.list_folder(resource=resource, folder=tgt_name)
@@ -1196,8 +1272,9 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original,
             unzip_folder = os.path.join(os.path.dirname(zip_with_full_path), folder_name)
 
             unzip_folder = _get_nonexistant_path(istorage, unzip_folder)
-            unzip_to_folder_path = istorage.unzip(zip_with_full_path, unzipped_folder=unzip_folder)
-            res_files = link_s3_folder_to_django(resource, istorage, unzip_to_folder_path, auto_aggregate)
+            unzip_to_folder_path = unzip_folder
+            unzipped_files = istorage.unzip_files(zip_with_full_path, unzipped_folder=unzip_folder)
+            res_files = link_unzipped_files_to_django(resource, unzipped_files, auto_aggregate)
             if resource.resource_type == 'CompositeResource':
                 # make the newly added files part of an aggregation if needed
                 aggregations = list(resource.logical_files)
@@ -1275,11 +1352,9 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original,
                 for res_file in added_resource_files:
                     # make the newly added files part of an aggregation if needed
                     resource.add_file_to_aggregation(res_file, aggregations=aggregations)
-                    # sets size, checksum, and modified time for the newly added file
-                    res_file.set_system_metadata(resource=resource, save=False)
 
-                ResourceFile.objects.bulk_update(added_resource_files, ResourceFile.system_meta_fields(),
-                                                 batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+                # sets size, checksum, and modified time for the newly added files from a single listing
+                hydroshare.utils.set_files_system_metadata_from_listing(resource, added_resource_files)
 
             if auto_aggregate:
                 check_aggregations(resource, added_resource_files)
@@ -1374,12 +1449,8 @@ def ingest_bag(resource, bag_file, user):
         res_file = link_s3_file_to_django(resource, s3_path)
         added_resource_files.append(res_file)
 
-    for res_file in added_resource_files:
-        # sets size, checksum, and modified time for the newly added file
-        res_file.set_system_metadata(resource=resource, save=False)
-
-    ResourceFile.objects.bulk_update(added_resource_files, ResourceFile.system_meta_fields(),
-                                     batch_size=settings.BULK_UPDATE_CREATE_BATCH_SIZE)
+    # sets size, checksum, and modified time for the newly added files from a single listing
+    hydroshare.utils.set_files_system_metadata_from_listing(resource, added_resource_files)
 
     check_aggregations(resource, added_resource_files)
 
@@ -1489,6 +1560,7 @@ def create_folder(res_id, folder_path, migrating_resource=False):
 
     istorage.create_folder(resource.short_id, coll_path)
     # istorage.session.run("imkdir", None, '-p', coll_path)
+    listing_changed(resource.id)
 
 
 def remove_folder(user, res_id, folder_path):
@@ -1515,6 +1587,7 @@ def remove_folder(user, res_id, folder_path):
     # istorage command is the longest-running and most likely to get interrupted
     istorage.remove_folder(resource.short_id, coll_path)
     remove_s3_folder_in_django(resource, coll_path, user)
+    listing_changed(resource.id)
 
     resource.update_public_and_discoverable()  # make private if required
 
@@ -1642,6 +1715,8 @@ def move_to_folder(user, res_id, src_paths, tgt_path, validate_move=True):
         rename_s3_file_or_folder_in_django(resource, src_full_path, tgt_qual_path)
         if resource.resource_type == "CompositeResource":
             resource.set_flag_to_recreate_aggregation_meta_files(orig_path=src_full_path, new_path=tgt_qual_path)
+    # moved folders may be empty, in which case no resource file changed
+    listing_changed(resource.id)
 
     # TODO: should check can_be_public_or_discoverable here
 
@@ -1785,6 +1860,8 @@ def _path_move_rename(user, res_id, src_path, tgt_path, validate_move_rename=Tru
     rename_s3_file_or_folder_in_django(resource, src_full_path, tgt_full_path)
     if resource.resource_type == "CompositeResource":
         resource.set_flag_to_recreate_aggregation_meta_files(orig_path=src_full_path, new_path=tgt_full_path)
+    # moved folders may be empty, in which case no resource file changed
+    listing_changed(resource.id)
 
     hydroshare.utils.resource_modified(resource, user, overwrite_bag=False)
 
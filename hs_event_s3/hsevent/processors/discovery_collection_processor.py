@@ -1,13 +1,20 @@
 import asyncio
+import sys
 import threading
+import time
 import logging
 import redpanda_connect
 import json
+from datetime import datetime, timezone
 
 import django
 django.setup()
+from django.db import close_old_connections
 from hs_core.models import BaseResource
-from hs_core.hydroshare_atlas_discovery_collection import collect_file_to_catalog, delete_file_from_catalog
+from hs_core.hydroshare_atlas_discovery_collection import (collect_file_to_catalog, delete_file_from_catalog,
+                                                           sync_files_to_catalog)
+
+logger = logging.getLogger(__name__)
 
 
 def sync_discoverable_collection(key: str, resource_id: str, file_created: bool):
@@ -21,19 +28,83 @@ def sync_discoverable_collection(key: str, resource_id: str, file_created: bool)
         delete_file_from_catalog(key)
 
 
-@redpanda_connect.processor
-def discovery_collection_event(msg: redpanda_connect.Message) -> redpanda_connect.Message:
+def _dataset_metadata_event(msg: redpanda_connect.Message):
+    """Get (key, resource id, file created, event time) of an event of a dataset metadata file, None otherwise"""
     json_payload = json.loads(msg.payload)
     key = json_payload['Key']
-    file_created = json_payload['EventName'].startswith("s3:ObjectCreated")
     bucket_name = key.split('/')[0]
     resource_id = key.split('/')[1]
-    if key == f'{bucket_name}/{resource_id}/.hsjsonld/dataset_metadata.json':
+    if key != f'{bucket_name}/{resource_id}/.hsjsonld/dataset_metadata.json':
+        return None
+    file_created = json_payload['EventName'].startswith("s3:ObjectCreated")
+    event_time = None
+    try:
+        event_time = datetime.fromisoformat(json_payload['Records'][0]['eventTime'].replace('Z', '+00:00'))
+    except (KeyError, IndexError, ValueError):
+        pass
+    return key, resource_id, file_created, event_time
+
+
+@redpanda_connect.processor
+def discovery_collection_event(msg: redpanda_connect.Message) -> redpanda_connect.Message:
+    event = _dataset_metadata_event(msg)
+    if event is not None:
+        key, resource_id, file_created, _ = event
         fetch_thread = threading.Thread(target=sync_discoverable_collection, args=(key, resource_id, file_created))
         fetch_thread.start()
         fetch_thread.join()
 
 
+@redpanda_connect.batch_processor
+def discovery_collection_batch(batch: list[redpanda_connect.Message]) -> list[redpanda_connect.Message]:
+    """Sync a batch of events with one read of resources and one write to the discovery collection
+
+    Only the latest event of each file is applied.
+    """
+    start = time.monotonic()
+    # the connection is reused across batches, unless it broke or expired
+    close_old_connections()
+    latest = {}
+    oldest_event_time = None
+    for msg in batch:
+        event = _dataset_metadata_event(msg)
+        if event is None:
+            continue
+        key, resource_id, file_created, event_time = event
+        # messages of a partition are in order, a later event of a file replaces an earlier one
+        latest[key] = (resource_id, file_created)
+        if event_time is not None and (oldest_event_time is None or event_time < oldest_event_time):
+            oldest_event_time = event_time
+    if not latest:
+        return batch
+
+    created_resource_ids = {resource_id for resource_id, file_created in latest.values() if file_created}
+    discoverable = dict(BaseResource.objects.filter(short_id__in=created_resource_ids)
+                        .values_list('short_id', 'raccess__discoverable'))
+    collect = []
+    delete = []
+    for key, (resource_id, file_created) in latest.items():
+        if not file_created:
+            delete.append(key)
+        elif resource_id not in discoverable:
+            logger.warning(f"Resource {resource_id} of {key} not found")
+        elif discoverable[resource_id]:
+            collect.append(key)
+        else:
+            delete.append(key)
+    written = sync_files_to_catalog(collect, delete)
+
+    lag = ''
+    if oldest_event_time is not None:
+        lag = f", lag {(datetime.now(timezone.utc) - oldest_event_time).total_seconds():.1f}s"
+    logger.info(f"Batch of {len(batch)} events for {len(latest)} files: collected {len(collect)}, "
+                f"deleted {len(delete)}, wrote {written} documents in {time.monotonic() - start:.3f}s{lag}")
+    return batch
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    asyncio.run(redpanda_connect.processor_main(discovery_collection_event))
+    if '--batch' in sys.argv:
+        asyncio.run(redpanda_connect.processor_main(discovery_collection_batch))
+    else:
+        asyncio.run(redpanda_connect.processor_main(discovery_collection_event))
@@ -1,73 +1,78 @@
 import redpanda_connect
 import asyncio
 import json
+import logging
+import sys
+import time
+from datetime import datetime
+
 import django
-import threading
 
 django.setup()
 # django imports can only happen after django is setup
-from hs_core.models import BaseResource
-from hs_core.hydroshare.resource import delete_resource_file
-from theme.models import UserProfile
-from hs_core.views.utils import link_s3_file_to_django
-from hs_file_types.utils import get_logical_file_type, set_logical_file_type
-import boto3
-
-
-s3 = boto3.client('s3')
-
-def link_s3_files_to_resource(resource, fullpath):
-    try:
-        res_file = link_s3_file_to_django(resource, fullpath)
-        # Create required logical files as necessary
-        if resource.resource_type == "CompositeResource":
-            file_type = get_logical_file_type(res=resource, file_id=res_file.pk, fail_feedback=False)
-            if not res_file.has_logical_file and file_type is not None:
-                set_logical_file_type(res=resource, user=None, file_id=res_file.pk, fail_feedback=False)
-    except Exception as e:
-        print(f"Error syncing resource {resource.short_id}: {e}")
+from django.db import close_old_connections
+from hs_core.s3_event_sync import S3FileEvent, sync_s3_events
 
 
-def sync_resource(file_created, key, resource_id, username):
-    short_path = key.split(f'{resource_id}/data/contents/')[1]
-    if file_created:
-        try:
-            resource = BaseResource.objects.get(short_id=resource_id)
-            link_s3_files_to_resource(resource, short_path)
-        except Exception as e:
-            print(f"Error syncing resource {resource_id}: {e}")
-    else:
-        # assume file deleted, only tracking put,delete events in kafka
-        try:
-            print(f"Deleting file {key} for resource {resource_id}")
-            # the user identity from minio is equivalent to bucket name
-            user = UserProfile.objects.get(_bucket_name=username).user
-            delete_resource_file(resource_id, short_path, user)
-            print(f"Deleted file {key} for resource {resource_id}")
-        except Exception as e:
-            print(f"Error deleting file for resource {resource_id}: {e}")
+logger = logging.getLogger(__name__)
 
 
-@redpanda_connect.processor
-def handle_minio_event(msg: redpanda_connect.Message) -> redpanda_connect.Message:
-    print("Received message from Redpanda print")
+def _s3_file_event(msg: redpanda_connect.Message):
+    """Get the S3FileEvent of a message for a file in the contents of a resource, None otherwise"""
     json_payload = json.loads(msg.payload)
     key = json_payload['Key']
     file_created = json_payload['EventName'].startswith("s3:ObjectCreated")
     bucket_name = key.split('/')[0]
     resource_id = key.split('/')[1]
-    username = json_payload['Records'][0]['userIdentity']['principalId']
+    record = json_payload['Records'][0]
+    username = record['userIdentity']['principalId']
     if username == "cuahsi":
-        return
+        return None
     if not key.startswith(f'{bucket_name}/{resource_id}/data/contents/'):
         # TODO: tests around this check, possibly tighten up
         print(f"Ignoring event for key {key} not in contents directory")
-        return
-    print(f"Processing event for resource id: {resource_id}")
-    fetch_thread = threading.Thread(target=sync_resource, args=(file_created, key, resource_id, username))
-    fetch_thread.start()
-    fetch_thread.join()
+        return None
+    s3_object = record.get('s3', {}).get('object', {})
+    modified_time = None
+    if 'eventTime' in record:
+        modified_time = datetime.fromisoformat(record['eventTime'].replace('Z', '+00:00'))
+    return S3FileEvent(
+        resource_id=resource_id,
+        key=key.split(f'{resource_id}/data/contents/', 1)[1],
+        created=file_created,
+        size=s3_object.get('size', 0),
+        checksum=s3_object.get('eTag'),
+        modified_time=modified_time,
+        username=username,
+    )
+
+
+@redpanda_connect.processor
+def handle_minio_event(msg: redpanda_connect.Message) -> redpanda_connect.Message:
+    print("Received message from Redpanda print")
+    event = _s3_file_event(msg)
+    if event is not None:
+        print(f"Processing event for resource id: {event.resource_id}")
+        close_old_connections()
+        sync_s3_events([event])
+
+
+@redpanda_connect.batch_processor
+def handle_minio_events(batch: list[redpanda_connect.Message]) -> list[redpanda_connect.Message]:
+    """Apply a batch of events with one bulk insert, bulk delete and modification per resource"""
+    start = time.monotonic()
+    events = [event for event in (_s3_file_event(msg) for msg in batch) if event is not None]
+    results = sync_s3_events(events)
+    linked = sum(result[0] for result in results.values())
+    deleted = sum(result[1] for result in results.values())
+    logger.info(f"Batch of {len(batch)} events for {len(results)} resources: linked {linked} files, "
+                f"deleted {deleted} files in {time.monotonic() - start:.3f}s")
+    return batch
 
 
 if __name__ == "__main__":
-    asyncio.run(redpanda_connect.processor_main(handle_minio_event))
+    logging.basicConfig(level=logging.INFO)
+    if '--batch' in sys.argv:
+        asyncio.run(redpanda_connect.processor_main(handle_minio_events))
+    else:
+        asyncio.run(redpanda_connect.processor_main(handle_minio_event))
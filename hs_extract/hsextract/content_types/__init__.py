@@ -54,9 +54,14 @@ def determine_metadata_object_from_user_metadata(
         # all other content type user metadata
         relative_content_path = relative_user_meta_path[:-len(".user_metadata.json")]
     content_path = os.path.join(bucket_path, "data", "contents", relative_content_path)
+    md = None
     if not is_fileset_user_metadata:
         # check content path exists, if not return BaseMetadataObject (unknown content type)
         from hsextract.utils.s3 import exists
         if not exists(content_path):
-            return BaseMetadataObject(content_path, file_updated)
-    return determine_metadata_object(content_path, file_updated)
+            md = BaseMetadataObject(content_path, file_updated)
+    if md is None:
+        md = determine_metadata_object(content_path, file_updated)
+    # the event is for the user metadata file, not for a data file
+    md.event_object_path = user_metadata_file_path
+    return md
@@ -28,6 +28,8 @@ class BaseMetadataObject:
 
     def __init__(self, file_object_path: str, file_updated: bool):
         self.file_object_path = file_object_path
+        # the object of the event, content types may change file_object_path to their main file
+        self.event_object_path = file_object_path
         self.file_updated = file_updated
 
         self.bucket_name = self._bucket_name(file_object_path)
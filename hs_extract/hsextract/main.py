@@ -1,8 +1,11 @@
 import logging
 import json
 import os
+import time
 import redpanda_connect
 import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from hs_cloudnative_schemas.schema.base import IsPartOf, HasPart
 from hsextract.content_types.models import ContentType
 from hsextract.content_types import (
@@ -28,31 +31,79 @@ def _normalize_list(value) -> list:
     return [value]
 
 
-def _iter_resource_has_parts(md: BaseMetadataObject, user_json: dict):
+def _is_content_type_jsonld(md: BaseMetadataObject, file: str) -> bool:
     jsonld_files_to_exclude = {
         md.resource_metadata_jsonld_path,
         md.resource_associated_media_jsonld_path,
         md.resource_has_parts_jsonld_path,
     }
+    # fileset manifest files are not parts either
+    return file not in jsonld_files_to_exclude and not file.endswith("file_manifest.json")
+
+
+def _content_type_has_part(file: str) -> dict | None:
+    content_type_metadata = load_metadata(file)
+    if not content_type_metadata:
+        return None
+    has_part = HasPart(
+        name=content_type_metadata.get("name", None),
+        description=content_type_metadata.get("description", None),
+        url=f"{os.environ['AWS_S3_ENDPOINT_URL']}/{file}",
+    )
+    return has_part.model_dump(exclude_none=True)
+
+
+def _iter_resource_has_parts(md: BaseMetadataObject, user_json: dict):
     for file in iter_find(md.resource_md_jsonld_path):
-        if file in jsonld_files_to_exclude:
+        if not _is_content_type_jsonld(md, file):
             continue
-        if file.endswith("file_manifest.json"):
-            # fileset manifest file - so skip
-            continue
-        content_type_metadata = load_metadata(file)
-        has_part = HasPart(
-            name=content_type_metadata.get("name", None),
-            description=content_type_metadata.get("description", None),
-            url=f"{os.environ['AWS_S3_ENDPOINT_URL']}/{file}",
-        )
-        yield has_part.model_dump(exclude_none=True)
+        has_part = _content_type_has_part(file)
+        if has_part is not None:
+            yield has_part
 
     for has_part in _normalize_list(user_json.get("hasPart")):
         yield has_part
 
 
-def write_resource_jsonld_metadata(md: BaseMetadataObject) -> bool:
+def _changed_content_type_jsonld_paths(md: BaseMetadataObject) -> list[str]:
+    """Get the content type jsonld files that the event of md may have written or deleted"""
+    if md.content_type_md_jsonld_path is None:
+        return []
+    changed_paths = [md.content_type_md_jsonld_path]
+    if md.file_updated and md.is_content_file:
+        changed_paths.extend(f for f in md.clean_up_extracted_metadata() if f.startswith(md.resource_md_jsonld_path))
+    return changed_paths
+
+
+def _updated_resource_has_parts(md: BaseMetadataObject, user_json: dict, stored_has_parts: dict) -> list[dict]:
+    """
+    Get the hasPart of the resource from the stored has_parts.json, keyed by url, updated with the content type
+    jsonld files changed by the event of md.
+    """
+    # the parts of the content types, the parts from the user metadata are added as they are now
+    url_prefix = f"{os.environ['AWS_S3_ENDPOINT_URL']}/{md.resource_md_jsonld_path}/"
+    content_type_has_parts = {url: has_part for url, has_part in stored_has_parts.items()
+                              if url.startswith(url_prefix)}
+    for file in _changed_content_type_jsonld_paths(md):
+        if not _is_content_type_jsonld(md, file):
+            continue
+        has_part = _content_type_has_part(file)
+        url = f"{os.environ['AWS_S3_ENDPOINT_URL']}/{file}"
+        if has_part is None:
+            content_type_has_parts.pop(url, None)
+        else:
+            content_type_has_parts[url] = has_part
+    # in the order the files are listed, as in a rebuilt has_parts.json
+    return ([content_type_has_parts[url] for url in sorted(content_type_has_parts)]
+            + _normalize_list(user_json.get("hasPart")))
+
+
+def write_resource_jsonld_metadata(md: BaseMetadataObject, rebuild: bool = False) -> bool:
+    """
+    Write the resource dataset_metadata.json, has_parts.json and file_manifest.json.
+    has_parts.json and file_manifest.json are updated with the event of md, and rebuilt from the listing of the
+    resource if *rebuild* is True or they are missing or do not match their checksum.
+    """
     # read the system metadata file
     system_json = load_metadata(md.system_metadata_path)
 
@@ -62,19 +113,21 @@ def write_resource_jsonld_metadata(md: BaseMetadataObject) -> bool:
     # Combine system metadata and user metadata
     combined_metadata = {**system_json, **user_json}
 
-    # TODO: If we can assume that the user is not allowed to edit the hasPart relationship in the user metadata,
-    # then we can optimize the generation of the has_parts.json so that we only re-generate this file on
-    # specific s3 object notification.
+    def update_has_parts(stored_has_parts):
+        return _updated_resource_has_parts(md, user_json, stored_has_parts)
+
     has_part_reference = write_has_part_file(
         md.resource_has_parts_jsonld_path,
-        _iter_resource_has_parts(md, user_json),
+        lambda: _iter_resource_has_parts(md, user_json),
+        update=None if rebuild else update_has_parts
     )
     combined_metadata["hasPart"] = [has_part_reference] if has_part_reference else []
 
     # file_manifest.json is re-generated only on s3 object notification for a data file
     manifest_reference = write_file_manifest(
         md,
-        enabled=True
+        enabled=True,
+        rebuild=rebuild
     )
     combined_metadata["associatedMedia"] = [manifest_reference] if manifest_reference else []
 
@@ -135,13 +188,7 @@ def workflow_metadata_extraction(file_object_path: str, file_size: int, file_upd
     if md.content_type != ContentType.UNKNOWN:
         if file_updated:
             if file_size < int(os.environ.get("METADATA_EXTRACTION_FILE_SIZE_LIMIT", 4 * 1024 * 1024 * 1024)):
-                content_type_metadata = md.extract_metadata()
-                if content_type_metadata:
-                    write_metadata(md.content_type_md_path, content_type_metadata)
-                write_content_type_jsonld_metadata(md)
-                files_to_cleanup = md.clean_up_extracted_metadata()
-                for f in files_to_cleanup:
-                    delete_metadata(f)
+                extract_content_type_metadata(md)
         else:
             # TODO: not all file deletes for content types will need metadata deleted but rather updated
             delete_metadata(md.content_type_md_path)
@@ -153,26 +200,69 @@ def workflow_metadata_extraction(file_object_path: str, file_size: int, file_upd
         print(f"Error writing resource jsonld metadata: {str(ex)}")
 
 
+def extract_content_type_metadata(md: BaseMetadataObject) -> None:
+    content_type_metadata = md.extract_metadata()
+    if content_type_metadata:
+        write_metadata(md.content_type_md_path, content_type_metadata)
+    write_content_type_jsonld_metadata(md)
+    files_to_cleanup = md.clean_up_extracted_metadata()
+    for f in files_to_cleanup:
+        delete_metadata(f)
+
+
+def _extraction_workers() -> int:
+    return int(os.environ.get("METADATA_EXTRACTION_WORKERS", 8))
+
+
+def group_content_types(metadata_objects) -> list[BaseMetadataObject]:
+    """
+    Get one metadata object per content type of the given metadata objects, in the order they were found.
+    All files of a content type (e.g. the files of a shapefile, the tif files of a vrt or the files of a fileset)
+    resolve to the same main file and metadata files, so the content type needs to be extracted only once.
+    """
+    content_types = {}
+    for md in metadata_objects:
+        if md.content_type != ContentType.UNKNOWN:
+            content_types.setdefault(md.content_type_md_path, md)
+    return list(content_types.values())
+
+
+def _timed_extraction(md: BaseMetadataObject) -> float:
+    start = time.perf_counter()
+    try:
+        extract_content_type_metadata(md)
+    except Exception as ex:
+        print(f"Error extracting metadata for file {md.file_object_path}: {str(ex)}")
+    return time.perf_counter() - start
+
+
 def refresh_resource_metadata(bucket: str, resource_id: str) -> None:
     resource_content_path = f"{bucket}/{resource_id}/data/contents/"
-    md = None
-    for resource_file in iter_find(resource_content_path):
-        md = determine_metadata_object(resource_file, True)
-        if md.content_type != ContentType.UNKNOWN:
-            try:
-                content_type_metadata = md.extract_metadata()
-                if content_type_metadata:
-                    write_metadata(md.content_type_md_path, content_type_metadata)
-                write_content_type_jsonld_metadata(md)
-                files_to_cleanup = md.clean_up_extracted_metadata()
-                for f in files_to_cleanup:
-                    delete_metadata(f)
-            except Exception as ex:
-                print(f"Error extracting metadata for file {resource_file}: {str(ex)}")
+    resource_files = list(iter_find(resource_content_path))
+    if not resource_files:
+        return
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=_extraction_workers()) as executor:
+        # content types of different files are determined and extracted independently, the metadata files of
+        # a content type are written by a single worker
+        metadata_objects = list(executor.map(lambda f: determine_metadata_object(f, True), resource_files))
+        content_types = group_content_types(metadata_objects)
+        durations = list(executor.map(_timed_extraction, content_types))
+
+    timings = defaultdict(lambda: [0, 0.0])
+    for md, duration in zip(content_types, durations):
+        timings[md.content_type.value][0] += 1
+        timings[md.content_type.value][1] += duration
+    for content_type, (count, duration) in timings.items():
+        print(f"Extracted {count} {content_type} content types of resource {resource_id} in {duration:.2f}s")
+
     # TODO determine any metadata files that may need to be deleted
     # if metadata files do not have corresponding data files
-    if md:
-        write_resource_jsonld_metadata(md)
+    # file_manifest.json and has_parts.json are rebuilt once, after all content types are extracted
+    write_resource_jsonld_metadata(metadata_objects[-1], rebuild=True)
+    print(f"Refreshed metadata of {len(resource_files)} files of resource {resource_id} "
+          f"in {time.perf_counter() - start:.2f}s")
 
 
 @redpanda_connect.processor
@@ -1,12 +1,14 @@
 from __future__ import annotations
+import hashlib
 import json
 import mimetypes
 import os
 from tempfile import SpooledTemporaryFile
-from typing import Iterator, Protocol, TYPE_CHECKING
+from typing import Callable, Iterator, Protocol, TYPE_CHECKING
 
 import boto3
 import s3fs
+from botocore.exceptions import ClientError
 from hs_cloudnative_schemas.schema.base import HasPart, MediaObject
 if TYPE_CHECKING:
     from hsextract.content_types.models import ContentType
@@ -18,6 +20,8 @@ class SupportsFileManifest(Protocol):
         ...
 
     content_type: ContentType
+    event_object_path: str
+    file_updated: bool
     resource_contents_path: str
     resource_associated_media_jsonld_path: str
     content_type_contents_path: str
@@ -26,6 +30,12 @@ class SupportsFileManifest(Protocol):
 
 JSON_SPOOL_MAX_SIZE_ENV_VAR = "HS_EXTRACT_JSON_SPOOL_MAX_SIZE"
 DEFAULT_JSON_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+# user metadata key of the sha256 checksum of the JSON arrays written to S3
+JSON_ARRAY_CHECKSUM_METADATA_KEY = "sha256"
+# times a JSON array changed concurrently is read and updated again before it is rebuilt
+JSON_ARRAY_UPDATE_ATTEMPTS = 5
+# error codes of a conditional write refused because the object was changed since it was read
+_CONDITIONAL_WRITE_CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '409', '412')
 
 s3_config = {
     "endpoint_url": os.environ.get("AWS_S3_ENDPOINT_URL", "https://s3.beta.hydroshare.org"),
@@ -42,6 +52,10 @@ s3fsInstance = s3fs.S3FileSystem(
 )
 
 
+class ConcurrentUpdateError(Exception):
+    """A conditional write was refused because the object was changed since it was read."""
+
+
 def _split_s3_path(path: str) -> tuple[str, str]:
     """Split an S3-style bucket/key path into bucket and key."""
     return path.split('/', 1)
@@ -108,32 +122,136 @@ def _get_json_spool_max_size() -> int:
     return int(spool_max_size) if spool_max_size is not None else DEFAULT_JSON_SPOOL_MAX_SIZE
 
 
-def _write_json_array(output_path: str, items: Iterator[dict]) -> int:
-    """Stream a JSON array to S3 and return the uploaded size in bytes."""
+def _head_etag(path: str) -> str | None:
+    """Return the ETag of an S3 object, or None if the object does not exist."""
+    bucket, key = _split_s3_path(path)
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)['ETag']
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+        return None
+
+
+def _write_json_array(output_path: str, items: Iterator[dict], conditional: bool = False,
+                      etag: str | None = None) -> int:
+    """
+    Stream a JSON array to S3, along with its checksum, and return the uploaded size in bytes.
+    If *conditional* is True the array is written only if the object still has the ETag *etag*, or does not
+    exist if *etag* is None, and ConcurrentUpdateError is raised otherwise.
+    """
     bucket_name, key = _split_s3_path(output_path)
     spool_max_size = _get_json_spool_max_size()
+    checksum = hashlib.sha256()
 
     with SpooledTemporaryFile(mode='w+b', max_size=spool_max_size) as stream:
-        stream.write(b"[\n")
+        def write(content: bytes) -> None:
+            stream.write(content)
+            checksum.update(content)
+
+        write(b"[\n")
         first_item = True
         for item in items:
             if not first_item:
-                stream.write(b",\n")
-            stream.write(b"  ")
-            stream.write(json.dumps(item, default=str).encode('utf-8'))
+                write(b",\n")
+            write(b"  ")
+            write(json.dumps(item, default=str).encode('utf-8'))
             first_item = False
-        stream.write(b"\n]\n")
+        write(b"\n]\n")
         size_bytes = stream.tell()
         stream.seek(0)
-        s3_client.upload_fileobj(
-            stream,
-            bucket_name,
-            key,
-            ExtraArgs={'ContentType': 'application/json'}
-        )
+        extra_args = {
+            'ContentType': 'application/json',
+            'Metadata': {JSON_ARRAY_CHECKSUM_METADATA_KEY: checksum.hexdigest()}
+        }
+        if not conditional:
+            s3_client.upload_fileobj(stream, bucket_name, key, ExtraArgs=extra_args)
+            return size_bytes
+        if etag is None:
+            extra_args['IfNoneMatch'] = '*'
+        else:
+            extra_args['IfMatch'] = etag
+        try:
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=stream, ContentLength=size_bytes, **extra_args)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in _CONDITIONAL_WRITE_CONFLICT_CODES:
+                raise ConcurrentUpdateError(f"{output_path} was changed concurrently") from e
+            raise
         return size_bytes
 
 
+def load_json_array_index(path: str, key: Callable[[dict], str]) -> tuple[dict, int, str] | None:
+    """
+    Load a JSON array written by _write_json_array into a dict of its items keyed by *key*.
+    Return the dict, the size of the array file in bytes and its ETag, or None if the file is missing,
+    unreadable or does not match its checksum, in which case the array needs to be rebuilt.
+    """
+    bucket, object_key = _split_s3_path(path)
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=object_key)
+        with response["Body"] as stream:
+            content = stream.read()
+    except Exception as e:
+        print(f"Index file not found {path}: {str(e)}")
+        return None
+    if response.get("Metadata", {}).get(JSON_ARRAY_CHECKSUM_METADATA_KEY) != hashlib.sha256(content).hexdigest():
+        print(f"Index file {path} does not match its checksum")
+        return None
+    try:
+        return {key(item): item for item in json.loads(content.decode("utf-8"))}, len(content), response["ETag"]
+    except Exception as e:
+        print(f"Error reading index file {path}: {str(e)}")
+        return None
+
+
+def rebuild_json_array(path: str, items: Callable[[], Iterator[dict]]) -> int:
+    """
+    Write the JSON array of the items returned by *items* to *path* and return its size in bytes.
+    The items are listed again when the array was changed while they were listed, so that a rebuild does not
+    overwrite a concurrent update with an older listing.
+    """
+    for _ in range(JSON_ARRAY_UPDATE_ATTEMPTS):
+        etag = _head_etag(path)
+        try:
+            return _write_json_array(path, items(), conditional=True, etag=etag)
+        except ConcurrentUpdateError as e:
+            print(f"Rebuilding {path} again: {str(e)}")
+    # the latest listing is newer than the updates that kept changing the array
+    return _write_json_array(path, items())
+
+
+def update_json_array(
+    path: str,
+    key: Callable[[dict], str],
+    update: Callable[[dict], list[dict] | None],
+    items: Callable[[], Iterator[dict]]
+) -> int:
+    """
+    Update the JSON array at *path* and return its size in bytes.
+    *update* is called with the items of the stored array keyed by *key* and returns the updated items, or None
+    if the array is unchanged. The array is written only if it was not changed since it was read, and is read
+    and updated again otherwise, so that concurrent updates of an array are not lost. The array is rebuilt from
+    *items* if it is missing, does not match its checksum, cannot be updated or keeps being changed.
+    """
+    for _ in range(JSON_ARRAY_UPDATE_ATTEMPTS):
+        loaded = load_json_array_index(path, key)
+        if loaded is None:
+            break
+        index, size_bytes, etag = loaded
+        try:
+            updated_items = update(index)
+        except Exception as e:
+            print(f"Error updating {path}: {str(e)}")
+            break
+        if updated_items is None:
+            return size_bytes
+        try:
+            return _write_json_array(path, updated_items, conditional=True, etag=etag)
+        except ConcurrentUpdateError as e:
+            print(f"Updating {path} again: {str(e)}")
+    return rebuild_json_array(path, items)
+
+
 def iter_file_manifest(
     resource_root_path: str,
     folder_path: str | None = None,
@@ -160,12 +278,53 @@ def iter_file_manifest(
         raise
 
 
+def _apply_file_event(manifest: dict, md: SupportsFileManifest, data_path_prefix: str) -> bool:
+    """Apply the event of the object md was created for to the manifest, return whether the manifest changed."""
+    event_path = md.event_object_path
+    if not event_path.startswith(data_path_prefix):
+        return False
+    bucket, key = _split_s3_path(event_path)
+    content_url = f"{os.environ['AWS_S3_ENDPOINT_URL']}/{bucket}/{key}"
+    response = None
+    if md.file_updated:
+        try:
+            response = s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+    if response is None:
+        return manifest.pop(content_url, None) is not None
+    manifest[content_url] = _build_media_object(
+        bucket=bucket,
+        key=key,
+        size_bytes=response['ContentLength'],
+        checksum=response.get('ETag', 'N/A').strip('"')
+    )
+    return True
+
+
+def _updated_file_manifest(manifest: dict, md: SupportsFileManifest, data_path_prefix: str) -> list[dict] | None:
+    """
+    Apply the event of the object md was created for to the stored manifest and return the updated manifest, or
+    None if the manifest is unchanged.
+    """
+    if not _apply_file_event(manifest, md, data_path_prefix):
+        return None
+    # in the order the objects are listed, as in a rebuilt manifest
+    return [manifest[content_url] for content_url in sorted(manifest)]
+
+
 def write_file_manifest(
     md: SupportsFileManifest,
     enabled: bool = False,
-    fileset_manifest: bool = False
+    fileset_manifest: bool = False,
+    rebuild: bool = False
 ) -> dict | None:
-    """Write file_manifest.json to S3 and return a MediaObject pointing to that manifest."""
+    """
+    Write file_manifest.json to S3 and return a MediaObject pointing to that manifest.
+    The manifest is updated with the event of the object md was created for, and rebuilt from the listing of the
+    data files if *rebuild* is True or the stored manifest is missing or does not match its checksum.
+    """
     manifest_size_bytes = 0
     if not fileset_manifest:
         # generating manifest for resource level associated media
@@ -177,10 +336,18 @@ def write_file_manifest(
         data_path_prefix = md.content_type_contents_path
     if md.is_content_file or not exists(manifest_path):
         try:
-            manifest_size_bytes = _write_json_array(
-                manifest_path,
-                iter_file_manifest(data_path_prefix, enabled=enabled),
-            )
+            def listed_manifest():
+                return iter_file_manifest(data_path_prefix, enabled=enabled)
+
+            if enabled and not rebuild:
+                manifest_size_bytes = update_json_array(
+                    manifest_path,
+                    lambda media_object: media_object["contentUrl"],
+                    lambda manifest: _updated_file_manifest(manifest, md, data_path_prefix),
+                    listed_manifest,
+                )
+            else:
+                manifest_size_bytes = rebuild_json_array(manifest_path, listed_manifest)
             return _build_manifest_reference(manifest_path, manifest_size_bytes)
         except Exception as e:
             print(f"Error writing file manifest to {manifest_path}: {str(e)}")
@@ -193,10 +360,21 @@ def write_file_manifest(
             raise
 
 
-def write_has_part_file(parts_path: str, has_parts: Iterator[dict]) -> dict:
-    """Write has_parts.json to S3 and return a HasPart pointing to that file."""
+def write_has_part_file(
+    parts_path: str,
+    has_parts: Callable[[], Iterator[dict]],
+    update: Callable[[dict], list[dict] | None] | None = None
+) -> dict:
+    """
+    Write has_parts.json to S3 and return a HasPart pointing to that file.
+    The stored has_parts.json, keyed by url, is updated with *update* if given, and rebuilt from *has_parts*
+    otherwise or if it cannot be updated.
+    """
     try:
-        _write_json_array(parts_path, has_parts)
+        if update is None:
+            rebuild_json_array(parts_path, has_parts)
+        else:
+            update_json_array(parts_path, lambda has_part: has_part.get("url", ""), update, has_parts)
         return _build_has_part_reference(parts_path)
     except Exception as e:
         print(f"Error writing hasPart file to {parts_path}: {str(e)}")
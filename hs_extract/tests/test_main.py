@@ -0,0 +1,26 @@
+from hsextract.main import group_content_types
+from hsextract.content_types.models import BaseMetadataObject
+from hsextract.content_types.feature.models import FeatureMetadataObject
+from hsextract.content_types.fileset.models import FileSetMetadataObject
+
+
+def test_group_content_types():
+    contents_path = "test-bucket/resourceid/data/contents"
+    metadata_objects = [
+        FeatureMetadataObject(f"{contents_path}/watersheds.shp", True),
+        BaseMetadataObject(f"{contents_path}/readme.txt", True),
+        FileSetMetadataObject(f"{contents_path}/fileset/a.txt", True),
+        FeatureMetadataObject(f"{contents_path}/watersheds.dbf", True),
+        FeatureMetadataObject(f"{contents_path}/watersheds.shp.xml", True),
+        FileSetMetadataObject(f"{contents_path}/fileset/b.txt", True),
+        FeatureMetadataObject(f"{contents_path}/rivers.shx", True),
+    ]
+
+    content_types = group_content_types(metadata_objects)
+
+    assert [md.content_type_md_path for md in content_types] == [
+        "test-bucket/resourceid/.hsmetadata/watersheds.shp.json",
+        "test-bucket/resourceid/.hsmetadata/fileset/user_metadata.json",
+        "test-bucket/resourceid/.hsmetadata/rivers.shp.json",
+    ]
+    assert content_types[0] is metadata_objects[0]
@@ -0,0 +1,105 @@
+import uuid
+
+import pytest
+
+from tests import read_s3_json, s3_client, write_s3_json
+from hsextract.content_types.models import BaseMetadataObject
+from hsextract.utils.s3 import (
+    ConcurrentUpdateError,
+    _write_json_array,
+    load_json_array_index,
+    update_json_array,
+    write_file_manifest,
+)
+
+
+def _manifest_names(resource_id: str) -> list[str]:
+    manifest = read_s3_json(f"test-bucket/{resource_id}/.hsjsonld/file_manifest.json")
+    return [media_object["name"] for media_object in manifest]
+
+
+def test_incremental_file_manifest():
+    resource_id = str(uuid.uuid4())
+    contents_path = f"test-bucket/{resource_id}/data/contents"
+    for name in ["b.txt", "c.txt"]:
+        s3_client.put_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/{name}", Body=b"data")
+
+    # the manifest is missing, so it is built from the listing
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/b.txt", True), enabled=True)
+    assert _manifest_names(resource_id) == ["b.txt", "c.txt"]
+
+    # an added file is added in listing order
+    s3_client.put_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/a.txt", Body=b"data")
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/a.txt", True), enabled=True)
+    assert _manifest_names(resource_id) == ["a.txt", "b.txt", "c.txt"]
+
+    # a deleted file is removed
+    s3_client.delete_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/b.txt")
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/b.txt", False), enabled=True)
+    assert _manifest_names(resource_id) == ["a.txt", "c.txt"]
+
+    # a manifest that does not match its checksum is rebuilt
+    write_s3_json(f"test-bucket/{resource_id}/.hsjsonld/file_manifest.json", [])
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/c.txt", True), enabled=True)
+    assert _manifest_names(resource_id) == ["a.txt", "c.txt"]
+
+
+def test_conditional_json_array_write():
+    path = f"test-bucket/{uuid.uuid4()}/.hsjsonld/file_manifest.json"
+    # an array that does not exist yet is not overwritten by a write that expects it missing
+    _write_json_array(path, iter([{"name": "a"}]), conditional=True)
+    with pytest.raises(ConcurrentUpdateError):
+        _write_json_array(path, iter([{"name": "b"}]), conditional=True)
+
+    _, _, etag = load_json_array_index(path, lambda item: item["name"])
+    _write_json_array(path, iter([{"name": "b"}]), conditional=True, etag=etag)
+    # the etag that was read is stale after the array got written
+    with pytest.raises(ConcurrentUpdateError):
+        _write_json_array(path, iter([{"name": "c"}]), conditional=True, etag=etag)
+    assert read_s3_json(path) == [{"name": "b"}]
+
+
+def test_concurrent_file_manifest_updates():
+    resource_id = str(uuid.uuid4())
+    contents_path = f"test-bucket/{resource_id}/data/contents"
+    manifest_path = f"test-bucket/{resource_id}/.hsjsonld/file_manifest.json"
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        s3_client.put_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/{name}", Body=b"data")
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/a.txt", True), enabled=True, rebuild=True)
+    s3_client.delete_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/b.txt")
+
+    updates = []
+
+    def update(manifest):
+        updates.append(sorted(manifest))
+        if len(updates) == 1:
+            # the event of another file updates the manifest after it was read here
+            write_file_manifest(BaseMetadataObject(f"{contents_path}/b.txt", False), enabled=True)
+        return [manifest[content_url] for content_url in sorted(manifest)]
+
+    update_json_array(manifest_path, lambda media_object: media_object["contentUrl"], update, iter)
+    # the manifest was read again, and still has the change of the concurrent event
+    assert len(updates) == 2
+    assert len(updates[1]) == 2
+    assert _manifest_names(resource_id) == ["a.txt", "c.txt"]
+
+
+def test_file_manifest_rebuilt_after_conflict():
+    resource_id = str(uuid.uuid4())
+    contents_path = f"test-bucket/{resource_id}/data/contents"
+    manifest_path = f"test-bucket/{resource_id}/.hsjsonld/file_manifest.json"
+    for name in ["a.txt", "b.txt"]:
+        s3_client.put_object(Bucket="test-bucket", Key=f"{resource_id}/data/contents/{name}", Body=b"data")
+    write_file_manifest(BaseMetadataObject(f"{contents_path}/a.txt", True), enabled=True, rebuild=True)
+
+    def update(manifest):
+        # the manifest is replaced after it was read by one that does not match its checksum
+        write_s3_json(manifest_path, [])
+        return []
+
+    def listed_manifest():
+        return iter([{"name": "a.txt"}, {"name": "b.txt"}])
+
+    update_json_array(manifest_path, lambda media_object: media_object.get("contentUrl", ""), update,
+                      listed_manifest)
+    assert _manifest_names(resource_id) == ["a.txt", "b.txt"]
@@ -2,7 +2,9 @@ import concurrent.futures
 import csv
 import logging
 import os
-from typing import Optional, List
+import shutil
+from itertools import chain
+from typing import Iterable, Optional, List
 from typing import Literal as TypeLiteral
 
 import pandas as pd
@@ -14,11 +16,17 @@ from pydantic import BaseModel, field_validator, PositiveInt
 from rdflib import Literal, BNode, Graph
 
 from hs_core.hs_rdf import HSTERMS, DC
+from hs_core.hydroshare.utils import get_temp_dir
 from hs_core.signals import post_add_csv_aggregation
 from .base import AbstractLogicalFile, FileTypeContext
 from .generic import GenericFileMetaDataMixin
 from ..enums import AggregationMetaFilePath
 
+# the first data rows of a CSV file used to detect the delimiter, the header row and the column data types,
+# the rest of the file is only counted
+_PROFILE_HEAD_DATA_ROWS = 1010
+_PROFILE_HEAD_MAX_SIZE = 16 * 1024 * 1024
+
 
 class _CSVColumnSchema(BaseModel):
     column_number: PositiveInt
@@ -61,6 +69,12 @@ class CSVMetaSchemaModel(BaseModel):
     table: _CSVColumnsSchema
 
 
+class _CSVProfile(BaseModel):
+    table_schema: dict
+    preview_data: str
+    null_counts: List[int]
+
+
 class CSVFileMetaData(GenericFileMetaDataMixin):
     # this field is used for storing the extracted CSV metadata
     tableSchema = models.JSONField(default=dict)
@@ -363,16 +377,19 @@ class CSVLogicalFile(AbstractLogicalFile):
         with FileTypeContext(aggr_cls=cls, user=user, resource=resource, file_id=file_id,
                              folder_path=folder_path,
                              post_aggr_signal=post_add_csv_aggregation,
-                             is_temp_file=True) as ft_ctx:
+                             is_temp_file=False) as ft_ctx:
             res_file = ft_ctx.res_file
             if res_file.extension.lower() != '.csv':
                 raise ValidationError("File extension should be .csv")
-            csv_temp_file = ft_ctx.temp_file
+            istorage = resource.get_s3_storage()
             try:
-                metadata = cls._extract_metadata(csv_temp_file)
+                with istorage.open_stream(res_file.storage_path, 'r', encoding='utf-8', newline='') as csv_stream:
+                    profile = cls._profile_csv(csv_stream)
             except Exception as ex:
                 log.exception(f"Error extracting metadata from CSV file: {str(ex)}")
                 raise ValidationError(f"Error extracting metadata from CSV file: {str(ex)}")
+            log.info(f"CSV file:{res_file.storage_path} has {profile.table_schema['rows']} data rows, "
+                     f"empty values per column: {profile.null_counts}")
 
             upload_folder = res_file.file_folder
             dataset_name, _ = os.path.splitext(res_file.file_name)
@@ -383,57 +400,71 @@ class CSVLogicalFile(AbstractLogicalFile):
                                                   new_files_to_upload=[],
                                                   folder_path=upload_folder)
 
-            preview_data = cls._get_preview_data(csv_temp_file)
-            logical_file.preview_data = preview_data
+            logical_file.preview_data = profile.preview_data
             logical_file.save()
-            logical_file.metadata.tableSchema = metadata
+            logical_file.metadata.tableSchema = profile.table_schema
             logical_file.metadata.save()
             ft_ctx.logical_file = logical_file
             log.info(f"CSV aggregation was created for file:{res_file.storage_path}.")
             return logical_file
 
     @classmethod
-    def _extract_metadata(cls, csv_file_path: str) -> dict:
+    def _profile_csv(cls, csv_lines: Iterable[str]) -> _CSVProfile:
         """
-        Extracts metadata from the CSV file
-        :param csv_file_path: a temporary file path of the CSV file after the file is copied from S3
-        :return: a dictionary of extracted metadata
+        Profiles the CSV file in one pass over its lines
+        The first lines of the file (at most _PROFILE_HEAD_DATA_ROWS data rows or _PROFILE_HEAD_MAX_SIZE characters)
+        are kept to detect the delimiter, the header row, the column data types and the preview data. The rest of the
+        file is only streamed through the csv reader to count the data rows and the empty values of each column, so
+        the memory used doesn't depend on the size of the file.
+        :param csv_lines: lines of the CSV file, e.g., a file object opened with newline=''
+        :return: the table schema, preview data and number of empty values of each column of the CSV file
         """
 
+        csv_lines = iter(csv_lines)
+        head_lines = []
+        head_size = 0
+        head_data_rows = 0
+        for line in csv_lines:
+            head_lines.append(line)
+            head_size += len(line)
+            if not line.startswith("#") and line.strip():
+                head_data_rows += 1
+            if head_data_rows > _PROFILE_HEAD_DATA_ROWS or head_size > _PROFILE_HEAD_MAX_SIZE:
+                break
+
+        temp_dir = get_temp_dir()
         try:
-            rows_count, delimiter, skip_rows = cls._get_rows_count(csv_file_path)
+            head_file_path = os.path.join(temp_dir, 'head.csv')
+            with open(head_file_path, 'w', newline='') as head_file:
+                head_file.writelines(head_lines)
+            try:
+                delimiter, number_of_columns, skip_rows = cls._get_delimiter(head_file_path)
+            except pd.errors.ParserError as ex:
+                raise ValidationError(f"Error parsing CSV file: {str(ex)}")
+            columns, has_header = cls._get_column_data_types(head_file_path, delimiter, skip_rows=skip_rows)
+            preview_data = cls._get_preview_data(head_file_path)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        try:
+            rows_count, null_counts = cls._count_data_rows(chain(head_lines, csv_lines), delimiter,
+                                                           number_of_columns, len(columns), has_header)
         except pd.errors.ParserError as ex:
             raise ValidationError(f"Error parsing CSV file: {str(ex)}")
-        if rows_count == 0:
+        if rows_count <= 0:
             err_msg = "No data rows found in the CSV file"
             raise ValidationError(err_msg)
 
-        columns, has_header = cls._get_column_data_types(csv_file_path, delimiter, skip_rows=skip_rows)
-        if has_header:
-            rows_count -= 1
-            if rows_count <= 0:
-                err_msg = "No data rows found in the CSV file"
-                raise ValidationError(err_msg)
-
         table = _CSVColumnsSchema(columns=columns)
         csv_meta_schema = CSVMetaSchemaModel(rows=rows_count, delimiter=delimiter, table=table)
-        return csv_meta_schema.model_dump()
+        return _CSVProfile(table_schema=csv_meta_schema.model_dump(), preview_data=preview_data,
+                           null_counts=null_counts)
 
     @classmethod
-    def _get_rows_count(cls, csv_file_path: str) -> tuple[int, str, int]:
-        """Get the number of rows/records in the csv file (includes header row), the delimiter, and number of rows
-        to skip (to find the header row or first data row).
-        As part of finding the number of rows, also doing validation of the csv file"""
-
-        def is_data_row(row):
-            if not row:
-                return False
-            if not row[0].startswith("#"):
-                if len(row) > number_of_columns:
-                    raise pd.errors.ParserError("Invalid CSV file. Parsing error - number of data "
-                                                "columns more than number of header columns.")
-                return True
-            return False
+    def _get_delimiter(cls, csv_file_path: str) -> tuple[str, int, int]:
+        """Get the delimiter, the number of columns, and number of rows to skip (to find the header row or first
+        data row) of the csv file.
+        As part of finding the delimiter, also doing validation of the first data rows of the csv file"""
 
         def check_for_non_comment_text(delimiter=','):
             """Checks if there is any non-comment text line (line that doesn't start with #) in the file"""
@@ -501,10 +532,32 @@ class CSVLogicalFile(AbstractLogicalFile):
             err_msg = "Invalid CSV file. No supported delimiter found - comma, semicolon, or tab"
             raise pd.errors.ParserError(err_msg)
 
-        with open(csv_file_path, 'r') as file:
-            # using csv.reader to efficiently count the rows instead of using pandas
-            row_count = sum(1 for _row in csv.reader(file, delimiter=matching_delimiter) if is_data_row(_row))
-            return row_count, matching_delimiter, skip_rows
+        return matching_delimiter, number_of_columns, skip_rows
+
+    @classmethod
+    def _count_data_rows(cls, csv_lines: Iterable[str], delimiter: str, number_of_columns: int,
+                         columns_count: int, has_header: bool) -> tuple[int, List[int]]:
+        """Get the number of data rows (excludes header row) and the number of empty values of each column
+        As part of counting the rows, also doing validation of the csv file"""
+
+        row_count = 0
+        null_counts = [0] * columns_count
+        header_row = has_header
+        for row in csv.reader(csv_lines, delimiter=delimiter):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) > number_of_columns:
+                raise pd.errors.ParserError("Invalid CSV file. Parsing error - number of data "
+                                            "columns more than number of header columns.")
+            if header_row:
+                header_row = False
+                continue
+            row_count += 1
+            for col_index in range(columns_count):
+                # missing trailing values of uneven rows are empty too
+                if col_index >= len(row) or not row[col_index].strip():
+                    null_counts[col_index] += 1
+        return row_count, null_counts
 
     @classmethod
     def _get_pd_data_types(cls, csv_file_path: str, delimiter: str, skip_rows: int) -> dict:
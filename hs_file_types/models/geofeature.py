@@ -724,28 +724,22 @@ def get_all_related_shp_files(resource, selected_resource_file, file_type):
                 if f.extension.lower() in GeoFeatureLogicalFile.get_allowed_storage_file_types():
                     collect_shape_resource_files(f)
 
+        # the shape files are read by GDAL/OGR which needs all of them as local files in one directory
         for f in shape_res_files:
-            temp_file = utils.get_file_from_s3(resource=resource, file_path=f.storage_path)
+            temp_file = utils.get_file_from_s3(resource=resource, file_path=f.storage_path,
+                                               temp_dir=temp_dir or None)
             if not temp_dir:
                 temp_dir = os.path.dirname(temp_file)
-            else:
-                file_temp_dir = os.path.dirname(temp_file)
-                dst_dir = os.path.join(temp_dir, os.path.basename(temp_file))
-                shutil.copy(temp_file, dst_dir)
-                shutil.rmtree(file_temp_dir)
-                temp_file = dst_dir
             shape_temp_files.append(temp_file)
 
     elif selected_resource_file.extension.lower() == '.zip':
-        temp_file = utils.get_file_from_s3(resource=resource, file_path=selected_resource_file.storage_path)
-        temp_dir = os.path.dirname(temp_file)
-        if not zipfile.is_zipfile(temp_file):
-            if os.path.isdir(temp_dir):
-                shutil.rmtree(temp_dir)
-            raise ValidationError('Selected file is not a zip file')
-        zf = zipfile.ZipFile(temp_file, 'r')
-        zf.extractall(temp_dir)
-        zf.close()
+        # only the zip directory and the members are read from S3 - the zip file itself is not copied
+        with utils.open_file_from_s3(resource=resource, file_path=selected_resource_file.storage_path) as zip_file:
+            if not zipfile.is_zipfile(zip_file):
+                raise ValidationError('Selected file is not a zip file')
+            temp_dir = utils.get_temp_dir()
+            with zipfile.ZipFile(zip_file, 'r') as zf:
+                zf.extractall(temp_dir)
         for dirpath, _, filenames in os.walk(temp_dir):
             for name in filenames:
                 if name == selected_resource_file.file_name:
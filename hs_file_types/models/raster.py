@@ -956,10 +956,8 @@ def list_tif_files(vrt_file):
     :return: List of string filenames read from vrt_file
     """
     resource = vrt_file.resource
-    temp_vrt_file = utils.get_file_from_s3(resource=resource, file_path=vrt_file.storage_path)
-    with open(temp_vrt_file, 'r') as opened_vrt_file:
-        vrt_string = opened_vrt_file.read()
-        root = ET.fromstring(vrt_string)
+    with utils.open_file_from_s3(resource=resource, file_path=vrt_file.storage_path) as opened_vrt_file:
+        root = ET.parse(opened_vrt_file).getroot()
         file_names_in_vrt = [file_name.text for file_name in root.iter('SourceFilename')]
         return file_names_in_vrt
 
@@ -6,9 +6,11 @@ import shutil
 import sqlite3
 import tempfile
 import time
+import warnings
 from collections import OrderedDict
 from uuid import uuid4
 
+import pandas as pd
 from dateutil import parser
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import ArrayField, HStoreField
@@ -30,6 +32,8 @@ from ..enums import AggregationMetaFilePath
 
 _SQLITE_FILE_NAME = 'ODM2.sqlite'
 _ODM2_SQLITE_FILE_PATH = f'hs_file_types/files/{_SQLITE_FILE_NAME}'
+# number of csv data rows read (and validated or loaded) at a time, which bounds the memory used for large files
+_CSV_CHUNK_ROWS = 50000
 
 
 class AbstractCVLookupTable(models.Model):
@@ -1513,7 +1517,7 @@ class TimeSeriesMetaDataMixin(models.Model):
                          ts_item.id == res_item['object_id']][0]
             cur.execute(insert_sql, (result['ResultID'], ts_result.aggregation_statistics), )
 
-    def update_timeseriesresultvalues_table_insert(self, con, cur, temp_csv_file, results_data):
+    def update_timeseriesresultvalues_table_insert(self, con, cur, csv_file, results_data):
         # insert record to TimeSeriesResultValues table - first delete any existing records
         # used for updating a sqlite file that is blank (case of CSV upload)
 
@@ -1522,45 +1526,49 @@ class TimeSeriesMetaDataMixin(models.Model):
         insert_sql = "INSERT INTO TimeSeriesResultValues (ValueID, ResultID, DataValue, " \
                      "ValueDateTime, ValueDateTimeUTCOffset, CensorCodeCV, " \
                      "QualityCodeCV, TimeAggregationInterval, " \
-                     "TimeAggregationIntervalUnitsID) VALUES(?,?,?,?,?,?,?,?,?)"
+                     "TimeAggregationIntervalUnitsID) " \
+                     "SELECT ColumnIndex * ? + RowIndex + 1, ResultID, DataValue, ValueDateTime, ?, " \
+                     "'Unknown', 'Unknown', ?, 102 FROM CsvValues ORDER BY ColumnIndex, RowIndex"
 
-        # read the csv file to determine time interval (in minutes) between each reading
-        # we will use the first 2 rows of data to determine this value
         utc_offset = self.utc_offset.value
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header)
-            header = next(csv_reader)
-            first_row_data = next(csv_reader)
-            second_row_data = next(csv_reader)
-            time_interval = (parser.parse(second_row_data[0])
-                             - parser.parse(first_row_data[0])).seconds / 60
-
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header) and skip
-            next(csv_reader)
-            value_id = 1
-            data_header = header[1:]
-            for col, value in enumerate(data_header):
-                # get the ts_result object with matching series_label
-                ts_result = [ts_item for ts_item in self.time_series_results if
-                             ts_item.series_label == value][0]
-                # get the result id associated with ts_result object
-                result_data_item = [dict_item for dict_item in results_data if
-                                    dict_item['object_id'] == ts_result.id][0]
-                result_id = result_data_item['result_id']
-                data_col_index = col + 1
-                # start at the beginning of data row
-                fl_obj.seek(0)
-                next(csv_reader)
-                for date_time, data_value in self._read_csv_specified_column(
-                        csv_reader, data_col_index):
-                    date_time = parser.parse(date_time)
-                    cur.execute(insert_sql, (value_id, result_id, data_value,
-                                             date_time, utc_offset, 'Unknown', 'Unknown',
-                                             time_interval, 102), )
-                    value_id += 1
+        # the result id of each data column (the columns are named by the series labels)
+        result_ids = {}
+        for ts_result in self.time_series_results:
+            result_data_item = [dict_item for dict_item in results_data if
+                                dict_item['object_id'] == ts_result.id][0]
+            result_ids[ts_result.series_label] = result_data_item['result_id']
+
+        # the csv file is read once, a chunk of rows at a time, with all values kept as strings as in the file.
+        # The values are staged in a temporary table, since the value ids number the values a column at a time
+        # (all values of the first data column, then all values of the second, ...) and depend on the row count
+        start = time.monotonic()
+        cur.execute("CREATE TEMP TABLE CsvValues (ColumnIndex INTEGER, RowIndex INTEGER, ResultID INTEGER, "
+                    "DataValue, ValueDateTime)")
+        staging_sql = "INSERT INTO CsvValues (ColumnIndex, RowIndex, ResultID, DataValue, ValueDateTime) " \
+                      "VALUES(?,?,?,?,?)"
+        time_interval = None
+        row_count = 0
+        chunks = pd.read_csv(csv_file, dtype=str, keep_default_na=False, chunksize=_CSV_CHUNK_ROWS)
+        for chunk in chunks:
+            date_times = _parse_csv_dates(chunk.iloc[:, 0])
+            if time_interval is None:
+                # time interval (in minutes) between each reading from the first 2 rows of data
+                time_interval = (date_times[1] - date_times[0]).seconds / 60
+            for column_index, series_label in enumerate(chunk.columns[1:]):
+                result_id = result_ids[series_label]
+                rows = [(column_index, row_count + index, result_id, data_value, date_time)
+                        for index, (data_value, date_time) in enumerate(zip(chunk[series_label], date_times))]
+                cur.executemany(staging_sql, rows)
+            row_count += len(chunk)
+
+        cur.execute(insert_sql, (row_count, utc_offset, time_interval))
+        value_count = cur.rowcount
+        cur.execute("DROP TABLE CsvValues")
+
+        elapsed = time.monotonic() - start
+        log = logging.getLogger()
+        log.info("Loaded {} values of {} rows into TimeSeriesResultValues in {:.2f} seconds ({:.0f} rows per second)"
+                 .format(value_count, row_count, elapsed, row_count / elapsed if elapsed else 0))
 
     def populate_blank_sqlite_file(self, temp_sqlite_file, user):
         """
@@ -1589,8 +1597,8 @@ class TimeSeriesMetaDataMixin(models.Model):
             elif f.extension == '.csv':
                 csv_file = f
 
-        # retrieve the csv file from S3 and save it to temp directory
-        temp_csv_file = utils.get_file_from_s3(resource=self.resource, file_path=csv_file.storage_path)
+        # the csv file is streamed from S3 - only the sqlite file needs to be copied to a temp directory
+        csv_stream = self.resource.get_s3_storage().open_stream(csv_file.storage_path, 'r', newline='')
         try:
             con = sqlite3.connect(temp_sqlite_file)
             with con:
@@ -1632,7 +1640,7 @@ class TimeSeriesMetaDataMixin(models.Model):
                 self.update_timeseriesresults_table_insert(con, cur, results_data)
 
                 # insert record to TimeSeriesResultValues table
-                self.update_timeseriesresultvalues_table_insert(con, cur, temp_csv_file,
+                self.update_timeseriesresultvalues_table_insert(con, cur, csv_stream,
                                                                 results_data)
 
                 # insert record to Datasets table
@@ -1656,10 +1664,9 @@ class TimeSeriesMetaDataMixin(models.Model):
             log.exception("Failed to update blank SQLite file. Error:{}".format(str(ex)))
             raise ex
         finally:
+            csv_stream.close()
             if os.path.exists(temp_sqlite_file):
                 shutil.rmtree(os.path.dirname(temp_sqlite_file))
-            if os.path.exists(temp_csv_file):
-                shutil.rmtree(os.path.dirname(temp_csv_file))
 
 
 class TimeSeriesFileMetaData(TimeSeriesMetaDataMixin, AbstractFileMetaData):
@@ -2516,6 +2523,34 @@ def validate_odm2_db_file(sqlite_file_path):
         return str(e)
 
 
+def _parse_csv_dates(values):
+    """
+    Parse the date values of a csv file column as datetime objects that can be written to SQLite.
+    Values that share one date format are parsed at once by pandas, other values (e.g., of mixed formats or
+    mixed UTC offsets) are parsed one at a time by dateutil, which keeps the UTC offset of each value.
+    """
+    values = list(values)
+    try:
+        with warnings.catch_warnings():
+            # pandas warns that it will stop parsing dates of mixed UTC offsets
+            warnings.simplefilter('error', FutureWarning)
+            date_times = pd.to_datetime(pd.Series(values))
+        if pd.api.types.is_datetime64_any_dtype(date_times):
+            return [date_time.to_pydatetime() for date_time in date_times]
+    except (ValueError, TypeError, OverflowError, FutureWarning):
+        pass
+    return [parser.parse(value) for value in values]
+
+
+def _are_csv_dates(values):
+    """Check that all values of a list of csv file values are date values"""
+    try:
+        _parse_csv_dates(values)
+        return True
+    except (ValueError, TypeError, OverflowError):
+        return False
+
+
 def validate_csv_file(csv_file_path):
     err_message = "Uploaded file is not a valid timeseries csv file."
     log = logging.getLogger()
@@ -2551,9 +2586,10 @@ def validate_csv_file(csv_file_path):
             log.error(err_message)
             return err_message
 
-        # process data rows
+        # process data rows - the dates of the first column are parsed a chunk of rows at a time
         date_data_error = False
         data_row_count = 0
+        dates = []
         for row in csv_reader:
             # check that data row has the same number of columns as the header
             if len(row) != len(header):
@@ -2567,10 +2603,10 @@ def validate_csv_file(csv_file_path):
                 float(row[0])
                 date_data_error = True
             except ValueError:
-                try:
-                    parser.parse(row[0])
-                except ValueError:
-                    date_data_error = True
+                dates.append(row[0])
+                if len(dates) >= _CSV_CHUNK_ROWS:
+                    date_data_error = not _are_csv_dates(dates)
+                    dates = []
 
             if date_data_error:
                 err_message += " Data for the first column must be a date value."
@@ -2587,6 +2623,11 @@ def validate_csv_file(csv_file_path):
                     return err_message
             data_row_count += 1
 
+        if dates and not _are_csv_dates(dates):
+            err_message += " Data for the first column must be a date value."
+            log.error(err_message)
+            return err_message
+
         if data_row_count < 2:
             err_message += " There needs to be at least two rows of data."
             log.error(err_message)
@@ -2933,10 +2974,9 @@ def extract_cv_metadata_from_blank_sqlite_file(target):
         target.metadata.create_cv_lookup_models(cur)
 
     # save some data from the csv file
-    # get the csv file from S3 to a temp directory
+    # the csv file is streamed from S3 - it is read only once from start to end
     resource = csv_res_file.resource
-    temp_csv_file = utils.get_file_from_s3(resource=resource, file_path=csv_res_file.storage_path)
-    with open(temp_csv_file, 'r') as fl_obj:
+    with resource.get_s3_storage().open_stream(csv_res_file.storage_path, 'r', newline='') as fl_obj:
         csv_reader = csv.reader(fl_obj, delimiter=',')
         # read the first row - header
         header = next(csv_reader)
@@ -2967,10 +3007,6 @@ def extract_cv_metadata_from_blank_sqlite_file(target):
     if os.path.exists(temp_dir):
         shutil.rmtree(temp_dir)
 
-    # cleanup the temp csv file
-    if os.path.exists(temp_csv_file):
-        shutil.rmtree(os.path.dirname(temp_csv_file))
-
 
 def _get_timestamped_file_name(file_name):
     name, ext = os.path.splitext(file_name)
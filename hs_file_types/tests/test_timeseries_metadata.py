@@ -1,4 +1,8 @@
 import os
+import shutil
+import sqlite3
+import tempfile
+from unittest.mock import patch
 
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
@@ -6,6 +10,7 @@ from django.test import TransactionTestCase
 from rest_framework.exceptions import ValidationError as DRF_ValidationError
 
 from hs_core import hydroshare
+from hs_core.hydroshare import utils
 from hs_core.models import ResourceFile
 from hs_core.testing import MockS3TestCaseMixin
 from hs_core.views.utils import remove_folder, move_or_rename_file_or_folder
@@ -29,6 +34,8 @@ from hs_file_types.models.timeseries import (
     CVUnitsType,
     CVStatus,
     CVAggregationStatistic,
+    _parse_csv_dates,
+    validate_csv_file,
 )
 from .utils import assert_time_series_file_type_metadata, CompositeResourceTestMixin
 
@@ -260,6 +267,67 @@ class TimeSeriesFileTypeTest(MockS3TestCaseMixin, TransactionTestCase,
 
         self.composite_resource.delete()
 
+    @patch('hs_file_types.models.timeseries._CSV_CHUNK_ROWS', 4)
+    def test_CSV_values_loaded_in_chunks(self):
+        # here we are testing that the values of a CSV file with more rows than are read at a time are
+        # all loaded into the blank sqlite file, with the values of each data column numbered in sequence
+
+        temp_dir = tempfile.mkdtemp()
+        csv_file = os.path.join(temp_dir, 'chunked_values.csv')
+        with open(csv_file, 'w') as fl_obj:
+            fl_obj.write('ValueDateTime,Temp_DegC_Mendon,Temp_DegC_Paradise\n')
+            for row in range(10):
+                fl_obj.write('2008-01-01 {:02d}:{:02d}:00,{},{}\n'.format(row // 2, row % 2 * 30, row, row * 10))
+        self.create_composite_resource()
+        self.add_file_to_resource(file_to_add=csv_file)
+        shutil.rmtree(temp_dir)
+        res_file = self.composite_resource.files.first()
+        TimeSeriesLogicalFile.set_file_type(self.composite_resource, self.user, res_file.id)
+        logical_file = TimeSeriesLogicalFile.objects.first()
+        sqlite_file = [f for f in logical_file.files.all() if f.extension == '.sqlite'][0]
+        temp_sqlite_file = utils.get_file_from_s3(resource=self.composite_resource,
+                                                  file_path=sqlite_file.storage_path)
+
+        logical_file.metadata.populate_blank_sqlite_file(temp_sqlite_file, self.user)
+        con = sqlite3.connect(temp_sqlite_file)
+        rows = con.execute("SELECT ValueID, ResultID, DataValue, ValueDateTime, TimeAggregationInterval "
+                           "FROM TimeSeriesResultValues ORDER BY ValueID").fetchall()
+        con.close()
+        shutil.rmtree(os.path.dirname(temp_sqlite_file))
+
+        self.assertEqual([row[0] for row in rows], list(range(1, 21)))
+        # all values of the first data column are numbered before the values of the second
+        self.assertEqual(len({row[1] for row in rows[:10]}), 1)
+        self.assertEqual(len({row[1] for row in rows[10:]}), 1)
+        self.assertNotEqual(rows[0][1], rows[10][1])
+        self.assertEqual([row[2] for row in rows], [float(row) for row in range(10)]
+                         + [float(row * 10) for row in range(10)])
+        self.assertEqual([row[3] for row in rows[:2]], ['2008-01-01 00:00:00', '2008-01-01 00:30:00'])
+        self.assertEqual(rows[9][3], '2008-01-01 04:30:00')
+        self.assertEqual(rows[19][3], '2008-01-01 04:30:00')
+        # time interval (in minutes) between the first 2 rows of data
+        self.assertEqual({row[4] for row in rows}, {30.0})
+
+        self.composite_resource.delete()
+
+    def test_CSV_dates_with_mixed_utc_offsets(self):
+        # here we are testing that CSV dates of different UTC offsets or formats are valid, and parsed
+        # with the UTC offset of each date
+
+        temp_dir = tempfile.mkdtemp()
+        csv_file = os.path.join(temp_dir, 'mixed_offsets.csv')
+        with open(csv_file, 'w') as fl_obj:
+            fl_obj.write('ValueDateTime,Temp_DegC_Mendon\n'
+                         '2008-01-01T00:00:00-07:00,1\n'
+                         '2008-01-01T00:30:00-06:00,2\n'
+                         '01/01/2008 01:00,3\n')
+        self.assertIsNone(validate_csv_file(csv_file))
+        shutil.rmtree(temp_dir)
+
+        date_times = _parse_csv_dates(['2008-01-01T00:00:00-07:00', '2008-01-01T00:30:00-06:00'])
+        self.assertEqual([date_time.isoformat() for date_time in date_times],
+                         ['2008-01-01T00:00:00-07:00', '2008-01-01T00:30:00-06:00'])
+
     def test_create_aggregation_from_sqlite_invalid_file(self):
         # here we are using an invalid sqlite file for setting it
         # to TimeSeries file type which should fail
@@ -0,0 +1,118 @@
+"""
+In-process buffer of tracking variables written to the database in batches by a background thread.
+
+Recording a visit on every page view used to cost an INSERT (and a resource lookup) in the request
+thread. Buffered variables are instead appended to a bounded ring buffer and written with bulk_create
+by a worker thread every TRACKING_FLUSH_INTERVAL seconds, or as soon as TRACKING_BATCH_SIZE variables
+are waiting. When the buffer is full the oldest variables are dropped rather than slowing requests down.
+
+Variables are timestamped when they are recorded, so that a variable written after midnight is still
+counted on the day of its request.
+Variables still buffered when a process exits are written by an atexit handler; those of a process that
+is killed are lost, which is acceptable for usage statistics.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = getattr(settings, 'TRACKING_BUFFER_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'TRACKING_BATCH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'TRACKING_FLUSH_INTERVAL', 5)
+
+
+class VariableBuffer(object):
+    """Ring buffer of tracking variables flushed to the database by a background thread"""
+
+    def __init__(self, maxlen=BUFFER_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._variables = deque(maxlen=maxlen)
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._variables)
+
+    def add(self, **fields):
+        """
+        Buffer a tracking variable
+
+        :param fields: the fields of the Variable, except that the resource is given as resource_short_id
+        """
+        self._ensure_worker()
+        if len(self._variables) == self._variables.maxlen:
+            logger.warning("hs_tracking buffer is full, dropping the oldest tracking variable")
+        # deque.append is thread safe
+        self._variables.append(fields)
+        if len(self._variables) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all buffered variables to the database, a batch at a time"""
+        from .models import Variable
+        from hs_core.models import BaseResource
+
+        with self._flush_lock:
+            while self._variables:
+                batch = []
+                while self._variables and len(batch) < self.batch_size:
+                    batch.append(self._variables.popleft())
+
+                # resolve the resources of the whole batch in one query
+                short_ids = {fields['resource_short_id'] for fields in batch if fields['resource_short_id']}
+                resource_ids = {}
+                if short_ids:
+                    resource_ids = dict(BaseResource.objects.filter(short_id__in=short_ids)
+                                        .values_list('short_id', 'id'))
+                variables = []
+                for fields in batch:
+                    fields = dict(fields)
+                    fields['resource_id'] = resource_ids.get(fields.pop('resource_short_id'))
+                    variables.append(Variable(**fields))
+                Variable.objects.bulk_create(variables)
+
+    def _ensure_worker(self):
+        # the worker is started lazily, and again in processes forked after it was started
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                atexit.register(self._flush_at_exit)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='hs_tracking_flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except Exception as ex:
+                    logger.error(f"Error writing tracking variables: {str(ex)}")
+                    # the connection may be broken; a new one is opened for the next flush
+                    connection.close()
+        finally:
+            connection.close()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as ex:
+            logger.error(f"Error writing tracking variables at exit: {str(ex)}")
+
+
+variable_buffer = VariableBuffer()
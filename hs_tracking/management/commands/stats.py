@@ -255,7 +255,7 @@ class Command(BaseCommand):
         variables = hs_tracking.Variable.objects.filter(
             timestamp__gte=yesterday_start,
             timestamp__lt=today_start
-        )
+        ).select_related('session__visitor__user').iterator()
         for v in variables:
             uid = v.session.visitor.user.id if v.session.visitor.user else None
 
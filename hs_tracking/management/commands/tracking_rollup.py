@@ -0,0 +1,29 @@
+"""
+Roll up tracking variables into daily resource and user activity.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hs_tracking.models import ResourceDailyActivity
+
+
+class Command(BaseCommand):
+    help = "Roll up the tracking variables of complete days into daily activity"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, dest='days', default=None,
+                            help='recompute the last DAYS complete days instead of the days not yet rolled up')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            rolled_up = ResourceDailyActivity.rollup_pending()
+            print("rolled up {} days".format(len(rolled_up)))
+            return
+
+        today = timezone.now().date()
+        for offset in range(days, 0, -1):
+            day = today - timedelta(days=offset)
+            count = ResourceDailyActivity.rollup(day)
+            print("{}: {} resources".format(day, count))
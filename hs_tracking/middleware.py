@@ -1,8 +1,11 @@
+import random
+import re
+
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
 from .models import Session
 from . import utils
-import re
 
 RESOURCE_RE = re.compile('resource/([0-9a-f]{32})/')  # parser for resource id
 BAG_RE = re.compile('bags/([0-9a-f]{32})\.zip')  # parser for resource id # noqa
@@ -49,7 +52,10 @@ def get_landing_from_url(path):
 
 class Tracking(MiddlewareMixin):
     """The default tracking middleware logs all successful responses as a 'visit' variable with
-    the URL path as its value."""
+    the URL path as its value.
+
+    Only a fraction settings.TRACKING_SAMPLING_RATE of visits is logged. Visits are buffered and
+    written in batches outside of the request (see hs_tracking.buffer)."""
 
     def process_response(self, request, response):
 
@@ -69,6 +75,10 @@ class Tracking(MiddlewareMixin):
         if not hasattr(request, 'user'):
             return response
 
+        sampling_rate = getattr(settings, 'TRACKING_SAMPLING_RATE', 1.0)
+        if sampling_rate < 1.0 and random.random() >= sampling_rate:
+            return response
+
         # get user info that will be recorded in the visit log
         session = Session.objects.for_request(request)
         usertype = utils.get_user_type(session)
@@ -88,8 +98,8 @@ class Tracking(MiddlewareMixin):
         rest = get_rest_from_url(request.path)
         landing = get_landing_from_url(request.path)
 
-        # save the activity in the database
-        session.record('visit', value=msg, resource_id=resource_id,
-                       landing=landing, rest=rest)
+        # save the activity in the database, in a batch outside of the request
+        session.record_buffered('visit', value=msg, resource_id=resource_id,
+                                landing=landing, rest=rest)
 
         return response
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0088_re_populate_resource_cached_metadata'),
+        ('hs_tracking', '0007_auto_20190503_1724'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='variable',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ResourceDailyActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('user_visits', models.IntegerField(default=0, help_text='visits by logged in users')),
+                ('users', models.IntegerField(default=0, help_text='distinct logged in users who visited')),
+                ('downloads', models.IntegerField(default=0)),
+                ('app_launches', models.IntegerField(default=0)),
+                ('last_visit', models.DateTimeField(null=True)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='hs_core.baseresource')),
+            ],
+            options={
+                'unique_together': {('resource', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserResourceDailyActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('last_accessed', models.DateTimeField()),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_daily_activity', to='hs_core.baseresource')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'resource', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def mark_rolled_up_days(apps, schema_editor):
+    # every day up to the last day with rolled up activity has been rolled up, including the days without activity
+    ResourceDailyActivity = apps.get_model('hs_tracking', 'ResourceDailyActivity')
+    RolledUpDay = apps.get_model('hs_tracking', 'RolledUpDay')
+    dates = ResourceDailyActivity.objects.aggregate(first=models.Min('date'), last=models.Max('date'))
+    if dates['first'] is None:
+        return
+    day = dates['first']
+    days = []
+    while day <= dates['last']:
+        days.append(RolledUpDay(date=day))
+        day += timedelta(days=1)
+    RolledUpDay.objects.bulk_create(days, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_tracking', '0008_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolledUpDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('rolled_up', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(mark_rolled_up_days, migrations.RunPython.noop),
+    ]
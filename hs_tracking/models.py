@@ -1,14 +1,16 @@
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 from django.utils import timezone
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import F
 from django.core import signing
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth.models import User
 
 from theme.models import UserProfile
+from .buffer import variable_buffer
 from .utils import get_std_log_fields
 from hs_core.models import BaseResource
 from hs_core.hydroshare import get_resource_by_shortkey
@@ -22,6 +24,10 @@ if set(PROFILE_FIELDS) & set(USER_FIELDS):
                                " overlapping field names")
 
 
+def _session_cache_key(session_id):
+    return f"hs_tracking_session_{session_id}"
+
+
 class SessionManager(models.Manager):
     def for_request(self, request, user=None):
         if hasattr(request, 'user'):
@@ -34,25 +40,33 @@ class SessionManager(models.Manager):
             cut_off = timezone.make_aware(cut_off)
             session = None
 
-            try:
-                session = Session.objects.filter(
-                    variable__timestamp__gte=cut_off).filter(id=tracking_id['id']).first()
-            except Session.DoesNotExist:
-                pass
+            # the ids of active sessions, their visitors and users are cached with the time they were last
+            # used so that most requests do not need to query sessions and their variables
+            cached = cache.get(_session_cache_key(tracking_id['id']))
+            if cached is not None and cached[3] >= cut_off:
+                session = Session.from_cached_ids(*cached[:3], user=user)
+            else:
+                try:
+                    session = Session.objects.select_related('visitor__user__userprofile').filter(
+                        variable__timestamp__gte=cut_off).filter(id=tracking_id['id']).first()
+                except Session.DoesNotExist:
+                    pass
 
             if session is not None and user is not None:
                 if session.visitor.user is None and user.is_authenticated:
+                    # the session may have been built from cached ids, only the changed fields are saved
                     try:
                         session.visitor = Visitor.objects.get(user=user)
-                        session.save()
+                        session.save(update_fields=['visitor'])
                     except Visitor.DoesNotExist:
                         session.visitor.user = user
-                        session.visitor.save()
+                        session.visitor.save(update_fields=['user'])
+                session.touch()
                 return session
 
         # No session found, create one
         if user.is_authenticated:
-            visitor, _ = Visitor.objects.get_or_create(user=user)
+            visitor, _ = Visitor.objects.select_related('user__userprofile').get_or_create(user=user)
         else:
             visitor = Visitor.objects.create()
 
@@ -64,6 +78,7 @@ class SessionManager(models.Manager):
 
         session.record('begin_session', msg)
         request.session['hs_tracking_id'] = signing.dumps({'id': session.id})
+        session.touch()
         return session
 
 
@@ -110,6 +125,29 @@ class Session(models.Model):
         args = (self,) + args
         return Variable.record(*args, **kwargs)
 
+    def record_buffered(self, *args, **kwargs):
+        args = (self,) + args
+        return Variable.record_buffered(*args, **kwargs)
+
+    def touch(self):
+        """Cache this session as used now; it stays active for SESSION_TIMEOUT seconds"""
+        last_used = timezone.make_aware(datetime.now())
+        cache.set(_session_cache_key(self.id), (self.id, self.visitor_id, self.visitor.user_id, last_used),
+                  SESSION_TIMEOUT)
+
+    @classmethod
+    def from_cached_ids(cls, session_id, visitor_id, user_id, user=None):
+        """
+        Build a session cached by touch() without querying the database
+
+        :param user: the user of the request, used as the user of the visitor if it is the same user;
+            another user of the visitor is read when first used.
+        """
+        visitor = Visitor(id=visitor_id, user_id=user_id)
+        if user is not None and user_id is not None and user.is_authenticated and user.id == user_id:
+            visitor.user = user
+        return cls(id=session_id, visitor=visitor)
+
 
 class Variable(models.Model):
     TYPES = (
@@ -128,7 +166,8 @@ class Variable(models.Model):
     from hs_core.models import BaseResource
 
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='variable')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # set when the variable is recorded, which is before it is written for buffered variables
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     name = models.CharField(max_length=32)
     type = models.IntegerField(choices=TYPE_CHOICES)
     # change value to TextField to be less restrictive as max_length of CharField has been
@@ -180,6 +219,25 @@ class Variable(models.Model):
                                        rest=rest,
                                        landing=landing)
 
+    @classmethod
+    def record_buffered(cls, session, name, value=None, resource_id=None, rest=False, landing=False):
+        """
+        Record a variable without writing to the database in the request thread
+
+        The variable is written in a batch by a background thread (see hs_tracking.buffer), or
+        immediately if settings.TRACKING_BUFFERED is False.
+        """
+        if not getattr(settings, 'TRACKING_BUFFERED', True):
+            return cls.record(session, name, value=value, resource_id=resource_id, rest=rest, landing=landing)
+        variable_buffer.add(session_id=session.id, name=name,
+                            timestamp=timezone.now(),
+                            type=cls.encode_type(value),
+                            value=cls.encode(value),
+                            last_resource_id=resource_id,
+                            resource_short_id=resource_id,
+                            rest=rest,
+                            landing=landing)
+
     @classmethod
     def encode(cls, value):
         if value is None:
@@ -217,52 +275,75 @@ class Variable(models.Model):
         :param n_resources: the number of resources to return.
         :param days: the number of days to scan.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the days that one scans. Thus, there is a tradeoff
-        between reporting history and timely responsiveness of the dashboard.
+        Complete days are read from UserResourceDailyActivity; only the variables recorded after
+        the last rolled up day are scanned. The window is rounded to whole days.
         """
         # TODO: document actions like labeling and commenting (currently these are 'visit's)
-        return BaseResource.objects.filter(
-            variable__session__visitor__user=user,
-            variable__timestamp__gte=(datetime.now() - timedelta(days)),
-            variable__resource__isnull=False,
-            variable__name='visit')\
-            .only('short_id', 'created')\
-            .distinct()\
+        start, boundary = _activity_window(timezone.now() - timedelta(days))
+        last_accessed = dict(UserResourceDailyActivity.objects
+                             .filter(user=user, date__gte=start.date(), date__lt=boundary.date())
+                             .values('resource_id')
+                             .annotate(last_accessed=models.Max('last_accessed'))
+                             .values_list('resource_id', 'last_accessed'))
+        live = Variable.objects.filter(session__visitor__user=user,
+                                       timestamp__gte=max(start, boundary),
+                                       resource__isnull=False,
+                                       name='visit')\
+            .values('resource_id')\
+            .annotate(last_accessed=models.Max('timestamp'))\
+            .values_list('resource_id', 'last_accessed')
+        _merge(last_accessed, live, max)
+        ranked = _top(last_accessed, n_resources)
+        return _annotate_ranked(BaseResource.objects.only('short_id', 'created'),
+                                ranked, 'last_accessed', models.DateTimeField())\
             .annotate(public=F('raccess__public'),
                       discoverable=F('raccess__discoverable'),
-                      published=F('raccess__published'),
-                      last_accessed=models.Max('variable__timestamp'))\
-            .filter(variable__timestamp=F('last_accessed'))\
-            .order_by('-last_accessed')[:n_resources]
+                      published=F('raccess__published'))\
+            .order_by('-last_accessed')
 
     @classmethod
     def popular_resources(cls, n_resources=5, days=60, today=None):
         """
-        fetch the most recent n resources with which a specific user has interacted
+        fetch the n resources most visited by logged in users
 
         :param n_resources: the number of resources to return.
         :param days: the number of days to scan.
+        :param today: the end of the window, now by default.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the days that one scans. Thus, there is a tradeoff
-        between reporting history and timely responsiveness of the dashboard.
+        Complete days are read from ResourceDailyActivity; only the variables recorded after
+        the last rolled up day are scanned. The window is rounded to whole days.
         """
         # TODO: document actions like labeling and commenting (currently these are 'visit's)
         if today is None:
-            today = datetime.now()
-        return BaseResource.objects.filter(
-            variable__timestamp__gte=(today - timedelta(days)),
-            variable__timestamp__lt=(today),
-            variable__resource__isnull=False,
-            variable__name='visit')\
-            .distinct()\
-            .annotate(users=models.Count('variable__session__visitor__user'))\
-            .annotate(public=F('raccess__public'),
+            today = timezone.now()
+        start, boundary = _activity_window(today - timedelta(days))
+        users = {}
+        last_accessed = {}
+        for resource_id, user_visits, last_visit in ResourceDailyActivity.objects\
+                .filter(date__gte=start.date(), date__lt=min(boundary, today).date(), visits__gt=0)\
+                .values('resource_id')\
+                .annotate(users=models.Sum('user_visits'), last_accessed=models.Max('last_visit'))\
+                .values_list('resource_id', 'users', 'last_accessed'):
+            users[resource_id] = user_visits
+            last_accessed[resource_id] = last_visit
+        live = Variable.objects.filter(timestamp__gte=max(start, boundary),
+                                       timestamp__lt=today,
+                                       resource__isnull=False,
+                                       name='visit')\
+            .values('resource_id')\
+            .annotate(users=models.Count('session__visitor__user'),
+                      last_accessed=models.Max('timestamp'))\
+            .values_list('resource_id', 'users', 'last_accessed')
+        live = list(live)
+        _merge(users, ((resource_id, count) for resource_id, count, _ in live), lambda a, b: a + b)
+        _merge(last_accessed, ((resource_id, last) for resource_id, _, last in live), max)
+        ranked = _top(users, n_resources)
+        return _annotate_ranked(BaseResource.objects.all(), ranked, 'users', models.IntegerField())\
+            .annotate(last_accessed=_case(last_accessed, ranked, models.DateTimeField()),
+                      public=F('raccess__public'),
                       discoverable=F('raccess__discoverable'),
-                      published=F('raccess__published'),
-                      last_accessed=models.Max('variable__timestamp'))\
-            .order_by('-users')[:n_resources]
+                      published=F('raccess__published'))\
+            .order_by('-users')
 
     @classmethod
     def recent_users(cls, resource, n_users=5, days=60):
@@ -273,16 +354,171 @@ class Variable(models.Model):
         :param n_users: the number of users to return.
         :param days: the number of days to scan.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the number of days that one scans. Thus, there is a
-        tradeoff between reporting history and timely responsiveness of the dashboard.
+        Complete days are read from UserResourceDailyActivity; only the variables recorded after
+        the last rolled up day are scanned. The window is rounded to whole days.
         """
-        return User.objects\
-            .filter(visitor__session__variable__resource=resource,
-                    visitor__session__variable__name='visit',
-                    visitor__session__variable__timestamp__gte=(datetime.now()
-                                                                - timedelta(days)))\
-            .distinct()\
-            .annotate(last_accessed=models.Max('visitor__session__variable__timestamp'))\
-            .filter(visitor__session__variable__timestamp=F('last_accessed'))\
-            .order_by('-last_accessed')[:n_users]
+        start, boundary = _activity_window(timezone.now() - timedelta(days))
+        last_accessed = dict(UserResourceDailyActivity.objects
+                             .filter(resource=resource, date__gte=start.date(), date__lt=boundary.date())
+                             .values('user_id')
+                             .annotate(last_accessed=models.Max('last_accessed'))
+                             .values_list('user_id', 'last_accessed'))
+        live = Variable.objects.filter(resource=resource,
+                                       name='visit',
+                                       session__visitor__user__isnull=False,
+                                       timestamp__gte=max(start, boundary))\
+            .values('session__visitor__user_id')\
+            .annotate(last_accessed=models.Max('timestamp'))\
+            .values_list('session__visitor__user_id', 'last_accessed')
+        _merge(last_accessed, live, max)
+        ranked = _top(last_accessed, n_users)
+        return _annotate_ranked(User.objects.all(), ranked, 'last_accessed', models.DateTimeField())\
+            .order_by('-last_accessed')
+
+
+class ResourceDailyActivity(models.Model):
+    """
+    Daily rollup of the activity recorded for a resource
+
+    Rows are written for complete days by ResourceDailyActivity.rollup and are not updated afterwards,
+    so that the dashboard and tracking reports need not scan raw variables. Days are UTC days.
+    """
+    resource = models.ForeignKey(BaseResource, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField(db_index=True)
+    visits = models.IntegerField(default=0)
+    user_visits = models.IntegerField(default=0, help_text='visits by logged in users')
+    users = models.IntegerField(default=0, help_text='distinct logged in users who visited')
+    downloads = models.IntegerField(default=0)
+    app_launches = models.IntegerField(default=0)
+    last_visit = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('resource', 'date')
+
+    @classmethod
+    def last_rolled_up(cls):
+        """the last day that has been rolled up, None if there is none"""
+        return RolledUpDay.objects.aggregate(last=models.Max('date'))['last']
+
+    @classmethod
+    def rollup(cls, day):
+        """
+        (re)compute the resource and user activity of one day from its variables
+
+        :param day: the date to roll up.
+        :return: the number of resources with activity that day.
+        """
+        start = timezone.make_aware(datetime.combine(day, time.min), dt_timezone.utc)
+        variables = Variable.objects.filter(timestamp__gte=start,
+                                            timestamp__lt=start + timedelta(days=1),
+                                            resource__isnull=False)
+        visit = models.Q(name='visit')
+        resource_activity = [
+            cls(date=day, **fields) for fields in variables
+            .values('resource_id')
+            .annotate(visits=models.Count('id', filter=visit),
+                      user_visits=models.Count('session__visitor__user', filter=visit),
+                      users=models.Count('session__visitor__user', filter=visit, distinct=True),
+                      downloads=models.Count('id', filter=models.Q(name__in=('download', 'resource_download'))),
+                      app_launches=models.Count('id', filter=models.Q(name='app_launch')),
+                      last_visit=models.Max('timestamp', filter=visit))
+            .order_by()]
+        user_activity = [
+            UserResourceDailyActivity(date=day, user_id=fields['session__visitor__user_id'],
+                                      resource_id=fields['resource_id'], visits=fields['visits'],
+                                      last_accessed=fields['last_accessed'])
+            for fields in variables
+            .filter(visit, session__visitor__user__isnull=False)
+            .values('session__visitor__user_id', 'resource_id')
+            .annotate(visits=models.Count('id'), last_accessed=models.Max('timestamp'))
+            .order_by()]
+
+        with transaction.atomic():
+            cls.objects.filter(date=day).delete()
+            UserResourceDailyActivity.objects.filter(date=day).delete()
+            cls.objects.bulk_create(resource_activity, batch_size=1000)
+            UserResourceDailyActivity.objects.bulk_create(user_activity, batch_size=1000)
+            # days without activity have no rows, the marker records that the day has been rolled up
+            RolledUpDay.objects.update_or_create(date=day)
+        return len(resource_activity)
+
+    @classmethod
+    def rollup_pending(cls, today=None):
+        """
+        roll up each complete day after the last rolled up day
+
+        :param today: the first day not to roll up, today (UTC) by default.
+        :return: the days rolled up.
+        """
+        if today is None:
+            today = timezone.now().date()
+        last = cls.last_rolled_up()
+        if last is not None:
+            day = last + timedelta(days=1)
+        else:
+            first = Variable.objects.aggregate(first=models.Min('timestamp'))['first']
+            if first is None:
+                return []
+            day = first.astimezone(dt_timezone.utc).date()
+        days = []
+        while day < today:
+            cls.rollup(day)
+            days.append(day)
+            day += timedelta(days=1)
+        return days
+
+
+class RolledUpDay(models.Model):
+    """A day that has been rolled up by ResourceDailyActivity.rollup, whether or not it had activity"""
+    date = models.DateField(unique=True)
+    rolled_up = models.DateTimeField(auto_now=True)
+
+
+class UserResourceDailyActivity(models.Model):
+    """Daily rollup of the visits of a logged in user to a resource; see ResourceDailyActivity"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_activity')
+    resource = models.ForeignKey(BaseResource, on_delete=models.CASCADE, related_name='user_daily_activity')
+    date = models.DateField(db_index=True)
+    visits = models.IntegerField(default=0)
+    last_accessed = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'resource', 'date')
+
+
+def _activity_window(start):
+    """
+    Round the start of an activity window down to a whole day and find where the rollups end
+
+    :return: (start, boundary), the aware start of the window and the start of the first day
+        that has not been rolled up; variables from boundary on must be scanned.
+    """
+    start = timezone.make_aware(datetime.combine(start.astimezone(dt_timezone.utc).date(), time.min),
+                                dt_timezone.utc)
+    last = ResourceDailyActivity.last_rolled_up()
+    if last is None:
+        return start, start
+    boundary = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min), dt_timezone.utc)
+    return start, boundary
+
+
+def _merge(totals, items, combine):
+    for key, value in items:
+        totals[key] = combine(totals[key], value) if key in totals else value
+
+
+def _top(values, n):
+    """the n keys with the largest values, with their values"""
+    return dict(sorted(values.items(), key=lambda item: item[1], reverse=True)[:n])
+
+
+def _case(values, ranked, output_field):
+    return models.Case(*[models.When(id=key, then=models.Value(values[key])) for key in ranked],
+                       default=None, output_field=output_field)
+
+
+def _annotate_ranked(queryset, ranked, name, output_field):
+    """restrict queryset to the keys in ranked, annotated with their values as name"""
+    if not ranked:
+        return queryset.none().annotate(**{name: models.Value(None, output_field=output_field)})
+    return queryset.filter(id__in=list(ranked)).annotate(**{name: _case(ranked, ranked, output_field)})
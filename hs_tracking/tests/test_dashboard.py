@@ -1,11 +1,13 @@
 import socket
+from datetime import timedelta
 
 from django.contrib.auth.models import Group
 from django.test import Client, TestCase
+from django.utils import timezone
 from rest_framework import status
 
 from hs_core import hydroshare
-from hs_tracking.models import Variable
+from hs_tracking.models import ResourceDailyActivity, Session, UserResourceDailyActivity, Variable, Visitor
 
 
 class TestDashboard(TestCase):
@@ -95,3 +97,68 @@ class TestDashboard(TestCase):
         self.assertEqual(one.last_resource_id, self.holes.short_id)
         self.assertEqual(one.landing, True)
         self.assertEqual(one.rest, False)
+
+    def test_rollup(self):
+        """ rolled up days and live variables are combined """
+
+        visitor, _ = Visitor.objects.get_or_create(user=self.dog)
+        session = Session.objects.create(visitor=visitor)
+        anonymous = Session.objects.create(visitor=Visitor.objects.create())
+        two_days_ago = timezone.now() - timedelta(days=2)
+        session.record('visit', resource=self.holes)
+        session.record('visit', resource=self.holes)
+        anonymous.record('visit', resource=self.holes)
+        session.record('download', resource=self.holes)
+        Variable.objects.update(timestamp=two_days_ago)
+
+        ResourceDailyActivity.rollup_pending()
+        activity = ResourceDailyActivity.objects.get(resource=self.holes)
+        self.assertEqual(activity.date, two_days_ago.date())
+        self.assertEqual(activity.visits, 3)
+        self.assertEqual(activity.user_visits, 2)
+        self.assertEqual(activity.users, 1)
+        self.assertEqual(activity.downloads, 1)
+        user_activity = UserResourceDailyActivity.objects.get(user=self.dog, resource=self.holes)
+        self.assertEqual(user_activity.visits, 2)
+        self.assertEqual(ResourceDailyActivity.last_rolled_up(), (timezone.now() - timedelta(days=1)).date())
+        # yesterday had no activity, and is not rolled up again
+        self.assertFalse(ResourceDailyActivity.objects.filter(date=(timezone.now() - timedelta(days=1)).date()))
+        self.assertEqual(ResourceDailyActivity.rollup_pending(), [])
+
+        # today's variables have not been rolled up
+        session.record('visit', resource=self.squirrels)
+        session.record('visit', resource=self.holes)
+
+        recent = Variable.recent_resources(self.dog)
+        self.assertEqual([r.short_id for r in recent], [self.holes.short_id, self.squirrels.short_id])
+        popular = Variable.popular_resources()
+        self.assertEqual([(r.short_id, r.users) for r in popular],
+                         [(self.holes.short_id, 3), (self.squirrels.short_id, 1)])
+        self.assertEqual(list(Variable.recent_users(self.holes)), [self.dog])
+        self.assertEqual(Variable.recent_resources(self.dog, n_resources=1).count(), 1)
+
+        # pruning keeps the variables that have not been rolled up
+        Variable.objects.filter(timestamp__lt=two_days_ago + timedelta(minutes=1)).delete()
+        recent = Variable.recent_resources(self.dog, days=3)
+        self.assertEqual(recent.count(), 2)
+
+    def test_cleanup(self):
+        """ variables older than the cut-off are pruned once their days have been rolled up """
+
+        from hs_core.tasks import nightly_hs_tracking_cleanup
+
+        session = Session.objects.create(visitor=Visitor.objects.create())
+        session.record('visit', resource=self.holes)
+        Variable.objects.update(timestamp=timezone.now() - timedelta(days=70))
+        session.record('visit', resource=self.holes)
+
+        # nothing is pruned before the days have been rolled up
+        nightly_hs_tracking_cleanup()
+        self.assertEqual(Variable.objects.count(), 2)
+
+        # the quiet days after the first visit are rolled up too, only today's visit is kept
+        ResourceDailyActivity.rollup_pending()
+        self.assertEqual(ResourceDailyActivity.objects.count(), 1)
+        self.assertEqual(ResourceDailyActivity.last_rolled_up(), (timezone.now() - timedelta(days=1)).date())
+        nightly_hs_tracking_cleanup()
+        self.assertEqual(Variable.objects.count(), 1)
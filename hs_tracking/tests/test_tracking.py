@@ -8,14 +8,17 @@ from pprint import pprint
 
 from django.contrib.auth.models import Group, User
 from django.http import HttpRequest, QueryDict, response
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
 from mock import Mock, patch
 
 import hs_tracking.utils as utils
 from hs_core import hydroshare
 from hs_tools_resource.models import RequestUrlBase
+from hs_tracking.buffer import VariableBuffer
 from hs_tracking.models import (SESSION_TIMEOUT, VISITOR_FIELDS, Session,
-                                Variable, Visitor)
+                                Variable, Visitor, _session_cache_key)
 from hs_tracking.views import AppLaunch
 
 
@@ -257,6 +260,50 @@ class TrackingTests(TestCase):
         self.assertNotEqual(session1.id, session2.id)
         self.assertNotEqual(session1.visitor.id, session2.visitor.id)
 
+    def test_for_request_cached(self):
+        request = self.createRequest(user=self.user)
+        request.session = {}
+        session1 = Session.objects.for_request(request)
+        # an active session is read from the cache
+        with self.assertNumQueries(0):
+            session2 = Session.objects.for_request(request)
+        self.assertEqual(session1.id, session2.id)
+        self.assertEqual(session2.visitor.user.id, self.user.id)
+        # only the ids are cached, not the model instances
+        self.assertEqual(cache.get(_session_cache_key(session1.id))[:3],
+                         (session1.id, session1.visitor.id, self.user.id))
+
+    @override_settings(TRACKING_BUFFERED=True)
+    def test_record_buffered(self):
+        resource = hydroshare.create_resource(resource_type='CompositeResource', owner=self.user,
+                                              title='Test Resource')
+        buffer = VariableBuffer(batch_size=2, flush_interval=3600)
+        with patch('hs_tracking.models.variable_buffer', buffer), \
+                patch.object(buffer, '_ensure_worker'):
+            self.session.record_buffered('visit', value='request_url=/', landing=True)
+            self.session.record_buffered('visit', value='request_url=/resource/', resource_id=resource.short_id)
+            self.session.record_buffered('visit', value='request_url=/resource/', resource_id='0' * 32, rest=True)
+        recorded = timezone.now()
+        # nothing is written in the request
+        self.assertEqual(Variable.objects.filter(name='visit').count(), 0)
+        self.assertEqual(len(buffer), 3)
+
+        buffer.flush()
+        self.assertEqual(len(buffer), 0)
+        visits = list(Variable.objects.filter(name='visit').order_by('id'))
+        self.assertEqual(len(visits), 3)
+        self.assertTrue(visits[0].landing)
+        self.assertEqual(visits[0].get_value(), 'request_url=/')
+        self.assertEqual(visits[1].resource, resource)
+        self.assertEqual(visits[1].last_resource_id, resource.short_id)
+        self.assertIsNone(visits[2].resource)
+        self.assertEqual(visits[2].last_resource_id, '0' * 32)
+        self.assertTrue(visits[2].rest)
+        for visit in visits:
+            self.assertEqual(visit.session_id, self.session.id)
+            # variables are timestamped when they are recorded, not when they are written
+            self.assertLessEqual(visit.timestamp, recorded)
+
     def test_export_visitor_info(self):
         request = self.createRequest(user=self.user)
         request.session = {}
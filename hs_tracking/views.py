@@ -55,7 +55,12 @@ class AppLaunch(TemplateView):
 
             # format and save the log message
             msg = Variable.format_kwargs(**fields)
-            session.record('app_launch', value=msg)
+
+            # attribute the launch to the resource it was launched from, if any
+            res_id = fields.get('res_id')
+            if not (isinstance(res_id, str) and len(res_id) == 32):
+                res_id = None
+            session.record('app_launch', value=msg, resource_id=res_id)
 
         return HttpResponseRedirect(url)
 
@@ -575,6 +575,7 @@ MIDDLEWARE = (
     "hs_core.robots.RobotFilter",
     "hs_tracking.middleware.Tracking",
     "hs_core.middleware.HSClientMiddleware",
+    "hs_core.middleware.MetadataSyncMiddleware",
 )
 
 HSCLIENT_MIN_VERSION = "1.1.6"
@@ -800,6 +801,19 @@ TRACKING_PROFILE_FIELDS = [
     "country",
 ]
 TRACKING_USER_FIELDS = ["username", "email", "first_name", "last_name"]
+# fraction of page visits that are logged
+TRACKING_SAMPLING_RATE = 1.0
+# page visits are buffered in each process and written in batches by a background thread
+TRACKING_BUFFERED = True
+TRACKING_BUFFER_SIZE = 10000  # the oldest buffered visits are dropped beyond this
+TRACKING_BATCH_SIZE = 500
+TRACKING_FLUSH_INTERVAL = 5  # seconds
+
+# resource view and download counts are accumulated in Redis and flushed to the database periodically
+RESOURCE_COUNTERS_BUFFERED = True
+
+# folder listings of the file browser are cached per resource content version, for at most this long
+FOLDER_LISTING_CACHE_TIMEOUT = 3600  # seconds
 
 
 # Content Security Policy
@@ -943,6 +957,20 @@ AWS_S3_ENDPOINT_URL_PUBLIC = 'http://localhost:9000'
 ACCESS_CONTROL_CHANGE_ENDPOINT = None
 PUBLISHER_USER_NAME = "published"
 MINIO_LIFECYCLE_POLICY = None
+
+# streaming zip engine used by S3Storage.zipup
+S3_ZIP_MAX_WORKERS = 8  # threads fetching byte ranges concurrently
+S3_ZIP_PREFETCH = 16  # byte ranges fetched ahead of the zip writer
+S3_STREAM_ZIP_CHUNKING_SIZE = 1024 * 1024 * 8  # 8MB ranged reads, at most S3_ZIP_PREFETCH of them are held in memory
+
+# server side copy engine used by S3Storage.copyFiles and moveFile
+S3_COPY_MAX_WORKERS = 16  # copy requests running concurrently
+S3_COPY_PART_SIZE = 1024 * 1024 * 512  # part size for multipart copies of objects over 5GB
+S3_COPY_PROGRESS_INTERVAL = 5  # seconds between two task progress updates
+
+# zip extraction engine used by S3Storage.unzip
+S3_UNZIP_MAX_WORKERS = 8  # members extracted concurrently
+S3_UNZIP_PART_SIZE = 1024 * 1024 * 16  # members larger than this are uploaded with multipart uploads
 DEFAULT_QUOTA_VALUE = 20
 DEFAULT_QUOTA_UNIT = "GB"
 
@@ -999,6 +1027,12 @@ if any('pytest' in arg for arg in sys.argv) or 'test' in sys.argv:
     }
 
     TESTING = True
+    # write tracking variables in the request thread, within the test transaction
+    TRACKING_BUFFERED = False
+    # count resource views and downloads in the database, within the test transaction
+    RESOURCE_COUNTERS_BUFFERED = False
+    # resource ids are reused across tests, do not cache folder listings
+    FOLDER_LISTING_CACHE_TIMEOUT = 0
 
 ####################
 # DYNAMIC SETTINGS #
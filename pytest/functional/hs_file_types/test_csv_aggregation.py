@@ -6,6 +6,7 @@ from django.core.files.uploadedfile import UploadedFile
 
 from hs_core.hydroshare import add_file_to_resource
 from hs_file_types.models import CSVLogicalFile, CSVMetaSchemaModel, CSVFileMetaData
+from hs_file_types.models import csv as csv_module
 
 
 @pytest.mark.django_db(transaction=True)
@@ -233,6 +234,24 @@ def test_create_csv_aggregation_column_data_types(composite_resource, use_csv_wi
         assert col.column_number == col_number
 
 
+@pytest.mark.parametrize("head_data_rows", [1010, 2])
+def test_profile_csv(monkeypatch, head_data_rows):
+    # here we are testing that profiling a csv file finds the number of data rows and the number of
+    # empty values in each column, also when only the first couple of data rows of the file are used to
+    # find the delimiter, the header row and the column data types
+
+    monkeypatch.setattr(csv_module, '_PROFILE_HEAD_DATA_ROWS', head_data_rows)
+    with open('pytest/assets/csv_with_missing_data.csv', newline='') as csv_file:
+        profile = CSVLogicalFile._profile_csv(csv_file)
+
+    csv_meta_schema_model = CSVMetaSchemaModel(**profile.table_schema)
+    assert csv_meta_schema_model.rows == 6
+    assert csv_meta_schema_model.delimiter == ","
+    assert [col.titles for col in csv_meta_schema_model.table.columns] == [f"Col-{n}" for n in range(1, 6)]
+    assert profile.null_counts == [0, 1, 1, 0, 0]
+    assert profile.preview_data.startswith("Col-1,Col-2,Col-3,Col-4,Col-5")
+
+
 @pytest.mark.django_db(transaction=True)
 def test_create_csv_aggregation_from_one_data_column_file(composite_resource):
     # here we are testing that we can create a CSV file type aggregation from a csv file that
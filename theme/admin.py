@@ -73,8 +73,8 @@ class QuotaAdmin(admin.ModelAdmin):
     list_display = ('user', 'allocated_value', 'unit', 'zone')
     list_filter = ('zone',)
 
-    readonly_fields = ('user', 'data_zone_value')
-    fields = ('allocated_value', 'unit', 'zone', 'user', 'data_zone_value')
+    readonly_fields = ('user', 'data_zone_value', 'used_size_reconciled')
+    fields = ('allocated_value', 'unit', 'zone', 'user', 'data_zone_value', 'used_size_reconciled')
     search_fields = ('user__username',)
 
 
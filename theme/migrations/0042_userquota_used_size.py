@@ -0,0 +1,42 @@
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_used_size(apps, schema_editor):
+    """Initialize the quota usage ledger from the cached sizes of the files of the resources each user holds.
+    The ledger is reconciled with the bucket usage in MinIO by the nightly_reconcile_quota_usage task."""
+    BaseResource = apps.get_model('hs_core', 'BaseResource')
+    ResourceFile = apps.get_model('hs_core', 'ResourceFile')
+    UserQuota = apps.get_model('theme', 'UserQuota')
+
+    res_sizes = ResourceFile.objects.filter(_size__gt=0).order_by().values('object_id') \
+        .annotate(size=Sum('_size'))
+    res_sizes = {r['object_id']: r['size'] for r in res_sizes}
+    used_sizes = {}
+    quota_holders = BaseResource.objects.filter(quota_holder__isnull=False).values_list('id', 'quota_holder_id')
+    for res_id, quota_holder_id in quota_holders.iterator():
+        used_sizes[quota_holder_id] = used_sizes.get(quota_holder_id, 0) + res_sizes.get(res_id, 0)
+    for user_id, used_size in used_sizes.items():
+        UserQuota.objects.filter(user_id=user_id, zone='hydroshare').update(used_size=used_size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0088_re_populate_resource_cached_metadata'),
+        ('theme', '0041_remove_quotamessage_enforce_quota_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userquota',
+            name='used_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userquota',
+            name='used_size_reconciled',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_used_size, migrations.RunPython.noop),
+    ]
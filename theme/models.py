@@ -241,12 +241,68 @@ class UserQuota(models.Model):
 
     zone = models.CharField(max_length=100, default="hydroshare")
 
+    # bytes held by the user in the zone. This ledger is updated incrementally as files of the resources the user
+    # is quota holder of are added, deleted or replaced and as resources change quota holder, and it is
+    # periodically reconciled with the usage of the user bucket in MinIO (see reconcile_used_size)
+    used_size = models.BigIntegerField(default=0)
+    used_size_reconciled = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = _("User quota")
         verbose_name_plural = _("User quotas")
         unique_together = ("user", "zone")
 
+    def save(self, *args, **kwargs):
+        # the used size ledger is only changed with single UPDATE statements (see update_used_size and
+        # reconcile_used_size), saving the instance must not overwrite it with the value loaded with the instance
+        if self.pk and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in ("used_size", "used_size_reconciled")]
+        super(UserQuota, self).save(*args, **kwargs)
+
+    @classmethod
+    def update_used_size(cls, user_id, delta, zone="hydroshare"):
+        """
+        Add delta bytes (which may be negative) to the used size of the user in a single UPDATE, without reading
+        the quota row first so that concurrent updates are not lost
+        :param user_id: id of the user to update the used size for; nothing is done if it is None
+        :param delta: the number of bytes to add to the used size
+        """
+        if user_id is None or not delta:
+            return
+        cls.objects.filter(user_id=user_id, zone=zone).update(used_size=models.F("used_size") + delta)
+
+    def _bucket_size(self):
+        """Return the total size in bytes of the objects in the user bucket in MinIO"""
+        istorage = S3Storage()
+        bucket_name = self.user.userprofile.bucket_name
+        if not istorage.bucket_exists(bucket_name):
+            return 0
+        return istorage.bucket_size(bucket_name)
+
+    def reconcile_used_size(self):
+        """
+        Reconcile the used size ledger with the usage of the user bucket in MinIO.
+        The difference is applied as an increment so that ledger updates made while the bucket is being listed
+        are kept.
+        :return: the difference in bytes between the bucket usage and the ledger before reconciliation
+        """
+        used_size = UserQuota.objects.filter(pk=self.pk).values_list("used_size", flat=True).first() or 0
+        drift = self._bucket_size() - used_size
+        reconciled = timezone.now()
+        UserQuota.objects.filter(pk=self.pk).update(used_size=models.F("used_size") + drift,
+                                                    used_size_reconciled=reconciled)
+        self.used_size = used_size + drift
+        self.used_size_reconciled = reconciled
+        return drift
+
     def _allocated_value_size_and_unit(self):
+        # allocated quota is stored in MinIO, query it once per instance
+        if getattr(self, "_allocated", None) is None:
+            self._allocated = self._query_allocated_value_size_and_unit()
+        return self._allocated
+
+    def _query_allocated_value_size_and_unit(self):
         try:
             result = subprocess.run(
                 ["mc", "quota", "info", f"{self.zone}/{self.user.userprofile.bucket_name}"],
@@ -285,25 +341,11 @@ class UserQuota(models.Model):
             )
         except subprocess.CalledProcessError as e:
             raise ValidationError(f"Error setting quota: {e}")
+        self._allocated = None
 
     def _size_and_unit(self):
-        try:
-            result = subprocess.run(
-                ["mc", "stat", f"{self.zone}/{self.user.userprofile.bucket_name}"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                text=True,
-            )
-        except (subprocess.CalledProcessError, ValueError, IndexError):
-            # return a default value of 0 and default unit
-            return float(0), settings.DEFAULT_QUOTA_UNIT
-        size_with_unit_str = result.stdout.split("Total size: ")[1].split("\n")[0]
-        size_and_unit = size_with_unit_str.split(" ")
-        size = size_and_unit[0]
-        unit = size_and_unit[1]
-        unit = unit.replace("i", "")
-        return float(size), unit
+        # the used size is read from the ledger instead of querying the bucket usage in MinIO
+        return float(max(self.used_size, 0)), "B"
 
     @property
     def data_zone_value(self):